@@ -59,6 +59,27 @@ async def startup_event():
     finally:
         db.close()
 
+    # 按 Widget refresh_interval 后台刷新 Dashboard 数据（多 worker 时只有租约持有者执行）
+    from app.services.dashboard_refresh_scheduler import dashboard_refresh_scheduler
+    dashboard_refresh_scheduler.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时停止 Dashboard 自动刷新，释放 SQL 执行线程池、目标数据库连接池、Milvus 客户端和 Neo4j 驱动，并落盘查询历史索引"""
+    from app.services.dashboard_refresh_scheduler import dashboard_refresh_scheduler
+    await dashboard_refresh_scheduler.stop()
+    from app.services.sql_execution_service import sql_execution_service
+    from app.services.db_engine_registry import db_engine_registry
+    from app.services.hybrid_retrieval.storage.milvus_client_pool import milvus_client_pool
+    from app.services.neo4j_service import neo4j_service
+    from app.services.query_history_index import query_history_index
+    sql_execution_service.shutdown()
+    db_engine_registry.dispose_all()
+    milvus_client_pool.close_all()
+    query_history_index.flush_all()
+    await neo4j_service.close_async()
+
 
 # 强制重新加载 - 修复路由问题
 
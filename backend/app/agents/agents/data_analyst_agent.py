@@ -399,7 +399,7 @@ class DataAnalystAgent:
             # 将值列表转换为字典列表（如果需要）
             data = []
             for row in raw_data:
-                if isinstance(row, list) and len(row) == len(columns):
+                if isinstance(row, (list, tuple)) and len(row) == len(columns):
                     # 值列表格式 -> 转换为字典
                     data.append(dict(zip(columns, row)))
                 elif isinstance(row, dict):
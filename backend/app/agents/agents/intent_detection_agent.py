@@ -199,7 +199,7 @@ async def detect_intent_with_llm(query: str) -> IntentResult:
             HumanMessage(content=f"请分析以下查询:\n\n{query}")
         ]
         
-        response = await llm.ainvoke(messages)
+        response = await llm.ainvoke(messages, cache=True)
         content = response.content.strip()
         
         # 提取 JSON
@@ -2,6 +2,7 @@
 SQL执行代理
 负责安全地执行SQL查询并处理结果
 """
+import time
 from typing import Dict, Any
 
 from langchain_core.runnables import RunnableConfig
@@ -11,10 +12,11 @@ from langgraph.prebuilt import create_react_agent
 
 from app.core.state import SQLMessageState, SQLExecutionResult, extract_connection_id
 from app.core.agent_config import get_agent_llm, CORE_AGENT_SQL_GENERATOR
+from app.core.config import settings
 
 
 @tool
-def execute_sql_query(sql_query: str, connection_id, timeout: int = 30) -> Dict[str, Any]:
+async def execute_sql_query(sql_query: str, connection_id, timeout: int = 30) -> Dict[str, Any]:
     """
     执行SQL查询
 
@@ -26,39 +28,34 @@ def execute_sql_query(sql_query: str, connection_id, timeout: int = 30) -> Dict[
     Returns:
         查询执行结果
     """
+    start_time = time.time()
     try:
-        # 根据connection_id获取数据库连接并执行查询
-        from app.services.db_service import get_db_connection_by_id, execute_query_with_connection
+        from app.services.sql_execution_service import sql_execution_service
 
-        # 获取数据库连接
-        connection = get_db_connection_by_id(connection_id)
-        if not connection:
-            return {
-                "success": False,
-                "error": f"找不到连接ID为 {connection_id} 的数据库连接"
-            }
-
-        # 执行查询
-        result_data = execute_query_with_connection(connection, sql_query)
+        # 在专用线程池中执行（服务端游标流式拉取，超过行数上限截断；超时/取消会中止数据库端查询）
+        result = await sql_execution_service.execute_by_id(
+            int(connection_id), sql_query, timeout=timeout
+        )
 
         return {
             "success": True,
             "data": {
-                "columns": list(result_data[0].keys()) if result_data else [],
-                "data": [list(row.values()) for row in result_data],
-                "row_count": len(result_data),
-                "column_count": len(result_data[0].keys()) if result_data else 0
+                "columns": result.columns,
+                "data": result.rows,
+                "row_count": result.row_count,
+                "column_count": len(result.columns),
+                "truncated": result.truncated
             },
             "error": None,
-            "execution_time": 0,
-            "rows_affected": len(result_data)
+            "execution_time": round(time.time() - start_time, 3),
+            "rows_affected": result.row_count
         }
 
     except Exception as e:
         return {
             "success": False,
             "error": str(e),
-            "execution_time": 0
+            "execution_time": round(time.time() - start_time, 3)
         }
 
 
@@ -110,7 +107,7 @@ class SQLExecutorAgent:
             raw_result = await execute_sql_query.ainvoke({
                 "sql_query": sql_query,
                 "connection_id": connection_id,
-                "timeout": 30
+                "timeout": settings.SQL_DEFAULT_TIMEOUT
             })
 
             if not isinstance(raw_result, dict):
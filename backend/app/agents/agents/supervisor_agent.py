@@ -10,6 +10,7 @@
 - 消息历史裁剪优化 token 消耗
 """
 from typing import Dict, Any, List, Optional
+import asyncio
 import logging
 
 from langgraph_supervisor import create_supervisor
@@ -263,8 +264,9 @@ class SupervisorAgent:
             
             db = SessionLocal()
             try:
-                # 获取相关表结构
-                schema_context = retrieve_relevant_schema(
+                # 获取相关表结构（同步 LLM/Neo4j 调用，放到线程中执行避免阻塞事件循环）
+                schema_context = await asyncio.to_thread(
+                    retrieve_relevant_schema,
                     db=db,
                     connection_id=connection_id,
                     query=user_query
@@ -259,7 +259,7 @@ async def relationship_analyzer_node(state: DashboardInsightState) -> Dict[str,
             return {"relationship_context": None, "current_stage": "relationship_done"}
         
         connection_id = state.get("connection_id", 1)
-        relationship_context = graph_relationship_service.query_table_relationships(
+        relationship_context = await graph_relationship_service.query_table_relationships(
             connection_id, table_names
         )
         
@@ -382,12 +382,12 @@ async def sql_executor_node(state: DashboardInsightState) -> Dict[str, Any]:
         if not sql:
             raise ValueError("没有找到需要执行的 SQL 语句")
         
-        result_json = execute_sql_query.invoke({
+        result_json = await execute_sql_query.ainvoke({
             "sql_query": sql,
             "connection_id": connection_id,
             "timeout": 30
         })
-        result = json.loads(result_json)
+        result = json.loads(result_json) if isinstance(result_json, str) else result_json
         elapsed_ms = int((time.time() - start_time) * 1000)
         
         # P0: 收集执行元数据到 lineage
@@ -407,7 +407,7 @@ async def sql_executor_node(state: DashboardInsightState) -> Dict[str, Any]:
             
             formatted_data = []
             for row in rows:
-                if isinstance(row, list) and len(row) == len(columns):
+                if isinstance(row, (list, tuple)) and len(row) == len(columns):
                     formatted_data.append(dict(zip(columns, row)))
                 elif isinstance(row, dict):
                     formatted_data.append(row)
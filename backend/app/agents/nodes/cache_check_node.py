@@ -241,7 +241,7 @@ def _send_cache_hit_stream_events(
         # 转换数据格式
         rows = []
         for raw_row in raw_rows:
-            if isinstance(raw_row, list) and len(raw_row) == len(columns):
+            if isinstance(raw_row, (list, tuple)) and len(raw_row) == len(columns):
                 rows.append(dict(zip(columns, raw_row)))
             elif isinstance(raw_row, dict):
                 rows.append(raw_row)
@@ -325,7 +325,7 @@ async def cache_check_node(state: SQLMessageState, writer: StreamWriter) -> Dict
     # 2. 检查缓存
     try:
         cache_service = get_cache_service()
-        cache_hit = await cache_service.check_cache(user_query, connection_id)
+        cache_hit = await cache_service.check_cache(user_query, connection_id, state.get("tenant_id"))
         
         elapsed_ms = int((time.time() - start_time) * 1000)
         
@@ -368,7 +368,7 @@ async def cache_check_node(state: SQLMessageState, writer: StreamWriter) -> Dict
                 try:
                     from app.agents.agents.sql_executor_agent import execute_sql_query
                     
-                    exec_result_str = execute_sql_query.invoke({
+                    exec_result_str = await execute_sql_query.ainvoke({
                         "sql_query": clean_sql,
                         "connection_id": connection_id,
                         "timeout": 30
@@ -287,7 +287,7 @@ def thread_history_check_node(state: SQLMessageState, writer: StreamWriter) -> D
         # 转换数据格式
         rows = []
         for raw_row in raw_rows:
-            if isinstance(raw_row, list) and len(raw_row) == len(columns):
+            if isinstance(raw_row, (list, tuple)) and len(raw_row) == len(columns):
                 rows.append(dict(zip(columns, raw_row)))
             elif isinstance(raw_row, dict):
                 rows.append(raw_row)
@@ -18,7 +18,7 @@ LangGraph 规范:
 """
 import logging
 import time
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from langgraph.types import StreamWriter
 from langchain_core.messages import AIMessage
@@ -132,6 +132,9 @@ async def sql_executor_node(state: SQLMessageState, writer: StreamWriter) -> Dic
     ))
     
     try:
+        # 执行前探测源表版本，缓存条目记录的是执行前的版本，执行期间的写入会使其失效
+        source_table_versions = await _probe_source_table_versions(state)
+        
         agent = get_custom_agent(state, "sql_executor", sql_executor_agent)
         result = await agent.process(state)
         
@@ -194,6 +197,9 @@ async def sql_executor_node(state: SQLMessageState, writer: StreamWriter) -> Dic
         ))
         
         logger.info(f"[Worker] sql_executor 完成 ({elapsed_ms}ms)")
+        if source_table_versions is not None:
+            result["source_table_versions"] = source_table_versions
+        await _store_result_in_cache(state, result)
         result["current_stage"] = "execution_done"
         return result
         
@@ -217,6 +223,83 @@ async def sql_executor_node(state: SQLMessageState, writer: StreamWriter) -> Dic
         }
 
 
+def _cacheable_user_query(state: SQLMessageState) -> Optional[str]:
+    """
+    返回可写入精确缓存的用户查询，不可缓存时返回 None
+    
+    经过澄清补充条件的查询不缓存，避免把带条件的结果返回给原始问题。
+    """
+    from app.agents.nodes.base import extract_user_query
+    
+    user_query = extract_user_query(state.get("messages", []))
+    if not (state.get("connection_id") and user_query):
+        return None
+    enriched_query = state.get("enriched_query")
+    if enriched_query and enriched_query.strip() != user_query.strip():
+        return None
+    return user_query
+
+
+async def _probe_source_table_versions(state: SQLMessageState) -> Optional[Dict[str, Optional[str]]]:
+    """
+    执行 SQL 前探测其源表的数据版本（访问目标库，放到线程池执行）
+    
+    结果不会写入缓存时返回 None。
+    """
+    import asyncio
+    from functools import partial
+    from app.services.query_cache_service import get_cache_service
+    
+    sql = state.get("generated_sql")
+    if not (sql and _cacheable_user_query(state)):
+        return None
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(
+            get_cache_service().probe_table_versions, state.get("connection_id"), sql
+        ))
+    except Exception as e:
+        logger.warning(f"[Worker] sql_executor 源表版本探测失败: {e}")
+        return None
+
+
+async def _store_result_in_cache(state: SQLMessageState, result: Dict[str, Any]) -> None:
+    """
+    SQL 执行成功后写入全局精确缓存
+    
+    键与 cache_check_node 查询时一致（用户查询 + connection_id + tenant_id）。
+    条目记录执行前探测的源表版本（source_table_versions），没有时才在写入时探测，
+    写入可能访问目标库，因此放到线程池执行。
+    """
+    import asyncio
+    from dataclasses import asdict, is_dataclass
+    from functools import partial
+    from app.services.query_cache_service import get_cache_service
+    
+    try:
+        connection_id = state.get("connection_id")
+        sql = result.get("generated_sql") or state.get("generated_sql")
+        exec_result = result.get("execution_result")
+        user_query = _cacheable_user_query(state)
+        if not (sql and exec_result and user_query):
+            return
+        
+        payload = asdict(exec_result) if is_dataclass(exec_result) else dict(exec_result)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, partial(
+            get_cache_service().store_result,
+            user_query,
+            connection_id,
+            sql,
+            payload,
+            tenant_id=state.get("tenant_id"),
+            table_versions=result.get("source_table_versions")
+        ))
+    except Exception as e:
+        # 缓存写入失败不影响主流程
+        logger.warning(f"[Worker] sql_executor 结果写入缓存失败: {e}")
+
+
 # ============================================================================
 # Data Analyst 节点
 # ============================================================================
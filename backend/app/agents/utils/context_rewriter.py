@@ -202,7 +202,7 @@ async def rewrite_query_with_context(
     try:
         # 使用 LLMWrapper 统一处理重试和超时
         llm = get_agent_llm(CORE_AGENT_SQL_GENERATOR, use_wrapper=True)
-        response = await llm.ainvoke([HumanMessage(content=prompt)])
+        response = await llm.ainvoke([HumanMessage(content=prompt)], cache=True)
         
         rewritten = response.content.strip()
         
@@ -32,6 +32,31 @@ def read_connections(
     return connections
 
 
+@router.get("/pool-stats", response_model=Dict[str, Any])
+def read_pool_stats(
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Get connection pool statistics (checkouts, wait time) for current user's tenant.
+    """
+    if not current_user.tenant_id:
+        raise HTTPException(status_code=403, detail="User is not associated with a tenant")
+
+    from app.services.db_engine_registry import db_engine_registry
+
+    tenant_connection_ids = {
+        c.id for c in crud.db_connection.get_multi_by_tenant(
+            db, tenant_id=current_user.tenant_id, limit=1000
+        )
+    }
+    stats = db_engine_registry.get_stats()
+    stats["pools"] = {
+        cid: pool for cid, pool in stats["pools"].items() if cid in tenant_connection_ids
+    }
+    stats["engine_count"] = len(stats["pools"])
+    return stats
+
 
 @router.post("/", response_model=schemas.DBConnection)
 def create_connection(
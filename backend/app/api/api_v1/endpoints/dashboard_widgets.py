@@ -1,6 +1,6 @@
 """Dashboard Widget API端点"""
-from typing import Any
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 import logging
 
@@ -8,10 +8,11 @@ from app.api import deps
 from app.models.user import User
 from app.schemas.dashboard_widget import (
     WidgetCreate, WidgetUpdate, WidgetResponse,
-    WidgetRefreshResponse, WidgetRegenerateRequest,
+    WidgetRefreshResponse, WidgetRegenerateRequest, WidgetDataResponse,
     AIChartRecommendRequest, AIChartRecommendResponse
 )
 from app.services.dashboard_widget_service import dashboard_widget_service
+from app.services.widget_cache_codec import cache_rows
 from app import crud
 
 router = APIRouter()
@@ -40,6 +41,28 @@ def create_widget(
     return widget
 
 
+@router.get("/dashboards/{dashboard_id}/widgets/data", response_model=WidgetDataResponse)
+def get_widget_data(
+    *,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_user),
+    dashboard_id: int,
+    widget_ids: Optional[List[int]] = Query(None, description="指定的Widget ID，为空则返回全部"),
+) -> Any:
+    """按需获取Widget数据（配合 GET /dashboards/{id}?include_data=false 使用）"""
+    items = dashboard_widget_service.get_widget_data(
+        db,
+        dashboard_id=dashboard_id,
+        user_id=current_user.id,
+        widget_ids=widget_ids
+    )
+    
+    if items is None:
+        raise HTTPException(status_code=403, detail="No permission")
+    
+    return WidgetDataResponse(items=items)
+
+
 @router.put("/widgets/{widget_id}", response_model=WidgetResponse)
 def update_widget(
     *,
@@ -145,15 +168,16 @@ async def ai_recommend_chart(
     # 获取数据样本（优先使用请求中的，否则从缓存获取）
     data_sample = request.data_sample
     if not data_sample and widget.data_cache:
-        # 取前10条作为样本
+        # 取前10条作为样本（兼容列式缓存和旧格式）
         cache_data = widget.data_cache
-        if isinstance(cache_data, dict) and "rows" in cache_data:
+        sample_rows = cache_rows(cache_data, limit=10)
+        if isinstance(cache_data, dict) and sample_rows:
             data_sample = {
-                "columns": cache_data.get("columns", []),
-                "rows": cache_data.get("rows", [])[:10]
+                "columns": cache_data.get("columns") or list(sample_rows[0].keys()),
+                "rows": sample_rows
             }
         elif isinstance(cache_data, list):
-            data_sample = cache_data[:10]
+            data_sample = sample_rows
     
     # 分析数据特征，推荐图表类型
     recommended_type = "bar"
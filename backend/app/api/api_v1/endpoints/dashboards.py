@@ -28,26 +28,32 @@ def get_dashboards(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     search: str = Query(None, description="搜索关键词"),
+    cursor: str = Query(None, description="分页游标（上一页返回的next_cursor），提供时忽略page"),
 ) -> Any:
     """获取Dashboard列表
     
     多租户隔离：自动按用户所属租户过滤
     """
-    items, total = dashboard_service.get_dashboards_by_user(
-        db,
-        user_id=current_user.id,
-        tenant_id=current_user.tenant_id,  # 多租户隔离
-        scope=scope,
-        page=page,
-        page_size=page_size,
-        search=search
-    )
+    try:
+        items, total, next_cursor = dashboard_service.get_dashboards_by_user(
+            db,
+            user_id=current_user.id,
+            tenant_id=current_user.tenant_id,  # 多租户隔离
+            scope=scope,
+            page=page,
+            page_size=page_size,
+            search=search,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return DashboardListResponse(
         total=total,
         page=page,
         page_size=page_size,
-        items=items
+        items=items,
+        next_cursor=next_cursor
     )
 
 
@@ -57,12 +63,14 @@ def get_dashboard(
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_user),
     dashboard_id: int,
+    include_data: bool = Query(True, description="是否返回Widget数据，为false时通过 /dashboards/{id}/widgets/data 按需获取"),
 ) -> Any:
     """获取Dashboard详情"""
     dashboard = dashboard_service.get_dashboard_detail(
         db,
         dashboard_id=dashboard_id,
-        user_id=current_user.id
+        user_id=current_user.id,
+        include_data=include_data
     )
     
     if not dashboard:
@@ -233,7 +241,6 @@ async def global_refresh(
         result = await dashboard_refresh_service.global_refresh(
             db,
             dashboard_id=dashboard_id,
-            force=request.force,
             widget_ids=request.widget_ids
         )
         return result
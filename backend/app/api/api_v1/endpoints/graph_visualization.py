@@ -3,12 +3,11 @@ from typing import Any, Dict, List
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from neo4j import GraphDatabase
 
 from app import crud
 from app.api import deps
-from app.core.config import settings
 from app.models.user import User
+from app.services.neo4j_service import neo4j_service
 
 router = APIRouter()
 
@@ -32,12 +31,10 @@ def get_graph_data(
         raise HTTPException(status_code=404, detail="Connection not found")
 
     try:
-        # Connect to Neo4j
-        print(f"Connecting to Neo4j at {settings.NEO4J_URI} with user {settings.NEO4J_USER}")
-        driver = GraphDatabase.driver(
-            settings.NEO4J_URI,
-            auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
-        )
+        # Shared pooled Neo4j driver
+        driver = neo4j_service.get_driver()
+        if driver is None:
+            raise Exception("Neo4j driver unavailable")
 
         # Prepare result structure
         result = {
@@ -186,7 +183,6 @@ def get_graph_data(
 
             print(f"Found {relationship_count} relationships, skipped {skipped_relationships} invalid relationships")
 
-        driver.close()
         print(f"Returning result with {len(result['nodes'])} nodes and {len(result['edges'])} edges")
         return result
 
@@ -1,7 +1,12 @@
 # 混合问答对管理API端点
 
+import os
+import shutil
+import tempfile
 from typing import Any, List, Optional, Dict
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from datetime import datetime
@@ -12,6 +17,8 @@ from app.services.hybrid_retrieval_service import (
     HybridRetrievalEngine, QAPairWithContext, RetrievalResult,
     extract_tables_from_sql, extract_entities_from_question, clean_sql, generate_qa_id
 )
+from app.services.qa_bulk_ingestion import qa_bulk_ingestion, SUPPORTED_FORMATS
+from app.services.qa_export import EXPORT_FORMATS, normalize_export_format, export_qa_pairs as export_qa_pairs_stream
 from app.core.config import settings
 import logging
 
@@ -440,57 +447,98 @@ async def batch_create_qa_pairs(
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_user)
 ):
-    """批量创建问答对"""
+    """批量创建问答对（分块批量向量化和写入，见 qa_bulk_ingestion）"""
     try:
         engine = await get_hybrid_engine()
 
-        created_count = 0
-        failed_count = 0
-        errors = []
-
-        for i, qa_create in enumerate(qa_pairs):
-            try:
-                # 自动提取表名和实体
-                used_tables = qa_create.used_tables or extract_tables_from_sql(qa_create.sql)
-                mentioned_entities = qa_create.mentioned_entities or extract_entities_from_question(qa_create.question)
-
-                # 创建问答对对象
-                qa_pair = QAPairWithContext(
-                    id=generate_qa_id(),
-                    question=qa_create.question,
-                    sql=clean_sql(qa_create.sql),
-                    connection_id=qa_create.connection_id,
-                    difficulty_level=qa_create.difficulty_level,
-                    query_type=qa_create.query_type,
-                    success_rate=0.0,
-                    verified=qa_create.verified,
-                    created_at=datetime.now(),
-                    used_tables=used_tables,
-                    used_columns=[],
-                    query_pattern=qa_create.query_type,
-                    mentioned_entities=mentioned_entities
-                )
-
-                # 存储问答对
-                schema_context = {"tables": [{"name": table} for table in used_tables]}
-                await engine.store_qa_pair(qa_pair, schema_context)
-                created_count += 1
-
-            except Exception as e:
-                failed_count += 1
-                errors.append(f"第{i+1}个问答对创建失败: {str(e)}")
+        job = await qa_bulk_ingestion.run(
+            engine, enumerate((qa_create.dict() for qa_create in qa_pairs), 1)
+        )
 
         return {
             "status": "completed",
-            "created_count": created_count,
-            "failed_count": failed_count,
-            "errors": errors
+            "created_count": job.created,
+            "failed_count": job.failed,
+            "errors": [f"第{error['row']}个问答对创建失败: {error['error']}" for error in job.errors]
         }
 
     except Exception as e:
         logger.error(f"批量创建问答对失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"批量创建失败: {str(e)}")
 
+@router.post("/qa-pairs/bulk-import", response_model=Dict[str, Any])
+async def bulk_import_qa_pairs(
+    connection_id: int = Query(..., description="数据库连接ID"),
+    file: UploadFile = File(..., description="JSONL 或 CSV 文件，字段同创建问答对接口"),
+    format: Optional[str] = Query(None, description="文件格式: jsonl, csv（默认按扩展名判断）"),
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_user)
+):
+    """
+    上传 JSONL / CSV 文件批量导入问答对
+
+    导入在后台分块执行，返回 job_id；通过 GET /qa-pairs/bulk-import/{job_id} 查询进度，
+    GET /qa-pairs/bulk-import/{job_id}/errors 获取逐行错误报告。
+    """
+    deps.get_verified_connection(db, connection_id, current_user)
+
+    file_format = (format or os.path.splitext(file.filename or "")[1].lstrip(".")).lower()
+    if file_format == "json":
+        file_format = "jsonl"
+    if file_format not in SUPPORTED_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的文件格式: {file_format or '未知'}，支持 jsonl、csv")
+
+    # 上传文件在请求结束后关闭，先写入临时文件，由后台任务逐行读取并在结束后删除
+    fd, path = tempfile.mkstemp(prefix="qa_import_", suffix=f".{file_format}")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            await run_in_threadpool(shutil.copyfileobj, file.file, tmp)
+        engine = await get_hybrid_engine(connection_id)
+        job = qa_bulk_ingestion.start_file(
+            engine, path, file_format, connection_id, filename=file.filename,
+            user_id=current_user.id, tenant_id=current_user.tenant_id
+        )
+    except Exception as e:
+        os.remove(path)
+        logger.error(f"启动批量导入失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"启动批量导入失败: {str(e)}")
+
+    logger.info(f"批量导入任务已启动: {job.id}, 文件: {file.filename}, 连接ID: {connection_id}")
+    return {
+        "status": "accepted",
+        "job_id": job.id,
+        "message": "批量导入任务已启动"
+    }
+
+@router.get("/qa-pairs/bulk-import/{job_id}", response_model=Dict[str, Any])
+async def get_bulk_import_status(
+    job_id: str,
+    current_user: User = Depends(deps.get_current_active_user)
+):
+    """查询批量导入任务进度（只包含前若干条错误）"""
+    # 其他用户的任务同样返回 404，不暴露任务是否存在
+    job = qa_bulk_ingestion.get_job(job_id, user_id=current_user.id, tenant_id=current_user.tenant_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="导入任务不存在或已过期")
+    return job.to_dict()
+
+@router.get("/qa-pairs/bulk-import/{job_id}/errors", response_model=Dict[str, Any])
+async def get_bulk_import_errors(
+    job_id: str,
+    current_user: User = Depends(deps.get_current_active_user)
+):
+    """获取批量导入任务的逐行错误报告"""
+    # 其他用户的任务同样返回 404，不暴露任务是否存在
+    job = qa_bulk_ingestion.get_job(job_id, user_id=current_user.id, tenant_id=current_user.tenant_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="导入任务不存在或已过期")
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "failed": job.failed,
+        "errors": job.errors
+    }
+
 @router.put("/qa-pairs/{qa_id}", response_model=Dict[str, Any])
 async def update_qa_pair(
     qa_id: str,
@@ -550,25 +598,33 @@ async def delete_qa_pair(
         logger.error(f"删除问答对失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"删除失败: {str(e)}")
 
-@router.get("/qa-pairs/export", response_model=Dict[str, Any])
+@router.get("/qa-pairs/export")
 async def export_qa_pairs(
-    connection_id: Optional[int] = Query(None, description="数据库连接ID"),
-    format: str = Query("json", description="导出格式: json, csv"),
+    connection_id: int = Query(..., description="数据库连接ID"),
+    format: str = Query("ndjson", description="导出格式: ndjson(json/jsonl), csv"),
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_user)
 ):
-    """导出问答对数据"""
-    try:
-        # 这里可以添加导出逻辑
-        # 从Neo4j或Milvus中获取数据并导出
+    """
+    流式导出问答对（NDJSON 或 CSV，逐页读取，导出文件可通过批量导入接口重新导入）
 
-        return {
-            "status": "success",
-            "message": "导出功能开发中",
-            "format": format,
-            "connection_id": connection_id
-        }
+    只能导出当前租户下的单个连接，不提供跨连接的全量导出
+    """
+    file_format = normalize_export_format(format)
+    if file_format is None:
+        raise HTTPException(status_code=400, detail=f"不支持的导出格式: {format}，支持 ndjson、csv")
+    deps.get_verified_connection(db, connection_id, current_user)
 
+    try:
+        engine = await get_hybrid_engine(connection_id)
     except Exception as e:
         logger.error(f"导出问答对失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"导出失败: {str(e)}")
+
+    media_type, extension = EXPORT_FORMATS[file_format]
+    filename = f"qa_pairs_{connection_id}_{datetime.now():%Y%m%d%H%M%S}.{extension}"
+    return StreamingResponse(
+        export_qa_pairs_stream(engine, connection_id, file_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
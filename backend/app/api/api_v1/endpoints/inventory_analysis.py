@@ -17,6 +17,7 @@ from app.schemas.inventory_analysis import (
     InventoryAnalysisResponse
 )
 from app.services.inventory_analysis_service import inventory_analysis_service
+from app.services.widget_cache_codec import cache_rows
 from app import crud
 from app.models.user import User
 
@@ -42,12 +43,8 @@ def get_data_from_request(
         if not widget:
             raise HTTPException(status_code=404, detail=f"Widget {widget_id} 不存在")
         
-        data_cache = widget.data_cache or {}
-        # 兼容多种数据格式
-        data = data_cache.get("data") or data_cache.get("rows") or []
-        
-        if isinstance(data_cache, list):
-            data = data_cache
+        # 兼容列式缓存和旧的多种数据格式
+        data = cache_rows(widget.data_cache)
             
         if not data:
             raise HTTPException(status_code=400, detail="Widget 数据为空，请先刷新 Widget")
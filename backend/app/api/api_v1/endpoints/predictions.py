@@ -18,6 +18,7 @@ from app.schemas.prediction import (
     CategoricalAnalysisResult
 )
 from app.services.prediction_service import prediction_service, categorical_analysis_service
+from app.services.widget_cache_codec import cache_rows
 
 router = APIRouter()
 
@@ -52,8 +53,7 @@ async def create_prediction(
             raise HTTPException(status_code=400, detail="Widget does not belong to this dashboard")
         
         # 获取Widget数据
-        data_cache = widget.data_cache or {}
-        data = data_cache.get("data", [])
+        data = cache_rows(widget.data_cache)
         
         if not data:
             raise HTTPException(status_code=400, detail="Widget没有可用数据")
@@ -115,18 +115,13 @@ def get_prediction_columns(
         if not has_permission:
             raise HTTPException(status_code=403, detail="No permission")
         
-        # 获取数据 - 兼容data和rows两种格式
-        data_cache = widget.data_cache or {}
-        data = data_cache.get("data") or data_cache.get("rows") or []
-        
-        # 如果data_cache本身就是列表，直接使用
-        if isinstance(data_cache, list) and data_cache:
-            data = data_cache
+        # 获取数据 - 兼容列式缓存和旧的data/rows/列表格式
+        data = cache_rows(widget.data_cache)
         
         # 调试信息
         import logging
         logger = logging.getLogger(__name__)
-        logger.info(f"Widget {widget_id} data_cache type: {type(data_cache)}, data length: {len(data) if data else 0}")
+        logger.info(f"Widget {widget_id} data length: {len(data) if data else 0}")
         if data and len(data) > 0:
             logger.info(f"Sample row keys: {list(data[0].keys()) if isinstance(data[0], dict) else 'Not a dict'}")
         
@@ -318,11 +313,7 @@ def analyze_categorical(
             raise HTTPException(status_code=403, detail="No permission")
         
         # 获取数据
-        data_cache = widget.data_cache or {}
-        data = data_cache.get("data") or data_cache.get("rows") or []
-        
-        if isinstance(data_cache, list) and data_cache:
-            data = data_cache
+        data = cache_rows(widget.data_cache)
         
         if not data:
             raise HTTPException(status_code=400, detail="Widget没有可用数据")
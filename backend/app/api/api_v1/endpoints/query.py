@@ -11,8 +11,10 @@ from langchain_core.messages import HumanMessage
 from app import crud, schemas
 from app.api import deps
 from app.agents.chat_graph import IntelligentSQLGraph
+from app.core.config import settings
 from app.core.state import SQLMessageState
 from app.models.user import User
+from app.services.query_single_flight import copy_thread_state, is_new_thread, query_single_flight
 
 router = APIRouter()
 
@@ -77,6 +79,67 @@ def _extract_results(execution_result) -> Optional[Any]:
     return execution_result
 
 
+# SSE 结果行分块大小
+RESULT_ROWS_CHUNK_SIZE = 500
+
+
+def _extract_result_data(execution_result) -> Optional[dict]:
+    """提取列式结果数据（columns/data/row_count/truncated）"""
+    data = _extract_results(execution_result)
+    return data if isinstance(data, dict) else None
+
+
+def _iter_result_rows_events(result_data: dict, chunk_size: int = RESULT_ROWS_CHUNK_SIZE):
+    """将列式结果按块切分为 result_rows 事件，列名只在首块发送"""
+    rows = result_data.get("data") or []
+    total = len(rows)
+    for offset in range(0, total, chunk_size):
+        event = {
+            "type": "result_rows",
+            "offset": offset,
+            "rows": rows[offset:offset + chunk_size],
+            "done": offset + chunk_size >= total,
+        }
+        if offset == 0:
+            event["columns"] = result_data.get("columns", [])
+            event["row_count"] = result_data.get("row_count", total)
+            event["truncated"] = result_data.get("truncated", False)
+        yield event
+
+
+# 合并执行的流结束时附带 leader 会话 ID 的内部事件（不推送给客户端）
+_LEADER_THREAD_EVENT = "__leader_thread__"
+
+
+async def _single_flight_key(
+    chat_request: schemas.ChatQueryRequest, tenant_id: Optional[int], thread_id: str, *variant
+) -> Optional[str]:
+    """
+    相同问题合并执行的键，不能合并时返回 None
+
+    只合并新会话的请求：已有历史的会话，结果依赖各自的上下文。
+    带澄清回复的请求结果依赖各自的会话状态，同样不合并。
+    """
+    from app.core.checkpointer import get_checkpointer
+
+    if not settings.QUERY_SINGLE_FLIGHT_ENABLED or chat_request.clarification_responses:
+        return None
+    if chat_request.conversation_id and not await is_new_thread(get_checkpointer(), thread_id):
+        return None
+    return query_single_flight.make_key(
+        chat_request.natural_language_query, chat_request.connection_id, tenant_id, *variant
+    )
+
+
+async def _adopt_leader_thread(leader_thread_id: str, thread_id: str) -> bool:
+    """把 leader 会话的最终状态写入当前请求自己的会话，见 copy_thread_state"""
+    from app.core.checkpointer import get_checkpointer
+
+    if leader_thread_id == thread_id or get_checkpointer() is None:
+        return True
+    return await copy_thread_state(IntelligentSQLGraph().graph, leader_thread_id, thread_id)
+
+
 @router.post("/chat", response_model=schemas.ChatQueryResponse)
 async def chat_query(
     *,
@@ -131,17 +194,33 @@ async def chat_query(
             else:
                 logger.warning(f"Agent with id={chat_request.agent_id} not found, using default")
         
-        # 创建 LangGraph 实例（传入自定义智能体）
-        graph = IntelligentSQLGraph(custom_analyst=custom_analyst)
+        async def _process():
+            # 创建 LangGraph 实例（传入自定义智能体）
+            graph = IntelligentSQLGraph(custom_analyst=custom_analyst)
+            
+            # ✅ 使用新的process_query方法，传递thread_id
+            # 这将启用状态持久化和多轮对话支持
+            return await graph.process_query(
+                query=query_text,
+                connection_id=chat_request.connection_id,
+                thread_id=thread_id,  # ✅ 传递thread_id
+                tenant_id=current_user.tenant_id,
+            )
+        
+        async def _process_shared():
+            return thread_id, await _process()
         
-        # ✅ 使用新的process_query方法，传递thread_id
-        # 这将启用状态持久化和多轮对话支持
-        result = await graph.process_query(
-            query=query_text,
-            connection_id=chat_request.connection_id,
-            thread_id=thread_id,  # ✅ 传递thread_id
-            tenant_id=current_user.tenant_id,
+        # 相同问题正在执行时直接等待其结果，并把最终状态写入自己的会话
+        flight_key = await _single_flight_key(
+            chat_request, current_user.tenant_id, thread_id, "chat", chat_request.agent_id
         )
+        if flight_key:
+            leader_thread_id, result = await query_single_flight.run(flight_key, _process_shared)
+            if not await _adopt_leader_thread(leader_thread_id, thread_id):
+                # leader 停在中断（等待澄清），自己执行一次，之后才能在自己的会话上 resume
+                result = await _process()
+        else:
+            result = await _process()
         
         # 构建响应
         response = schemas.ChatQueryResponse(
@@ -317,6 +396,9 @@ async def chat_query_stream(
     
     特性:
     - 实时推送节点执行进度
+    - 查询结果按块推送（result_rows 事件，列名只发送一次）
+    - 客户端断开连接时取消执行中的 SQL 查询
+    - 相同问题的并发请求共享一次执行（同一租户、同一连接）
     - Server-Sent Events (SSE)格式
     - 支持interrupt暂停和恢复
     
@@ -340,67 +422,99 @@ async def chat_query_stream(
     
     deps.get_verified_connection(db, chat_request.connection_id, current_user)
     
+    thread_id = chat_request.conversation_id or str(uuid4())
+    tenant_id = current_user.tenant_id
+    
+    async def graph_events():
+        """执行图并产生 (事件名, 数据) 序列，可被相同问题的并发请求共享"""
+        logger.info(f"开始流式执行: thread_id={thread_id}")
+        
+        # 创建图实例
+        graph = IntelligentSQLGraph()
+        
+        # 构建初始状态
+        initial_state = SQLMessageState(
+            messages=[HumanMessage(content=chat_request.natural_language_query)],
+            connection_id=chat_request.connection_id,
+            thread_id=thread_id,
+            tenant_id=tenant_id,
+        )
+        
+        config = {"configurable": {"thread_id": thread_id}}
+        
+        # ✅ 使用astream流式执行 (LangGraph官方标准)
+        # stream_mode="updates": 每个节点执行后推送增量更新
+        async for chunk in graph.graph.astream(
+            initial_state,
+            config=config,
+            stream_mode="updates"  # LangGraph官方推荐
+        ):
+            # chunk格式: {node_name: node_output}
+            for node_name, node_output in chunk.items():
+                # 构建事件数据
+                event_data = {
+                    "type": "node_update",
+                    "node": node_name,
+                    "stage": node_output.get("current_stage", "processing"),
+                    "timestamp": time.time()
+                }
+                
+                # 添加节点特定数据
+                if node_name == "cache_check":
+                    event_data["cache_hit"] = node_output.get("cache_hit", False)
+                    if node_output.get("cache_hit_type"):
+                        event_data["cache_hit_type"] = node_output["cache_hit_type"]
+                
+                elif node_name == "clarification":
+                    if node_output.get("enriched_query"):
+                        event_data["enriched_query"] = node_output["enriched_query"]
+                
+                elif node_name == "supervisor":
+                    if node_output.get("generated_sql"):
+                        event_data["sql"] = node_output["generated_sql"]
+                
+                exec_result = node_output.get("execution_result")
+                result_data = _extract_result_data(exec_result)
+                if exec_result is not None:
+                    event_data["result_preview"] = {
+                        "success": getattr(exec_result, 'success', False),
+                        "row_count": result_data.get("row_count", 0) if result_data else 0,
+                        "truncated": result_data.get("truncated", False) if result_data else False
+                    }
+                
+                yield "node_update", event_data
+                
+                # 结果行分块推送，避免单个超大事件
+                if result_data and getattr(exec_result, 'success', False):
+                    for rows_event in _iter_result_rows_events(result_data):
+                        yield "result_rows", rows_event
+        
+        logger.info(f"流式执行完成: thread_id={thread_id}")
+    
+    async def shared_graph_events():
+        """合并执行时使用：事件结束后附带 leader 的会话 ID"""
+        async for event in graph_events():
+            yield event
+        yield _LEADER_THREAD_EVENT, thread_id
+    
     async def event_generator():
         """SSE事件生成器"""
         try:
-            thread_id = chat_request.conversation_id or str(uuid4())
-            logger.info(f"开始流式执行: thread_id={thread_id}")
-            
-            # 创建图实例
-            graph = IntelligentSQLGraph()
-            
-            # 构建初始状态
-            initial_state = SQLMessageState(
-                messages=[HumanMessage(content=chat_request.natural_language_query)],
-                connection_id=chat_request.connection_id,
-                thread_id=thread_id,
-                tenant_id=current_user.tenant_id,
-            )
+            # 相同问题正在执行时订阅其事件流（从头回放），不重复执行
+            flight_key = await _single_flight_key(chat_request, tenant_id, thread_id, "stream")
+            events = query_single_flight.stream(flight_key, shared_graph_events) if flight_key else graph_events()
             
-            config = {"configurable": {"thread_id": thread_id}}
+            async for event_name, event_data in events:
+                if event_name == _LEADER_THREAD_EVENT:
+                    # 把 leader 的最终状态写入自己的会话，之后可以继续多轮对话
+                    if not await _adopt_leader_thread(event_data, thread_id):
+                        logger.warning(f"合并执行的会话停在中断，未写入当前会话: thread_id={thread_id}")
+                    continue
+                # ✅ SSE格式推送事件
+                yield f"event: {event_name}\n"
+                yield f"data: {json.dumps(event_data, ensure_ascii=False, default=str)}\n\n"
             
-            # ✅ 使用astream流式执行 (LangGraph官方标准)
-            # stream_mode="updates": 每个节点执行后推送增量更新
-            async for chunk in graph.graph.astream(
-                initial_state,
-                config=config,
-                stream_mode="updates"  # LangGraph官方推荐
-            ):
-                # chunk格式: {node_name: node_output}
-                for node_name, node_output in chunk.items():
-                    # 构建事件数据
-                    event_data = {
-                        "type": "node_update",
-                        "node": node_name,
-                        "stage": node_output.get("current_stage", "processing"),
-                        "timestamp": time.time()
-                    }
-                    
-                    # 添加节点特定数据
-                    if node_name == "cache_check":
-                        event_data["cache_hit"] = node_output.get("cache_hit", False)
-                        if node_output.get("cache_hit_type"):
-                            event_data["cache_hit_type"] = node_output["cache_hit_type"]
-                    
-                    elif node_name == "clarification":
-                        if node_output.get("enriched_query"):
-                            event_data["enriched_query"] = node_output["enriched_query"]
-                    
-                    elif node_name == "supervisor":
-                        if node_output.get("generated_sql"):
-                            event_data["sql"] = node_output["generated_sql"]
-                        if node_output.get("execution_result"):
-                            exec_result = node_output["execution_result"]
-                            event_data["result_preview"] = {
-                                "success": getattr(exec_result, 'success', False),
-                                "row_count": len(getattr(exec_result, 'data', []) or [])
-                            }
-                    
-                    # ✅ SSE格式推送事件
-                    yield f"event: node_update\n"
-                    yield f"data: {json.dumps(event_data, ensure_ascii=False)}\n\n"
-            
-            # 发送完成事件
+            # 发送完成事件（thread_id 始终是当前请求自己的会话）
             final_event = {
                 "type": "complete",
                 "thread_id": thread_id,
@@ -408,8 +522,6 @@ async def chat_query_stream(
             }
             yield f"event: complete\n"
             yield f"data: {json.dumps(final_event, ensure_ascii=False)}\n\n"
-            
-            logger.info(f"流式执行完成: thread_id={thread_id}")
         
         except Exception as e:
             logger.exception("流式执行异常")
@@ -1,12 +1,19 @@
 from typing import Any, List, Dict
+import asyncio
+import json
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
 from app.api import deps
 from app.models.user import User
-from app.services.schema_service import discover_schema, sync_schema_to_graph_db, save_discovered_schema
+from app.services.schema_service import (
+    discover_schema, sync_schema_to_graph_db, save_discovered_schema, save_published_schema
+)
+from app.services.schema.persistence import load_existing_schema
+from app.services.schema_snapshot import schema_snapshot_cache
 
 router = APIRouter()
 
@@ -29,34 +36,86 @@ def discover_connection_schema(
     try:
         # Discover schema from the database
         schema_info = discover_schema(connection)
+        _attach_existing_ids(db, connection_id, schema_info)
+        return schema_info
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error discovering schema: {str(e)}")
 
-        # For each table, check if it already exists in our metadata
-        for table_info in schema_info:
-            table_name = table_info["table_name"]
-            existing_table = crud.schema_table.get_by_name_and_connection(
-                db=db,
-                table_name=table_name,
-                connection_id=connection_id
-            )
 
-            # If the table exists in our metadata, add its ID to the schema info
-            if existing_table:
-                table_info["id"] = existing_table.id
-
-                # Add column IDs if they exist in our metadata
-                for column_info in table_info["columns"]:
-                    column_name = column_info["column_name"]
-                    existing_column = crud.schema_column.get_by_name_and_table(
-                        db=db,
-                        column_name=column_name,
-                        table_id=existing_table.id
-                    )
-                    if existing_column:
-                        column_info["id"] = existing_column.id
+def _attach_existing_ids(db: Session, connection_id: int, schema_info: List[Dict[str, Any]]) -> None:
+    """Add IDs of tables/columns that already exist in our metadata to the discovered schema."""
+    existing = load_existing_schema(db, connection_id)
+    for table_info in schema_info:
+        existing_table = existing.tables.get(table_info["table_name"])
+        if not existing_table:
+            continue
+        table_info["id"] = existing_table.id
+        for column_info in table_info["columns"]:
+            existing_column = existing.columns.get((existing_table.id, column_info["column_name"]))
+            if existing_column:
+                column_info["id"] = existing_column.id
+
+
+@router.get("/{connection_id}/discover/stream")
+async def discover_connection_schema_stream(
+    *,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user),
+    connection_id: int,
+) -> StreamingResponse:
+    """
+    Discover schema and stream progress as Server-Sent Events.
 
+    Events:
+    - progress: {"stage": "tables" | "reflect" | "analyze", "done": n, "total": m}
+    - complete: {"tables": [...]}  (same payload as /discover)
+    - error: {"error": "..."}
+    """
+    if not current_user.tenant_id:
+        raise HTTPException(status_code=403, detail="User is not associated with a tenant")
+    connection = crud.db_connection.get_by_tenant(db=db, id=connection_id, tenant_id=current_user.tenant_id)
+    if not connection:
+        raise HTTPException(status_code=404, detail="Connection not found")
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def on_progress(stage: str, done: int, total: int) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, ("progress", {"stage": stage, "done": done, "total": total}))
+
+    def run() -> List[Dict[str, Any]]:
+        schema_info = discover_schema(connection, progress_callback=on_progress)
+        _attach_existing_ids(db, connection_id, schema_info)
         return schema_info
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error discovering schema: {str(e)}")
+
+    async def event_generator():
+        task = loop.run_in_executor(None, run)
+        task.add_done_callback(lambda _: loop.call_soon_threadsafe(queue.put_nowait, None))
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            event, data = item
+            yield f"event: {event}\n"
+            yield f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+        try:
+            schema_info = task.result()
+            yield "event: complete\n"
+            yield f"data: {json.dumps({'tables': schema_info}, ensure_ascii=False, default=str)}\n\n"
+        except Exception as e:
+            yield "event: error\n"
+            yield f"data: {json.dumps({'error': f'Error discovering schema: {str(e)}'}, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 
 @router.get("/{connection_id}/metadata", response_model=List[schemas.SchemaTableWithRelationships])
 def get_schema_metadata(
@@ -190,137 +249,8 @@ def publish_schema(
         raise HTTPException(status_code=404, detail="Connection not found")
 
     try:
-        # Save to MySQL
-        tables_data = schema_data.get("tables", [])
-        relationships_data = schema_data.get("relationships", [])
-
-        # Process tables and columns
-        for table_data in tables_data:
-            table_obj = crud.schema_table.get_by_name_and_connection(
-                db=db,
-                table_name=table_data["table_name"],
-                connection_id=connection_id
-            )
-
-            if table_obj:
-                # Update existing table
-                table_update = schemas.SchemaTableUpdate(
-                    description=table_data.get("description"),
-                    ui_metadata=table_data.get("ui_metadata")
-                )
-                table_obj = crud.schema_table.update(db=db, db_obj=table_obj, obj_in=table_update)
-            else:
-                # Create new table
-                table_create = schemas.SchemaTableCreate(
-                    connection_id=connection_id,
-                    table_name=table_data["table_name"],
-                    description=table_data.get("description"),
-                    ui_metadata=table_data.get("ui_metadata")
-                )
-                table_obj = crud.schema_table.create(db=db, obj_in=table_create)
-
-            # Process columns
-            for column_data in table_data.get("columns", []):
-                column_obj = crud.schema_column.get_by_name_and_table(
-                    db=db,
-                    column_name=column_data["column_name"],
-                    table_id=table_obj.id
-                )
-
-                if column_obj:
-                    # Update existing column
-                    column_update = schemas.SchemaColumnUpdate(
-                        description=column_data.get("description"),
-                        is_primary_key=column_data.get("is_primary_key"),
-                        is_foreign_key=column_data.get("is_foreign_key")
-                    )
-                    crud.schema_column.update(db=db, db_obj=column_obj, obj_in=column_update)
-                else:
-                    # Create new column
-                    column_create = schemas.SchemaColumnCreate(
-                        table_id=table_obj.id,
-                        column_name=column_data["column_name"],
-                        data_type=column_data["data_type"],
-                        description=column_data.get("description"),
-                        is_primary_key=column_data.get("is_primary_key", False),
-                        is_foreign_key=column_data.get("is_foreign_key", False)
-                    )
-                    crud.schema_column.create(db=db, obj_in=column_create)
-
-        # Get all existing relationships for this connection
-        existing_relationships = crud.schema_relationship.get_by_connection(db=db, connection_id=connection_id)
-
-        # Track which relationships are still valid
-        processed_relationship_ids = set()
-
-        # Process relationships from the frontend
-        for rel_data in relationships_data:
-            # Find source and target tables
-            source_table = crud.schema_table.get_by_name_and_connection(
-                db=db,
-                table_name=rel_data["source_table"],
-                connection_id=connection_id
-            )
-            target_table = crud.schema_table.get_by_name_and_connection(
-                db=db,
-                table_name=rel_data["target_table"],
-                connection_id=connection_id
-            )
-
-            if not source_table or not target_table:
-                continue
-
-            # Find source and target columns
-            source_column = crud.schema_column.get_by_name_and_table(
-                db=db,
-                column_name=rel_data["source_column"],
-                table_id=source_table.id
-            )
-            target_column = crud.schema_column.get_by_name_and_table(
-                db=db,
-                column_name=rel_data["target_column"],
-                table_id=target_table.id
-            )
-
-            if not source_column or not target_column:
-                continue
-
-            # Check if relationship exists
-            rel_obj = crud.schema_relationship.get_by_columns(
-                db=db,
-                source_column_id=source_column.id,
-                target_column_id=target_column.id
-            )
-
-            if rel_obj:
-                # Update existing relationship
-                rel_update = schemas.SchemaRelationshipUpdate(
-                    relationship_type=rel_data.get("relationship_type"),
-                    description=rel_data.get("description")
-                )
-                crud.schema_relationship.update(db=db, db_obj=rel_obj, obj_in=rel_update)
-                # Mark this relationship as processed
-                processed_relationship_ids.add(rel_obj.id)
-            else:
-                # Create new relationship
-                rel_create = schemas.SchemaRelationshipCreate(
-                    connection_id=connection_id,
-                    source_table_id=source_table.id,
-                    source_column_id=source_column.id,
-                    target_table_id=target_table.id,
-                    target_column_id=target_column.id,
-                    relationship_type=rel_data.get("relationship_type"),
-                    description=rel_data.get("description")
-                )
-                new_rel = crud.schema_relationship.create(db=db, obj_in=rel_create)
-                # Mark this new relationship as processed
-                processed_relationship_ids.add(new_rel.id)
-
-        # Delete relationships that are no longer in the frontend
-        for rel in existing_relationships:
-            if rel.id not in processed_relationship_ids:
-                # This relationship was not in the frontend data, so delete it
-                crud.schema_relationship.remove(db=db, id=rel.id)
+        # Save to MySQL (tables, columns and relationships in one transaction)
+        save_published_schema(db, connection_id, schema_data)
 
         # Sync to Graph DB
         sync_schema_to_graph_db(connection_id)
@@ -418,9 +348,11 @@ def sync_to_neo4j(
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user),
     connection_id: int,
+    full_rebuild: bool = False,
 ) -> Any:
     """
     Manually sync schema metadata to Neo4j graph database.
+    Only changed tables/columns/relationships are written unless full_rebuild is set.
     """
     if not current_user.tenant_id:
         raise HTTPException(status_code=403, detail="User is not associated with a tenant")
@@ -430,7 +362,7 @@ def sync_to_neo4j(
 
     try:
         # Sync to Graph DB
-        result = sync_schema_to_graph_db(connection_id)
+        result = sync_schema_to_graph_db(connection_id, incremental=not full_rebuild)
         if result:
             return {"status": "success", "message": "Schema synced to Neo4j successfully"}
         else:
@@ -501,6 +433,7 @@ def update_table(
 
     try:
         table = crud.schema_table.update(db=db, db_obj=table, obj_in=table_in)
+        schema_snapshot_cache.invalidate(table.connection_id)
         return table
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating table: {str(e)}")
@@ -533,6 +466,7 @@ def update_column(
 
     try:
         column = crud.schema_column.update(db=db, db_obj=column, obj_in=column_in)
+        schema_snapshot_cache.invalidate(table.connection_id)
         return column
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating column: {str(e)}")
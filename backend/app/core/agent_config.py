@@ -49,6 +49,17 @@ def get_agent_llm(
         should_close = True
     
     display_name = AGENT_DISPLAY_NAMES.get(agent_name, agent_name)
+    
+    def _result(llm: BaseChatModel) -> Union[BaseChatModel, LLMWrapper]:
+        # 如果需要包装器,返回带重试保护的版本
+        if use_wrapper:
+            wrapper_config = LLMWrapperConfig(
+                max_retries=3,
+                retry_base_delay=1.0,
+                timeout=60.0,
+            )
+            return LLMWrapper(llm=llm, config=wrapper_config, name=f"agent:{agent_name}")
+        return llm
         
     try:
         # 1. 查找 AgentProfile
@@ -64,44 +75,24 @@ def get_agent_llm(
                 # 检查配置是否存在
                 if not llm_config:
                     logger.warning(f"Agent [{agent_name}] LLM config not found, using default")
-                    return get_default_model()
+                    return _result(get_default_model())
                 
                 # 检查配置是否启用
                 if not llm_config.is_active:
                     logger.warning(f"Agent [{agent_name}] LLM config disabled, using default")
-                    return get_default_model()
+                    return _result(get_default_model())
                 
                 # 使用特定配置(简化日志)
                 logger.debug(f"Agent [{agent_name}] using {llm_config.provider}/{llm_config.model_name}")
-                llm = get_default_model(config_override=llm_config, caller=f"agent:{agent_name}")
-                        
-                # 如果需要包装器,返回带重试保护的版本
-                if use_wrapper:
-                    wrapper_config = LLMWrapperConfig(
-                        max_retries=3,
-                        retry_base_delay=1.0,
-                        timeout=60.0,
-                    )
-                    return LLMWrapper(llm=llm, config=wrapper_config, name=f"agent:{agent_name}")
-                return llm
+                return _result(get_default_model(config_override=llm_config, caller=f"agent:{agent_name}"))
                 
         # 3. 回退到全局默认
         logger.debug(f"Agent [{agent_name}] using global default")
-        llm = get_default_model(caller=f"agent:{agent_name}")
-                
-        # 如果需要包装器,返回带重试保护的版本
-        if use_wrapper:
-            wrapper_config = LLMWrapperConfig(
-                max_retries=3,
-                retry_base_delay=1.0,
-                timeout=60.0,
-            )
-            return LLMWrapper(llm=llm, config=wrapper_config, name=f"agent:{agent_name}")
-        return llm
+        return _result(get_default_model(caller=f"agent:{agent_name}"))
         
     except Exception as e:
         logger.error(f"Error fetching agent LLM for {agent_name}: {e}")
-        return get_default_model()
+        return _result(get_default_model())
     finally:
         if should_close:
             db.close()
@@ -4,6 +4,18 @@ from typing import Any, Dict, List, Optional, Union
 from pydantic import AnyHttpUrl, validator
 from pydantic_settings import BaseSettings
 
+# backend 目录：本地缓存、索引文件的相对路径以此为基准，与启动时的工作目录无关
+BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _data_path(env_name: str, default: str) -> str:
+    """读取本地数据文件路径，相对路径按 backend 目录解析；留空表示不落盘"""
+    value = os.getenv(env_name, default)
+    if not value or os.path.isabs(value):
+        return value
+    return os.path.normpath(os.path.join(BACKEND_ROOT, value))
+
+
 class Settings(BaseSettings):
     API_V1_STR: str = "/v1"
     SECRET_KEY: str = os.getenv("SECRET_KEY", "development_secret_key")
@@ -38,22 +50,97 @@ class Settings(BaseSettings):
     MYSQL_DB: str = os.getenv("MYSQL_DB", "chatdb")
     MYSQL_PORT: str = os.getenv("MYSQL_PORT", "3306")
 
+    # ==========================================
+    # 目标数据库连接池配置
+    # ==========================================
+    # 按 connection_id 复用 SQLAlchemy Engine，避免每次查询重新建立连接
+    # ==========================================
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))                  # 每个连接的常驻连接数
+    DB_POOL_MAX_OVERFLOW: int = int(os.getenv("DB_POOL_MAX_OVERFLOW", "10")) # 峰值时允许额外创建的连接数
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))           # 等待空闲连接的超时（秒）
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))         # 连接最长存活时间（秒）
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_CONNECT_TIMEOUT: int = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))     # 建立连接超时（秒）
+    DB_MAX_QUERY_TIMEOUT: int = int(os.getenv("DB_MAX_QUERY_TIMEOUT", "300"))  # 单条查询最长读写时间（秒）
+    DB_ENGINE_IDLE_TTL: int = int(os.getenv("DB_ENGINE_IDLE_TTL", "3600"))   # Engine 闲置多久后释放（秒，0=不释放）
+
+    # 查询结果拉取配置（服务端游标流式拉取）
+    SQL_RESULT_MAX_ROWS: int = int(os.getenv("SQL_RESULT_MAX_ROWS", "10000"))    # 单次查询最多返回行数，超出截断（0=不限制）
+    SQL_FETCH_BATCH_SIZE: int = int(os.getenv("SQL_FETCH_BATCH_SIZE", "1000"))   # 每批从游标拉取的行数
+
+    # 异步 SQL 执行配置（专用线程池 + 租户级并发限制）
+    SQL_EXECUTOR_MAX_WORKERS: int = int(os.getenv("SQL_EXECUTOR_MAX_WORKERS", "16"))      # 执行线程池大小
+    SQL_TENANT_MAX_CONCURRENCY: int = int(os.getenv("SQL_TENANT_MAX_CONCURRENCY", "4"))   # 单租户同时执行的查询数
+    SQL_DEFAULT_TIMEOUT: int = int(os.getenv("SQL_DEFAULT_TIMEOUT", "30"))                # 默认查询超时（秒，含排队时间）
+
+    # Schema 快照缓存（按 connection_id 缓存编译好的表/列/关系索引）
+    SCHEMA_SNAPSHOT_TTL: int = int(os.getenv("SCHEMA_SNAPSHOT_TTL", "300"))                # 快照最长有效期（秒，兜底多进程间的失效，0=不缓存）
+    SCHEMA_SNAPSHOT_MAX_ENTRIES: int = int(os.getenv("SCHEMA_SNAPSHOT_MAX_ENTRIES", "256")) # 最多缓存的连接数
+
+    # Schema 发现配置（按表分块批量反射）
+    SCHEMA_DISCOVERY_CHUNK_SIZE: int = int(os.getenv("SCHEMA_DISCOVERY_CHUNK_SIZE", "200"))  # 每个分块反射的表数量
+    SCHEMA_DISCOVERY_MAX_WORKERS: int = int(os.getenv("SCHEMA_DISCOVERY_MAX_WORKERS", "4"))  # 并行反射的分块数（1=串行）
+
+    # 查询历史向量索引配置（相似查询检索）
+    QUERY_HISTORY_INDEX_DIR: str = _data_path("QUERY_HISTORY_INDEX_DIR", "./data/query_history_index")  # 索引文件目录（留空则不落盘）
+    QUERY_HISTORY_INDEX_MAX_TENANTS: int = int(os.getenv("QUERY_HISTORY_INDEX_MAX_TENANTS", "64"))  # 内存中最多保留的租户索引数
+    QUERY_HISTORY_INDEX_SYNC_INTERVAL: float = float(os.getenv("QUERY_HISTORY_INDEX_SYNC_INTERVAL", "30"))  # 从数据库补齐新记录的间隔（秒）
+    QUERY_HISTORY_INDEX_FLUSH_SIZE: int = int(os.getenv("QUERY_HISTORY_INDEX_FLUSH_SIZE", "256"))  # 累积多少条新向量后写回文件
+
+    # Dashboard 自动刷新（按 Widget 的 refresh_interval 在后台刷新 data_cache，多 worker 时只有租约持有者执行）
+    DASHBOARD_AUTO_REFRESH_ENABLED: bool = os.getenv("DASHBOARD_AUTO_REFRESH_ENABLED", "true").lower() == "true"
+    DASHBOARD_AUTO_REFRESH_TICK: float = float(os.getenv("DASHBOARD_AUTO_REFRESH_TICK", "15"))                  # 检查到期 Widget 的间隔（秒）
+    DASHBOARD_AUTO_REFRESH_JITTER: float = float(os.getenv("DASHBOARD_AUTO_REFRESH_JITTER", "0.1"))             # 检查间隔和刷新间隔的随机抖动比例
+    DASHBOARD_AUTO_REFRESH_MIN_INTERVAL: int = int(os.getenv("DASHBOARD_AUTO_REFRESH_MIN_INTERVAL", "30"))      # 最小刷新间隔（秒），更小的 refresh_interval 按此值处理
+    DASHBOARD_AUTO_REFRESH_PER_CONNECTION: int = int(os.getenv("DASHBOARD_AUTO_REFRESH_PER_CONNECTION", "2"))  # 单个数据库连接同时刷新的 Widget 数
+    DASHBOARD_AUTO_REFRESH_BATCH_SIZE: int = int(os.getenv("DASHBOARD_AUTO_REFRESH_BATCH_SIZE", "100"))        # 每轮最多刷新的 Widget 数
+    DASHBOARD_AUTO_REFRESH_MAX_BACKOFF: int = int(os.getenv("DASHBOARD_AUTO_REFRESH_MAX_BACKOFF", "3600"))     # 连续失败后的最长退避时间（秒）
+    DASHBOARD_AUTO_REFRESH_LEASE_TTL: int = int(os.getenv("DASHBOARD_AUTO_REFRESH_LEASE_TTL", "60"))           # 调度租约有效期（秒），持有者退出后其他 worker 最迟这么久接管
+    DASHBOARD_REFRESH_PER_CONNECTION: int = int(os.getenv("DASHBOARD_REFRESH_PER_CONNECTION", "3"))            # 全局刷新时单个数据库连接同时执行的查询数
+
+    # Widget 数据缓存（列式存储，较大的缓存用 zstd 压缩）
+    DASHBOARD_CACHE_COMPRESSION: str = os.getenv("DASHBOARD_CACHE_COMPRESSION", "zstd").lower()             # zstd / none
+    DASHBOARD_CACHE_COMPRESS_MIN_BYTES: int = int(os.getenv("DASHBOARD_CACHE_COMPRESS_MIN_BYTES", "16384"))  # 列数据超过此大小才压缩
+    DASHBOARD_CACHE_ZSTD_LEVEL: int = int(os.getenv("DASHBOARD_CACHE_ZSTD_LEVEL", "3"))                      # zstd 压缩级别
+
     # Neo4j settings
     NEO4J_URI: str = os.getenv("NEO4J_URI", "bolt://localhost:7687")
     NEO4J_USER: str = os.getenv("NEO4J_USER", "neo4j")
     NEO4J_PASSWORD: str = os.getenv("NEO4J_PASSWORD", "")
+    NEO4J_MAX_POOL_SIZE: int = int(os.getenv("NEO4J_MAX_POOL_SIZE", "50"))                          # 驱动连接池上限
+    NEO4J_CONNECTION_ACQUISITION_TIMEOUT: float = float(os.getenv("NEO4J_CONNECTION_ACQUISITION_TIMEOUT", "30"))  # 从池中获取连接超时（秒）
+    NEO4J_CONNECTION_TIMEOUT: float = float(os.getenv("NEO4J_CONNECTION_TIMEOUT", "10"))             # 建立连接超时（秒）
+    NEO4J_MAX_CONNECTION_LIFETIME: int = int(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600"))     # 连接最长存活时间（秒）
+    NEO4J_SYNC_BATCH_SIZE: int = int(os.getenv("NEO4J_SYNC_BATCH_SIZE", "1000"))                   # Schema 同步每个事务写入的行数
 
     # LLM settings
     LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "deepseek")
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     OPENAI_API_BASE: Optional[str] = os.getenv("OPENAI_API_BASE", "https://api.deepseek.com/v1")
     LLM_MODEL: str = os.getenv("LLM_MODEL", "deepseek-chat")
+    # 确定性 LLM 调用结果缓存（查询分析、意图识别、查询改写、Skill 路由等调用点按需开启）
+    LLM_CALL_CACHE_ENABLED: bool = os.getenv("LLM_CALL_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CALL_CACHE_TTL: int = int(os.getenv("LLM_CALL_CACHE_TTL", "3600"))  # 缓存有效期（秒）
+    LLM_CALL_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CALL_CACHE_MAX_ENTRIES", "2000"))  # 内存层最多缓存的响应数（LRU）
+    LLM_CALL_CACHE_DB_PATH: str = _data_path("LLM_CALL_CACHE_DB_PATH", "./data/llm_call_cache.sqlite3")  # 磁盘层 SQLite 文件（留空不启用）
 
     # ==========================================
     # Milvus 向量数据库配置
     # ==========================================
     MILVUS_HOST: str = os.getenv("MILVUS_HOST", "localhost")
     MILVUS_PORT: str = os.getenv("MILVUS_PORT", "19530")
+    MILVUS_EXECUTOR_MAX_WORKERS: int = int(os.getenv("MILVUS_EXECUTOR_MAX_WORKERS", "8"))  # Milvus 调用线程池大小
+    MILVUS_META_CACHE_TTL: float = float(os.getenv("MILVUS_META_CACHE_TTL", "30"))          # 集合存在性/是否有数据缓存时间（秒）
+    # QA 样本内存索引：样本数不超过上限的连接在进程内做向量检索，超过上限仍走 Milvus
+    QA_MEMORY_INDEX_ENABLED: bool = os.getenv("QA_MEMORY_INDEX_ENABLED", "true").lower() == "true"
+    QA_MEMORY_INDEX_MAX_SIZE: int = int(os.getenv("QA_MEMORY_INDEX_MAX_SIZE", "5000"))      # 单个连接可加载到内存的最大样本数
+    QA_MEMORY_INDEX_TTL: float = float(os.getenv("QA_MEMORY_INDEX_TTL", "300"))             # 内存索引重新加载的间隔（秒），同步其他进程的写入
+    # 结构检索 / 模式检索使用进程内倒排索引（从 Neo4j 加载一次），不再每次执行 Cypher
+    QA_INVERTED_INDEX_ENABLED: bool = os.getenv("QA_INVERTED_INDEX_ENABLED", "true").lower() == "true"
+    # 问答对批量导入：每块一次批量向量化 + 一次 Milvus 多行 insert + 一个 Neo4j UNWIND 事务
+    QA_BULK_INGEST_CHUNK_SIZE: int = int(os.getenv("QA_BULK_INGEST_CHUNK_SIZE", "256"))     # 每块行数
+    QA_BULK_INGEST_MAX_JOBS: int = int(os.getenv("QA_BULK_INGEST_MAX_JOBS", "50"))          # 保留状态的最近任务数
+    QA_EXPORT_BATCH_SIZE: int = int(os.getenv("QA_EXPORT_BATCH_SIZE", "1000"))             # 流式导出每页读取的问答对数
 
     # ==========================================
     # 向量模型配置（Fallback 机制）
@@ -86,7 +173,12 @@ class Settings(BaseSettings):
     VECTOR_SERVICE_TYPE: str = os.getenv("VECTOR_SERVICE_TYPE", "aliyun")  # Fallback: ollama | aliyun（支持OpenAI兼容API）
     VECTOR_CACHE_ENABLED: bool = os.getenv("VECTOR_CACHE_ENABLED", "true").lower() == "true"
     VECTOR_CACHE_TTL: int = int(os.getenv("VECTOR_CACHE_TTL", "3600"))  # 缓存有效期（秒）
+    VECTOR_CACHE_MAX_ENTRIES: int = int(os.getenv("VECTOR_CACHE_MAX_ENTRIES", "10000"))  # 内存层最多缓存的向量数（LRU）
+    VECTOR_CACHE_DB_PATH: str = _data_path("VECTOR_CACHE_DB_PATH", "./data/embedding_cache.sqlite3")  # 磁盘层 SQLite 文件（留空不启用）
+    VECTOR_CACHE_DISK_MAX_ENTRIES: int = int(os.getenv("VECTOR_CACHE_DISK_MAX_ENTRIES", "200000"))  # 磁盘层最多缓存的向量数
     VECTOR_BATCH_SIZE: int = int(os.getenv("VECTOR_BATCH_SIZE", "32"))  # 批处理大小
+    VECTOR_MICRO_BATCH_ENABLED: bool = os.getenv("VECTOR_MICRO_BATCH_ENABLED", "true").lower() == "true"  # 合并并发的单条向量化请求
+    VECTOR_MICRO_BATCH_WAIT_MS: float = float(os.getenv("VECTOR_MICRO_BATCH_WAIT_MS", "5"))  # 合并等待窗口（毫秒）
     VECTOR_MAX_RETRIES: int = int(os.getenv("VECTOR_MAX_RETRIES", "3"))  # 最大重试次数
     VECTOR_RETRY_DELAY: float = float(os.getenv("VECTOR_RETRY_DELAY", "1.0"))  # 重试延迟（秒）
 
@@ -227,6 +319,19 @@ class Settings(BaseSettings):
     
     # 精确缓存 TTL（秒）
     EXACT_CACHE_TTL: int = int(os.getenv("EXACT_CACHE_TTL", "3600"))
+
+    # 精确缓存存储（本机所有 worker 进程共享的 SQLite 文件，留空则仅进程内存）
+    QUERY_CACHE_DB_PATH: str = _data_path("QUERY_CACHE_DB_PATH", "./data/query_cache.sqlite3")
+    # 精确缓存总大小上限（字节），超出后按最近访问时间淘汰
+    QUERY_CACHE_MAX_BYTES: int = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    # 按源表数据版本失效：所有源表都能探测到版本的条目使用更长的 TTL
+    QUERY_CACHE_TRACKED_TTL: int = int(os.getenv("QUERY_CACHE_TRACKED_TTL", "86400"))
+    # 表数据版本探测结果的复用时间（秒），避免每次缓存检查都访问目标库
+    QUERY_CACHE_VERSION_PROBE_TTL: float = float(os.getenv("QUERY_CACHE_VERSION_PROBE_TTL", "5"))
+    # 水位列（如 updated_at），MySQL/PostgreSQL 取不到版本或其他数据库时用 MAX(列) 作为表版本，留空不启用
+    QUERY_CACHE_WATERMARK_COLUMN: str = os.getenv("QUERY_CACHE_WATERMARK_COLUMN", "")
+    # 相同问题（同一租户、同一连接）的并发请求合并为一次执行（只合并新会话的请求）
+    QUERY_SINGLE_FLIGHT_ENABLED: bool = os.getenv("QUERY_SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
     
     # 全量加载的表数量阈值（超过此数量自动降级到智能过滤）
     SCHEMA_FULL_LOAD_THRESHOLD: int = int(os.getenv("SCHEMA_FULL_LOAD_THRESHOLD", "100"))
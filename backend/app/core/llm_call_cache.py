@@ -0,0 +1,109 @@
+"""
+LLM 调用结果缓存 (LLM Call Cache)
+
+部分 LLM 调用只取决于输入（查询分析、意图识别、查询改写、Skill 路由等），
+由调用方通过 LLMWrapper.ainvoke(..., cache=True) 按调用点开启：
+- 缓存键：sha256(模型标识, temperature, 消息内容, 额外参数)，与进程无关
+- 内存层：LRU，最多 LLM_CALL_CACHE_MAX_ENTRIES 条
+- 磁盘层（可选）：SQLite 文件 LLM_CALL_CACHE_DB_PATH，多进程共享、重启后仍可命中
+- 过期：LLM_CALL_CACHE_TTL 秒
+
+只缓存响应文本（AIMessage.content），命中时返回新的 AIMessage。
+存储逻辑见 app.core.two_tier_cache。
+
+使用方式：
+    from app.core.llm_call_cache import llm_call_cache
+
+    key = llm_call_cache.make_key(llm, messages)
+    content = llm_call_cache.get(key)        # 未命中返回 None；异步代码使用 await aget(key)
+    llm_call_cache.put(key, response.content)
+"""
+import hashlib
+import json
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.two_tier_cache import TwoTierCache
+
+# 磁盘层条目上限（相对内存层的倍数）
+_DISK_MAX_ENTRIES_FACTOR = 10
+# 参与缓存键的模型属性（不同 LangChain 模型类的属性名不同）
+_MODEL_ATTRS = ("model_name", "model", "openai_api_base", "base_url")
+
+
+def _message_payload(message: Any) -> Tuple[str, Any]:
+    """将 BaseMessage / dict / str 统一为 (角色, 内容)"""
+    if isinstance(message, str):
+        return "human", message
+    if isinstance(message, dict):
+        return str(message.get("role", "")), message.get("content")
+    return getattr(message, "type", type(message).__name__), getattr(message, "content", str(message))
+
+
+class LLMCallCache(TwoTierCache):
+    """两级 LLM 调用结果缓存，响应内容以 JSON 文本存储"""
+
+    table_name = "llm_call_cache"
+    value_column = "content"
+    value_type = "TEXT"
+    label = "LLM call"
+    disk_prune_interval = 500
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        db_path: Optional[str] = None,
+        enabled: Optional[bool] = None
+    ):
+        max_entries = max_entries or settings.LLM_CALL_CACHE_MAX_ENTRIES
+        super().__init__(
+            max_entries=max_entries,
+            ttl=settings.LLM_CALL_CACHE_TTL if ttl is None else ttl,
+            db_path=settings.LLM_CALL_CACHE_DB_PATH if db_path is None else db_path,
+            disk_max_entries=max_entries * _DISK_MAX_ENTRIES_FACTOR
+        )
+        self.enabled = settings.LLM_CALL_CACHE_ENABLED if enabled is None else enabled
+
+    @staticmethod
+    def make_key(llm: Any, messages: Any, **kwargs) -> str:
+        """根据模型标识、temperature、消息和额外参数生成稳定的缓存键"""
+        model = [type(llm).__name__] + [
+            str(getattr(llm, attr)) for attr in _MODEL_ATTRS if getattr(llm, attr, None)
+        ]
+        if isinstance(messages, (str, dict)) or not isinstance(messages, Sequence):
+            messages = [messages]
+        raw = json.dumps(
+            {
+                "model": model,
+                "temperature": getattr(llm, "temperature", None),
+                "messages": [_message_payload(m) for m in messages],
+                "kwargs": kwargs,
+            },
+            ensure_ascii=False, sort_keys=True, default=str
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def put(self, key: str, content: Any) -> None:
+        """写入响应内容（空内容不缓存）"""
+        if content:
+            super().put(key, content)
+
+    async def aput(self, key: str, content: Any) -> None:
+        if content:
+            await super().aput(key, content)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats["enabled"] = self.enabled
+        return stats
+
+    def _encode(self, content: Any) -> str:
+        return json.dumps(content, ensure_ascii=False)
+
+    def _decode(self, raw: str) -> Any:
+        return json.loads(raw)
+
+
+# 创建全局实例
+llm_call_cache = LLMCallCache()
@@ -6,6 +6,7 @@
 2. LangSmith 追踪集成
 3. 错误分类和处理
 4. 性能监控
+5. 确定性调用的结果缓存（按调用点开启，见 app.core.llm_call_cache）
 
 注意：不设置超时限制，因为复杂任务执行时间无法预估。
 重试机制针对可恢复错误（如 429 限流、服务器错误）。
@@ -28,6 +29,9 @@
         trace_id="req-123",
         metadata={"user_id": "user-1"}
     )
+    
+    # 结果只取决于输入的调用（分类、改写等）可开启缓存
+    response = await wrapper.ainvoke(messages, cache=True)
 """
 import asyncio
 import logging
@@ -42,6 +46,8 @@ from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 from langchain_core.callbacks import CallbackManager
 from langchain_core.tracers import LangChainTracer
 
+from app.core.llm_call_cache import llm_call_cache
+
 logger = logging.getLogger(__name__)
 
 
@@ -181,6 +187,10 @@ class LLMMetrics:
     total_latency_ms: float = 0.0
     total_tokens: int = 0
     
+    # 结果缓存统计（只统计开启缓存的调用）
+    cache_hits: int = 0
+    cache_misses: int = 0
+    
     # 错误统计
     error_counts: Dict[str, int] = field(default_factory=dict)
     
@@ -199,6 +209,13 @@ class LLMMetrics:
             if error_type:
                 self.error_counts[error_type] = self.error_counts.get(error_type, 0) + 1
     
+    def record_cache(self, hit: bool):
+        """记录一次缓存查询"""
+        if hit:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+    
     @property
     def success_rate(self) -> float:
         """成功率"""
@@ -213,6 +230,14 @@ class LLMMetrics:
             return 0.0
         return self.total_latency_ms / self.total_calls
     
+    @property
+    def cache_hit_rate(self) -> float:
+        """缓存命中率"""
+        lookups = self.cache_hits + self.cache_misses
+        if lookups == 0:
+            return 0.0
+        return self.cache_hits / lookups
+    
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典"""
         return {
@@ -223,6 +248,9 @@ class LLMMetrics:
             "total_retries": self.total_retries,
             "avg_latency_ms": round(self.avg_latency_ms, 2),
             "total_tokens": self.total_tokens,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_rate": round(self.cache_hit_rate, 4),
             "error_counts": self.error_counts
         }
 
@@ -241,6 +269,7 @@ class LLMWrapper:
     - 错误分类
     - 性能监控
     - LangSmith 追踪集成
+    - 确定性调用的结果缓存（cache=True）
     """
     
     def __init__(
@@ -253,7 +282,7 @@ class LLMWrapper:
         初始化包装器
         
         Args:
-            llm: LLM 模型实例（如果为 None，将延迟加载）
+            llm: LLM 模型实例（如果为 None，每次调用时使用当前的默认模型）
             config: 配置
             name: 包装器名称（用于日志和监控）
         """
@@ -265,11 +294,16 @@ class LLMWrapper:
     
     @property
     def llm(self) -> BaseChatModel:
-        """延迟加载 LLM"""
-        if self._llm is None:
-            from app.core.llms import get_default_model
-            self._llm = get_default_model(caller=f"LLMWrapper:{self.name}")
-        return self._llm
+        """
+        本次调用使用的 LLM
+        
+        未指定 llm 时每次都重新获取默认模型（get_default_model 自带配置和实例缓存），
+        管理员切换默认模型后立即生效，不会固定为首次调用时的模型。
+        """
+        if self._llm is not None:
+            return self._llm
+        from app.core.llms import get_default_model
+        return get_default_model(caller=f"LLMWrapper:{self.name}")
     
     def _get_tracer(self) -> Optional[LangChainTracer]:
         """获取 LangSmith tracer"""
@@ -301,11 +335,26 @@ class LLMWrapper:
         delay = self.config.retry_base_delay * (self.config.retry_exponential_base ** attempt)
         return min(delay, self.config.retry_max_delay)
     
+    def _cache_key(self, llm: BaseChatModel, messages: Any, kwargs: Dict[str, Any]) -> Optional[str]:
+        """调用结果缓存的键，未开启缓存时返回 None"""
+        if not llm_call_cache.enabled:
+            return None
+        return llm_call_cache.make_key(llm, messages, **kwargs)
+    
+    def _cached_message(self, content: Any, trace_id: str) -> Optional[AIMessage]:
+        """记录缓存命中情况，命中时返回响应消息"""
+        self.metrics.record_cache(hit=content is not None)
+        if content is None:
+            return None
+        logger.debug(f"[{trace_id}] LLM call served from cache")
+        return AIMessage(content=content)
+    
     async def ainvoke(
         self,
         messages: List[BaseMessage],
         trace_id: str = None,
         metadata: Dict[str, Any] = None,
+        cache: bool = False,
         **kwargs
     ) -> AIMessage:
         """
@@ -315,6 +364,7 @@ class LLMWrapper:
             messages: 消息列表
             trace_id: 追踪 ID（用于日志关联）
             metadata: 额外元数据
+            cache: 是否使用结果缓存（仅用于结果只取决于输入的调用）
             **kwargs: 传递给 LLM 的额外参数
             
         Returns:
@@ -328,6 +378,15 @@ class LLMWrapper:
             重试机制针对可恢复错误（如 429 限流、服务器错误）。
         """
         trace_id = trace_id or str(uuid.uuid4())[:8]
+        # 整个调用（含缓存键和重试）使用同一个模型
+        llm = self.llm
+        
+        cache_key = self._cache_key(llm, messages, kwargs) if cache else None
+        if cache_key:
+            # 磁盘层读取在线程池中执行，不阻塞事件循环
+            cached = self._cached_message(await llm_call_cache.aget(cache_key), trace_id)
+            if cached is not None:
+                return cached
         
         last_error = None
         retries = 0
@@ -336,7 +395,7 @@ class LLMWrapper:
         for attempt in range(self.config.max_retries + 1):
             try:
                 # 直接调用，不设置超时限制
-                response = await self.llm.ainvoke(messages, **kwargs)
+                response = await llm.ainvoke(messages, **kwargs)
                 
                 # 记录成功
                 latency_ms = (time.time() - start_time) * 1000
@@ -351,6 +410,9 @@ class LLMWrapper:
                     f"latency={latency_ms:.0f}ms, retries={retries}"
                 )
                 
+                if cache_key:
+                    await llm_call_cache.aput(cache_key, response.content)
+                
                 return response
                 
             except Exception as e:
@@ -392,6 +454,7 @@ class LLMWrapper:
         messages: List[BaseMessage],
         trace_id: str = None,
         metadata: Dict[str, Any] = None,
+        cache: bool = False,
         **kwargs
     ) -> AIMessage:
         """
@@ -400,6 +463,14 @@ class LLMWrapper:
         注意：在异步环境中请使用 ainvoke
         """
         trace_id = trace_id or str(uuid.uuid4())[:8]
+        # 整个调用（含缓存键和重试）使用同一个模型
+        llm = self.llm
+        
+        cache_key = self._cache_key(llm, messages, kwargs) if cache else None
+        if cache_key:
+            cached = self._cached_message(llm_call_cache.get(cache_key), trace_id)
+            if cached is not None:
+                return cached
         
         last_error = None
         retries = 0
@@ -407,7 +478,7 @@ class LLMWrapper:
         
         for attempt in range(self.config.max_retries + 1):
             try:
-                response = self.llm.invoke(messages, **kwargs)
+                response = llm.invoke(messages, **kwargs)
                 
                 # 记录成功
                 latency_ms = (time.time() - start_time) * 1000
@@ -422,6 +493,9 @@ class LLMWrapper:
                     f"latency={latency_ms:.0f}ms, retries={retries}"
                 )
                 
+                if cache_key:
+                    llm_call_cache.put(cache_key, response.content)
+                
                 return response
                 
             except Exception as e:
@@ -36,6 +36,7 @@ from app.core.llm_wrapper import (
     get_llm_wrapper,
     reset_llm_wrapper,
 )
+from app.core.llm_call_cache import llm_call_cache
 from app.db.session import SessionLocal
 from app.models.llm_config import LLMConfiguration
 from app.models.system_config import SystemConfig
@@ -527,7 +528,9 @@ def get_llm_metrics() -> Dict[str, Any]:
         包含调用统计的字典
     """
     wrapper = get_llm_wrapper()
-    return wrapper.get_metrics()
+    metrics = wrapper.get_metrics()
+    metrics["call_cache"] = llm_call_cache.get_stats()
+    return metrics
 
 
 def clear_all_llm_caches():
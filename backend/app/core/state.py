@@ -33,6 +33,9 @@ class SQLMessageState(AgentState):
     # 数据库连接信息
     connection_id: int = 15
 
+    # 租户ID（多租户隔离，缓存键等使用）
+    tenant_id: Optional[int] = None
+
     # 查询分析结果
     query_analysis: Optional[Dict[str, Any]] = None
 
@@ -48,6 +51,9 @@ class SQLMessageState(AgentState):
     # 执行结果
     execution_result: Optional[SQLExecutionResult] = None
 
+    # 执行 SQL 前探测的源表数据版本（写入查询缓存时使用）
+    source_table_versions: Optional[Dict[str, Optional[str]]] = None
+
     # 样本检索结果
     sample_retrieval_result: Optional[Dict[str, Any]] = None
 
@@ -0,0 +1,224 @@
+"""
+两级缓存基类 (Two-Tier Cache)
+
+向量缓存和 LLM 调用结果缓存共用的存储逻辑：
+- 内存层：LRU，最多 max_entries 条
+- 磁盘层（可选）：SQLite 文件，进程重启后仍可命中，多进程共享（WAL）
+- 过期：ttl 秒，读取时判断，内存层由 LRU 限制总量，磁盘层定期清理过期/超量条目
+
+子类只需指定表名、值列，并实现值与磁盘列之间的转换（_encode / _decode）。
+线程安全；磁盘层读写失败只记录日志，退化为纯内存缓存。
+异步代码使用 aget / aput，磁盘层读写在线程池中执行，不阻塞事件循环。
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TwoTierCache:
+    """内存 LRU + SQLite 两级缓存"""
+
+    # 磁盘层表名
+    table_name: str = ""
+    # 磁盘层值列的列名和 SQLite 类型
+    value_column: str = "value"
+    value_type: str = "BLOB"
+    # 日志中使用的缓存名称
+    label: str = "Cache"
+    # 磁盘层每写入多少条清理一次过期/超量条目
+    disk_prune_interval: int = 1000
+
+    def __init__(self, max_entries: int, ttl: float, db_path: str, disk_max_entries: int):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._db_path = db_path
+        self._disk_max_entries = disk_max_entries
+        self._memory: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk: Optional[sqlite3.Connection] = None
+        self._disk_failed = False
+        self._disk_writes = 0
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+
+    # ===== 序列化（子类实现） =====
+
+    def _encode(self, value: Any) -> Any:
+        """值 -> 磁盘列"""
+        raise NotImplementedError
+
+    def _decode(self, raw: Any) -> Any:
+        """磁盘列 -> 值"""
+        raise NotImplementedError
+
+    # ===== 对外接口 =====
+
+    @property
+    def disk_enabled(self) -> bool:
+        return bool(self._db_path) and not self._disk_failed
+
+    def get(self, key: str) -> Optional[Any]:
+        """查询缓存，内存未命中时查磁盘层并回填内存"""
+        now = time.time()
+        value = self._get_memory(key, now)
+        if value is not None:
+            return value
+        return self._get_disk(key, now)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """异步查询：内存层直接返回，磁盘层在线程池中读取"""
+        now = time.time()
+        value = self._get_memory(key, now)
+        if value is not None:
+            return value
+        if not self.disk_enabled:
+            return self._get_disk(key, now)
+        return await asyncio.to_thread(self._get_disk, key, now)
+
+    def put(self, key: str, value: Any) -> None:
+        """写入内存层和磁盘层"""
+        now = time.time()
+        with self._lock:
+            self._put_memory(key, value, now)
+            self._stats["stores"] += 1
+        self._disk_put(key, value, now)
+
+    async def aput(self, key: str, value: Any) -> None:
+        """异步写入：磁盘层在线程池中写入"""
+        if not self.disk_enabled:
+            self.put(key, value)
+            return
+        await asyncio.to_thread(self.put, key, value)
+
+    def clear(self) -> None:
+        """清空内存层和磁盘层"""
+        with self._lock:
+            self._memory.clear()
+        conn = self._disk_connect()
+        if conn is not None:
+            with self._disk_lock:
+                conn.execute(f"DELETE FROM {self.table_name}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        requests = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["requests"] = requests
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / requests, 4) if requests else 0.0
+        stats["max_entries"] = self._max_entries
+        stats["disk_enabled"] = self.disk_enabled
+        return stats
+
+    # ===== 内存层 =====
+
+    def _get_memory(self, key: str, now: float) -> Optional[Any]:
+        with self._lock:
+            item = self._memory.get(key)
+            if item is None:
+                return None
+            if now - item[1] <= self._ttl:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return item[0]
+            del self._memory[key]
+            return None
+
+    def _put_memory(self, key: str, value: Any, stored_at: float) -> None:
+        self._memory[key] = (value, stored_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_entries:
+            self._memory.popitem(last=False)
+
+    # ===== 磁盘层 =====
+
+    def _get_disk(self, key: str, now: float) -> Optional[Any]:
+        found = self._disk_get(key, now)
+        with self._lock:
+            if found is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["disk_hits"] += 1
+            self._put_memory(key, found[0], found[1])
+        return found[0]
+
+    def _disk_connect(self) -> Optional[sqlite3.Connection]:
+        if not self.disk_enabled:
+            return None
+        if self._disk is None:
+            with self._disk_lock:
+                if self._disk is None:
+                    try:
+                        os.makedirs(os.path.dirname(os.path.abspath(self._db_path)), exist_ok=True)
+                        conn = sqlite3.connect(
+                            self._db_path, timeout=5.0, check_same_thread=False, isolation_level=None
+                        )
+                        conn.execute("PRAGMA busy_timeout = 5000")
+                        conn.execute("PRAGMA journal_mode = WAL")
+                        conn.execute("PRAGMA synchronous = NORMAL")
+                        conn.execute(
+                            f"CREATE TABLE IF NOT EXISTS {self.table_name} ("
+                            f"cache_key TEXT PRIMARY KEY, {self.value_column} {self.value_type} NOT NULL, "
+                            "created_at REAL NOT NULL)"
+                        )
+                        conn.execute(
+                            f"CREATE INDEX IF NOT EXISTS ix_{self.table_name}_created_at "
+                            f"ON {self.table_name} (created_at)"
+                        )
+                        self._disk = conn
+                    except Exception as e:
+                        logger.warning(f"{self.label} disk cache disabled ({self._db_path}): {e}")
+                        self._disk_failed = True
+                        return None
+        return self._disk
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[Any, float]]:
+        conn = self._disk_connect()
+        if conn is None:
+            return None
+        try:
+            with self._disk_lock:
+                row = conn.execute(
+                    f"SELECT {self.value_column}, created_at FROM {self.table_name} WHERE cache_key = ?", (key,)
+                ).fetchone()
+        except Exception as e:
+            logger.warning(f"{self.label} disk cache read failed: {e}")
+            return None
+        if row is None or now - row[1] > self._ttl:
+            return None
+        return self._decode(row[0]), row[1]
+
+    def _disk_put(self, key: str, value: Any, now: float) -> None:
+        conn = self._disk_connect()
+        if conn is None:
+            return
+        try:
+            with self._disk_lock:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table_name} (cache_key, {self.value_column}, created_at) "
+                    "VALUES (?, ?, ?)",
+                    (key, self._encode(value), now)
+                )
+                self._disk_writes += 1
+                if self._disk_writes % self.disk_prune_interval == 0:
+                    self._disk_prune(conn, now)
+        except Exception as e:
+            logger.warning(f"{self.label} disk cache write failed: {e}")
+
+    def _disk_prune(self, conn: sqlite3.Connection, now: float) -> None:
+        """删除过期条目，并在超过上限时删除最旧的条目"""
+        conn.execute(f"DELETE FROM {self.table_name} WHERE created_at < ?", (now - self._ttl,))
+        count = conn.execute(f"SELECT COUNT(*) FROM {self.table_name}").fetchone()[0]
+        if count > self._disk_max_entries:
+            conn.execute(
+                f"DELETE FROM {self.table_name} WHERE cache_key IN ("
+                f"SELECT cache_key FROM {self.table_name} ORDER BY created_at LIMIT ?)",
+                (count - self._disk_max_entries,)
+            )
@@ -1,19 +1,35 @@
 """Dashboard CRUD操作"""
-from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_
+from typing import List, Optional, Dict, Any, Tuple
+from sqlalchemy.orm import Session, joinedload, load_only
+from sqlalchemy import and_, or_, func, select
 from datetime import datetime
+import base64
 import logging
 
 from app.crud.base import CRUDBase
 from app.models.dashboard import Dashboard
 from app.models.dashboard_permission import DashboardPermission
+from app.models.dashboard_widget import DashboardWidget
 from app.models.user import User
 from app.schemas.dashboard import DashboardCreate, DashboardUpdate
 
 logger = logging.getLogger(__name__)
 
 
+def _encode_cursor(updated_at: datetime, dashboard_id: int) -> str:
+    """列表游标：最后一条记录的 (updated_at, id)"""
+    raw = f"{updated_at.isoformat()}|{dashboard_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        updated_at, dashboard_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(updated_at), int(dashboard_id)
+    except Exception:
+        raise ValueError("无效的分页游标")
+
+
 class CRUDDashboard(CRUDBase[Dashboard, DashboardCreate, DashboardUpdate]):
     """Dashboard CRUD操作类"""
 
@@ -26,122 +42,121 @@ class CRUDDashboard(CRUDBase[Dashboard, DashboardCreate, DashboardUpdate]):
         scope: str = "mine",
         skip: int = 0,
         limit: int = 20,
-        search: Optional[str] = None
-    ) -> tuple[List[Dashboard], int]:
+        search: Optional[str] = None,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Tuple[Dashboard, int]], int, Optional[str]]:
         """获取用户可访问的Dashboard列表
         
-        优化：使用 joinedload 预加载关联数据，避免 N+1 查询
+        优化：列表只加载卡片需要的列，不加载 widgets（data_cache 可能有数 MB），
+        Widget 数量通过按 dashboard_id 的聚合子查询获取，查询耗时与 Widget 大小无关
         多租户隔离：当提供 tenant_id 时，只返回该租户的 Dashboard
+        分页：提供 cursor 时按 (updated_at, id) 键集分页，否则按 skip 偏移分页
         
         Args:
             user_id: 用户ID
             tenant_id: 租户ID（可选，用于多租户隔离）
             scope: 范围 (mine/shared/public/tenant)
-            skip: 跳过数量
+            skip: 跳过数量（未提供 cursor 时使用）
             limit: 限制数量
             search: 搜索关键词
+            cursor: 上一页返回的游标
             
         Returns:
-            (Dashboard列表, 总数)
+            ([(Dashboard, Widget数量)], 总数, 下一页游标)
+            
+        Raises:
+            ValueError: 游标无效
         """
-        # 基础查询，预加载 widgets、permissions 和 owner
-        base_query = db.query(Dashboard).options(
-            joinedload(Dashboard.widgets),
-            joinedload(Dashboard.owner)
-        ).filter(Dashboard.deleted_at.is_(None))
+        filters = self._list_filters(db, user_id=user_id, tenant_id=tenant_id, scope=scope, search=search)
+        
+        # 获取总数（与列表使用相同的过滤条件）
+        total = db.query(func.count(Dashboard.id)).filter(*filters).scalar()
+        
+        widget_count = select(func.count(DashboardWidget.id)).where(
+            DashboardWidget.dashboard_id == Dashboard.id
+        ).correlate(Dashboard).scalar_subquery()
+        
+        query = db.query(Dashboard, widget_count).options(
+            load_only(
+                Dashboard.id, Dashboard.name, Dashboard.description, Dashboard.is_public,
+                Dashboard.tags, Dashboard.owner_id, Dashboard.created_at, Dashboard.updated_at
+            ),
+            joinedload(Dashboard.owner).load_only(User.id, User.username, User.display_name)
+        ).filter(*filters).order_by(
+            # id 作为相同更新时间的次序，保证游标稳定
+            Dashboard.updated_at.desc(), Dashboard.id.desc()
+        )
+        
+        # 分页
+        if cursor:
+            updated_at, last_id = _decode_cursor(cursor)
+            query = query.filter(or_(
+                Dashboard.updated_at < updated_at,
+                and_(Dashboard.updated_at == updated_at, Dashboard.id < last_id)
+            ))
+        else:
+            query = query.offset(skip)
+        
+        rows = query.limit(limit).all()
+        
+        next_cursor = None
+        if len(rows) == limit:
+            last = rows[-1][0]
+            next_cursor = _encode_cursor(last.updated_at, last.id)
+        
+        return [(dashboard, count) for dashboard, count in rows], total, next_cursor
+
+    def _list_filters(
+        self,
+        db: Session,
+        *,
+        user_id: int,
+        tenant_id: Optional[int],
+        scope: str,
+        search: Optional[str]
+    ) -> list:
+        """Dashboard列表的过滤条件（列表和总数共用）"""
+        filters = [Dashboard.deleted_at.is_(None)]
         
         # 多租户隔离：如果提供了 tenant_id，限制在租户范围内
         if tenant_id:
-            base_query = base_query.filter(Dashboard.tenant_id == tenant_id)
+            filters.append(Dashboard.tenant_id == tenant_id)
+        
+        shared_dashboard_ids = db.query(DashboardPermission.dashboard_id).filter(
+            DashboardPermission.user_id == user_id
+        )
         
         # 根据scope过滤
         if scope == "mine":
-            query = base_query.filter(Dashboard.owner_id == user_id)
+            filters.append(Dashboard.owner_id == user_id)
         elif scope == "shared":
-            # 共享给我的Dashboard - 需要单独处理以避免重复
-            shared_dashboard_ids = db.query(DashboardPermission.dashboard_id).filter(
-                DashboardPermission.user_id == user_id
-            ).subquery()
-            query = base_query.filter(
-                Dashboard.id.in_(shared_dashboard_ids),
-                Dashboard.owner_id != user_id
-            )
+            # 共享给我的Dashboard
+            filters.append(Dashboard.id.in_(shared_dashboard_ids))
+            filters.append(Dashboard.owner_id != user_id)
         elif scope == "public":
             # 公开的Dashboard
-            query = base_query.filter(Dashboard.is_public == True)
+            filters.append(Dashboard.is_public == True)
         elif scope == "tenant":
             # 租户内所有 Dashboard（需要 tenant_id）
             if not tenant_id:
-                query = base_query.filter(Dashboard.owner_id == user_id)
-            else:
-                query = base_query  # 已在基础查询中过滤
+                filters.append(Dashboard.owner_id == user_id)
         else:
             # 全部可访问的
-            query = base_query.filter(
-                or_(
-                    Dashboard.owner_id == user_id,
-                    Dashboard.is_public == True,
-                    Dashboard.id.in_(
-                        db.query(DashboardPermission.dashboard_id).filter(
-                            DashboardPermission.user_id == user_id
-                        )
-                    )
-                )
-            )
+            filters.append(or_(
+                Dashboard.owner_id == user_id,
+                Dashboard.is_public == True,
+                Dashboard.id.in_(shared_dashboard_ids)
+            ))
         
         # 搜索过滤 - 使用参数化查询防止 SQL 注入
         if search:
             search_pattern = f"%{search}%"
-            query = query.filter(
-                or_(
-                    Dashboard.name.ilike(search_pattern),
-                    Dashboard.description.ilike(search_pattern)
-                )
-            )
-        
-        # 获取总数（在分页前）
-        # 使用子查询避免 joinedload 影响 count
-        count_query = db.query(Dashboard.id).filter(Dashboard.deleted_at.is_(None))
-        if scope == "mine":
-            count_query = count_query.filter(Dashboard.owner_id == user_id)
-        elif scope == "shared":
-            shared_ids = db.query(DashboardPermission.dashboard_id).filter(
-                DashboardPermission.user_id == user_id
-            ).subquery()
-            count_query = count_query.filter(
-                Dashboard.id.in_(shared_ids),
-                Dashboard.owner_id != user_id
-            )
-        elif scope == "public":
-            count_query = count_query.filter(Dashboard.is_public == True)
-        else:
-            count_query = count_query.filter(
-                or_(
-                    Dashboard.owner_id == user_id,
-                    Dashboard.is_public == True,
-                    Dashboard.id.in_(
-                        db.query(DashboardPermission.dashboard_id).filter(
-                            DashboardPermission.user_id == user_id
-                        )
-                    )
-                )
-            )
-        
-        if search:
-            search_pattern = f"%{search}%"
-            count_query = count_query.filter(
-                or_(
-                    Dashboard.name.ilike(search_pattern),
-                    Dashboard.description.ilike(search_pattern)
-                )
-            )
-        
-        total = count_query.count()
+            filters.append(or_(
+                Dashboard.name.ilike(search_pattern),
+                Dashboard.description.ilike(search_pattern)
+            ))
         
-        # 分页和排序
-        items = query.order_by(Dashboard.updated_at.desc()).offset(skip).limit(limit).all()
-        
-        return items, total
+        return filters
 
     def get_user_permission_batch(
         self,
@@ -209,19 +224,26 @@ class CRUDDashboard(CRUDBase[Dashboard, DashboardCreate, DashboardUpdate]):
         db: Session,
         *,
         dashboard_id: int,
-        user_id: Optional[int] = None
+        user_id: Optional[int] = None,
+        include_data: bool = True
     ) -> Optional[Dashboard]:
         """获取Dashboard详情(包含widgets和permissions)
         
         Args:
             dashboard_id: Dashboard ID
             user_id: 当前用户ID(用于检查权限)
+            include_data: 是否加载Widget的data_cache（为False时延迟加载，不要访问该属性）
             
         Returns:
             Dashboard对象或None
         """
+        widgets = joinedload(Dashboard.widgets)
+        if not include_data:
+            # Widget数据通过单独的接口按需获取
+            widgets = widgets.defer(DashboardWidget.data_cache)
+        
         query = db.query(Dashboard).options(
-            joinedload(Dashboard.widgets),
+            widgets,
             joinedload(Dashboard.permissions),
             joinedload(Dashboard.owner)
         ).filter(
@@ -1,7 +1,7 @@
 """Dashboard Widget CRUD操作"""
 from typing import List, Optional
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_, func
+from sqlalchemy import bindparam, or_, func, update
 from datetime import datetime
 import time
 import logging
@@ -34,6 +34,31 @@ class CRUDDashboardWidget(CRUDBase[DashboardWidget, WidgetCreate, WidgetUpdate])
             DashboardWidget.dashboard_id == dashboard_id
         ).order_by(DashboardWidget.created_at).all()
 
+    def get_payloads(
+        self,
+        db: Session,
+        *,
+        dashboard_id: int,
+        widget_ids: Optional[List[int]] = None
+    ) -> List[tuple]:
+        """获取Widget的数据缓存（只查询数据相关的列）
+
+        Args:
+            dashboard_id: Dashboard ID
+            widget_ids: 指定的Widget ID列表，为空则返回全部
+
+        Returns:
+            (id, data_cache, last_refresh_at) 列表
+        """
+        query = db.query(
+            DashboardWidget.id,
+            DashboardWidget.data_cache,
+            DashboardWidget.last_refresh_at
+        ).filter(DashboardWidget.dashboard_id == dashboard_id)
+        if widget_ids:
+            query = query.filter(DashboardWidget.id.in_(widget_ids))
+        return query.order_by(DashboardWidget.created_at).all()
+
     def create_widget(
         self,
         db: Session,
@@ -175,6 +200,40 @@ class CRUDDashboardWidget(CRUDBase[DashboardWidget, WidgetCreate, WidgetUpdate])
         
         return widget, duration_ms
 
+    def bulk_update_cache(
+        self,
+        db: Session,
+        *,
+        updates: List[dict]
+    ) -> int:
+        """批量写入Widget的刷新结果（一条按主键的批量UPDATE，一次提交）
+
+        使用 Core executemany 而不是 ORM 按主键批量更新：刷新期间被删除的Widget
+        只是匹配不到行，不会抛出 StaleDataError 导致整批回滚。
+
+        Args:
+            updates: [{"id", "data_cache", "last_refresh_at"}, ...]
+
+        Returns:
+            更新的Widget数（不含已删除的Widget）
+        """
+        if not updates:
+            return 0
+        table = DashboardWidget.__table__
+        try:
+            result = db.execute(
+                update(table).where(table.c.id == bindparam("b_id")),
+                [
+                    {"b_id": row["id"], "data_cache": row["data_cache"], "last_refresh_at": row["last_refresh_at"]}
+                    for row in updates
+                ]
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return result.rowcount
+
     def get_widgets_need_refresh(
         self,
         db: Session,
@@ -215,6 +274,43 @@ class CRUDDashboardWidget(CRUDBase[DashboardWidget, WidgetCreate, WidgetUpdate])
         
         return need_refresh
 
+    def get_auto_refresh_candidates(self, db: Session) -> List[tuple]:
+        """获取启用了自动刷新的Widget（只查询调度需要的列，不加载data_cache）
+
+        Returns:
+            (id, dashboard_id, connection_id, refresh_interval, last_refresh_at) 列表，
+            不包含洞察分析Widget和已删除Dashboard的Widget
+        """
+        from app.models.dashboard import Dashboard
+
+        return db.query(
+            DashboardWidget.id,
+            DashboardWidget.dashboard_id,
+            DashboardWidget.connection_id,
+            DashboardWidget.refresh_interval,
+            DashboardWidget.last_refresh_at
+        ).join(
+            Dashboard, Dashboard.id == DashboardWidget.dashboard_id
+        ).filter(
+            DashboardWidget.refresh_interval > 0,
+            DashboardWidget.widget_type != "insight_analysis",
+            Dashboard.deleted_at.is_(None)
+        ).all()
+
+    def get_refresh_queries(self, db: Session, *, widget_ids: List[int]) -> List[tuple]:
+        """获取Widget刷新需要的查询配置（不加载data_cache）
+
+        Returns:
+            (id, connection_id, query_config) 列表
+        """
+        if not widget_ids:
+            return []
+        return db.query(
+            DashboardWidget.id,
+            DashboardWidget.connection_id,
+            DashboardWidget.query_config
+        ).filter(DashboardWidget.id.in_(widget_ids)).all()
+
     def update_query_config(
         self,
         db: Session,
@@ -2,9 +2,7 @@ from typing import Any, Dict, Optional, Union, List
 
 from sqlalchemy.orm import Session
 from sqlalchemy import delete
-from neo4j import GraphDatabase
 
-from app.core.config import settings
 from app.core.security import get_password_hash, verify_password
 from app.crud.base import CRUDBase
 from app.models.db_connection import DBConnection
@@ -93,7 +91,9 @@ class CRUDDBConnection(CRUDBase[DBConnection, DBConnectionCreate, DBConnectionUp
             plain_password = update_data["password"]
             del update_data["password"]
             update_data["password_encrypted"] = plain_password  # 暂时存储明文密码
-        return super().update(db, db_obj=db_obj, obj_in=update_data)
+        db_obj = super().update(db, db_obj=db_obj, obj_in=update_data)
+        self._invalidate_engine(db_obj.id)
+        return db_obj
 
     def get_by_name(self, db: Session, *, name: str) -> Optional[DBConnection]:
         return db.query(DBConnection).filter(DBConnection.name == name).first()
@@ -135,6 +135,8 @@ class CRUDDBConnection(CRUDBase[DBConnection, DBConnectionCreate, DBConnectionUp
             # Step 5: Delete the connection itself
             db.delete(connection)
             db.commit()
+            self._invalidate_engine(id)
+            self._invalidate_schema_snapshot(id)
 
             return connection
         except Exception as e:
@@ -142,15 +144,25 @@ class CRUDDBConnection(CRUDBase[DBConnection, DBConnectionCreate, DBConnectionUp
             print(f"Error deleting connection: {str(e)}")
             raise e
 
+    def _invalidate_engine(self, connection_id: int) -> None:
+        """连接配置变更或删除后，释放对应的池化 Engine"""
+        from app.services.db_engine_registry import db_engine_registry
+        db_engine_registry.invalidate(connection_id)
+
+    def _invalidate_schema_snapshot(self, connection_id: int) -> None:
+        """连接删除后，丢弃对应的 Schema 快照"""
+        from app.services.schema_snapshot import schema_snapshot_cache
+        schema_snapshot_cache.invalidate(connection_id)
+
     def _clean_neo4j_data(self, connection_id: int) -> None:
         """清理Neo4j图数据库中与指定连接相关的所有数据"""
+        from app.services.neo4j_service import neo4j_service
         try:
             print(f"开始清理Neo4j中连接ID为{connection_id}的数据")
-            # 连接到Neo4j
-            driver = GraphDatabase.driver(
-                settings.NEO4J_URI,
-                auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
-            )
+            # 使用共享的 Neo4j 驱动
+            driver = neo4j_service.get_driver()
+            if driver is None:
+                raise Exception("Neo4j driver unavailable")
 
             with driver.session() as session:
                 # 删除与此连接相关的所有节点和关系
@@ -160,8 +172,6 @@ class CRUDDBConnection(CRUDBase[DBConnection, DBConnectionCreate, DBConnectionUp
                     connection_id=connection_id
                 )
                 print(f"成功清理Neo4j中连接ID为{connection_id}的数据")
-
-            driver.close()
         except Exception as e:
             print(f"清理Neo4j数据失败: {str(e)}")
             # 这里我们只记录错误，但不抛出异常，因为即使Neo4j清理失败，我们仍然希望继续删除MySQL中的数据
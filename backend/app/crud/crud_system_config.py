@@ -1,4 +1,7 @@
+import json
+import time
 from typing import Optional, Dict, Any, Union
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app.crud.base import CRUDBase
@@ -106,5 +109,53 @@ class CRUDSystemConfig(CRUDBase[SystemConfig, SystemConfigCreate, SystemConfigUp
         config["enabled"] = enabled
         return self.set_qa_sample_config(db, config=config)
 
+    # ===== 后台任务租约（多 worker 选主） =====
+
+    def try_acquire_lease(self, db: Session, *, lease_key: str, holder: str, ttl_seconds: float) -> bool:
+        """
+        获取或续期租约：行锁（SELECT ... FOR UPDATE）保证同一时刻只有一个持有者
+
+        租约未被占用、已过期或已由 holder 持有时写入 holder 和新的过期时间并返回 True。
+        """
+        now = time.time()
+        try:
+            config = db.query(self.model).filter(
+                self.model.config_key == lease_key
+            ).with_for_update().first()
+            try:
+                lease = json.loads(config.config_value) if config and config.config_value else {}
+            except json.JSONDecodeError:
+                lease = {}
+            if lease.get("holder") not in (None, holder) and lease.get("expires_at", 0) > now:
+                db.rollback()
+                return False
+
+            value = json.dumps({"holder": holder, "expires_at": now + ttl_seconds})
+            if config:
+                config.config_value = value
+            else:
+                db.add(self.model(config_key=lease_key, config_value=value, description="后台任务租约"))
+            db.commit()
+            return True
+        except IntegrityError:
+            # 其他 worker 同时创建了租约行
+            db.rollback()
+            return False
+
+    def release_lease(self, db: Session, *, lease_key: str, holder: str) -> None:
+        """释放 holder 持有的租约，其他 worker 无需等待过期即可接管"""
+        config = db.query(self.model).filter(
+            self.model.config_key == lease_key
+        ).with_for_update().first()
+        try:
+            lease = json.loads(config.config_value) if config and config.config_value else {}
+        except json.JSONDecodeError:
+            lease = {}
+        if lease.get("holder") == holder:
+            config.config_value = json.dumps({"holder": None, "expires_at": 0})
+            db.commit()
+        else:
+            db.rollback()
+
 
 system_config = CRUDSystemConfig(SystemConfig)
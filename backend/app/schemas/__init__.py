@@ -44,6 +44,8 @@ from app.schemas.dashboard_widget import (
     WidgetUpdate,
     WidgetResponse,
     WidgetRefreshResponse,
+    WidgetDataItem,
+    WidgetDataResponse,
     WidgetRegenerateRequest,
     UserSimple
 )
@@ -68,6 +68,7 @@ class DashboardListResponse(BaseModel):
     page: int = Field(..., description="当前页码")
     page_size: int = Field(..., description="每页数量")
     items: List[DashboardListItem] = Field(..., description="Dashboard列表")
+    next_cursor: Optional[str] = Field(None, description="下一页游标，没有更多数据时为空")
 
 
 # 布局更新请求Schema
@@ -130,7 +131,7 @@ class RefreshConfig(BaseModel):
 
 class GlobalRefreshRequest(BaseModel):
     """全局刷新请求"""
-    force: bool = Field(False, description="强制刷新(忽略缓存)")
+    force: bool = Field(False, description="保留兼容：刷新总是直接查询数据源，不经过缓存")
     widget_ids: Optional[List[int]] = Field(None, description="指定刷新的Widget ID, 为空则刷新全部")
 
 
@@ -1,7 +1,7 @@
 """Dashboard Widget Schema定义"""
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
 
 # Widget基础Schema
@@ -31,6 +31,12 @@ class WidgetUpdate(BaseModel):
     position_config: Optional[Dict[str, Any]] = None
 
 
+def _columnar_data_cache(v: Any) -> Any:
+    """data_cache 在响应中保持列式格式（压缩的只解压，不展开为行字典，由前端展开）"""
+    from app.services.widget_cache_codec import columnar_view
+    return columnar_view(v)
+
+
 # Widget的响应Schema
 class WidgetResponse(WidgetBase):
     """Widget响应Schema"""
@@ -42,6 +48,8 @@ class WidgetResponse(WidgetBase):
     updated_at: datetime
     connection_name: Optional[str] = Field(None, description="连接名称")
 
+    _columnar_cache = field_validator("data_cache", mode="before")(_columnar_data_cache)
+
     class Config:
         from_attributes = True
 
@@ -54,6 +62,23 @@ class WidgetRefreshResponse(BaseModel):
     last_refresh_at: datetime
     refresh_duration_ms: int = Field(..., description="刷新耗时(毫秒)")
 
+    _columnar_cache = field_validator("data_cache", mode="before")(_columnar_data_cache)
+
+
+# Widget数据响应Schema（按需获取，Dashboard详情可不带数据）
+class WidgetDataItem(BaseModel):
+    """单个Widget的数据"""
+    id: int
+    data_cache: Optional[Dict[str, Any]] = None
+    last_refresh_at: Optional[datetime] = None
+
+    _columnar_cache = field_validator("data_cache", mode="before")(_columnar_data_cache)
+
+
+class WidgetDataResponse(BaseModel):
+    """Widget数据列表响应Schema"""
+    items: List[WidgetDataItem] = Field(default_factory=list)
+
 
 # Widget重新生成查询请求Schema
 class WidgetRegenerateRequest(BaseModel):
@@ -12,6 +12,7 @@ from app import crud, schemas
 from app.models.dashboard_widget import DashboardWidget
 from app.services.graph_relationship_service import graph_relationship_service
 from app.db.session import SessionLocal
+from app.services.widget_cache_codec import cache_rows
 from app.services.text2sql_utils import retrieve_relevant_schema, format_schema_for_prompt
 from app.core.agent_config import get_agent_llm, CORE_AGENT_SQL_GENERATOR
 from langchain_core.messages import SystemMessage, HumanMessage
@@ -182,7 +183,9 @@ class DashboardInsightService:
         
         # 1. 获取上下文
         if request.intent:
-            schema_context = retrieve_relevant_schema(db, request.connection_id, request.intent)
+            schema_context = await asyncio.to_thread(
+                retrieve_relevant_schema, db, request.connection_id, request.intent
+            )
         else:
             tables = crud.schema_table.get_by_connection(db=db, connection_id=request.connection_id)
             
@@ -221,7 +224,7 @@ class DashboardInsightService:
             # 获取表之间的关系
             relationships = []
             try:
-                relationship_context = graph_relationship_service.query_table_relationships(
+                relationship_context = await graph_relationship_service.query_table_relationships(
                     connection_id=request.connection_id,
                     table_names=table_names
                 )
@@ -610,7 +613,7 @@ SQL 语法注意事项（{db_type}）：
                 if request.use_graph_relationships and aggregated_data["table_names"]:
                     try:
                         connection_id = data_widgets[0].connection_id
-                        relationship_context = graph_relationship_service.query_table_relationships(
+                        relationship_context = await graph_relationship_service.query_table_relationships(
                             connection_id,
                             aggregated_data["table_names"]
                         )
@@ -1199,10 +1202,7 @@ SQL 语法注意事项（{db_type}）：
         
         for widget in widgets:
             # 提取widget数据
-            if not widget.data_cache or "data" not in widget.data_cache:
-                continue
-            
-            data = widget.data_cache["data"]
+            data = cache_rows(widget.data_cache)
             if not data or not isinstance(data, list):
                 continue
             
@@ -0,0 +1,274 @@
+"""
+Dashboard 自动刷新调度 (Dashboard Auto-Refresh Scheduler)
+
+按 DashboardWidget.refresh_interval 在后台刷新 data_cache，打开 Dashboard 时直接读取缓存：
+- 进程内 asyncio 循环，每 DASHBOARD_AUTO_REFRESH_TICK 秒（带随机抖动）检查一次到期 Widget
+- 多 worker 部署时通过 system_config 行锁租约选出一个执行者，其余 worker 只续租失败后等待下一轮；
+  一轮刷新期间每 1/3 租约有效期续租一次，续租失败（租约已被接管）时立即停止本轮
+- 每个 Widget 的到期时间提前一个固定的随机比例（最多 DASHBOARD_AUTO_REFRESH_JITTER），
+  相同刷新间隔的 Widget 不会在同一时刻集中刷新
+- 与全局刷新相同，按 (connection_id, 规范化SQL) 合并查询，相同 SQL 只执行一次；
+  单个连接同时执行的查询数不超过 DASHBOARD_AUTO_REFRESH_PER_CONNECTION
+- 连续失败的 Widget 指数退避（最长 DASHBOARD_AUTO_REFRESH_MAX_BACKOFF 秒），成功后恢复
+
+刷新本身复用 DashboardRefreshService，与手动刷新写入相同的 data_cache 格式；
+只读取刷新需要的列（不加载 data_cache），数据库读写都在线程池中执行。
+
+使用方式：
+    from app.services.dashboard_refresh_scheduler import dashboard_refresh_scheduler
+
+    dashboard_refresh_scheduler.start()        # 应用启动时
+    await dashboard_refresh_scheduler.stop()   # 应用关闭时
+"""
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+LEASE_KEY = "dashboard_auto_refresh_leader"
+
+
+class DashboardRefreshScheduler:
+    """Dashboard 自动刷新调度器（每个进程一个实例，同一时刻只有租约持有者执行刷新）"""
+
+    def __init__(self, session_factory: Optional[Callable[[], Any]] = None, enabled: Optional[bool] = None):
+        self.enabled = settings.DASHBOARD_AUTO_REFRESH_ENABLED if enabled is None else enabled
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._session_factory = session_factory
+        self._task: Optional[asyncio.Task] = None
+        self._is_leader = False
+        # widget_id -> (连续失败次数, 下次允许刷新的时间戳)
+        self._failures: Dict[int, Tuple[int, float]] = {}
+        self._stats = {"ticks": 0, "refreshed": 0, "failed": 0, "backoff_skips": 0, "lease_lost": 0}
+
+    # ===== 生命周期 =====
+
+    def start(self) -> None:
+        """在当前事件循环中启动调度循环（未启用或已启动时忽略）"""
+        if not self.enabled or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"Dashboard auto-refresh scheduler started ({self.holder})")
+
+    async def stop(self) -> None:
+        """停止调度循环并释放租约"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._is_leader:
+            try:
+                await asyncio.to_thread(self._release_lease)
+            except Exception as e:
+                logger.warning(f"Failed to release dashboard refresh lease: {e}")
+            self._is_leader = False
+
+    async def run_once(self) -> int:
+        """执行一轮检查：获取租约、挑选到期 Widget 并刷新，返回刷新成功的 Widget 数"""
+        self._stats["ticks"] += 1
+        self._is_leader = await asyncio.to_thread(self._acquire_lease)
+        if not self._is_leader:
+            return 0
+
+        candidates = await asyncio.to_thread(self._load_candidates)
+        due = self._select_due(candidates, time.time(), datetime.utcnow())
+        if not due:
+            return 0
+
+        # 一轮可能比租约有效期更长：刷新期间定期续租，续租失败时停止本轮
+        refresh = asyncio.ensure_future(self._refresh_due(due))
+        heartbeat = asyncio.create_task(self._keep_lease(refresh))
+        try:
+            return await refresh
+        except asyncio.CancelledError:
+            if not heartbeat.done() or heartbeat.cancelled():
+                raise
+            logger.warning("Dashboard refresh lease lost, stopped the current auto-refresh round")
+            return 0
+        finally:
+            heartbeat.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["enabled"] = self.enabled
+        stats["is_leader"] = self._is_leader
+        stats["backing_off"] = sum(1 for _, retry_at in self._failures.values() if retry_at > time.time())
+        return stats
+
+    # ===== 调度 =====
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.warning(f"Dashboard auto-refresh round failed: {e}")
+            await asyncio.sleep(self._jittered(settings.DASHBOARD_AUTO_REFRESH_TICK))
+
+    @staticmethod
+    def _jittered(seconds: float) -> float:
+        jitter = settings.DASHBOARD_AUTO_REFRESH_JITTER
+        return seconds * random.uniform(1 - jitter, 1 + jitter)
+
+    @staticmethod
+    def _phase(widget_id: int) -> float:
+        """Widget 固定的提前比例 [0, JITTER)，分散相同刷新间隔的 Widget"""
+        return random.Random(widget_id).random() * settings.DASHBOARD_AUTO_REFRESH_JITTER
+
+    def _select_due(self, candidates: List[tuple], now: float, utc_now: datetime) -> List[Tuple[int, int, int]]:
+        """挑选到期的 Widget，最久未刷新的优先，返回 (widget_id, connection_id, 刷新间隔)"""
+        due = []
+        for widget_id, _, connection_id, refresh_interval, last_refresh_at in candidates:
+            failure = self._failures.get(widget_id)
+            if failure is not None and failure[1] > now:
+                self._stats["backoff_skips"] += 1
+                continue
+            interval = max(refresh_interval, settings.DASHBOARD_AUTO_REFRESH_MIN_INTERVAL)
+            if last_refresh_at is None:
+                overdue = float("inf")
+            else:
+                overdue = (utc_now - last_refresh_at).total_seconds() - interval * (1 - self._phase(widget_id))
+                if overdue < 0:
+                    continue
+            due.append((overdue, widget_id, connection_id, interval))
+
+        due.sort(key=lambda item: item[0], reverse=True)
+        return [(widget_id, connection_id, interval)
+                for _, widget_id, connection_id, interval in due[:settings.DASHBOARD_AUTO_REFRESH_BATCH_SIZE]]
+
+    async def _keep_lease(self, round_task: asyncio.Future) -> None:
+        """每 1/3 租约有效期续租一次，续租失败时取消本轮刷新"""
+        interval = settings.DASHBOARD_AUTO_REFRESH_LEASE_TTL / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                renewed = await asyncio.to_thread(self._acquire_lease)
+            except Exception as e:
+                logger.warning(f"Failed to renew dashboard refresh lease: {e}")
+                renewed = False
+            if not renewed:
+                self._is_leader = False
+                self._stats["lease_lost"] += 1
+                round_task.cancel()
+                return
+
+    async def _refresh_due(self, due: List[Tuple[int, int, int]]) -> int:
+        """
+        刷新到期的 Widget，返回刷新成功的 Widget 数
+
+        与全局刷新共用 DashboardRefreshService.refresh_queries：相同连接上的相同 SQL 只执行一次，
+        单个连接的并发不超过 DASHBOARD_AUTO_REFRESH_PER_CONNECTION；结果在本轮结束时一次批量写回。
+        """
+        from app.services.dashboard_refresh_service import dashboard_refresh_service
+
+        queries = await asyncio.to_thread(self._load_queries, [widget_id for widget_id, _, _ in due])
+        # 选出后已被删除的 Widget 不再刷新
+        due = [item for item in due if item[0] in queries]
+        logger.info(f"Auto-refreshing {len(due)} dashboard widgets")
+
+        results, updates = await dashboard_refresh_service.refresh_queries(
+            [(widget_id, *queries[widget_id]) for widget_id, _, _ in due],
+            per_connection=settings.DASHBOARD_AUTO_REFRESH_PER_CONNECTION
+        )
+        errors = {widget_id: result.error for widget_id, result in results.items() if not result.success}
+        try:
+            await asyncio.to_thread(self._save_results, updates)
+        except Exception as e:
+            errors.update((row["id"], f"保存刷新结果失败: {e}") for row in updates)
+
+        for widget_id, _, interval in due:
+            self._record_outcome(widget_id, interval, errors.get(widget_id))
+        return len(due) - len(errors)
+
+    def _record_outcome(self, widget_id: int, interval: int, error: Optional[str]) -> None:
+        """成功时清除失败记录，失败时按连续失败次数指数退避"""
+        if error is None:
+            self._failures.pop(widget_id, None)
+            self._stats["refreshed"] += 1
+            return
+
+        # 指数退避：间隔 × 2^(连续失败次数-1)，不超过 MAX_BACKOFF
+        failures = self._failures.get(widget_id, (0, 0.0))[0] + 1
+        delay = self._jittered(min(interval * 2 ** (failures - 1), settings.DASHBOARD_AUTO_REFRESH_MAX_BACKOFF))
+        self._failures[widget_id] = (failures, time.time() + delay)
+        self._stats["failed"] += 1
+        logger.warning(
+            f"Auto-refresh of widget {widget_id} failed ({failures} in a row), retry in {delay:.0f}s: {error}"
+        )
+
+    # ===== 数据库访问（在线程池中执行） =====
+
+    def _new_session(self):
+        if self._session_factory is None:
+            from app.db.session import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    def _acquire_lease(self) -> bool:
+        from app import crud
+
+        db = self._new_session()
+        try:
+            return crud.system_config.try_acquire_lease(
+                db, lease_key=LEASE_KEY, holder=self.holder,
+                ttl_seconds=settings.DASHBOARD_AUTO_REFRESH_LEASE_TTL
+            )
+        finally:
+            db.close()
+
+    def _release_lease(self) -> None:
+        from app import crud
+
+        db = self._new_session()
+        try:
+            crud.system_config.release_lease(db, lease_key=LEASE_KEY, holder=self.holder)
+        finally:
+            db.close()
+
+    def _load_candidates(self) -> List[tuple]:
+        from app import crud
+
+        db = self._new_session()
+        try:
+            return [tuple(row) for row in crud.crud_dashboard_widget.get_auto_refresh_candidates(db)]
+        finally:
+            db.close()
+
+    def _load_queries(self, widget_ids: List[int]) -> Dict[int, Tuple[int, Optional[str]]]:
+        """widget_id -> (connection_id, SQL)"""
+        from app import crud
+
+        db = self._new_session()
+        try:
+            return {
+                widget_id: (connection_id, (query_config or {}).get("generated_sql"))
+                for widget_id, connection_id, query_config
+                in crud.crud_dashboard_widget.get_refresh_queries(db, widget_ids=widget_ids)
+            }
+        finally:
+            db.close()
+
+    def _save_results(self, updates: List[Dict[str, Any]]) -> None:
+        from app import crud
+
+        db = self._new_session()
+        try:
+            crud.crud_dashboard_widget.bulk_update_cache(db, updates=updates)
+        finally:
+            db.close()
+
+
+# 创建全局实例
+dashboard_refresh_scheduler = DashboardRefreshScheduler()
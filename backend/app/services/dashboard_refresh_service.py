@@ -2,23 +2,44 @@
 Dashboard刷新服务
 P1功能：实现动态数据刷新机制，包括全局刷新和定时刷新
 优化：增加并发限流，防止数据库压力过大
+优化：全局刷新按 (connection_id, 规范化SQL) 合并，相同查询只执行一次，结果分发给所有使用它的Widget；
+      每个连接只加载一次连接配置，同一连接上的查询并发受 DASHBOARD_REFRESH_PER_CONNECTION 限制
+优化：并发查询不接触请求Session，结果先收集在内存中，结束时一次批量UPDATE写回（一次刷新一个事务）
+优化：data_cache 使用列式格式（见 widget_cache_codec），列名只存一次，较大的结果压缩存储
 """
 import asyncio
+import re
 import time
-import json
 import logging
-from typing import List, Dict, Any, Optional
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, date
 from decimal import Decimal
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from app import crud, schemas
-from app.models.dashboard_widget import DashboardWidget
+from app.core.config import settings
+from app.services.widget_cache_codec import encode_data_cache
 
 logger = logging.getLogger(__name__)
 
 # 并发限制配置
 MAX_CONCURRENT_REFRESHES = 5  # 最大并发刷新数
+REFRESH_TIMEOUT_SECONDS = 60  # 单个 Widget 刷新超时时间
+
+# 引号内的字符串/标识符原样保留，其余连续空白合并
+_SQL_WHITESPACE = re.compile(r"('(?:[^']|'')*'|\"[^\"]*\"|`[^`]*`)|\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    生成SQL的合并键：去掉首尾空白和结尾分号，引号外的连续空白合并为一个空格
+
+    不改变大小写，避免把只有字符串常量大小写不同的查询合并
+    """
+    sql = sql.strip().rstrip(";").strip()
+    return _SQL_WHITESPACE.sub(lambda m: m.group(1) or " ", sql)
 
 
 def _serialize_value(val: Any) -> Any:
@@ -34,18 +55,6 @@ def _serialize_value(val: Any) -> Any:
     return val
 
 
-def _serialize_row(row: Any) -> Any:
-    """
-    序列化单行数据
-    """
-    if isinstance(row, dict):
-        return {k: _serialize_value(v) for k, v in row.items()}
-    elif isinstance(row, (list, tuple)):
-        return [_serialize_value(v) for v in row]
-    return _serialize_value(row)
-REFRESH_TIMEOUT_SECONDS = 60  # 单个 Widget 刷新超时时间
-
-
 class DashboardRefreshService:
     """Dashboard刷新服务"""
     
@@ -56,7 +65,6 @@ class DashboardRefreshService:
         self,
         db: Session,
         dashboard_id: int,
-        force: bool = False,
         widget_ids: Optional[List[int]] = None
     ) -> schemas.GlobalRefreshResponse:
         """
@@ -65,14 +73,13 @@ class DashboardRefreshService:
         Args:
             db: 数据库会话
             dashboard_id: Dashboard ID
-            force: 是否强制刷新(忽略缓存)
             widget_ids: 指定刷新的Widget ID列表，为空则刷新全部
             
         Returns:
             GlobalRefreshResponse: 刷新结果
         """
         start_time = time.time()
-        logger.info(f"开始全局刷新 Dashboard {dashboard_id}, force={force}")
+        logger.info(f"开始全局刷新 Dashboard {dashboard_id}")
         
         # 获取所有需要刷新的Widget
         all_widgets = crud.crud_dashboard_widget.get_by_dashboard(db, dashboard_id=dashboard_id)
@@ -93,52 +100,29 @@ class DashboardRefreshService:
                 refresh_timestamp=datetime.utcnow()
             )
         
-        logger.info(f"需要刷新 {len(data_widgets)} 个 Widget，并发限制: {MAX_CONCURRENT_REFRESHES}")
-        
-        # 使用信号量限制并发
-        results: Dict[int, schemas.WidgetRefreshResult] = {}
-        success_count = 0
-        failed_count = 0
-        
-        # 创建带限流的刷新任务
-        async def refresh_with_limit(widget: DashboardWidget):
-            async with self._semaphore:
-                return await self._refresh_single_widget(db, widget, force)
-        
-        # 使用asyncio.gather并行执行（受信号量限制）
-        refresh_tasks = [
-            asyncio.wait_for(
-                refresh_with_limit(widget),
-                timeout=REFRESH_TIMEOUT_SECONDS
-            )
-            for widget in data_widgets
-        ]
-        
-        task_results = await asyncio.gather(*refresh_tasks, return_exceptions=True)
-        
-        for widget, result in zip(data_widgets, task_results):
-            if isinstance(result, asyncio.TimeoutError):
-                results[widget.id] = schemas.WidgetRefreshResult(
-                    widget_id=widget.id,
-                    success=False,
-                    error=f"刷新超时（>{REFRESH_TIMEOUT_SECONDS}秒）",
-                    duration_ms=REFRESH_TIMEOUT_SECONDS * 1000
-                )
-                failed_count += 1
-            elif isinstance(result, Exception):
-                results[widget.id] = schemas.WidgetRefreshResult(
-                    widget_id=widget.id,
+        # 并发任务只拿到 SQL 和 Widget ID，不访问 ORM 对象
+        results, updates = await self.refresh_queries(
+            [
+                (widget.id, widget.connection_id, (widget.query_config or {}).get("generated_sql"))
+                for widget in data_widgets
+            ]
+        )
+
+        # 所有查询结束后一次性写回（同步数据库操作放到线程池，不阻塞事件循环）
+        try:
+            await run_in_threadpool(crud.crud_dashboard_widget.bulk_update_cache, db, updates=updates)
+        except Exception as e:
+            logger.error(f"保存 Dashboard {dashboard_id} 的刷新结果失败: {e}")
+            for row in updates:
+                results[row["id"]] = schemas.WidgetRefreshResult(
+                    widget_id=row["id"],
                     success=False,
-                    error=str(result),
-                    duration_ms=0
+                    error=f"保存刷新结果失败: {e}",
+                    duration_ms=results[row["id"]].duration_ms
                 )
-                failed_count += 1
-            else:
-                results[widget.id] = result
-                if result.success:
-                    success_count += 1
-                else:
-                    failed_count += 1
+
+        success_count = sum(1 for result in results.values() if result.success)
+        failed_count = len(results) - success_count
         
         total_duration_ms = int((time.time() - start_time) * 1000)
         logger.info(f"全局刷新完成: 成功={success_count}, 失败={failed_count}, 耗时={total_duration_ms}ms")
@@ -151,131 +135,191 @@ class DashboardRefreshService:
             refresh_timestamp=datetime.utcnow()
         )
     
-    async def _refresh_single_widget(
+    async def refresh_queries(
         self,
-        db: Session,
-        widget: DashboardWidget,
-        force: bool = False
-    ) -> schemas.WidgetRefreshResult:
+        widgets: List[Tuple[int, int, Optional[str]]],
+        per_connection: Optional[int] = None
+    ) -> Tuple[Dict[int, schemas.WidgetRefreshResult], List[Dict[str, Any]]]:
         """
-        刷新单个Widget
-        
-        P1-FIX: 使用run_in_executor将同步操作转为异步，避免阻塞事件循环
-        
+        执行一批Widget的查询，返回 (各Widget的刷新结果, 待写回的缓存)，不访问数据库会话
+
+        按 (connection_id, 规范化SQL) 合并，相同查询只执行一次，结果分发给所有使用它的Widget。
+        全局刷新和自动刷新调度共用此方法，写回由调用方负责。
+
         Args:
-            db: 数据库会话
-            widget: Widget对象
-            force: 是否强制刷新
-            
-        Returns:
-            WidgetRefreshResult: 刷新结果
+            widgets: [(widget_id, connection_id, SQL)]
+            per_connection: 单个连接的并发上限，默认 DASHBOARD_REFRESH_PER_CONNECTION
         """
-        start_time = time.time()
-        widget_id = widget.id
-        
-        try:
-            # 获取Widget的SQL配置
-            query_config = widget.query_config or {}
-            sql = query_config.get("generated_sql")
-            
+        results: Dict[int, schemas.WidgetRefreshResult] = {}
+        query_groups: Dict[Tuple[int, str], Tuple[str, List[int]]] = {}
+        for widget_id, connection_id, sql in widgets:
             if not sql:
-                return schemas.WidgetRefreshResult(
+                results[widget_id] = schemas.WidgetRefreshResult(
                     widget_id=widget_id,
                     success=False,
                     error="Widget没有配置SQL查询",
                     duration_ms=0
                 )
-            
-            # P1-FIX: 使用run_in_executor执行同步的SQL查询
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None,  # 使用默认线程池
-                self._execute_sql_sync,
-                sql,
-                widget.connection_id,
-                force
+                continue
+            query_groups.setdefault((connection_id, normalize_sql(sql)), (sql, []))[1].append(widget_id)
+
+        by_connection: Dict[int, List[Tuple[str, List[int]]]] = defaultdict(list)
+        for (connection_id, _), query in query_groups.items():
+            by_connection[connection_id].append(query)
+
+        logger.info(
+            f"需要刷新 {len(widgets)} 个 Widget，合并后 {len(query_groups)} 条查询，"
+            f"涉及 {len(by_connection)} 个连接，并发限制: {MAX_CONCURRENT_REFRESHES}"
+        )
+
+        updates: List[Dict[str, Any]] = []
+        connection_results = await asyncio.gather(*(
+            self._refresh_connection(connection_id, queries, per_connection)
+            for connection_id, queries in by_connection.items()
+        ))
+        for connection_result, connection_updates in connection_results:
+            results.update(connection_result)
+            updates.extend(connection_updates)
+        return results, updates
+
+    async def _refresh_connection(
+        self,
+        connection_id: int,
+        queries: List[Tuple[str, List[int]]],
+        per_connection: Optional[int] = None
+    ) -> Tuple[Dict[int, schemas.WidgetRefreshResult], List[Dict[str, Any]]]:
+        """
+        刷新同一连接上的所有查询，返回 (各Widget的刷新结果, 待写回的缓存)
+
+        连接配置只加载一次；查询通过连接池并行执行，单个连接的并发不超过 per_connection
+        （默认 DASHBOARD_REFRESH_PER_CONNECTION），全局并发不超过 MAX_CONCURRENT_REFRESHES
+        """
+        from app.services.db_service import get_db_connection_by_id
+
+        loop = asyncio.get_event_loop()
+        connection = await loop.run_in_executor(None, get_db_connection_by_id, connection_id)
+        if not connection:
+            widget_ids = [widget_id for _, ids in queries for widget_id in ids]
+            return self._build_results(widget_ids, {
+                "success": False,
+                "error": f"找不到连接ID为 {connection_id} 的数据库连接"
+            }, 0)
+
+        if per_connection is None:
+            per_connection = settings.DASHBOARD_REFRESH_PER_CONNECTION
+        connection_semaphore = asyncio.Semaphore(max(per_connection, 1))
+
+        async def refresh_with_limit(sql: str, widget_ids: List[int]):
+            async with connection_semaphore, self._semaphore:
+                return await self._refresh_query(connection, sql, widget_ids)
+
+        results: Dict[int, schemas.WidgetRefreshResult] = {}
+        updates: List[Dict[str, Any]] = []
+        for query_results, query_updates in await asyncio.gather(*(
+            refresh_with_limit(sql, widget_ids) for sql, widget_ids in queries
+        )):
+            results.update(query_results)
+            updates.extend(query_updates)
+        return results, updates
+
+    async def _refresh_query(
+        self,
+        connection: Any,
+        sql: str,
+        widget_ids: List[int]
+    ) -> Tuple[Dict[int, schemas.WidgetRefreshResult], List[Dict[str, Any]]]:
+        """执行一条（合并后的）查询，结果分发给所有使用它的Widget"""
+        start_time = time.time()
+        loop = asyncio.get_event_loop()
+        try:
+            result = await asyncio.wait_for(
+                loop.run_in_executor(None, self._fetch_rows_sync, connection, sql),
+                timeout=REFRESH_TIMEOUT_SECONDS
             )
-            
-            # execute_sql_query 直接返回 dict，不需要 json.loads
-            elapsed_ms = int((time.time() - start_time) * 1000)
-            
-            if result.get("success"):
-                data = result.get("data", {})
-                rows = data.get("data", [])
-                columns = data.get("columns", [])
-                
-                # 格式化数据，同时处理 Decimal 等特殊类型
-                formatted_data = []
-                for row in rows:
-                    if isinstance(row, list) and len(row) == len(columns):
-                        # 先序列化值，再构建字典
-                        serialized_row = [_serialize_value(v) for v in row]
-                        formatted_data.append(dict(zip(columns, serialized_row)))
-                    elif isinstance(row, dict):
-                        formatted_data.append(_serialize_row(row))
-                    else:
-                        formatted_data.append(_serialize_row(row))
-                
-                # 更新Widget的data_cache
-                widget.data_cache = {
-                    "data": formatted_data,
-                    "columns": columns,
-                    "row_count": len(formatted_data),
-                    "refreshed_at": datetime.utcnow().isoformat()
-                }
-                widget.last_refresh_at = datetime.utcnow()
-                db.commit()
-                
-                return schemas.WidgetRefreshResult(
-                    widget_id=widget_id,
-                    success=True,
-                    duration_ms=elapsed_ms,
-                    from_cache=result.get("from_cache", False),
-                    row_count=len(formatted_data)
-                )
-            else:
-                return schemas.WidgetRefreshResult(
+        except asyncio.TimeoutError:
+            result = {"success": False, "error": f"刷新超时（>{REFRESH_TIMEOUT_SECONDS}秒）"}
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+
+        elapsed_ms = int((time.time() - start_time) * 1000)
+        if len(widget_ids) > 1:
+            logger.info(f"查询结果共享给 {len(widget_ids)} 个 Widget: {widget_ids}")
+        return self._build_results(widget_ids, result, elapsed_ms)
+
+    def _build_results(
+        self,
+        widget_ids: List[int],
+        result: Dict[str, Any],
+        elapsed_ms: int
+    ) -> Tuple[Dict[int, schemas.WidgetRefreshResult], List[Dict[str, Any]]]:
+        """
+        把查询结果转换为各Widget的刷新结果和待写回的缓存（不访问数据库）
+
+        Returns:
+            (widget_id -> WidgetRefreshResult, [{"id", "data_cache", "last_refresh_at"}])
+        """
+        if not result.get("success"):
+            error = result.get("error") or "SQL执行失败"
+            logger.error(f"刷新Widget {widget_ids} 失败: {error}")
+            return {
+                widget_id: schemas.WidgetRefreshResult(
                     widget_id=widget_id,
                     success=False,
-                    error=result.get("error", "SQL执行失败"),
+                    error=error,
                     duration_ms=elapsed_ms
                 )
-                
-        except Exception as e:
-            elapsed_ms = int((time.time() - start_time) * 1000)
-            logger.error(f"刷新Widget {widget_id} 失败: {e}")
-            return schemas.WidgetRefreshResult(
+                for widget_id in widget_ids
+            }, []
+
+        # 行数据已在拉取时逐批序列化，这里按列编码
+        rows = result.get("rows", [])
+        now = datetime.utcnow()
+        data_cache = encode_data_cache(
+            result.get("columns", []),
+            rows,
+            truncated=result.get("truncated", False),
+            refreshed_at=now.isoformat()
+        )
+        results = {
+            widget_id: schemas.WidgetRefreshResult(
                 widget_id=widget_id,
-                success=False,
-                error=str(e),
-                duration_ms=elapsed_ms
+                success=True,
+                duration_ms=elapsed_ms,
+                from_cache=False,
+                row_count=len(rows)
             )
+            for widget_id in widget_ids
+        }
+        updates = [
+            {"id": widget_id, "data_cache": data_cache, "last_refresh_at": now}
+            for widget_id in widget_ids
+        ]
+        return results, updates
 
-    def _execute_sql_sync(
-        self,
-        sql: str,
-        connection_id: int,
-        force: bool
-    ) -> Dict[str, Any]:
+    def _fetch_rows_sync(self, connection: Any, sql: str) -> Dict[str, Any]:
         """
-        同步执行SQL查询（在线程池中运行）
-        
-        Args:
-            sql: SQL语句
-            connection_id: 连接ID
-            force: 是否强制刷新
-            
-        Returns:
-            查询结果字典
+        在已加载的连接上执行SQL（在线程池中运行，连接从连接池借出）
+
+        使用服务端游标分批拉取并逐批序列化，峰值内存受 SQL_RESULT_MAX_ROWS 限制
         """
-        from app.agents.agents.sql_executor_agent import execute_sql_query
-        
-        return execute_sql_query.invoke({
-            "sql_query": sql,
-            "connection_id": connection_id,
-            "timeout": 30,
-            "force_refresh": force
-        })
+        from app.services.db_service import QueryStream
+
+        try:
+            stream = QueryStream(connection, sql, timeout_seconds=REFRESH_TIMEOUT_SECONDS)
+            rows: List[List[Any]] = []
+            for batch in stream:
+                rows.extend([_serialize_value(v) for v in row] for row in batch)
+            return {
+                "success": True,
+                "columns": stream.columns,
+                "rows": rows,
+                "truncated": stream.truncated
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
     
     def get_refresh_config(self, db: Session, dashboard_id: int) -> schemas.RefreshConfig:
         """
@@ -9,6 +9,7 @@ from app.schemas.dashboard import (
     DashboardListItem, DashboardDetail
 )
 from app.models.dashboard import Dashboard
+from app.services.widget_cache_codec import columnar_view
 
 logger = logging.getLogger(__name__)
 
@@ -25,30 +26,33 @@ class DashboardService:
         scope: str = "mine",
         page: int = 1,
         page_size: int = 20,
-        search: Optional[str] = None
-    ) -> Tuple[List[DashboardListItem], int]:
+        search: Optional[str] = None,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[DashboardListItem], int, Optional[str]]:
         """获取用户的Dashboard列表
         
-        优化：使用批量权限查询，避免 N+1 问题
+        优化：使用批量权限查询，避免 N+1 问题；不加载 Widget 数据，只统计数量
         多租户隔离：当提供 tenant_id 时，只返回该租户的 Dashboard
+        分页：提供 cursor 时使用键集分页（忽略 page）
         
         Returns:
-            (Dashboard列表, 总数)
+            (Dashboard列表, 总数, 下一页游标)
         """
         skip = (page - 1) * page_size
         
-        dashboards, total = crud.crud_dashboard.get_by_user(
+        rows, total, next_cursor = crud.crud_dashboard.get_by_user(
             db,
             user_id=user_id,
             tenant_id=tenant_id,
             scope=scope,
             skip=skip,
             limit=page_size,
-            search=search
+            search=search,
+            cursor=cursor
         )
         
         # 批量获取权限
-        dashboard_ids = [d.id for d in dashboards]
+        dashboard_ids = [d.id for d, _ in rows]
         permissions_map = crud.crud_dashboard.get_user_permission_batch(
             db,
             dashboard_ids=dashboard_ids,
@@ -57,10 +61,7 @@ class DashboardService:
         
         # 转换为响应格式
         items = []
-        for dashboard in dashboards:
-            # 获取widget数量（已通过 joinedload 预加载）
-            widget_count = len(dashboard.widgets) if dashboard.widgets else 0
-            
+        for dashboard, widget_count in rows:
             # 从批量查询结果获取权限
             permission_level = permissions_map.get(dashboard.id)
             
@@ -88,20 +89,26 @@ class DashboardService:
             )
             items.append(item)
         
-        return items, total
+        return items, total, next_cursor
 
     def get_dashboard_detail(
         self,
         db: Session,
         *,
         dashboard_id: int,
-        user_id: int
+        user_id: int,
+        include_data: bool = True
     ) -> Optional[DashboardDetail]:
-        """获取Dashboard详情"""
+        """获取Dashboard详情
+        
+        include_data 为 False 时不加载 Widget 的 data_cache（返回 None），
+        前端可通过 get_widget_data 接口按需获取
+        """
         dashboard = crud.crud_dashboard.get_with_details(
             db,
             dashboard_id=dashboard_id,
-            user_id=user_id
+            user_id=user_id,
+            include_data=include_data
         )
         
         if not dashboard:
@@ -127,7 +134,7 @@ class DashboardService:
                 "position_config": widget.position_config,
                 "refresh_interval": widget.refresh_interval,
                 "last_refresh_at": widget.last_refresh_at,
-                "data_cache": widget.data_cache
+                "data_cache": columnar_view(widget.data_cache) if include_data else None
             })
         
         # 构建permissions列表
@@ -1,5 +1,5 @@
 """Dashboard Widget业务服务"""
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from sqlalchemy.orm import Session
 from decimal import Decimal
 from datetime import datetime, date
@@ -8,9 +8,11 @@ import time
 from app import crud
 from app.schemas.dashboard_widget import (
     WidgetCreate, WidgetUpdate,
-    WidgetResponse, WidgetRefreshResponse
+    WidgetResponse, WidgetRefreshResponse,
+    WidgetDataItem
 )
 from app.models.dashboard_widget import DashboardWidget
+from app.services.widget_cache_codec import encode_data_cache
 
 
 def convert_to_json_serializable(obj):
@@ -111,6 +113,37 @@ class DashboardWidgetService:
         crud.crud_dashboard_widget.remove(db, id=widget_id)
         return True
 
+    def get_widget_data(
+        self,
+        db: Session,
+        *,
+        dashboard_id: int,
+        user_id: int,
+        widget_ids: Optional[List[int]] = None
+    ) -> Optional[List[WidgetDataItem]]:
+        """按需获取Widget数据（Dashboard详情可不带data_cache，由前端单独拉取）
+        
+        Returns:
+            Widget数据列表；无权限时返回None
+        """
+        if not crud.crud_dashboard.check_permission(
+            db,
+            dashboard_id=dashboard_id,
+            user_id=user_id,
+            required_level="viewer"
+        ):
+            return None
+        
+        payloads = crud.crud_dashboard_widget.get_payloads(
+            db,
+            dashboard_id=dashboard_id,
+            widget_ids=widget_ids
+        )
+        return [
+            WidgetDataItem(id=widget_id, data_cache=data_cache, last_refresh_at=last_refresh_at)
+            for widget_id, data_cache, last_refresh_at in payloads
+        ]
+
     def refresh_widget(
         self,
         db: Session,
@@ -133,7 +166,7 @@ class DashboardWidgetService:
             return None
         
         # 实际执行SQL查询获取数据
-        from app.services.db_service import get_db_connection_by_id, execute_query
+        from app.services.db_service import get_db_connection_by_id, QueryStream
         
         start_time = time.time()
         
@@ -148,41 +181,23 @@ class DashboardWidgetService:
             if not generated_sql:
                 raise Exception("Widget没有有效的SQL查询")
             
-            # 执行查询
-            result_data = execute_query(connection, generated_sql)
+            # 流式执行查询，逐批转换为JSON可序列化的值
+            stream = QueryStream(connection, generated_sql)
+            rows = []
+            for batch in stream:
+                rows.extend([convert_to_json_serializable(val) for val in row] for row in batch)
             
-            # P0-FIX: 统一数据格式为 {"columns": [...], "data": [...], "row_count": ...}
-            if result_data:
-                columns = list(result_data[0].keys()) if result_data else []
-                # 转换每个值为JSON可序列化格式，使用字典格式
-                formatted_data = [
-                    {col: convert_to_json_serializable(row[col]) for col in columns}
-                    for row in result_data
-                ]
-                data_cache = {
-                    "columns": columns,
-                    "data": formatted_data,
-                    "row_count": len(formatted_data),
-                    "refreshed_at": datetime.utcnow().isoformat()
-                }
-            else:
-                data_cache = {
-                    "columns": [],
-                    "data": [],
-                    "row_count": 0,
-                    "refreshed_at": datetime.utcnow().isoformat()
-                }
+            # 列式存储（见 widget_cache_codec），API 响应时还原为 {"columns", "data", "row_count", ...}
+            data_cache = encode_data_cache(
+                stream.columns if rows else [],
+                rows,
+                truncated=stream.truncated
+            )
             
         except Exception as e:
             print(f"刷新Widget数据失败: {str(e)}")
             # P0-FIX: 统一错误时的数据格式
-            data_cache = {
-                "columns": [],
-                "data": [],
-                "row_count": 0,
-                "error": str(e),
-                "refreshed_at": datetime.utcnow().isoformat()
-            }
+            data_cache = encode_data_cache([], [], error=str(e))
         
         updated_widget, duration_ms = crud.crud_dashboard_widget.refresh_data(
             db,
@@ -0,0 +1,340 @@
+"""
+目标数据库引擎注册表 (DB Engine Registry)
+
+按 connection_id 缓存 SQLAlchemy Engine，避免每次查询都重新建立 TCP/TLS 连接。
+
+特性：
+- 每个连接一个 Engine，内部使用有界 QueuePool
+- pool_pre_ping 自动剔除失效连接，pool_recycle 定期回收空闲连接
+- 连接配置变更（host/端口/账号/密码等）后自动重建，DBConnection 编辑/删除时显式失效
+- 长时间未使用的 Engine 自动释放
+- 暴露连接池 checkout / 等待耗时统计
+
+使用方式：
+    from app.services.db_engine_registry import db_engine_registry
+
+    with db_engine_registry.connect(connection) as conn:
+        conn.execute(text("SELECT 1"))
+"""
+import hashlib
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import NoSuchModuleError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PoolStats:
+    """单个连接池的统计信息"""
+    checkouts: int = 0                  # 连接借出次数
+    connects: int = 0                   # 新建物理连接次数
+    invalidations: int = 0              # 连接失效次数（pre_ping 失败等）
+    wait_count: int = 0                 # 计时的获取连接次数
+    total_wait_ms: float = 0.0          # 获取连接总等待时间
+    max_wait_ms: float = 0.0            # 获取连接最大等待时间
+    timeouts: int = 0                   # 等待连接超时次数
+
+    def record_wait(self, elapsed_ms: float) -> None:
+        self.wait_count += 1
+        self.total_wait_ms += elapsed_ms
+        if elapsed_ms > self.max_wait_ms:
+            self.max_wait_ms = elapsed_ms
+
+
+@dataclass
+class _RegistryEntry:
+    """注册表条目"""
+    engine: Engine
+    fingerprint: str
+    created_at: float
+    last_used_at: float
+    stats: PoolStats = field(default_factory=PoolStats)
+
+
+class DBEngineRegistry:
+    """
+    目标数据库 Engine 注册表
+
+    线程安全，可在事件循环线程和线程池中同时使用。
+    """
+
+    def __init__(self):
+        self._entries: Dict[int, _RegistryEntry] = {}
+        self._lock = threading.Lock()
+        self._last_sweep_at = time.time()
+
+    # ===== 对外接口 =====
+
+    def get_engine(self, connection: Any) -> Engine:
+        """
+        获取连接对应的池化 Engine（不存在或配置已变更时创建）
+
+        Args:
+            connection: DBConnection 对象（需包含 id）
+
+        Returns:
+            SQLAlchemy Engine
+        """
+        connection_id = getattr(connection, "id", None)
+        if connection_id is None:
+            raise ValueError("Pooled engine requires a persisted connection with an id")
+
+        fingerprint = self._fingerprint(connection)
+        stale_engine: Optional[Engine] = None
+
+        with self._lock:
+            entry = self._entries.get(connection_id)
+            if entry and entry.fingerprint != fingerprint:
+                # 连接配置已变更，重建 Engine
+                logger.info(f"Connection {connection_id} config changed, rebuilding engine")
+                stale_engine = entry.engine
+                entry = None
+                del self._entries[connection_id]
+
+            if entry is None:
+                engine = self._create_engine(connection)
+                entry = _RegistryEntry(
+                    engine=engine,
+                    fingerprint=fingerprint,
+                    created_at=time.time(),
+                    last_used_at=time.time(),
+                )
+                self._attach_pool_events(engine, entry.stats)
+                self._entries[connection_id] = entry
+                logger.info(f"Created pooled engine for connection {connection_id}")
+
+            entry.last_used_at = time.time()
+            idle_engines = self._collect_idle_locked(exclude=connection_id)
+
+        if stale_engine is not None:
+            self._dispose(stale_engine)
+        for idle_engine in idle_engines:
+            self._dispose(idle_engine)
+
+        return entry.engine
+
+    @contextmanager
+    def connect(self, connection: Any) -> Iterator[Connection]:
+        """
+        从连接池获取连接（记录等待耗时）
+
+        Args:
+            connection: DBConnection 对象
+        """
+        engine = self.get_engine(connection)
+        stats = self._get_stats_ref(connection.id)
+
+        start_time = time.perf_counter()
+        try:
+            conn = engine.connect()
+        except PoolTimeoutError:
+            if stats:
+                with self._lock:
+                    stats.timeouts += 1
+            raise
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        if stats:
+            with self._lock:
+                stats.record_wait(elapsed_ms)
+
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def invalidate(self, connection_id: int) -> bool:
+        """
+        使指定连接的 Engine 失效（DBConnection 编辑/删除时调用）
+
+        Returns:
+            是否存在并释放了 Engine
+        """
+        with self._lock:
+            entry = self._entries.pop(connection_id, None)
+        if entry is None:
+            return False
+        self._dispose(entry.engine)
+        logger.info(f"Invalidated pooled engine for connection {connection_id}")
+        return True
+
+    def dispose_all(self) -> None:
+        """释放所有 Engine（应用关闭时调用）"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            self._dispose(entry.engine)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取所有连接池的统计信息"""
+        now = time.time()
+        with self._lock:
+            items = list(self._entries.items())
+
+        pools = {}
+        for connection_id, entry in items:
+            pool = entry.engine.pool
+            stats = entry.stats
+            pool_info: Dict[str, Any] = {"status": pool.status()}
+            # 只有 QueuePool 提供以下指标
+            for name in ("size", "checkedin", "checkedout", "overflow"):
+                method = getattr(pool, name, None)
+                if callable(method):
+                    pool_info[name] = method()
+
+            pools[connection_id] = {
+                **pool_info,
+                "checkouts": stats.checkouts,
+                "connects": stats.connects,
+                "invalidations": stats.invalidations,
+                "timeouts": stats.timeouts,
+                "avg_wait_ms": round(stats.total_wait_ms / stats.wait_count, 2) if stats.wait_count else 0.0,
+                "max_wait_ms": round(stats.max_wait_ms, 2),
+                "age_seconds": int(now - entry.created_at),
+                "idle_seconds": int(now - entry.last_used_at),
+            }
+
+        return {
+            "engine_count": len(pools),
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_POOL_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "pools": pools,
+        }
+
+    # ===== 内部方法 =====
+
+    def _get_stats_ref(self, connection_id: int) -> Optional[PoolStats]:
+        with self._lock:
+            entry = self._entries.get(connection_id)
+            return entry.stats if entry else None
+
+    def _collect_idle_locked(self, exclude: int) -> list:
+        """清理长时间未使用的 Engine（需持有锁）"""
+        now = time.time()
+        idle_ttl = settings.DB_ENGINE_IDLE_TTL
+        if idle_ttl <= 0 or now - self._last_sweep_at < 60:
+            return []
+        self._last_sweep_at = now
+
+        idle_ids = [
+            cid for cid, entry in self._entries.items()
+            if cid != exclude and now - entry.last_used_at > idle_ttl
+        ]
+        engines = []
+        for cid in idle_ids:
+            engines.append(self._entries.pop(cid).engine)
+            logger.info(f"Released idle pooled engine for connection {cid}")
+        return engines
+
+    @staticmethod
+    def _fingerprint(connection: Any) -> str:
+        """连接配置指纹，配置变化时需重建 Engine"""
+        from app.services.db_service import resolve_connection_password
+
+        parts = [
+            str(getattr(connection, "db_type", "")).lower(),
+            str(getattr(connection, "host", "")),
+            str(getattr(connection, "port", "")),
+            str(getattr(connection, "username", "")),
+            str(getattr(connection, "database_name", "")),
+            resolve_connection_password(connection) or "",
+        ]
+        return hashlib.sha256("\x00".join(parts).encode()).hexdigest()
+
+    @staticmethod
+    def _create_engine(connection: Any) -> Engine:
+        """按数据库类型创建池化 Engine"""
+        from app.services.db_service import build_connection_url
+
+        db_type = connection.db_type.lower()
+        connect_timeout = settings.DB_CONNECT_TIMEOUT
+
+        if db_type == "sqlite":
+            return create_engine(
+                build_connection_url(connection),
+                pool_pre_ping=settings.DB_POOL_PRE_PING,
+            )
+
+        pool_kwargs = dict(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+            pool_use_lifo=True,
+        )
+
+        if db_type == "mysql":
+            return create_engine(
+                build_connection_url(connection),
+                connect_args={
+                    "connect_timeout": connect_timeout,
+                    # 语句级超时由 MAX_EXECUTION_TIME 控制，这里只是兜底
+                    "read_timeout": settings.DB_MAX_QUERY_TIMEOUT,
+                    "write_timeout": settings.DB_MAX_QUERY_TIMEOUT,
+                },
+                **pool_kwargs,
+            )
+
+        if db_type == "postgresql":
+            # 只按驱动是否可导入选择，不再使用 SELECT 1 探测
+            last_error: Optional[Exception] = None
+            for driver in ("psycopg2", "psycopg"):
+                try:
+                    return create_engine(
+                        build_connection_url(connection, driver=driver),
+                        connect_args={"connect_timeout": connect_timeout},
+                        **pool_kwargs,
+                    )
+                except (ModuleNotFoundError, ImportError, NoSuchModuleError) as e:
+                    last_error = e
+                    continue
+            raise Exception(
+                "PostgreSQL driver not available (tried: psycopg2, psycopg). "
+                "Install: pip install psycopg2-binary or pip install 'psycopg[binary]'"
+            ) from last_error
+
+        raise ValueError(f"Unsupported database type: {connection.db_type}")
+
+    def _attach_pool_events(self, engine: Engine, stats: PoolStats) -> None:
+        """挂载连接池事件，收集统计"""
+        lock = self._lock
+
+        @event.listens_for(engine, "connect")
+        def _on_connect(dbapi_conn, conn_record):
+            with lock:
+                stats.connects += 1
+
+        @event.listens_for(engine, "checkout")
+        def _on_checkout(dbapi_conn, conn_record, conn_proxy):
+            with lock:
+                stats.checkouts += 1
+
+        @event.listens_for(engine, "invalidate")
+        def _on_invalidate(dbapi_conn, conn_record, exception):
+            with lock:
+                stats.invalidations += 1
+
+    @staticmethod
+    def _dispose(engine: Engine) -> None:
+        try:
+            engine.dispose()
+        except Exception as e:
+            logger.warning(f"Error disposing engine: {e}")
+
+
+# 创建全局实例
+db_engine_registry = DBEngineRegistry()
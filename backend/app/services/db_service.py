@@ -1,9 +1,12 @@
 import pymysql
 import sqlalchemy
 from sqlalchemy import create_engine, inspect
-from typing import Dict, Any, List, Optional
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 import urllib.parse
 import re
+import threading
 
 from app.models.db_connection import DBConnection
 
@@ -30,29 +33,56 @@ def fix_mysql_full_outer_join(sql: str) -> str:
     
     return fixed_sql
 
+def resolve_connection_password(connection: DBConnection, password: str = None) -> str:
+    """
+    解析连接使用的明文密码
+    """
+    # 直接使用明文密码，不进行加密/解密处理
+    # 在实际应用中，应该对密码进行适当的加密和解密
+
+    # 如果是从配置文件读取的连接信息
+    if hasattr(connection, 'password') and connection.password:
+        return connection.password
+    # 如果是从数据库读取的连接信息
+    if password:
+        return password
+    # 这里我们假设password_encrypted存储的是明文密码
+    # 在实际应用中，应该进行解密
+    return connection.password_encrypted
+
+
+def build_connection_url(connection: DBConnection, password: str = None, driver: Optional[str] = None) -> str:
+    """
+    构建 SQLAlchemy 连接串
+    """
+    db_type = connection.db_type.lower()
+    if db_type == "sqlite":
+        # For SQLite, the database_name is treated as the file path
+        return f"sqlite:///{connection.database_name}"
+
+    # Encode password for URL safety
+    encoded_password = urllib.parse.quote_plus(resolve_connection_password(connection, password) or "")
+    if db_type == "mysql":
+        scheme = f"mysql+{driver or 'pymysql'}"
+    elif db_type == "postgresql":
+        scheme = f"postgresql+{driver or 'psycopg2'}"
+    else:
+        raise ValueError(f"Unsupported database type: {connection.db_type}")
+    return (
+        f"{scheme}://{connection.username}:"
+        f"{encoded_password}@"
+        f"{connection.host}:{connection.port}/{connection.database_name}"
+    )
+
+
 def get_db_engine(connection: DBConnection, password: str = None, timeout_seconds: Optional[int] = None):
     """
     Create a SQLAlchemy engine for the given database connection.
+
+    每次调用都会创建新的 Engine，仅用于连接测试等一次性场景；
+    常规查询请使用 get_pooled_engine / db_engine_registry。
     """
     try:
-        # 直接使用明文密码，不进行加密/解密处理
-        # 在实际应用中，应该对密码进行适当的加密和解密
-
-        # 如果是从配置文件读取的连接信息
-        if hasattr(connection, 'password') and connection.password:
-            actual_password = connection.password
-        # 如果是从数据库读取的连接信息
-        elif password:
-            actual_password = password
-        # 如果是使用已加密的密码
-        else:
-            # 这里我们假设password_encrypted存储的是明文密码
-            # 在实际应用中，应该进行解密
-            actual_password = connection.password_encrypted
-
-        # Encode password for URL safety
-        encoded_password = urllib.parse.quote_plus(actual_password)
-
         connect_args = None
         if timeout_seconds is not None:
             try:
@@ -63,11 +93,7 @@ def get_db_engine(connection: DBConnection, password: str = None, timeout_second
                 timeout_seconds = max(1, min(timeout_seconds, 300))
 
         if connection.db_type.lower() == "mysql":
-            conn_str = (
-                f"mysql+pymysql://{connection.username}:"
-                f"{encoded_password}@"
-                f"{connection.host}:{connection.port}/{connection.database_name}"
-            )
+            conn_str = build_connection_url(connection, password)
             print(f"Connecting to MySQL database: {connection.host}:{connection.port}/{connection.database_name}")
             if timeout_seconds is not None:
                 connect_args = {
@@ -85,11 +111,7 @@ def get_db_engine(connection: DBConnection, password: str = None, timeout_second
             # Try psycopg2 first
             for driver in ["psycopg2", "psycopg"]:
                 try:
-                    conn_str = (
-                        f"postgresql+{driver}://{connection.username}:"
-                        f"{encoded_password}@"
-                        f"{connection.host}:{connection.port}/{connection.database_name}"
-                    )
+                    conn_str = build_connection_url(connection, password, driver=driver)
                     print(f"Connecting to PostgreSQL database: {connection.host}:{connection.port}/{connection.database_name} (driver: {driver})")
                     if timeout_seconds is not None:
                         connect_args = {"connect_timeout": min(timeout_seconds, 60)}
@@ -115,8 +137,7 @@ def get_db_engine(connection: DBConnection, password: str = None, timeout_second
             )
 
         elif connection.db_type.lower() == "sqlite":
-            # For SQLite, the database_name is treated as the file path
-            conn_str = f"sqlite:///{connection.database_name}"
+            conn_str = build_connection_url(connection)
             print(f"Connecting to SQLite database: {connection.database_name}")
             return create_engine(conn_str)
 
@@ -133,67 +154,328 @@ def test_db_connection(connection: DBConnection) -> bool:
     try:
         print(f"Testing connection to {connection.db_type} database at {connection.host}:{connection.port}/{connection.database_name}")
         engine = get_db_engine(connection)
-        with engine.connect() as conn:
-            result = conn.execute(sqlalchemy.text("SELECT 1"))
-            print(f"Connection test successful: {result.fetchone()}")
+        try:
+            with engine.connect() as conn:
+                result = conn.execute(sqlalchemy.text("SELECT 1"))
+                print(f"Connection test successful: {result.fetchone()}")
+        finally:
+            engine.dispose()
         return True
     except Exception as e:
         error_msg = f"Connection test failed: {str(e)}"
         print(error_msg)
         raise Exception(error_msg)
 
+def get_pooled_engine(connection: DBConnection):
+    """
+    获取连接对应的池化 Engine（按 connection_id 复用）
+
+    未持久化的连接（如连接测试时的临时对象）没有 id，退化为一次性 Engine。
+    """
+    if getattr(connection, "id", None) is None:
+        return get_db_engine(connection)
+    from app.services.db_engine_registry import db_engine_registry
+    return db_engine_registry.get_engine(connection)
+
+
+@contextmanager
+def open_db_connection(connection: DBConnection) -> Iterator[sqlalchemy.engine.Connection]:
+    """
+    打开目标数据库连接（优先从连接池借出）
+    """
+    if getattr(connection, "id", None) is None:
+        engine = get_db_engine(connection)
+        try:
+            with engine.connect() as conn:
+                yield conn
+        finally:
+            engine.dispose()
+        return
+
+    from app.services.db_engine_registry import db_engine_registry
+    with db_engine_registry.connect(connection) as conn:
+        yield conn
+
+
+def _normalize_timeout(timeout_seconds: Optional[int]) -> Optional[int]:
+    if timeout_seconds is None:
+        return None
+    try:
+        timeout_seconds = int(timeout_seconds)
+    except Exception:
+        return None
+    return max(1, min(timeout_seconds, 300))
+
+
+def _apply_statement_timeout(
+    conn,
+    db_type: str,
+    query: str,
+    timeout_seconds: Optional[int],
+    transactional: bool = False
+) -> Tuple[str, Optional[str]]:
+    """
+    在会话上设置语句超时
+
+    Args:
+        transactional: 连接处于显式事务中（PostgreSQL 使用 SET LOCAL，随事务结束自动失效）
+
+    Returns:
+        (可能被改写的 SQL, 执行结束后恢复会话设置的 SQL)
+    """
+    timeout_seconds = _normalize_timeout(timeout_seconds)
+    if timeout_seconds is None:
+        return query, None
+
+    timeout_ms = timeout_seconds * 1000
+    reset_sql = None
+    if db_type == "postgresql":
+        try:
+            if transactional:
+                conn.execute(sqlalchemy.text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+            else:
+                conn.execute(sqlalchemy.text("SET statement_timeout = :ms"), {"ms": timeout_ms})
+                reset_sql = "RESET statement_timeout"
+        except Exception:
+            pass
+    elif db_type == "mysql":
+        try:
+            conn.execute(sqlalchemy.text("SET SESSION MAX_EXECUTION_TIME = :ms"), {"ms": timeout_ms})
+            reset_sql = "SET SESSION MAX_EXECUTION_TIME = DEFAULT"
+        except Exception:
+            pass
+        q_strip = (query or "").lstrip()
+        if q_strip[:6].lower() == "select" and "max_execution_time" not in q_strip.lower():
+            query = q_strip[:6] + f" /*+ MAX_EXECUTION_TIME({timeout_ms}) */" + q_strip[6:]
+    return query, reset_sql
+
+
+def _reset_session(conn, reset_sql: Optional[str]) -> None:
+    """连接会归还连接池，需恢复会话级设置，避免影响后续查询"""
+    if not reset_sql:
+        return
+    try:
+        conn.execute(sqlalchemy.text(reset_sql))
+    except Exception:
+        try:
+            conn.invalidate()
+        except Exception:
+            pass
+
+
+def _execute_with_retry(conn, query: str):
+    try:
+        return conn.execute(sqlalchemy.text(query))
+    except Exception as e:
+        error_text = str(e).lower()
+        if "current transaction is aborted" in error_text or "infailedsqltransaction" in error_text:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            return conn.execute(sqlalchemy.text(query))
+        raise
+
+
 def execute_query(connection: DBConnection, query: str, timeout_seconds: Optional[int] = None) -> List[Dict[str, Any]]:
     """
     Execute a SQL query on the target database and return the results.
     """
     try:
+        db_type = connection.db_type.lower()
         # MySQL 特殊处理：修复不支持的语法
-        if connection.db_type.lower() == "mysql":
+        if db_type == "mysql":
             query = fix_mysql_full_outer_join(query)
-        
-        engine = get_db_engine(connection, timeout_seconds=timeout_seconds)
-        with engine.connect() as conn:
-            if connection.db_type.lower() == "postgresql":
+
+        with open_db_connection(connection) as conn:
+            if db_type == "postgresql":
                 conn = conn.execution_options(isolation_level="AUTOCOMMIT")
-            if timeout_seconds is not None:
+            query, reset_sql = _apply_statement_timeout(conn, db_type, query, timeout_seconds)
+            try:
+                result = _execute_with_retry(conn, query)
+                columns = result.keys()
+                return [dict(zip(columns, row)) for row in result.fetchall()]
+            finally:
+                _reset_session(conn, reset_sql)
+    except Exception as e:
+        raise Exception(f"Query execution failed: {str(e)}")
+
+@dataclass
+class ColumnarResult:
+    """
+    列式查询结果：列名只保存一次，行数据为元组
+    """
+    columns: List[str] = field(default_factory=list)
+    rows: List[tuple] = field(default_factory=list)
+    truncated: bool = False             # 是否因行数上限被截断
+
+    @property
+    def row_count(self) -> int:
+        return len(self.rows)
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """转换为字典列表（兼容旧接口）"""
+        return [dict(zip(self.columns, row)) for row in self.rows]
+
+
+class QueryCancelledError(Exception):
+    """查询被取消（客户端断开或超时）"""
+
+
+# 服务端游标关闭时会读完剩余结果的数据库类型（截断时需要中止查询而不是关闭游标）
+_DRAINING_CURSOR_DB_TYPES = {"mysql"}
+
+
+class QueryStream:
+    """
+    流式查询：使用服务端游标分批拉取结果，内存占用受 max_rows 限制
+
+    Usage:
+        stream = QueryStream(connection, sql, max_rows=10000)
+        for batch in stream:          # batch: List[tuple]
+            ...
+        stream.columns, stream.row_count, stream.truncated
+    """
+
+    def __init__(
+        self,
+        connection: DBConnection,
+        query: str,
+        max_rows: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        timeout_seconds: Optional[int] = None
+    ):
+        from app.core.config import settings
+
+        self.connection = connection
+        self.query = query
+        self.max_rows = settings.SQL_RESULT_MAX_ROWS if max_rows is None else max_rows
+        self.batch_size = max(1, batch_size or settings.SQL_FETCH_BATCH_SIZE)
+        self.timeout_seconds = timeout_seconds
+        self.columns: List[str] = []
+        self.row_count = 0
+        self.truncated = False
+        self._cancelled = threading.Event()
+        self._dbapi_connection = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """
+        取消查询（可在其他线程调用）
+
+        停止继续拉取批次，并尽量让数据库中止正在执行的语句：
+        PostgreSQL 发送取消请求，MySQL 通过另一条连接执行 KILL QUERY。
+        """
+        self._cancelled.set()
+        self._stop_server_query()
+
+    def _stop_server_query(self) -> None:
+        """让数据库中止当前连接上正在执行的语句"""
+        dbapi_connection = self._dbapi_connection
+        if dbapi_connection is None:
+            return
+
+        db_type = self.connection.db_type.lower()
+        try:
+            if db_type == "postgresql":
+                dbapi_connection.cancel()
+            elif db_type == "mysql":
+                thread_id = dbapi_connection.thread_id()
+                with open_db_connection(self.connection) as killer:
+                    killer.execute(sqlalchemy.text(f"KILL QUERY {int(thread_id)}"))
+            elif db_type == "sqlite":
+                dbapi_connection.interrupt()
+        except Exception as e:
+            print(f"Failed to cancel running query: {e}")
+
+    def __iter__(self) -> Iterator[List[tuple]]:
+        try:
+            yield from self._iter_batches()
+        except QueryCancelledError:
+            raise
+        except Exception as e:
+            if self.cancelled:
+                raise QueryCancelledError("Query was cancelled")
+            raise Exception(f"Query execution failed: {str(e)}")
+
+    def _iter_batches(self) -> Iterator[List[tuple]]:
+        db_type = self.connection.db_type.lower()
+        query = self.query
+        if db_type == "mysql":
+            query = fix_mysql_full_outer_join(query)
+
+        if self.cancelled:
+            raise QueryCancelledError("Query was cancelled")
+
+        with open_db_connection(self.connection) as conn:
+            # 服务端游标：MySQL 使用 SSCursor，PostgreSQL 使用命名游标（需在事务内）
+            conn = conn.execution_options(stream_results=True, yield_per=self.batch_size)
+            query, reset_sql = _apply_statement_timeout(
+                conn, db_type, query, self.timeout_seconds, transactional=True
+            )
+            self._dbapi_connection = conn.connection.dbapi_connection
+            abandoned = False
+            try:
+                result = _execute_with_retry(conn, query)
                 try:
-                    timeout_seconds_int = int(timeout_seconds)
-                except Exception:
-                    timeout_seconds_int = None
-
-                if timeout_seconds_int is not None:
-                    timeout_seconds_int = max(1, min(timeout_seconds_int, 300))
-                    timeout_ms = timeout_seconds_int * 1000
-                    db_type = connection.db_type.lower()
-                    if db_type == "postgresql":
+                    if not result.returns_rows:
+                        return
+                    self.columns = list(result.keys())
+                    yield from self._read_capped(result)
+                finally:
+                    if self.truncated and db_type in _DRAINING_CURSOR_DB_TYPES:
+                        # SSCursor 关闭时会读完剩余的所有行：先中止服务端查询，再丢弃连接
+                        abandoned = True
+                        self._stop_server_query()
                         try:
-                            conn.execute(sqlalchemy.text("SET statement_timeout = :ms"), {"ms": timeout_ms})
+                            result.close()
                         except Exception:
                             pass
-                    elif db_type == "mysql":
-                        try:
-                            conn.execute(sqlalchemy.text("SET SESSION MAX_EXECUTION_TIME = :ms"), {"ms": timeout_ms})
-                        except Exception:
-                            pass
-                        q_strip = (query or "").lstrip()
-                        if q_strip[:6].lower() == "select" and "max_execution_time" not in q_strip.lower():
-                            query = q_strip[:6] + f" /*+ MAX_EXECUTION_TIME({timeout_ms}) */" + q_strip[6:]
-            try:
-                result = conn.execute(sqlalchemy.text(query))
-            except Exception as e:
-                error_text = str(e).lower()
-                if "current transaction is aborted" in error_text or "infailedsqltransaction" in error_text:
-                    try:
-                        conn.rollback()
-                    except Exception:
-                        pass
-                    result = conn.execute(sqlalchemy.text(query))
+                    else:
+                        result.close()
+            finally:
+                self._dbapi_connection = None
+                if self.cancelled or abandoned:
+                    # 被取消或中途放弃的连接状态不确定，不归还连接池
+                    conn.invalidate()
                 else:
-                    raise
-            columns = result.keys()
-            return [dict(zip(columns, row)) for row in result.fetchall()]
-    except Exception as e:
-        raise Exception(f"Query execution failed: {str(e)}")
+                    _reset_session(conn, reset_sql)
+
+    def _read_capped(self, result) -> Iterator[List[tuple]]:
+        for partition in result.partitions(self.batch_size):
+            if self.cancelled:
+                raise QueryCancelledError("Query was cancelled")
+            remaining = self.max_rows - self.row_count if self.max_rows else len(partition)
+            if remaining <= 0:
+                self.truncated = True
+                return
+            batch = [tuple(row) for row in partition[:remaining]]
+            self.row_count += len(batch)
+            if len(partition) > remaining:
+                self.truncated = True
+            yield batch
+            if self.truncated:
+                return
+
+
+def execute_query_columnar(
+    connection: DBConnection,
+    query: str,
+    max_rows: Optional[int] = None,
+    timeout_seconds: Optional[int] = None
+) -> ColumnarResult:
+    """
+    执行查询并返回列式结果（流式拉取，超过 max_rows 的部分被截断）
+    """
+    stream = QueryStream(connection, query, max_rows=max_rows, timeout_seconds=timeout_seconds)
+    rows: List[tuple] = []
+    for batch in stream:
+        rows.extend(batch)
+    return ColumnarResult(columns=stream.columns, rows=rows, truncated=stream.truncated)
+
 
 def get_db_connection_by_id(connection_id: int) -> DBConnection:
     """
@@ -3,27 +3,14 @@
 查询Neo4j中的表关系，为洞察分析提供关系上下文
 """
 from typing import List, Dict, Any, Optional
-from neo4j import GraphDatabase
 
-from app.core.config import settings
+from app.services.neo4j_service import neo4j_service
 
 
 class GraphRelationshipService:
     """图谱关系查询服务"""
     
-    def __init__(self):
-        self.driver = None
-    
-    def _get_driver(self):
-        """获取Neo4j驱动"""
-        if not self.driver:
-            self.driver = GraphDatabase.driver(
-                settings.NEO4J_URI,
-                auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
-            )
-        return self.driver
-    
-    def query_table_relationships(
+    async def query_table_relationships(
         self,
         connection_id: int,
         table_names: List[str]
@@ -51,16 +38,14 @@ class GraphRelationshipService:
             }
         
         try:
-            driver = self._get_driver()
-            
-            with driver.session() as session:
+            async with neo4j_service.async_session() as session:
                 # 查询直接关联关系
-                direct_relationships = self._query_direct_relationships(
+                direct_relationships = await self._query_direct_relationships(
                     session, connection_id, table_names
                 )
                 
                 # 查询二度关联（可选，用于发现更深层次的关系）
-                indirect_relationships = self._query_indirect_relationships(
+                indirect_relationships = await self._query_indirect_relationships(
                     session, connection_id, table_names
                 )
                 
@@ -87,7 +72,7 @@ class GraphRelationshipService:
                 "error": str(e)
             }
     
-    def _query_direct_relationships(
+    async def _query_direct_relationships(
         self,
         session,
         connection_id: int,
@@ -107,10 +92,10 @@ class GraphRelationshipService:
         ORDER BY source_table, target_table
         """
         
-        result = session.run(query, connection_id=connection_id, table_names=table_names)
+        result = await session.run(query, connection_id=connection_id, table_names=table_names)
         
         relationships = []
-        for record in result:
+        async for record in result:
             relationships.append({
                 "source_table": record["source_table"],
                 "source_column": record["source_column"],
@@ -123,7 +108,7 @@ class GraphRelationshipService:
         
         return relationships
     
-    def _query_indirect_relationships(
+    async def _query_indirect_relationships(
         self,
         session,
         connection_id: int,
@@ -144,10 +129,10 @@ class GraphRelationshipService:
         LIMIT 10
         """
         
-        result = session.run(query, connection_id=connection_id, table_names=table_names)
+        result = await session.run(query, connection_id=connection_id, table_names=table_names)
         
         relationships = []
-        for record in result:
+        async for record in result:
             relationships.append({
                 "source_table": record["source_table"],
                 "target_table": record["related_table"],
@@ -200,10 +185,8 @@ class GraphRelationshipService:
         }
     
     def close(self):
-        """关闭Neo4j连接"""
-        if self.driver:
-            self.driver.close()
-            self.driver = None
+        """关闭资源（使用公共 Neo4j 服务，此方法保留以保持兼容）"""
+        pass
 
 
 # 创建全局实例
@@ -7,10 +7,11 @@ import asyncio
 import logging
 from typing import Dict, Any, List, Optional
 
-from pymilvus import MilvusClient
-
 from app.core.config import settings
 from ..utils import get_database_name_by_connection_id
+from ..storage.milvus_client_pool import milvus_client_pool
+from ..storage.milvus_service import build_collection_name
+from ..storage.qa_memory_index import qa_memory_index
 from ..vector import VectorServiceFactory
 from .retrieval_engine import HybridRetrievalEngine
 
@@ -163,37 +164,21 @@ class HybridRetrievalEnginePool:
             bool: 是否有样本数据
         """
         try:
-            # 获取数据库名称并生成集合名
-            database_name = get_database_name_by_connection_id(connection_id)
-            if database_name:
-                clean_name = "".join(c if c.isascii() and (c.isalnum() or c == "_") else "_" for c in database_name.lower())
-                if clean_name and not (clean_name[0].isalpha() or clean_name[0] == "_"):
-                    clean_name = "db_" + clean_name
-                if not clean_name or clean_name.replace("_", "") == "":
-                    clean_name = "db_unknown"
-                clean_name = clean_name[:50]
-                collection_name = f"{clean_name}_qa_pairs"
-            else:
-                collection_name = "default_qa_pairs"
-            
-            # 快速连接 Milvus 检查
+            # 内存索引已加载时直接使用其样本数
+            count = qa_memory_index.count(connection_id)
+            if count is not None:
+                return count > 0
+
+            # 获取数据库名称并生成集合名（元数据库查询放到线程池，避免阻塞事件循环）
+            loop = asyncio.get_running_loop()
+            database_name = await loop.run_in_executor(None, get_database_name_by_connection_id, connection_id)
+            collection_name = build_collection_name(database_name)
+
+            # 复用共享 Milvus 客户端，集合存在性和是否有数据走短 TTL 缓存
             uri = f"http://{settings.MILVUS_HOST}:{settings.MILVUS_PORT}"
-            client = MilvusClient(uri=uri)
-            
-            # 检查集合是否存在
-            if not client.has_collection(collection_name=collection_name):
-                logger.debug(f"Collection {collection_name} does not exist, no QA samples")
-                return False
-            
-            # 检查是否有数据（使用 query 统计）
-            results = client.query(
-                collection_name=collection_name,
-                filter=f"connection_id == {connection_id}",
-                output_fields=["id"],
-                limit=1  # 只需要知道是否有数据
+            has_data = await milvus_client_pool.has_rows(
+                uri, collection_name, f"connection_id == {connection_id}"
             )
-            
-            has_data = len(results) > 0
             logger.debug(f"QA samples check for connection_id={connection_id}: {has_data}")
             return has_data
             
@@ -4,13 +4,13 @@
 
 import asyncio
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, AsyncIterator, List, Optional
 from datetime import datetime
 
 from app.core.config import settings
 from ..models import QAPairWithContext, RetrievalResult
 from ..vector import VectorService, VectorServiceFactory, VectorServiceMonitor
-from ..storage import MilvusService, EnhancedNeo4jService
+from ..storage import MilvusService, EnhancedNeo4jService, qa_inverted_index, qa_memory_index
 from ..ranking import FusionRanker
 
 logger = logging.getLogger(__name__)
@@ -118,10 +118,14 @@ class HybridRetrievalEngine:
             # 获取对应连接的Milvus服务
             milvus_service = await self.get_milvus_service_for_connection(connection_id)
 
-            # Milvus检索
-            milvus_results = await milvus_service.search_similar(
-                query_vector, top_k=5, connection_id=connection_id
+            # 样本较少的连接在内存索引中检索，否则走Milvus检索
+            milvus_results = await qa_memory_index.search(
+                connection_id, milvus_service, query_vector, top_k=5
             )
+            if milvus_results is None:
+                milvus_results = await milvus_service.search_similar(
+                    query_vector, top_k=5, connection_id=connection_id
+                )
 
             # 转换为RetrievalResult
             results = []
@@ -161,6 +165,12 @@ class HybridRetrievalEngine:
                                connection_id: int) -> List[RetrievalResult]:
         """结构检索"""
         try:
+            table_names = [table.get('name') for table in schema_context.get('tables', [])]
+            results = await qa_inverted_index.structural_search(
+                connection_id, self.neo4j_service, table_names, top_k=20
+            )
+            if results is not None:
+                return results
             return await self.neo4j_service.structural_search(
                 schema_context, connection_id, top_k=20
             )
@@ -175,6 +185,11 @@ class HybridRetrievalEngine:
             query_type = self._classify_query_type(query)
             difficulty_level = self._estimate_difficulty(query)
 
+            results = await qa_inverted_index.pattern_search(
+                connection_id, self.neo4j_service, query_type, difficulty_level, top_k=20
+            )
+            if results is not None:
+                return results
             return await self.neo4j_service.pattern_search(
                 query_type, difficulty_level, connection_id, top_k=20
             )
@@ -225,10 +240,12 @@ class HybridRetrievalEngine:
 
             # 存储到Neo4j
             await self.neo4j_service.store_qa_pair_with_context(qa_pair, schema_context)
+            qa_inverted_index.add(qa_pair)
 
             # 获取对应连接的Milvus服务并存储
             milvus_service = await self.get_milvus_service_for_connection(qa_pair.connection_id)
             await milvus_service.insert_qa_pair(qa_pair)
+            qa_memory_index.add(qa_pair)
 
             logger.info(f"Successfully stored QA pair: {qa_pair.id}")
 
@@ -236,6 +253,45 @@ class HybridRetrievalEngine:
             logger.error(f"Failed to store QA pair: {str(e)}")
             raise
 
+    async def store_qa_pairs_batch(self, qa_pairs: List[QAPairWithContext], flush: bool = True):
+        """
+        批量存储同一连接的问答对：一次批量向量化、一次 Milvus 多行 insert、一个 Neo4j UNWIND 写事务
+
+        Neo4j 写入失败时删除本批已写入 Milvus 的数据后抛出异常，整批视为失败。
+        """
+        if not qa_pairs:
+            return
+        if not self._initialized:
+            await self.initialize()
+
+        connection_ids = {qa_pair.connection_id for qa_pair in qa_pairs}
+        if len(connection_ids) != 1:
+            raise ValueError("store_qa_pairs_batch requires QA pairs from a single connection")
+
+        # 批量向量化（命中向量缓存的问题不会重复请求）
+        pending = [qa_pair for qa_pair in qa_pairs if not qa_pair.embedding_vector]
+        if pending:
+            vectors = await self.vector_service.batch_embed([qa_pair.question for qa_pair in pending])
+            for qa_pair, vector in zip(pending, vectors):
+                qa_pair.embedding_vector = vector
+
+        milvus_service = await self.get_milvus_service_for_connection(connection_ids.pop())
+        await milvus_service.insert_qa_pairs(qa_pairs, flush=flush)
+        try:
+            await self.neo4j_service.store_qa_pairs_batch(qa_pairs)
+        except Exception:
+            try:
+                await milvus_service.delete_qa_pairs([qa_pair.id for qa_pair in qa_pairs])
+            except Exception as e:
+                logger.error(f"Failed to roll back Milvus insert after Neo4j failure: {str(e)}")
+            raise
+
+        for qa_pair in qa_pairs:
+            qa_inverted_index.add(qa_pair)
+            qa_memory_index.add(qa_pair)
+
+        logger.info(f"Successfully stored {len(qa_pairs)} QA pairs in one batch")
+
     async def get_service_status(self) -> Dict[str, Any]:
         """获取服务状态"""
         status = {
@@ -251,6 +307,9 @@ class HybridRetrievalEngine:
         if self.monitor:
             status["monitoring_metrics"] = self.monitor.get_metrics()
 
+        status["qa_memory_index"] = qa_memory_index.get_stats()
+        status["qa_inverted_index"] = qa_inverted_index.get_stats()
+
         return status
 
     async def get_stats(self, connection_id: Optional[int] = None) -> Dict[str, Any]:
@@ -285,7 +344,7 @@ class HybridRetrievalEngine:
                 
                 try:
                     # 获取所有collections
-                    collections = self.milvus_service.client.list_collections()
+                    collections = await self.milvus_service.run("list_collections")
                     logger.info(f"找到 {len(collections)} 个collections进行统计")
                     
                     # 遍历每个collection
@@ -297,7 +356,8 @@ class HybridRetrievalEngine:
                         try:
                             logger.debug(f"统计collection: {collection_name}")
                             # 查询该collection中的所有QA对
-                            results = self.milvus_service.client.query(
+                            results = await self.milvus_service.run(
+                                "query",
                                 collection_name=collection_name,
                                 filter="id != ''",
                                 output_fields=["id", "query_type", "difficulty_level", "verified", "success_rate"],
@@ -385,7 +445,7 @@ class HybridRetrievalEngine:
                 
                 try:
                     # 获取所有collections
-                    collections = self.milvus_service.client.list_collections()
+                    collections = await self.milvus_service.run("list_collections")
                     logger.info(f"找到 {len(collections)} 个collections")
                     
                     # 遍历每个collection
@@ -397,7 +457,8 @@ class HybridRetrievalEngine:
                         try:
                             logger.debug(f"查询collection: {collection_name}")
                             # 查询该collection中的所有QA对
-                            results = self.milvus_service.client.query(
+                            results = await self.milvus_service.run(
+                                "query",
                                 collection_name=collection_name,
                                 filter="id != ''",  # 查询所有记录
                                 output_fields=["id", "question", "sql", "connection_id", 
@@ -432,6 +493,33 @@ class HybridRetrievalEngine:
             logger.error(f"Failed to get all QA pairs: {str(e)}")
             return []
 
+    async def iter_qa_pairs(self, connection_id: int, batch_size: int = 1000) -> AsyncIterator[List[Dict]]:
+        """
+        按页遍历一个连接的问答对（用于流式导出），每页附带 Neo4j 中的上下文
+
+        Milvus 按 query_iterator 分页读取，每页的 created_at / used_tables / mentioned_entities
+        通过一次 Neo4j 批量查询补齐；Neo4j 不可用时这些字段留空，导出继续。
+        """
+        if not self._initialized:
+            await self.initialize()
+
+        milvus_service = await self.get_milvus_service_for_connection(connection_id)
+        neo4j_available = True
+        async for page in milvus_service.iter_qa_pairs(connection_id, batch_size):
+            contexts = {}
+            if neo4j_available:
+                try:
+                    contexts = await self.neo4j_service.get_qa_contexts([row["id"] for row in page])
+                except Exception as e:
+                    logger.warning(f"Neo4j context unavailable during QA export, exporting Milvus fields only: {e}")
+                    neo4j_available = False
+            for row in page:
+                context = contexts.get(row["id"], {})
+                row["created_at"] = context.get("created_at")
+                row["used_tables"] = context.get("used_tables", [])
+                row["mentioned_entities"] = context.get("mentioned_entities", [])
+            yield page
+
     async def update_qa_pair(self, qa_id: str, update_data: Dict) -> bool:
         """更新问答对"""
         if not self._initialized:
@@ -445,13 +533,14 @@ class HybridRetrievalEngine:
             
             # 策略：从 Milvus 获取所有 collections，然后在每个 collection 中查找
             try:
-                collections = self.milvus_service.client.list_collections()
+                collections = await self.milvus_service.run("list_collections")
                 logger.info(f"Searching for QA pair {qa_id} in {len(collections)} collections")
                 
                 for collection_name in collections:
                     try:
                         # 尝试在这个 collection 中查询
-                        results = self.milvus_service.client.query(
+                        results = await self.milvus_service.run(
+                            "query",
                             collection_name=collection_name,
                             filter=f'id == "{qa_id}"',
                             output_fields=["id", "connection_id"],
@@ -472,6 +561,8 @@ class HybridRetrievalEngine:
                             # 执行更新
                             result = await milvus_service.update_qa_pair(qa_id, update_data, new_vector)
                             if result:
+                                qa_memory_index.update(connection_id, qa_id, update_data, new_vector)
+                                qa_inverted_index.update(connection_id, qa_id, update_data)
                                 await self._update_neo4j_qa_pair(qa_id, update_data)
                                 logger.info(f"Successfully updated QA pair {qa_id}")
                                 return True
@@ -496,7 +587,7 @@ class HybridRetrievalEngine:
             if not self.neo4j_service._initialized:
                 await self.neo4j_service.initialize()
             
-            with self.neo4j_service.driver.session() as session:
+            async with self.neo4j_service.session() as session:
                 # 构建SET子句
                 set_clauses = []
                 params = {"qa_id": qa_id}
@@ -521,7 +612,7 @@ class HybridRetrievalEngine:
                         SET {', '.join(set_clauses)}
                         RETURN qa
                     """
-                    session.run(query, params)
+                    await session.run(query, params)
                     logger.info(f"Updated QA pair in Neo4j: {qa_id}")
                     
         except Exception as e:
@@ -537,13 +628,14 @@ class HybridRetrievalEngine:
             deleted = False
             
             try:
-                collections = self.milvus_service.client.list_collections()
+                collections = await self.milvus_service.run("list_collections")
                 logger.info(f"Searching for QA pair {qa_id} to delete in {len(collections)} collections")
                 
                 for collection_name in collections:
                     try:
                         # 尝试在这个 collection 中查询
-                        results = self.milvus_service.client.query(
+                        results = await self.milvus_service.run(
+                            "query",
                             collection_name=collection_name,
                             filter=f'id == "{qa_id}"',
                             output_fields=["id", "connection_id"],
@@ -563,6 +655,8 @@ class HybridRetrievalEngine:
                             
                             # 执行删除
                             await milvus_service.delete_qa_pair(qa_id)
+                            qa_memory_index.remove(connection_id, qa_id)
+                            qa_inverted_index.remove(connection_id, qa_id)
                             deleted = True
                             logger.info(f"Deleted QA pair {qa_id} from collection {collection_name}")
                             break  # 找到并删除后退出循环
@@ -595,9 +689,9 @@ class HybridRetrievalEngine:
             if not self.neo4j_service._initialized:
                 await self.neo4j_service.initialize()
             
-            with self.neo4j_service.driver.session() as session:
+            async with self.neo4j_service.session() as session:
                 # 删除问答对及其关系
-                session.run("""
+                await session.run("""
                     MATCH (qa:QAPair {id: $qa_id})
                     DETACH DELETE qa
                 """, qa_id=qa_id)
@@ -4,12 +4,20 @@
 包含:
 - MilvusService: Milvus 向量数据库服务
 - EnhancedNeo4jService: 扩展的 Neo4j 服务
+- QAMemoryIndex: 小规模 QA 样本的进程内向量索引
+- QAInvertedIndex: 结构检索 / 模式检索的进程内倒排索引
 """
 
 from .milvus_service import MilvusService
 from .neo4j_enhanced import EnhancedNeo4jService
+from .qa_memory_index import QAMemoryIndex, qa_memory_index
+from .qa_inverted_index import QAInvertedIndex, qa_inverted_index
 
 __all__ = [
     "MilvusService",
     "EnhancedNeo4jService",
+    "QAMemoryIndex",
+    "qa_memory_index",
+    "QAInvertedIndex",
+    "qa_inverted_index",
 ]
@@ -0,0 +1,204 @@
+"""
+Milvus 异步访问层
+
+pymilvus.MilvusClient 是阻塞客户端，直接在协程中调用会阻塞事件循环。
+这里统一管理：
+- 每个 URI 一个共享 MilvusClient（内部 gRPC 通道本身支持并发）
+- 专用线程池执行所有 Milvus 调用，事件循环只负责等待
+- 集合是否存在 / 是否有数据的短 TTL 缓存，写入、删除、建删集合时失效
+
+使用方式：
+    from .milvus_client_pool import milvus_client_pool
+
+    results = await milvus_client_pool.run(uri, "search", collection_name=..., data=[vec])
+    async for page in milvus_client_pool.iterate(uri, "query_iterator", collection_name=..., batch_size=1000):
+        ...
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from pymilvus import MilvusClient
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MilvusClientPool:
+    """按 URI 复用 MilvusClient，并在专用线程池中执行调用"""
+
+    def __init__(self, max_workers: Optional[int] = None, meta_cache_ttl: Optional[float] = None):
+        self._max_workers = max_workers or settings.MILVUS_EXECUTOR_MAX_WORKERS
+        self._meta_cache_ttl = settings.MILVUS_META_CACHE_TTL if meta_cache_ttl is None else meta_cache_ttl
+        self._clients: Dict[str, MilvusClient] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        # (uri, collection_name) -> (过期时间, 是否存在)
+        self._collection_cache: Dict[Tuple[str, str], Tuple[float, bool]] = {}
+        # (uri, collection_name, filter) -> (过期时间, 是否有数据)
+        self._rows_cache: Dict[Tuple[str, str, str], Tuple[float, bool]] = {}
+
+    # ===== 客户端 =====
+
+    def get_client(self, uri: str) -> MilvusClient:
+        """获取 URI 对应的共享客户端（阻塞，需在线程池中调用）"""
+        with self._lock:
+            client = self._clients.get(uri)
+        if client is not None:
+            return client
+
+        client = MilvusClient(uri=uri)
+        with self._lock:
+            existing = self._clients.get(uri)
+            if existing is not None:
+                # 并发创建时保留先创建的实例
+                self._close_client(client)
+                return existing
+            self._clients[uri] = client
+        logger.info(f"Connected to Milvus at {uri}")
+        return client
+
+    async def run(self, uri: str, method: str, *args, **kwargs) -> Any:
+        """
+        在线程池中执行 MilvusClient 方法
+
+        Args:
+            uri: Milvus 地址
+            method: MilvusClient 方法名，如 "search"、"query"、"insert"
+        """
+        def call():
+            client = self.get_client(uri)
+            return getattr(client, method)(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), call)
+
+    async def iterate(self, uri: str, method: str, *args, **kwargs) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        在线程池中逐页读取 MilvusClient 迭代器（如 "query_iterator"），每次返回一页
+
+        调用方提前退出时关闭迭代器，释放服务端游标。
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        iterator = await self.run(uri, method, *args, **kwargs)
+        try:
+            while True:
+                page = await loop.run_in_executor(executor, iterator.next)
+                if not page:
+                    return
+                yield page
+        finally:
+            await loop.run_in_executor(executor, iterator.close)
+
+    # ===== 元数据缓存 =====
+
+    async def has_collection(self, uri: str, collection_name: str) -> bool:
+        """集合是否存在（短 TTL 缓存）"""
+        key = (uri, collection_name)
+        cached = self._get_cached(self._collection_cache, key)
+        if cached is not None:
+            return cached
+
+        exists = bool(await self.run(uri, "has_collection", collection_name=collection_name))
+        self._set_cached(self._collection_cache, key, exists)
+        return exists
+
+    async def has_rows(self, uri: str, collection_name: str, filter_expr: str) -> bool:
+        """集合中是否存在满足过滤条件的数据（短 TTL 缓存）"""
+        if not await self.has_collection(uri, collection_name):
+            return False
+
+        key = (uri, collection_name, filter_expr)
+        cached = self._get_cached(self._rows_cache, key)
+        if cached is not None:
+            return cached
+
+        results = await self.run(
+            uri, "query",
+            collection_name=collection_name,
+            filter=filter_expr,
+            output_fields=["id"],
+            limit=1
+        )
+        has_data = len(results) > 0
+        self._set_cached(self._rows_cache, key, has_data)
+        return has_data
+
+    def invalidate(self, uri: str, collection_name: Optional[str] = None) -> None:
+        """数据或集合变更后清除缓存（collection_name 为空时清除该 URI 下全部）"""
+        with self._lock:
+            for cache in (self._collection_cache, self._rows_cache):
+                stale = [
+                    key for key in cache
+                    if key[0] == uri and (collection_name is None or key[1] == collection_name)
+                ]
+                for key in stale:
+                    del cache[key]
+
+    # ===== 生命周期 =====
+
+    def close_all(self) -> None:
+        """关闭所有客户端和线程池（应用关闭时调用）"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._collection_cache.clear()
+            self._rows_cache.clear()
+            executor, self._executor = self._executor, None
+        for client in clients:
+            self._close_client(client)
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "clients": list(self._clients.keys()),
+                "max_workers": self._max_workers,
+                "cached_collections": len(self._collection_cache),
+                "cached_row_checks": len(self._rows_cache),
+            }
+
+    # ===== 内部方法 =====
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._max_workers, thread_name_prefix="milvus"
+                )
+            return self._executor
+
+    def _get_cached(self, cache: Dict, key: Tuple) -> Optional[bool]:
+        with self._lock:
+            entry = cache.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del cache[key]
+                return None
+            return value
+
+    def _set_cached(self, cache: Dict, key: Tuple, value: bool) -> None:
+        if self._meta_cache_ttl <= 0:
+            return
+        with self._lock:
+            cache[key] = (time.monotonic() + self._meta_cache_ttl, value)
+
+    @staticmethod
+    def _close_client(client: MilvusClient) -> None:
+        try:
+            client.close()
+        except Exception as e:
+            logger.warning(f"Error closing Milvus client: {e}")
+
+
+# 创建全局实例
+milvus_client_pool = MilvusClientPool()
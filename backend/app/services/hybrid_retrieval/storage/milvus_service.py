@@ -3,19 +3,40 @@ Milvus 向量数据库服务
 """
 
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, AsyncIterator, List, Optional
 
 from pymilvus import MilvusClient, DataType
 
 from app.core.config import settings
 from ..models import QAPairWithContext
 from ..utils import get_database_name_by_connection_id
+from .milvus_client_pool import milvus_client_pool
 
 logger = logging.getLogger(__name__)
 
 
+def build_collection_name(database_name: str = None) -> str:
+    """根据数据库名称生成集合名称"""
+    if database_name:
+        # 清理数据库名称，确保符合Milvus集合命名规范
+        # Milvus集合名称只能包含字母、数字和下划线，且以字母或下划线开头
+        clean_name = "".join(c if c.isascii() and (c.isalnum() or c == "_") else "_" for c in database_name.lower())
+        # 确保以字母或下划线开头
+        if clean_name and not (clean_name[0].isalpha() or clean_name[0] == "_"):
+            clean_name = "db_" + clean_name
+        # 如果清理后为空或只有下划线，使用默认前缀
+        if not clean_name or clean_name.replace("_", "") == "":
+            clean_name = "db_unknown"
+        # 限制长度（Milvus集合名称最大长度为255）
+        clean_name = clean_name[:50]  # 保留足够空间给后缀
+        return f"{clean_name}_qa_pairs"
+    else:
+        # 默认集合名称
+        return "default_qa_pairs"
+
+
 class MilvusService:
-    """Milvus向量数据库服务 - 使用MilvusClient"""
+    """Milvus向量数据库服务 - 共享 MilvusClient，调用在线程池中执行，不阻塞事件循环"""
 
     def __init__(self, host: str = None, port: str = None, database_name: str = None, connection_id: int = None):
         self.host = host or settings.MILVUS_HOST
@@ -34,42 +55,26 @@ class MilvusService:
 
         # 构建连接URI
         self.uri = f"http://{self.host}:{self.port}"
-        self.client = None
         self._initialized = False
 
     def _generate_collection_name(self, database_name: str = None) -> str:
         """根据数据库名称生成集合名称"""
-        if database_name:
-            # 清理数据库名称，确保符合Milvus集合命名规范
-            # Milvus集合名称只能包含字母、数字和下划线，且以字母或下划线开头
-            clean_name = "".join(c if c.isascii() and (c.isalnum() or c == "_") else "_" for c in database_name.lower())
-            # 确保以字母或下划线开头
-            if clean_name and not (clean_name[0].isalpha() or clean_name[0] == "_"):
-                clean_name = "db_" + clean_name
-            # 如果清理后为空或只有下划线，使用默认前缀
-            if not clean_name or clean_name.replace("_", "") == "":
-                clean_name = "db_unknown"
-            # 限制长度（Milvus集合名称最大长度为255）
-            clean_name = clean_name[:50]  # 保留足够空间给后缀
-            return f"{clean_name}_qa_pairs"
-        else:
-            # 默认集合名称
-            return "default_qa_pairs"
+        return build_collection_name(database_name)
+
+    async def run(self, method: str, *args, **kwargs):
+        """在线程池中执行 MilvusClient 方法"""
+        return await milvus_client_pool.run(self.uri, method, *args, **kwargs)
 
     async def initialize(self, dimension: int):
         """初始化Milvus连接和集合"""
         try:
-            # 创建MilvusClient连接
-            self.client = MilvusClient(uri=self.uri)
-            logger.info(f"Connected to Milvus at {self.uri}")
-
-            # 检查集合是否存在
-            if self.client.has_collection(collection_name=self.collection_name):
+            # 检查集合是否存在（共享客户端，首次调用时建立连接）
+            if await milvus_client_pool.has_collection(self.uri, self.collection_name):
                 logger.info(f"Collection {self.collection_name} exists, checking schema compatibility...")
                 # 检查现有集合的schema是否兼容
                 try:
                     # 尝试获取集合信息来验证schema
-                    collection_info = self.client.describe_collection(collection_name=self.collection_name)
+                    collection_info = await self.run("describe_collection", collection_name=self.collection_name)
                     logger.info(f"Existing collection schema: {collection_info}")
 
                     # 检查是否有vector字段
@@ -77,7 +82,8 @@ class MilvusService:
                     if not has_vector_field:
                         logger.warning(f"Collection {self.collection_name} missing vector field, recreating...")
                         # 删除旧集合并重新创建
-                        self.client.drop_collection(collection_name=self.collection_name)
+                        await self.run("drop_collection", collection_name=self.collection_name)
+                        milvus_client_pool.invalidate(self.uri, self.collection_name)
                         logger.info(f"Dropped incompatible collection: {self.collection_name}")
                         await self._create_new_collection(dimension)
                     else:
@@ -86,7 +92,8 @@ class MilvusService:
                     logger.warning(f"Failed to check collection schema: {e}, recreating collection...")
                     # 如果无法检查schema，删除并重新创建
                     try:
-                        self.client.drop_collection(collection_name=self.collection_name)
+                        await self.run("drop_collection", collection_name=self.collection_name)
+                        milvus_client_pool.invalidate(self.uri, self.collection_name)
                         logger.info(f"Dropped problematic collection: {self.collection_name}")
                     except:
                         pass
@@ -105,7 +112,7 @@ class MilvusService:
         """创建新的集合"""
         try:
             # 创建新集合 - 使用MilvusClient.create_schema方法
-            schema = self.client.create_schema(
+            schema = MilvusClient.create_schema(
                 auto_id=False,
                 enable_dynamic_field=False,
                 description="QA pairs for Text2SQL optimization"
@@ -123,7 +130,7 @@ class MilvusService:
             schema.add_field(field_name="vector", datatype=DataType.FLOAT_VECTOR, dim=dimension)
 
             # 创建索引参数
-            index_params = self.client.prepare_index_params()
+            index_params = MilvusClient.prepare_index_params()
             index_params.add_index(
                 field_name="vector",
                 index_type="IVF_FLAT",
@@ -132,11 +139,13 @@ class MilvusService:
             )
 
             # 创建集合
-            self.client.create_collection(
+            await self.run(
+                "create_collection",
                 collection_name=self.collection_name,
                 schema=schema,
                 index_params=index_params
             )
+            milvus_client_pool.invalidate(self.uri, self.collection_name)
             logger.info(f"Created new collection: {self.collection_name}")
 
         except Exception as e:
@@ -163,13 +172,11 @@ class MilvusService:
             }
 
             # 插入数据
-            self.client.insert(
-                collection_name=self.collection_name,
-                data=[data]
-            )
-            
+            await self.run("insert", collection_name=self.collection_name, data=[data])
+
             # 立即刷新以确保插入生效
-            self.client.flush(collection_name=self.collection_name)
+            await self.run("flush", collection_name=self.collection_name)
+            milvus_client_pool.invalidate(self.uri, self.collection_name)
 
             logger.info(f"Inserted QA pair: {qa_pair.id}")
             return qa_pair.id
@@ -178,6 +185,62 @@ class MilvusService:
             logger.error(f"Failed to insert QA pair: {str(e)}")
             raise
 
+    async def insert_qa_pairs(self, qa_pairs: List[QAPairWithContext], flush: bool = True) -> List[str]:
+        """批量插入问答对（一次多行 insert）；连续写入多批时可只在最后一批 flush"""
+        if not self._initialized:
+            raise RuntimeError("Milvus service not initialized")
+        if not qa_pairs:
+            return []
+
+        try:
+            data = [
+                {
+                    "id": qa_pair.id,
+                    "question": qa_pair.question,
+                    "sql": qa_pair.sql,
+                    "connection_id": qa_pair.connection_id,
+                    "difficulty_level": qa_pair.difficulty_level,
+                    "query_type": qa_pair.query_type,
+                    "success_rate": qa_pair.success_rate,
+                    "verified": qa_pair.verified,
+                    "vector": qa_pair.embedding_vector
+                }
+                for qa_pair in qa_pairs
+            ]
+            await self.run("insert", collection_name=self.collection_name, data=data)
+
+            if flush:
+                await self.run("flush", collection_name=self.collection_name)
+            milvus_client_pool.invalidate(self.uri, self.collection_name)
+
+            logger.info(f"Inserted {len(qa_pairs)} QA pairs into {self.collection_name}")
+            return [qa_pair.id for qa_pair in qa_pairs]
+
+        except Exception as e:
+            logger.error(f"Failed to insert QA pairs: {str(e)}")
+            raise
+
+    async def flush(self):
+        """刷新集合，使之前未 flush 的写入落盘"""
+        await self.run("flush", collection_name=self.collection_name)
+
+    async def delete_qa_pairs(self, qa_ids: List[str]) -> bool:
+        """按 ID 批量删除问答对（批量导入写 Neo4j 失败时回滚 Milvus 写入）"""
+        if not self._initialized:
+            raise RuntimeError("Milvus service not initialized")
+        if not qa_ids:
+            return True
+
+        try:
+            await self.run("delete", collection_name=self.collection_name, ids=list(qa_ids))
+            milvus_client_pool.invalidate(self.uri, self.collection_name)
+            logger.info(f"Deleted {len(qa_ids)} QA pairs from Milvus")
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to delete QA pairs: {str(e)}")
+            raise
+
     async def search_similar(self,
                            query_vector: List[float],
                            top_k: int = 5,
@@ -198,7 +261,8 @@ class MilvusService:
                 "params": {"nprobe": 10}
             }
 
-            results = self.client.search(
+            results = await self.run(
+                "search",
                 collection_name=self.collection_name,
                 data=[query_vector],
                 limit=top_k,
@@ -238,13 +302,12 @@ class MilvusService:
 
         try:
             # 获取集合中的实体数量
-            collection_info = self.client.describe_collection(collection_name=self.collection_name)
-            
             # 查询所有数据以计算统计信息
             filter_expr = f"connection_id == {connection_id}" if connection_id else None
             
             # 查询数据
-            results = self.client.query(
+            results = await self.run(
+                "query",
                 collection_name=self.collection_name,
                 filter=filter_expr if filter_expr else "id != ''",
                 output_fields=["id", "query_type", "difficulty_level", "verified", "success_rate"],
@@ -284,6 +347,19 @@ class MilvusService:
             logger.error(f"Failed to get stats: {str(e)}")
             return {"total": 0, "error": str(e)}
 
+    async def iter_qa_pairs(self, connection_id: int, batch_size: int = 1000) -> AsyncIterator[List[Dict]]:
+        """按页遍历一个连接的问答对（query_iterator，不受 query 的 limit 限制，内存占用只有一页）"""
+        async for page in milvus_client_pool.iterate(
+            self.uri,
+            "query_iterator",
+            collection_name=self.collection_name,
+            batch_size=batch_size,
+            filter=f"connection_id == {int(connection_id)}",
+            output_fields=["id", "question", "sql", "connection_id",
+                           "difficulty_level", "query_type", "success_rate", "verified"]
+        ):
+            yield page
+
     async def get_all_qa_pairs(self, connection_id: Optional[int] = None, limit: int = 100) -> List[Dict]:
         """获取所有问答对"""
         if not self._initialized:
@@ -292,7 +368,8 @@ class MilvusService:
         try:
             filter_expr = f"connection_id == {connection_id}" if connection_id else "id != ''"
             
-            results = self.client.query(
+            results = await self.run(
+                "query",
                 collection_name=self.collection_name,
                 filter=filter_expr,
                 output_fields=["id", "question", "sql", "connection_id", 
@@ -306,17 +383,21 @@ class MilvusService:
             logger.error(f"Failed to get all QA pairs: {str(e)}")
             return []
 
-    async def get_qa_pair_by_id(self, qa_id: str) -> Optional[Dict]:
+    async def get_qa_pair_by_id(self, qa_id: str, include_vector: bool = False) -> Optional[Dict]:
         """根据ID获取问答对"""
         if not self._initialized:
             return None
 
         try:
-            results = self.client.query(
+            output_fields = ["id", "question", "sql", "connection_id",
+                             "difficulty_level", "query_type", "success_rate", "verified"]
+            if include_vector:
+                output_fields.append("vector")
+            results = await self.run(
+                "query",
                 collection_name=self.collection_name,
                 filter=f'id == "{qa_id}"',
-                output_fields=["id", "question", "sql", "connection_id", 
-                              "difficulty_level", "query_type", "success_rate", "verified"]
+                output_fields=output_fields
             )
             
             return results[0] if results else None
@@ -332,7 +413,7 @@ class MilvusService:
 
         try:
             # 1. 获取原始数据
-            original = await self.get_qa_pair_by_id(qa_id)
+            original = await self.get_qa_pair_by_id(qa_id, include_vector=new_vector is None)
             if not original:
                 raise ValueError(f"QA pair with id {qa_id} not found")
             
@@ -340,13 +421,11 @@ class MilvusService:
             updated_data = {**original, **update_data}
             
             # 3. 删除原始记录
-            self.client.delete(
-                collection_name=self.collection_name,
-                filter=f'id == "{qa_id}"'
-            )
-            
+            await self.run("delete", collection_name=self.collection_name, filter=f'id == "{qa_id}"')
+
             # 立即刷新以确保删除生效
-            self.client.flush(collection_name=self.collection_name)
+            await self.run("flush", collection_name=self.collection_name)
+            milvus_client_pool.invalidate(self.uri, self.collection_name)
             
             # 4. 重新插入更新后的数据
             data = {
@@ -358,16 +437,15 @@ class MilvusService:
                 "query_type": updated_data["query_type"],
                 "success_rate": updated_data.get("success_rate", 0.0),
                 "verified": updated_data.get("verified", False),
-                "vector": new_vector if new_vector else [0.0] * 1024  # 需要重新生成向量
+                # 问题未修改时沿用原向量
+                "vector": new_vector or updated_data.get("vector") or [0.0] * 1024
             }
             
-            self.client.insert(
-                collection_name=self.collection_name,
-                data=[data]
-            )
-            
+            await self.run("insert", collection_name=self.collection_name, data=[data])
+
             # 再次刷新以确保插入生效
-            self.client.flush(collection_name=self.collection_name)
+            await self.run("flush", collection_name=self.collection_name)
+            milvus_client_pool.invalidate(self.uri, self.collection_name)
             
             logger.info(f"Updated QA pair: {qa_id}")
             return True
@@ -383,13 +461,11 @@ class MilvusService:
 
         try:
             # 执行删除
-            self.client.delete(
-                collection_name=self.collection_name,
-                filter=f'id == "{qa_id}"'
-            )
-            
+            await self.run("delete", collection_name=self.collection_name, filter=f'id == "{qa_id}"')
+
             # 立即刷新以确保删除生效
-            self.client.flush(collection_name=self.collection_name)
+            await self.run("flush", collection_name=self.collection_name)
+            milvus_client_pool.invalidate(self.uri, self.collection_name)
             
             logger.info(f"Deleted QA pair from Milvus: {qa_id}")
             return True
@@ -3,51 +3,132 @@
 """
 
 import logging
-from typing import Dict, Any, List, Optional
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
-from neo4j import GraphDatabase
-
-from app.core.config import settings
+from app.services.neo4j_service import neo4j_service
 from ..models import QAPairWithContext, RetrievalResult
 from ..utils import extract_tables_from_sql
 
 logger = logging.getLogger(__name__)
 
+# 写入语句按 id 查找 QAPair / QueryPattern / Entity 节点，没有唯一约束（索引）时每行都是全标签扫描，
+# 批量导入的耗时随已有样本数增长
+_QA_GRAPH_CONSTRAINTS = [
+    "CREATE CONSTRAINT qa_pair_id IF NOT EXISTS FOR (qa:QAPair) REQUIRE qa.id IS UNIQUE",
+    "CREATE CONSTRAINT query_pattern_id IF NOT EXISTS FOR (p:QueryPattern) REQUIRE p.id IS UNIQUE",
+    "CREATE CONSTRAINT entity_id IF NOT EXISTS FOR (e:Entity) REQUIRE e.id IS UNIQUE",
+    "CREATE INDEX qa_table_connection_name IF NOT EXISTS FOR (t:Table) ON (t.connection_id, t.name)",
+]
+
+# ===== 批量写入语句（UNWIND，store_qa_pairs_batch 使用） =====
+
+_CREATE_QA_PAIRS = """
+UNWIND $rows AS row
+CREATE (qa:QAPair {
+    id: row.id,
+    question: row.question,
+    sql: row.sql,
+    connection_id: row.connection_id,
+    difficulty_level: row.difficulty_level,
+    query_type: row.query_type,
+    success_rate: row.success_rate,
+    verified: row.verified,
+    created_at: datetime(row.created_at)
+})
+"""
+
+_LINK_QA_TABLES = """
+UNWIND $rows AS row
+MATCH (qa:QAPair {id: row.qa_id})
+MATCH (t:Table {name: row.table_name, connection_id: row.connection_id})
+CREATE (qa)-[:USES_TABLES]->(t)
+"""
+
+_UPSERT_PATTERNS = """
+UNWIND $rows AS row
+MERGE (p:QueryPattern {id: row.id})
+ON CREATE SET p.name = row.name, p.difficulty_level = row.difficulty_level,
+              p.usage_count = 0, p.created_at = datetime()
+SET p.usage_count = p.usage_count + row.count
+"""
+
+_LINK_QA_PATTERNS = """
+UNWIND $rows AS row
+MATCH (qa:QAPair {id: row.qa_id})
+MATCH (p:QueryPattern {id: row.pattern_id})
+CREATE (qa)-[:FOLLOWS_PATTERN]->(p)
+"""
+
+_LINK_QA_ENTITIES = """
+UNWIND $rows AS row
+MERGE (e:Entity {id: row.entity_id})
+ON CREATE SET e.name = row.entity_name, e.created_at = datetime()
+WITH row, e
+MATCH (qa:QAPair {id: row.qa_id})
+CREATE (qa)-[:MENTIONS_ENTITY]->(e)
+"""
+
+
+def _pattern_id(qa_pair: QAPairWithContext) -> str:
+    return f"pattern_{qa_pair.query_type}_{qa_pair.difficulty_level}"
+
+
+def _entity_id(entity: str) -> str:
+    return f"entity_{entity.lower().replace(' ', '_')}"
+
+
+async def _run_batch_write(tx, statements: List[tuple]) -> None:
+    for query, rows in statements:
+        if rows:
+            result = await tx.run(query, rows=rows)
+            await result.consume()
+
 
 class EnhancedNeo4jService:
-    """扩展的Neo4j服务"""
+    """扩展的Neo4j服务（使用进程内共享的异步驱动）"""
 
-    def __init__(self, uri: str = None, user: str = None, password: str = None):
-        self.uri = uri or settings.NEO4J_URI
-        self.user = user or settings.NEO4J_USER
-        self.password = password or settings.NEO4J_PASSWORD
-        self.driver = None
+    def __init__(self):
         self._initialized = False
 
+    def session(self):
+        """从共享异步驱动借出会话（async with）"""
+        return neo4j_service.async_session()
+
     async def initialize(self):
-        """初始化Neo4j连接"""
+        """初始化Neo4j连接，并创建问答图的约束和索引"""
         try:
-            self.driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password))
             # 测试连接
-            with self.driver.session() as session:
-                session.run("RETURN 1")
-            self._initialized = True
-            logger.info("Neo4j service initialized successfully")
+            await neo4j_service.run_query("RETURN 1")
         except Exception as e:
             logger.error(f"Failed to initialize Neo4j service: {str(e)}")
             raise
 
+        await self._ensure_constraints()
+        self._initialized = True
+        logger.info("Neo4j service initialized successfully")
+
+    async def _ensure_constraints(self):
+        """创建约束和索引（已存在时跳过），失败（如已有重复 id）只记录日志"""
+        async with self.session() as session:
+            for statement in _QA_GRAPH_CONSTRAINTS:
+                try:
+                    result = await session.run(statement)
+                    await result.consume()
+                except Exception as e:
+                    logger.warning(f"Failed to create Neo4j constraint ({statement}): {e}")
+
     async def store_qa_pair_with_context(self, qa_pair: QAPairWithContext,
                                        schema_context: Dict[str, Any]):
         """存储问答对及其完整上下文信息"""
         if not self._initialized:
             await self.initialize()
 
-        with self.driver.session() as session:
+        async with self.session() as session:
             try:
                 # 1. 创建QAPair节点
-                session.run("""
+                await session.run("""
                     CREATE (qa:QAPair {
                         id: $id,
                         question: $question,
@@ -80,13 +161,14 @@ class EnhancedNeo4jService:
 
                 for table_name in tables_to_use:
                     # 检查表是否存在
-                    table_exists = session.run("""
+                    result = await session.run("""
                         MATCH (t:Table {name: $table_name, connection_id: $connection_id})
                         RETURN count(t) > 0 as exists
-                    """, table_name=table_name, connection_id=qa_pair.connection_id).single()['exists']
+                    """, table_name=table_name, connection_id=qa_pair.connection_id)
+                    table_exists = (await result.single())['exists']
 
                     if table_exists:
-                        session.run("""
+                        await session.run("""
                             MATCH (qa:QAPair {id: $qa_id})
                             MATCH (t:Table {name: $table_name, connection_id: $connection_id})
                             CREATE (qa)-[:USES_TABLES]->(t)
@@ -107,25 +189,78 @@ class EnhancedNeo4jService:
                 logger.error(f"Failed to store QA pair with context: {str(e)}")
                 raise
 
+    async def store_qa_pairs_batch(self, qa_pairs: List[QAPairWithContext]):
+        """
+        批量存储问答对（与 store_qa_pair_with_context 写入相同的节点和关系）
+
+        每类节点/关系一条 UNWIND 语句，整批在一个写事务中提交，失败时整批回滚。
+        不存在的表直接跳过（MATCH 不到即不建关系）。
+        """
+        if not qa_pairs:
+            return
+        if not self._initialized:
+            await self.initialize()
+
+        qa_rows, table_rows, pattern_rows, entity_rows = [], [], [], []
+        for qa_pair in qa_pairs:
+            qa_rows.append({
+                "id": qa_pair.id,
+                "question": qa_pair.question,
+                "sql": qa_pair.sql,
+                "connection_id": qa_pair.connection_id,
+                "difficulty_level": qa_pair.difficulty_level,
+                "query_type": qa_pair.query_type,
+                "success_rate": qa_pair.success_rate,
+                "verified": qa_pair.verified,
+                "created_at": qa_pair.created_at.isoformat(),
+            })
+            tables = qa_pair.used_tables or (extract_tables_from_sql(qa_pair.sql) if qa_pair.sql else [])
+            table_rows.extend(
+                {"qa_id": qa_pair.id, "table_name": table, "connection_id": qa_pair.connection_id}
+                for table in tables
+            )
+            pattern_rows.append({"qa_id": qa_pair.id, "pattern_id": _pattern_id(qa_pair)})
+            entity_rows.extend(
+                {"qa_id": qa_pair.id, "entity_id": _entity_id(entity), "entity_name": entity}
+                for entity in qa_pair.mentioned_entities
+            )
+
+        # 同一模式在批内出现多次时只 MERGE 一次，使用计数一次加上
+        pattern_counts = Counter((qa_pair.query_type, qa_pair.difficulty_level) for qa_pair in qa_pairs)
+        patterns = [
+            {"id": f"pattern_{query_type}_{level}", "name": query_type, "difficulty_level": level, "count": count}
+            for (query_type, level), count in pattern_counts.items()
+        ]
+
+        async with self.session() as session:
+            await session.execute_write(_run_batch_write, [
+                (_CREATE_QA_PAIRS, qa_rows),
+                (_LINK_QA_TABLES, table_rows),
+                (_UPSERT_PATTERNS, patterns),
+                (_LINK_QA_PATTERNS, pattern_rows),
+                (_LINK_QA_ENTITIES, entity_rows),
+            ])
+        logger.info(f"Stored {len(qa_pairs)} QA pairs with context in one batch")
+
     async def _create_or_update_pattern(self, session, qa_pair: QAPairWithContext):
         """创建或更新查询模式"""
-        pattern_id = f"pattern_{qa_pair.query_type}_{qa_pair.difficulty_level}"
+        pattern_id = _pattern_id(qa_pair)
 
         # 检查模式是否存在
-        result = session.run("""
+        result = await session.run("""
             MATCH (p:QueryPattern {id: $pattern_id})
             RETURN p
         """, pattern_id=pattern_id)
 
-        if result.single():
+        if await result.single():
             # 更新使用计数
-            session.run("""
+            await session.run("""
                 MATCH (p:QueryPattern {id: $pattern_id})
                 SET p.usage_count = p.usage_count + 1
             """, pattern_id=pattern_id)
         else:
             # 创建新模式
-            session.run("""
+            await session.run("""
                 CREATE (p:QueryPattern {
                     id: $pattern_id,
                     name: $query_type,
@@ -140,7 +275,7 @@ class EnhancedNeo4jService:
             )
 
         # 建立QAPair与Pattern的关系
-        session.run("""
+        await session.run("""
             MATCH (qa:QAPair {id: $qa_id})
             MATCH (p:QueryPattern {id: $pattern_id})
             CREATE (qa)-[:FOLLOWS_PATTERN]->(p)
@@ -149,16 +284,16 @@ class EnhancedNeo4jService:
     async def _create_entity_relationships(self, session, qa_pair: QAPairWithContext):
         """创建实体关系"""
         for entity in qa_pair.mentioned_entities:
-            entity_id = f"entity_{entity.lower().replace(' ', '_')}"
+            entity_id = _entity_id(entity)
 
             # 创建或获取Entity节点
-            session.run("""
+            await session.run("""
                 MERGE (e:Entity {id: $entity_id})
                 ON CREATE SET e.name = $entity_name, e.created_at = datetime()
             """, entity_id=entity_id, entity_name=entity)
 
             # 建立关系
-            session.run("""
+            await session.run("""
                 MATCH (qa:QAPair {id: $qa_id})
                 MATCH (e:Entity {id: $entity_id})
                 CREATE (qa)-[:MENTIONS_ENTITY]->(e)
@@ -172,8 +307,8 @@ class EnhancedNeo4jService:
 
         table_names = [table.get('name') for table in schema_context.get('tables', [])]
 
-        with self.driver.session() as session:
-            result = session.run("""
+        async with self.session() as session:
+            result = await session.run("""
                 MATCH (qa:QAPair)-[:USES_TABLES]->(t:Table)
                 WHERE t.name IN $table_names AND qa.connection_id = $connection_id
                 WITH qa, count(t) as table_overlap, collect(t.name) as used_tables
@@ -183,7 +318,7 @@ class EnhancedNeo4jService:
             """, table_names=table_names, connection_id=connection_id, top_k=top_k)
 
             results = []
-            for record in result:
+            async for record in result:
                 qa_data = record['qa']
                 table_overlap = record['table_overlap']
                 used_tables = record['used_tables']
@@ -206,8 +341,8 @@ class EnhancedNeo4jService:
         if not self._initialized:
             await self.initialize()
 
-        with self.driver.session() as session:
-            result = session.run("""
+        async with self.session() as session:
+            result = await session.run("""
                 MATCH (qa:QAPair)-[:FOLLOWS_PATTERN]->(p:QueryPattern)
                 WHERE p.name = $query_type
                 AND p.difficulty_level <= $difficulty_level + 1
@@ -219,7 +354,7 @@ class EnhancedNeo4jService:
                 connection_id=connection_id, top_k=top_k)
 
             results = []
-            for record in result:
+            async for record in result:
                 qa_data = record['qa']
                 usage_count = record['p.usage_count']
 
@@ -235,6 +370,67 @@ class EnhancedNeo4jService:
 
             return results
 
+    async def load_qa_pairs(self, connection_id: int) -> List[QAPairWithContext]:
+        """加载连接的全部问答对及其使用的表（用于构建进程内倒排索引）"""
+        if not self._initialized:
+            await self.initialize()
+
+        async with self.session() as session:
+            result = await session.run("""
+                MATCH (qa:QAPair)
+                WHERE qa.connection_id = $connection_id
+                OPTIONAL MATCH (qa)-[:USES_TABLES]->(t:Table)
+                RETURN qa, collect(t.name) as used_tables
+            """, connection_id=connection_id)
+
+            return [
+                self._build_qa_pair_from_record(record['qa'], record['used_tables'])
+                async for record in result
+            ]
+
+    async def get_qa_contexts(self, qa_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """批量读取问答对的图上下文（创建时间、使用的表、提及的实体），一次 UNWIND 查询"""
+        if not qa_ids:
+            return {}
+        if not self._initialized:
+            await self.initialize()
+
+        async with self.session() as session:
+            result = await session.run("""
+                UNWIND $ids AS qa_id
+                MATCH (qa:QAPair {id: qa_id})
+                OPTIONAL MATCH (qa)-[:USES_TABLES]->(t:Table)
+                WITH qa, collect(DISTINCT t.name) as used_tables
+                OPTIONAL MATCH (qa)-[:MENTIONS_ENTITY]->(e:Entity)
+                RETURN qa.id as id, toString(qa.created_at) as created_at,
+                       used_tables, collect(DISTINCT e.name) as mentioned_entities
+            """, ids=list(qa_ids))
+
+            return {
+                record["id"]: {
+                    "created_at": record["created_at"],
+                    "used_tables": record["used_tables"],
+                    "mentioned_entities": record["mentioned_entities"],
+                }
+                async for record in result
+            }
+
+    async def load_pattern_usage(self) -> Dict[Tuple[str, int], int]:
+        """加载全部查询模式的使用次数 {(query_type, 难度): usage_count}（用于进程内倒排索引的模式打分）"""
+        if not self._initialized:
+            await self.initialize()
+
+        async with self.session() as session:
+            result = await session.run("""
+                MATCH (p:QueryPattern)
+                RETURN p.name as name, p.difficulty_level as difficulty_level, p.usage_count as usage_count
+            """)
+
+            return {
+                (record['name'], record['difficulty_level']): record['usage_count'] or 0
+                async for record in result
+            }
+
     def _build_qa_pair_from_record(self, qa_data, used_tables=None) -> QAPairWithContext:
         """从Neo4j记录构建QAPair对象"""
         return QAPairWithContext(
@@ -254,6 +450,5 @@ class EnhancedNeo4jService:
         )
 
     def close(self):
-        """关闭连接"""
-        if self.driver:
-            self.driver.close()
+        """关闭资源（使用公共 Neo4j 服务，此方法保留以保持兼容）"""
+        pass
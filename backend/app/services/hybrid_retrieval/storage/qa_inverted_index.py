@@ -0,0 +1,267 @@
+"""
+QA 样本倒排索引（结构检索 / 模式检索）
+
+混合检索的结构检索（共享表）和模式检索（相同 query_type/难度）原本每次都执行 Cypher。
+这里为每个 connection_id 在进程内维护倒排索引，检索时不再访问 Neo4j：
+- 表名 → QA 位图，(query_type, difficulty_level) → QA 位图（Python int 作为位图，每个 QA 占一位）
+- 每个 QA 的表集合也是位图，重叠数 / Jaccard 由位运算 + popcount 计算
+- 首次检索时从 Neo4j 加载一次；本进程的 store/update/delete 增量维护；
+  每 QA_MEMORY_INDEX_TTL 秒重新加载，同步其他进程的写入
+
+打分与原 Cypher 查询一致（结构分 = 重叠表数 / 查询表数，模式分 = min(1, QueryPattern.usage_count / 100)），
+结构检索在重叠数相同时按 Jaccard 排序。模式使用次数与 QueryPattern 节点一样是全局计数，
+加载时从 Neo4j 读取，本进程写入 QA 时加一。
+
+使用方式：
+    from .qa_inverted_index import qa_inverted_index
+
+    results = await qa_inverted_index.structural_search(connection_id, neo4j_service, table_names, top_k=20)
+    if results is None:
+        results = await neo4j_service.structural_search(schema_context, connection_id, top_k=20)
+"""
+
+import asyncio
+import dataclasses
+import logging
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+from ..models import QAPairWithContext, RetrievalResult
+from ..utils import extract_tables_from_sql
+
+logger = logging.getLogger(__name__)
+
+# update_qa_pair 可修改的字段
+_UPDATABLE_FIELDS = ("question", "sql", "difficulty_level", "query_type", "success_rate", "verified")
+
+
+def _iter_bits(bits: int) -> Iterator[int]:
+    """依次返回位图中为 1 的位"""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class ConnectionInvertedIndex:
+    """单个连接的表 / 模式倒排索引"""
+
+    def __init__(self, qa_pairs: Optional[List[QAPairWithContext]] = None,
+                 pattern_usage: Optional[Dict[Tuple[str, int], int]] = None):
+        self._qa: Dict[int, QAPairWithContext] = {}          # 位 -> QA
+        self._slots: Dict[str, int] = {}                     # qa_id -> 位
+        self._free: List[int] = []
+        self._table_ids: Dict[str, int] = {}                 # 表名(小写) -> 表编号
+        self._free_table_ids: List[int] = []
+        self._table_qas: Dict[str, int] = {}                 # 表名(小写) -> QA 位图
+        self._qa_tables: Dict[int, int] = {}                 # 位 -> 表位图
+        self._pattern_qas: Dict[Tuple[str, int], int] = {}   # (query_type, 难度) -> QA 位图
+        self._pattern_usage: Dict[Tuple[str, int], int] = dict(pattern_usage or {})  # (query_type, 难度) -> 使用次数
+        for qa_pair in qa_pairs or []:
+            self.add(qa_pair)
+
+    def __len__(self) -> int:
+        return len(self._qa)
+
+    # ===== 维护 =====
+
+    def add(self, qa_pair: QAPairWithContext) -> None:
+        """添加（或替换）QA"""
+        self.remove(qa_pair.id)
+        slot = self._free.pop() if self._free else len(self._slots)
+        bit = 1 << slot
+        tables = {t.lower() for t in (qa_pair.used_tables or extract_tables_from_sql(qa_pair.sql or "")) if t}
+        table_bits = 0
+        for table in tables:
+            table_id = self._table_ids.get(table)
+            if table_id is None:
+                table_id = self._free_table_ids.pop() if self._free_table_ids else len(self._table_ids)
+                self._table_ids[table] = table_id
+            table_bits |= 1 << table_id
+            self._table_qas[table] = self._table_qas.get(table, 0) | bit
+        pattern = (qa_pair.query_type, qa_pair.difficulty_level)
+        self._pattern_qas[pattern] = self._pattern_qas.get(pattern, 0) | bit
+
+        self._qa[slot] = dataclasses.replace(qa_pair, used_tables=sorted(tables), embedding_vector=None)
+        self._slots[qa_pair.id] = slot
+        self._qa_tables[slot] = table_bits
+
+    def record_pattern_use(self, query_type: str, difficulty_level: int) -> None:
+        """写入新 QA 时模式使用次数加一（与 Neo4j 中 QueryPattern.usage_count 的维护方式一致）"""
+        pattern = (query_type, difficulty_level)
+        self._pattern_usage[pattern] = self._pattern_usage.get(pattern, 0) + 1
+
+    def update(self, qa_id: str, fields: Dict[str, Any]) -> bool:
+        """更新字段（表关系不变），QA 不在索引中时返回 False"""
+        slot = self._slots.get(qa_id)
+        if slot is None:
+            return False
+        changes = {k: v for k, v in fields.items() if k in _UPDATABLE_FIELDS}
+        self.add(dataclasses.replace(self._qa[slot], **changes))
+        return True
+
+    def remove(self, qa_id: str) -> None:
+        slot = self._slots.pop(qa_id, None)
+        if slot is None:
+            return
+        mask = ~(1 << slot)
+        qa_pair = self._qa.pop(slot)
+        for table in qa_pair.used_tables:
+            self._table_qas[table] &= mask
+            if not self._table_qas[table]:
+                # 没有 QA 使用的表释放编号，避免表名只增不减
+                del self._table_qas[table]
+                self._free_table_ids.append(self._table_ids.pop(table))
+        pattern = (qa_pair.query_type, qa_pair.difficulty_level)
+        self._pattern_qas[pattern] &= mask
+        if not self._pattern_qas[pattern]:
+            del self._pattern_qas[pattern]
+        del self._qa_tables[slot]
+        self._free.append(slot)
+
+    # ===== 检索 =====
+
+    def structural_search(self, table_names: List[str], top_k: int = 20) -> List[RetrievalResult]:
+        """与给定表重叠最多的 QA（重叠数、Jaccard、成功率依次降序）"""
+        names = {t.lower() for t in table_names if t}
+        query_bits = 0
+        candidates = 0
+        for name in names:
+            if name in self._table_qas:
+                query_bits |= 1 << self._table_ids[name]
+                candidates |= self._table_qas[name]
+
+        scored = []
+        for slot in _iter_bits(candidates):
+            table_bits = self._qa_tables[slot]
+            overlap = (table_bits & query_bits).bit_count()
+            jaccard = overlap / (table_bits.bit_count() + len(names) - overlap)
+            scored.append((overlap, jaccard, self._qa[slot]))
+        scored.sort(key=lambda item: (item[0], item[1], item[2].success_rate), reverse=True)
+
+        return [
+            RetrievalResult(
+                qa_pair=qa_pair,
+                structural_score=overlap / max(len(names), 1),
+                explanation=f"使用了{overlap}个相同的表"
+            )
+            for overlap, _, qa_pair in scored[:top_k]
+        ]
+
+    def pattern_search(self, query_type: str, difficulty_level: int, top_k: int = 20) -> List[RetrievalResult]:
+        """相同查询类型、难度不超过 difficulty_level + 1 的 QA（成功率、模式使用次数依次降序）"""
+        scored = []
+        for (pattern_type, pattern_level), bits in self._pattern_qas.items():
+            if pattern_type != query_type or pattern_level > difficulty_level + 1:
+                continue
+            usage_count = self._pattern_usage.get((pattern_type, pattern_level), 0)
+            scored.extend((self._qa[slot], usage_count) for slot in _iter_bits(bits))
+        scored.sort(key=lambda item: (item[0].success_rate, item[1]), reverse=True)
+
+        return [
+            RetrievalResult(
+                qa_pair=qa_pair,
+                pattern_score=min(1.0, usage_count / 100.0),
+                explanation=f"匹配查询模式，使用次数: {usage_count}"
+            )
+            for qa_pair, usage_count in scored[:top_k]
+        ]
+
+
+class QAInvertedIndex:
+    """
+    按 connection_id 管理 QA 倒排索引
+
+    所有方法在事件循环中调用；加载失败时检索返回 None，调用方回退到 Neo4j 查询。
+    """
+
+    def __init__(self, ttl: Optional[float] = None, enabled: Optional[bool] = None):
+        self.enabled = settings.QA_INVERTED_INDEX_ENABLED if enabled is None else enabled
+        self._ttl = settings.QA_MEMORY_INDEX_TTL if ttl is None else ttl
+        # connection_id -> (索引, 加载时间)
+        self._entries: Dict[int, Tuple[ConnectionInvertedIndex, float]] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._stats = {"searches": 0, "loads": 0, "load_failures": 0}
+
+    # ===== 检索 =====
+
+    async def structural_search(self, connection_id: int, neo4j_service: Any,
+                                table_names: List[str], top_k: int = 20) -> Optional[List[RetrievalResult]]:
+        index = await self._get(connection_id, neo4j_service)
+        if index is None:
+            return None
+        self._stats["searches"] += 1
+        return index.structural_search(table_names, top_k)
+
+    async def pattern_search(self, connection_id: int, neo4j_service: Any, query_type: str,
+                             difficulty_level: int, top_k: int = 20) -> Optional[List[RetrievalResult]]:
+        index = await self._get(connection_id, neo4j_service)
+        if index is None:
+            return None
+        self._stats["searches"] += 1
+        return index.pattern_search(query_type, difficulty_level, top_k)
+
+    # ===== 增量维护 =====
+
+    def add(self, qa_pair: QAPairWithContext) -> None:
+        entry = self._entries.get(qa_pair.connection_id)
+        if entry is not None:
+            entry[0].add(qa_pair)
+        # QueryPattern 不区分连接，所有已加载的索引都要加一
+        for index, _ in self._entries.values():
+            index.record_pattern_use(qa_pair.query_type, qa_pair.difficulty_level)
+
+    def update(self, connection_id: int, qa_id: str, update_data: Dict[str, Any]) -> None:
+        entry = self._entries.get(connection_id) if connection_id else None
+        if entry is not None and not entry[0].update(qa_id, update_data):
+            self.invalidate(connection_id)
+
+    def remove(self, connection_id: int, qa_id: str) -> None:
+        entry = self._entries.get(connection_id) if connection_id else None
+        if entry is not None:
+            entry[0].remove(qa_id)
+
+    def invalidate(self, connection_id: Optional[int] = None) -> None:
+        """丢弃索引（connection_id 为空时丢弃全部），下次检索时重新加载"""
+        if connection_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(connection_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["connections"] = len(self._entries)
+        stats["qa_pairs"] = sum(len(entry[0]) for entry in self._entries.values())
+        return stats
+
+    # ===== 内部方法 =====
+
+    async def _get(self, connection_id: int, neo4j_service: Any) -> Optional[ConnectionInvertedIndex]:
+        if not self.enabled or not connection_id:
+            return None
+        entry = self._entries.get(connection_id)
+        if entry is not None and time.monotonic() - entry[1] < self._ttl:
+            return entry[0]
+
+        lock = self._locks.setdefault(connection_id, asyncio.Lock())
+        async with lock:
+            entry = self._entries.get(connection_id)
+            if entry is not None and time.monotonic() - entry[1] < self._ttl:
+                return entry[0]
+            self._stats["loads"] += 1
+            try:
+                qa_pairs = await neo4j_service.load_qa_pairs(connection_id)
+                pattern_usage = await neo4j_service.load_pattern_usage()
+            except Exception as e:
+                self._stats["load_failures"] += 1
+                logger.warning(f"Failed to load QA inverted index for connection {connection_id}: {e}")
+                return None
+            index = ConnectionInvertedIndex(qa_pairs, pattern_usage)
+            self._entries[connection_id] = (index, time.monotonic())
+            logger.info(f"Loaded QA inverted index for connection {connection_id}: {len(index)} pairs")
+            return index
+
+
+# 创建全局实例
+qa_inverted_index = QAInvertedIndex()
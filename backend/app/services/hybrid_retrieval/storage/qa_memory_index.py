@@ -0,0 +1,256 @@
+"""
+QA 样本内存索引
+
+大多数连接只有几十到几千条 QA 样本，每次语义检索都访问 Milvus 的网络往返远大于计算本身。
+这里为每个 connection_id 在进程内维护一个 float32 矩阵（行向量已归一化）：
+- 首次检索时从 Milvus 加载一次，之后 top-k 检索只需一次矩阵乘法（余弦相似度，与 Milvus COSINE 一致）
+- 样本数超过 QA_MEMORY_INDEX_MAX_SIZE 的连接不加载，仍由 Milvus 检索
+- 本进程的 store/update/delete 直接同步到索引；每 QA_MEMORY_INDEX_TTL 秒重新加载，同步其他进程的写入
+
+使用方式：
+    from .qa_memory_index import qa_memory_index
+
+    results = await qa_memory_index.search(connection_id, milvus_service, query_vector, top_k=5)
+    if results is None:
+        results = await milvus_service.search_similar(query_vector, top_k=5, connection_id=connection_id)
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from ..models import QAPairWithContext
+
+logger = logging.getLogger(__name__)
+
+# 与 MilvusService.search_similar 返回的字段一致
+_META_FIELDS = ["id", "question", "sql", "connection_id",
+                "difficulty_level", "query_type", "success_rate", "verified"]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class ConnectionQAIndex:
+    """单个连接的 QA 样本矩阵"""
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        self.records: List[Dict[str, Any]] = []
+        vectors = []
+        for record in records:
+            if record.get("vector") is None or len(record["vector"]) == 0:
+                continue
+            self.records.append({k: record.get(k) for k in _META_FIELDS})
+            vectors.append(record["vector"])
+        self.matrix = _normalize(np.asarray(vectors, dtype=np.float32)) if vectors else None
+        self._rows = {record["id"]: i for i, record in enumerate(self.records)}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, qa_id: str) -> bool:
+        return qa_id in self._rows
+
+    def search(self, query_vector: List[float], top_k: int) -> List[Dict[str, Any]]:
+        """返回余弦相似度最高的 top_k 条，格式与 MilvusService.search_similar 相同"""
+        if self.matrix is None or top_k <= 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        if query.shape != (self.matrix.shape[1],):
+            raise ValueError(f"Query vector dimension {query.shape} does not match index {self.matrix.shape[1]}")
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        scores = self.matrix @ (query / norm)
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{**self.records[i], "similarity_score": float(scores[i])} for i in top]
+
+    def upsert(self, record: Dict[str, Any], vector: List[float]) -> None:
+        row = _normalize(np.asarray(vector, dtype=np.float32).reshape(1, -1))
+        if self.matrix is not None and row.shape[1] != self.matrix.shape[1]:
+            raise ValueError(f"Vector dimension {row.shape[1]} does not match index {self.matrix.shape[1]}")
+        meta = {k: record.get(k) for k in _META_FIELDS}
+        i = self._rows.get(meta["id"])
+        if i is not None:
+            self.records[i] = meta
+            self.matrix[i] = row[0]
+            return
+        self._rows[meta["id"]] = len(self.records)
+        self.records.append(meta)
+        self.matrix = row if self.matrix is None else np.vstack([self.matrix, row])
+
+    def update(self, qa_id: str, fields: Dict[str, Any], vector: Optional[List[float]] = None) -> bool:
+        """更新字段（和向量），样本不在索引中时返回 False"""
+        i = self._rows.get(qa_id)
+        if i is None:
+            return False
+        self.records[i] = {**self.records[i], **{k: v for k, v in fields.items() if k in _META_FIELDS}}
+        if vector is not None:
+            self.upsert(self.records[i], vector)
+        return True
+
+    def remove(self, qa_id: str) -> None:
+        i = self._rows.pop(qa_id, None)
+        if i is None:
+            return
+        del self.records[i]
+        self.matrix = np.delete(self.matrix, i, axis=0) if self.records else None
+        for record in self.records[i:]:
+            self._rows[record["id"]] -= 1
+
+
+class QAMemoryIndex:
+    """
+    按 connection_id 管理 QA 样本内存索引
+
+    所有方法在事件循环中调用；索引为 None 表示该连接样本过多（或加载失败），由 Milvus 检索。
+    """
+
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None,
+                 enabled: Optional[bool] = None):
+        self.enabled = settings.QA_MEMORY_INDEX_ENABLED if enabled is None else enabled
+        self._max_size = max_size or settings.QA_MEMORY_INDEX_MAX_SIZE
+        self._ttl = settings.QA_MEMORY_INDEX_TTL if ttl is None else ttl
+        # connection_id -> (索引或 None, 加载时间)
+        self._entries: Dict[int, Tuple[Optional[ConnectionQAIndex], float]] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._stats = {"memory_searches": 0, "milvus_fallbacks": 0, "loads": 0}
+
+    # ===== 检索 =====
+
+    async def search(self, connection_id: int, milvus_service: Any,
+                     query_vector: List[float], top_k: int = 5) -> Optional[List[Dict[str, Any]]]:
+        """内存检索；返回 None 时调用方应改用 Milvus"""
+        if not self.enabled or not connection_id:
+            return None
+        index = await self._get(connection_id, milvus_service)
+        if index is None:
+            self._stats["milvus_fallbacks"] += 1
+            return None
+        try:
+            results = index.search(query_vector, top_k)
+        except ValueError as e:
+            # 向量维度变化（如切换了 Embedding 模型），丢弃索引
+            logger.warning(f"QA memory index for connection {connection_id} discarded: {e}")
+            self.invalidate(connection_id)
+            return None
+        self._stats["memory_searches"] += 1
+        return results
+
+    def count(self, connection_id: int) -> Optional[int]:
+        """已加载且未过期时返回样本数，否则返回 None"""
+        index = self._fresh(connection_id)
+        return len(index) if index is not None else None
+
+    # ===== 同步写入 =====
+
+    def add(self, qa_pair: QAPairWithContext) -> None:
+        index = self._loaded(qa_pair.connection_id)
+        if index is None or not qa_pair.embedding_vector:
+            return
+        if len(index) >= self._max_size and qa_pair.id not in index:
+            # 超过上限后改由 Milvus 检索
+            self._entries[qa_pair.connection_id] = (None, time.monotonic())
+            return
+        record = {field: getattr(qa_pair, field) for field in _META_FIELDS}
+        try:
+            index.upsert(record, qa_pair.embedding_vector)
+        except ValueError as e:
+            logger.warning(f"QA memory index for connection {qa_pair.connection_id} discarded: {e}")
+            self.invalidate(qa_pair.connection_id)
+
+    def update(self, connection_id: int, qa_id: str, update_data: Dict[str, Any],
+               new_vector: Optional[List[float]] = None) -> None:
+        index = self._loaded(connection_id)
+        if index is None:
+            return
+        try:
+            found = index.update(qa_id, update_data, new_vector)
+        except ValueError as e:
+            logger.warning(f"QA memory index for connection {connection_id} discarded: {e}")
+            found = False
+        if not found:
+            self.invalidate(connection_id)
+
+    def remove(self, connection_id: int, qa_id: str) -> None:
+        index = self._loaded(connection_id)
+        if index is not None:
+            index.remove(qa_id)
+
+    def invalidate(self, connection_id: Optional[int] = None) -> None:
+        """丢弃索引（connection_id 为空时丢弃全部），下次检索时重新加载"""
+        if connection_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(connection_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        indexes = [entry[0] for entry in self._entries.values()]
+        stats["connections"] = sum(1 for index in indexes if index is not None)
+        stats["milvus_only_connections"] = sum(1 for index in indexes if index is None)
+        stats["memory_bytes"] = sum(
+            index.matrix.nbytes for index in indexes if index is not None and index.matrix is not None
+        )
+        return stats
+
+    # ===== 内部方法 =====
+
+    def _loaded(self, connection_id: Optional[int]) -> Optional[ConnectionQAIndex]:
+        entry = self._entries.get(connection_id) if connection_id else None
+        return entry[0] if entry else None
+
+    def _fresh(self, connection_id: int) -> Optional[ConnectionQAIndex]:
+        entry = self._entries.get(connection_id)
+        if entry is None or time.monotonic() - entry[1] >= self._ttl:
+            return None
+        return entry[0]
+
+    async def _get(self, connection_id: int, milvus_service: Any) -> Optional[ConnectionQAIndex]:
+        entry = self._entries.get(connection_id)
+        if entry is not None and time.monotonic() - entry[1] < self._ttl:
+            return entry[0]
+
+        lock = self._locks.setdefault(connection_id, asyncio.Lock())
+        async with lock:
+            entry = self._entries.get(connection_id)
+            if entry is not None and time.monotonic() - entry[1] < self._ttl:
+                return entry[0]
+            index = await self._load(connection_id, milvus_service)
+            self._entries[connection_id] = (index, time.monotonic())
+            return index
+
+    async def _load(self, connection_id: int, milvus_service: Any) -> Optional[ConnectionQAIndex]:
+        self._stats["loads"] += 1
+        try:
+            records = await milvus_service.run(
+                "query",
+                collection_name=milvus_service.collection_name,
+                filter=f"connection_id == {connection_id}",
+                output_fields=_META_FIELDS + ["vector"],
+                limit=self._max_size + 1
+            )
+        except Exception as e:
+            logger.warning(f"Failed to load QA memory index for connection {connection_id}: {e}")
+            return None
+        if len(records) > self._max_size:
+            logger.info(
+                f"Connection {connection_id} has more than {self._max_size} QA pairs, using Milvus search"
+            )
+            return None
+        index = ConnectionQAIndex(records)
+        logger.info(f"Loaded QA memory index for connection {connection_id}: {len(index)} pairs")
+        return index
+
+
+# 创建全局实例
+qa_memory_index = QAMemoryIndex()
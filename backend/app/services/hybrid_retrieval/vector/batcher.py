@@ -0,0 +1,108 @@
+"""
+向量请求微批处理 (Embedding Micro-Batcher)
+
+将短时间内（VECTOR_MICRO_BATCH_WAIT_MS）到达的单条向量化请求合并为一次批量调用：
+- 单批最多 VECTOR_BATCH_SIZE 条，攒满立即发送
+- 相同文本去重：同一批次或正在请求中的相同文本共享一次调用结果
+- 按事件循环隔离，可在多个事件循环中使用
+
+使用方式：
+    batcher = EmbeddingBatcher(service._embed_batch_with_retry, max_batch_size=32, max_wait_ms=5)
+    embedding = await batcher.submit(text)
+"""
+import asyncio
+import logging
+import weakref
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+EmbedBatchFunc = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+class _LoopState:
+    """单个事件循环内的批处理状态"""
+
+    def __init__(self):
+        self.pending: Dict[str, asyncio.Future] = {}
+        self.in_flight: Dict[str, asyncio.Future] = {}
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+
+
+class EmbeddingBatcher:
+    """
+    向量请求微批处理器
+
+    调用方被取消不会影响同批次的其他请求。
+    """
+
+    def __init__(self, embed_batch: EmbedBatchFunc, max_batch_size: int, max_wait_ms: float):
+        self._embed_batch = embed_batch
+        self._max_batch_size = max(max_batch_size, 1)
+        self._max_wait = max(max_wait_ms, 0) / 1000
+        self._states: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._stats = {"requests": 0, "deduplicated": 0, "batches": 0, "texts": 0}
+
+    async def submit(self, text: str) -> List[float]:
+        """提交一条文本，返回其向量"""
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None:
+            state = self._states[loop] = _LoopState()
+
+        self._stats["requests"] += 1
+        future = state.in_flight.get(text) or state.pending.get(text)
+        if future is not None:
+            self._stats["deduplicated"] += 1
+        else:
+            future = loop.create_future()
+            # 所有调用方都已取消时，避免 "exception was never retrieved" 警告
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            state.pending[text] = future
+            if len(state.pending) >= self._max_batch_size:
+                self._flush(loop, state)
+            elif state.flush_handle is None:
+                state.flush_handle = loop.call_later(self._max_wait, self._flush, loop, state)
+        # shield：某个调用方取消时不取消共享的 future
+        return await asyncio.shield(future)
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self._stats)
+
+    def _flush(self, loop: asyncio.AbstractEventLoop, state: _LoopState) -> None:
+        if state.flush_handle is not None:
+            state.flush_handle.cancel()
+            state.flush_handle = None
+        if not state.pending:
+            return
+        batch, state.pending = state.pending, {}
+        state.in_flight.update(batch)
+        self._stats["batches"] += 1
+        self._stats["texts"] += len(batch)
+        loop.create_task(self._run(state, batch))
+
+    async def _run(self, state: _LoopState, batch: Dict[str, asyncio.Future]) -> None:
+        texts = list(batch)
+        try:
+            embeddings = await self._embed_batch(texts)
+            if len(embeddings) != len(texts):
+                raise ValueError(f"Embedding batch returned {len(embeddings)} vectors for {len(texts)} texts")
+        except BaseException as e:
+            if len(texts) > 1:
+                logger.warning(f"Embedding micro-batch of {len(texts)} texts failed: {e}")
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return
+        finally:
+            for text in texts:
+                state.in_flight.pop(text, None)
+
+        for text, embedding in zip(texts, embeddings):
+            future = batch[text]
+            if not future.done():
+                future.set_result(embedding)
@@ -0,0 +1,78 @@
+"""
+向量缓存 (Embedding Cache)
+
+VectorService 共享的两级向量缓存：
+- 内存层：LRU，最多 VECTOR_CACHE_MAX_ENTRIES 条，向量以 float32 数组存储
+- 磁盘层（可选）：SQLite 文件 VECTOR_CACHE_DB_PATH，进程重启后仍可命中，多进程共享
+- 缓存键：sha256(provider, model, 规范化文本)，与进程无关（不使用 Python 的随机化 hash）
+- 过期：VECTOR_CACHE_TTL 秒
+
+存储逻辑见 app.core.two_tier_cache，这里只负责缓存键和向量的序列化。
+
+使用方式：
+    from app.services.hybrid_retrieval.vector.embedding_cache import embedding_cache
+
+    key = embedding_cache.make_key(provider, model, text)
+    vector = embedding_cache.get(key)       # np.ndarray(float32) 或 None
+    embedding_cache.put(key, embedding)
+"""
+import hashlib
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.two_tier_cache import TwoTierCache
+
+
+class EmbeddingCache(TwoTierCache):
+    """两级向量缓存，向量以 float32 数组存储"""
+
+    table_name = "embedding_cache"
+    value_column = "vector"
+    value_type = "BLOB"
+    label = "Embedding"
+    disk_prune_interval = 1000
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        db_path: Optional[str] = None,
+        disk_max_entries: Optional[int] = None
+    ):
+        super().__init__(
+            max_entries=max_entries or settings.VECTOR_CACHE_MAX_ENTRIES,
+            ttl=settings.VECTOR_CACHE_TTL if ttl is None else ttl,
+            db_path=settings.VECTOR_CACHE_DB_PATH if db_path is None else db_path,
+            disk_max_entries=disk_max_entries or settings.VECTOR_CACHE_DISK_MAX_ENTRIES
+        )
+
+    @staticmethod
+    def make_key(provider: str, model: str, text: str) -> str:
+        """稳定的缓存键（text 应为已规范化的文本）"""
+        raw = f"{provider or ''}\x00{model or ''}\x00{text}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def put(self, key: str, embedding: Sequence[float]) -> np.ndarray:
+        """写入向量（转换为 float32），返回缓存中的数组"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector.setflags(write=False)
+        super().put(key, vector)
+        return vector
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        with self._lock:
+            stats["memory_bytes"] = sum(v.nbytes for v, _ in self._memory.values())
+        return stats
+
+    def _encode(self, vector: np.ndarray) -> bytes:
+        return vector.tobytes()
+
+    def _decode(self, raw: bytes) -> np.ndarray:
+        return np.frombuffer(raw, dtype=np.float32)
+
+
+# 创建全局实例
+embedding_cache = EmbeddingCache()
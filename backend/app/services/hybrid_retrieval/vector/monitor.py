@@ -30,18 +30,13 @@ class VectorServiceMonitor:
         start_time = time.time()
         self.metrics["total_requests"] += 1
 
-        # 检查缓存
-        if self.service._cache is not None:
-            cached_result = self.service._get_from_cache(question)
-            if cached_result is not None:
-                self.metrics["cache_hits"] += 1
-                return cached_result
-            else:
-                self.metrics["cache_misses"] += 1
-
         try:
-            result = await self.service.embed_question(question)
+            result, cache_hit = await self.service.embed_question_with_cache_status(question)
             self.metrics["successful_requests"] += 1
+            if cache_hit is True:
+                self.metrics["cache_hits"] += 1
+            elif cache_hit is False:
+                self.metrics["cache_misses"] += 1
             return result
 
         except Exception as e:
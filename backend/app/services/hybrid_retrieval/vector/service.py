@@ -8,7 +8,7 @@ import re
 import time
 import asyncio
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 
 from openai import AsyncOpenAI
 
@@ -18,6 +18,8 @@ from app.core.model_registry import (
     is_openai_compatible,
     get_provider_config,
 )
+from .batcher import EmbeddingBatcher
+from .embedding_cache import EmbeddingCache, embedding_cache
 
 logger = logging.getLogger(__name__)
 
@@ -65,14 +67,24 @@ class VectorService:
         self.client = None  # For AsyncOpenAI
         self.dimension = None
         self._initialized = False
-        self._cache = {} if settings.VECTOR_CACHE_ENABLED else None
-        self._cache_timestamps = {} if settings.VECTOR_CACHE_ENABLED else None
+        # 进程内共享的两级向量缓存（键包含 provider/model，多个服务实例可共用）
+        self._cache: Optional[EmbeddingCache] = embedding_cache if settings.VECTOR_CACHE_ENABLED else None
 
         # 性能配置
         self.batch_size = settings.VECTOR_BATCH_SIZE
         self.max_retries = settings.VECTOR_MAX_RETRIES
         self.retry_delay = settings.VECTOR_RETRY_DELAY
 
+        # 并发的单条请求合并为批量调用
+        self._batcher: Optional[EmbeddingBatcher] = (
+            EmbeddingBatcher(
+                self._embed_batch_with_retry,
+                max_batch_size=self.batch_size,
+                max_wait_ms=settings.VECTOR_MICRO_BATCH_WAIT_MS
+            )
+            if settings.VECTOR_MICRO_BATCH_ENABLED else None
+        )
+
     def _map_provider_to_service_type(self, provider: str) -> str:
         """
         将provider映射到service_type（用于兼容旧代码）
@@ -244,25 +256,34 @@ class VectorService:
 
     async def embed_question(self, question: str) -> List[float]:
         """将问题转换为向量"""
+        embedding, _ = await self.embed_question_with_cache_status(question)
+        return embedding
+
+    async def embed_question_with_cache_status(self, question: str) -> Tuple[List[float], Optional[bool]]:
+        """将问题转换为向量，同时返回本次是否命中缓存（未启用缓存时为 None）"""
         if not self._initialized:
             await self.initialize()
 
         # 检查缓存
         if self._cache is not None:
-            cached_result = self._get_from_cache(question)
+            cached_result = await self._get_from_cache(question)
             if cached_result is not None:
-                return cached_result
+                return cached_result, True
 
         processed_question = self._preprocess_question(question)
 
         try:
-            embedding = await self._embed_with_retry(processed_question)
+            if self._batcher is not None:
+                embedding = await self._batcher.submit(processed_question)
+            else:
+                embedding = await self._embed_with_retry(processed_question)
 
             # 存储到缓存
             if self._cache is not None:
-                self._store_to_cache(question, embedding)
+                await self._store_to_cache(question, embedding)
+                return embedding, False
 
-            return embedding
+            return embedding, None
 
         except Exception as e:
             logger.error(f"Failed to embed question: {str(e)}")
@@ -282,7 +303,7 @@ class VectorService:
 
         if self._cache is not None:
             for i, question in enumerate(questions):
-                cached_result = self._get_from_cache(question)
+                cached_result = await self._get_from_cache(question)
                 if cached_result is not None:
                     cached_results[i] = cached_result
                 else:
@@ -303,7 +324,7 @@ class VectorService:
                 for i, (original_idx, original_question) in enumerate(uncached_questions):
                     embedding = embeddings[i]
                     if self._cache is not None:
-                        self._store_to_cache(original_question, embedding)
+                        await self._store_to_cache(original_question, embedding)
                     cached_results[original_idx] = embedding
 
             except Exception as e:
@@ -395,41 +416,29 @@ class VectorService:
 
         return processed
 
-    def _get_from_cache(self, question: str) -> Optional[List[float]]:
-        """从缓存获取结果"""
+    async def _get_from_cache(self, question: str) -> Optional[List[float]]:
+        """从缓存获取结果（磁盘层在线程池中读取）"""
         if self._cache is None:
             return None
 
-        cache_key = self._get_cache_key(question)
+        vector = await self._cache.aget(self._get_cache_key(question))
+        return vector.tolist() if vector is not None else None
 
-        # 检查是否过期
-        if cache_key in self._cache_timestamps:
-            if time.time() - self._cache_timestamps[cache_key] > settings.VECTOR_CACHE_TTL:
-                # 清理过期缓存
-                del self._cache[cache_key]
-                del self._cache_timestamps[cache_key]
-                return None
-
-        return self._cache.get(cache_key)
-
-    def _store_to_cache(self, question: str, embedding: List[float]):
-        """存储到缓存"""
+    async def _store_to_cache(self, question: str, embedding: List[float]):
+        """存储到缓存（磁盘层在线程池中写入）"""
         if self._cache is None:
             return
 
-        cache_key = self._get_cache_key(question)
-        self._cache[cache_key] = embedding
-        self._cache_timestamps[cache_key] = time.time()
+        await self._cache.aput(self._get_cache_key(question), embedding)
 
     def _get_cache_key(self, question: str) -> str:
-        """生成缓存键"""
-        return f"{self.service_type}:{self.model_name}:{hash(question)}"
+        """生成缓存键（provider + model + 规范化文本的稳定摘要，跨进程一致）"""
+        return EmbeddingCache.make_key(self.provider, self.model_name, self._preprocess_question(question))
 
     def clear_cache(self):
         """清理缓存"""
         if self._cache is not None:
             self._cache.clear()
-            self._cache_timestamps.clear()
             logger.info("Vector service cache cleared")
 
     def get_cache_stats(self) -> Dict[str, Any]:
@@ -437,17 +446,16 @@ class VectorService:
         if self._cache is None:
             return {"cache_enabled": False}
 
-        current_time = time.time()
-        valid_entries = sum(
-            1 for timestamp in self._cache_timestamps.values()
-            if current_time - timestamp <= settings.VECTOR_CACHE_TTL
-        )
-
+        stats = self._cache.get_stats()
         return {
             "cache_enabled": True,
-            "total_entries": len(self._cache),
-            "valid_entries": valid_entries,
-            "cache_hit_rate": getattr(self, '_cache_hits', 0) / max(getattr(self, '_cache_requests', 1), 1)
+            "total_entries": stats["memory_entries"],
+            "memory_bytes": stats["memory_bytes"],
+            "disk_enabled": stats["disk_enabled"],
+            "memory_hits": stats["memory_hits"],
+            "disk_hits": stats["disk_hits"],
+            "misses": stats["misses"],
+            "cache_hit_rate": round(stats["hit_rate"], 4)
         }
 
     async def health_check(self) -> Dict[str, Any]:
@@ -471,7 +479,8 @@ class VectorService:
                 "model_name": self.model_name,
                 "dimension": self.dimension,
                 "response_time_ms": round(response_time * 1000, 2),
-                "cache_stats": self.get_cache_stats()
+                "cache_stats": self.get_cache_stats(),
+                "micro_batch_stats": self._batcher.get_stats() if self._batcher else None
             }
 
         except Exception as e:
@@ -14,9 +14,7 @@ from datetime import datetime
 import logging
 import uuid
 
-from neo4j import GraphDatabase
-
-from app.core.config import settings
+from app.services.neo4j_service import neo4j_service
 from app.schemas.join_rule import (
     JoinRuleCreate, JoinRuleUpdate, JoinRule, JoinRuleContext
 )
@@ -28,27 +26,16 @@ class JoinRuleService:
     """JOIN规则服务"""
     
     def __init__(self):
-        self.driver = None
         self._initialized = False
     
-    def _get_driver(self):
-        """获取 Neo4j 驱动"""
-        if not self.driver:
-            self.driver = GraphDatabase.driver(
-                settings.NEO4J_URI,
-                auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
-            )
-        return self.driver
-    
     async def initialize(self):
         """初始化服务"""
         if self._initialized:
             return
         
         try:
-            driver = self._get_driver()
-            with driver.session() as session:
-                session.run("""
+            async with neo4j_service.async_session() as session:
+                await session.run("""
                     CREATE CONSTRAINT join_rule_id IF NOT EXISTS
                     FOR (j:JoinRule) REQUIRE j.id IS UNIQUE
                 """)
@@ -67,9 +54,8 @@ class JoinRuleService:
         rule_id = f"join_{uuid.uuid4().hex[:12]}"
         now = datetime.now()
         
-        driver = self._get_driver()
-        with driver.session() as session:
-            session.run("""
+        async with neo4j_service.async_session() as session:
+            await session.run("""
                 CREATE (j:JoinRule {
                     id: $id,
                     name: $name,
@@ -107,7 +93,7 @@ class JoinRuleService:
             )
             
             # 创建与表的关系
-            session.run("""
+            await session.run("""
                 MATCH (j:JoinRule {id: $rule_id})
                 OPTIONAL MATCH (lt:Table {name: $left_table, connection_id: $connection_id})
                 OPTIONAL MATCH (rt:Table {name: $right_table, connection_id: $connection_id})
@@ -149,14 +135,13 @@ class JoinRuleService:
         """获取单个规则"""
         await self.initialize()
         
-        driver = self._get_driver()
-        with driver.session() as session:
-            result = session.run("""
+        async with neo4j_service.async_session() as session:
+            result = await session.run("""
                 MATCH (j:JoinRule {id: $rule_id})
                 RETURN j
             """, rule_id=rule_id)
             
-            record = result.single()
+            record = await result.single()
             if not record:
                 return None
             
@@ -170,8 +155,7 @@ class JoinRuleService:
         """获取连接的所有规则"""
         await self.initialize()
         
-        driver = self._get_driver()
-        with driver.session() as session:
+        async with neo4j_service.async_session() as session:
             query = "MATCH (j:JoinRule {connection_id: $connection_id})"
             params = {"connection_id": connection_id}
             
@@ -181,10 +165,10 @@ class JoinRuleService:
             
             query += " RETURN j ORDER BY j.priority DESC, j.name"
             
-            result = session.run(query, **params)
+            result = await session.run(query, **params)
             
             rules = []
-            for record in result:
+            async for record in result:
                 rules.append(self._build_rule_from_record(record["j"]))
             
             return rules
@@ -205,9 +189,8 @@ class JoinRuleService:
         if not table_names or len(table_names) < 2:
             return []
         
-        driver = self._get_driver()
-        with driver.session() as session:
-            result = session.run("""
+        async with neo4j_service.async_session() as session:
+            result = await session.run("""
                 MATCH (j:JoinRule {connection_id: $connection_id, is_active: true})
                 WHERE j.left_table IN $tables AND j.right_table IN $tables
                 RETURN j
@@ -215,7 +198,7 @@ class JoinRuleService:
             """, connection_id=connection_id, tables=table_names)
             
             contexts = []
-            for record in result:
+            async for record in result:
                 node = record["j"]
                 rule = self._build_rule_from_record(node)
                 
@@ -253,15 +236,14 @@ class JoinRuleService:
         
         set_clauses.append("j.updated_at = datetime($updated_at)")
         
-        driver = self._get_driver()
-        with driver.session() as session:
-            result = session.run(f"""
+        async with neo4j_service.async_session() as session:
+            result = await session.run(f"""
                 MATCH (j:JoinRule {{id: $rule_id}})
                 SET {', '.join(set_clauses)}
                 RETURN j
             """, **params)
             
-            record = result.single()
+            record = await result.single()
             if not record:
                 return None
             
@@ -272,15 +254,14 @@ class JoinRuleService:
         """删除规则"""
         await self.initialize()
         
-        driver = self._get_driver()
-        with driver.session() as session:
-            result = session.run("""
+        async with neo4j_service.async_session() as session:
+            result = await session.run("""
                 MATCH (j:JoinRule {id: $rule_id})
                 DETACH DELETE j
                 RETURN count(j) AS deleted
             """, rule_id=rule_id)
             
-            record = result.single()
+            record = await result.single()
             deleted = record["deleted"] > 0
             
             if deleted:
@@ -290,9 +271,8 @@ class JoinRuleService:
     
     async def increment_usage(self, rule_id: str):
         """增加使用计数"""
-        driver = self._get_driver()
-        with driver.session() as session:
-            session.run("""
+        async with neo4j_service.async_session() as session:
+            await session.run("""
                 MATCH (j:JoinRule {id: $rule_id})
                 SET j.usage_count = j.usage_count + 1
             """, rule_id=rule_id)
@@ -342,10 +322,8 @@ class JoinRuleService:
         )
     
     def close(self):
-        """关闭连接"""
-        if self.driver:
-            self.driver.close()
-            self.driver = None
+        """关闭资源（使用公共 Neo4j 服务，此方法保留以保持兼容）"""
+        pass
 
 
 # 创建全局实例
@@ -2,18 +2,31 @@
 Neo4j 公共服务 (Neo4j Service)
 
 统一管理 Neo4j 驱动连接，消除各服务中的重复代码。
+进程内只维护一个同步驱动和（每个事件循环）一个异步驱动，连接池参数统一配置。
 
 使用方式：
     from app.services.neo4j_service import neo4j_service
-    
+
+    # 异步代码（推荐）
+    async with neo4j_service.async_session() as session:
+        result = await session.run("MATCH (n) RETURN n LIMIT 10")
+        records = await result.data()
+
+    records = await neo4j_service.run_query("MATCH (n) RETURN n LIMIT $limit", limit=10)
+
+    # 同步代码（线程池、同步接口）
     driver = neo4j_service.get_driver()
     with driver.session() as session:
         result = session.run("MATCH (n) RETURN n LIMIT 10")
 """
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+import asyncio
 import logging
+import threading
+import weakref
 
-from neo4j import GraphDatabase, Driver
+from neo4j import AsyncDriver, AsyncGraphDatabase, AsyncSession, Driver, GraphDatabase
 
 from app.core.config import settings
 
@@ -23,36 +36,121 @@ logger = logging.getLogger(__name__)
 class Neo4jService:
     """
     Neo4j 公共服务
-    
+
     提供：
-    - 统一的驱动管理
-    - 连接复用
+    - 统一的驱动管理（同步驱动 + 按事件循环隔离的异步驱动）
+    - 连接池复用（池大小、获取超时可配置）
     - 优雅的关闭
     """
-    
+
     _driver: Optional[Driver] = None
+    _async_drivers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncDriver]" = weakref.WeakKeyDictionary()
+    # 每个事件循环一个关闭守卫（见 _close_on_loop_shutdown），强引用防止被回收
+    _shutdown_guards: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+    _lock = threading.Lock()
     _initialized: bool = False
-    
+
+    @staticmethod
+    def _driver_kwargs() -> Dict[str, Any]:
+        """驱动连接池参数"""
+        return {
+            "auth": (settings.NEO4J_USER, settings.NEO4J_PASSWORD),
+            "max_connection_pool_size": settings.NEO4J_MAX_POOL_SIZE,
+            "connection_acquisition_timeout": settings.NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+            "connection_timeout": settings.NEO4J_CONNECTION_TIMEOUT,
+            "max_connection_lifetime": settings.NEO4J_MAX_CONNECTION_LIFETIME,
+        }
+
     @classmethod
     def get_driver(cls) -> Optional[Driver]:
         """
-        获取 Neo4j 驱动（单例模式）
-        
+        获取 Neo4j 同步驱动（单例模式）
+
         Returns:
             Neo4j Driver 实例，连接失败返回 None
         """
         if cls._driver is None:
-            try:
-                cls._driver = GraphDatabase.driver(
-                    settings.NEO4J_URI,
-                    auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
-                )
-                logger.info("Neo4j driver initialized successfully")
-            except Exception as e:
-                logger.warning(f"Failed to connect to Neo4j: {e}")
-                return None
+            with cls._lock:
+                if cls._driver is None:
+                    try:
+                        cls._driver = GraphDatabase.driver(settings.NEO4J_URI, **cls._driver_kwargs())
+                        logger.info("Neo4j driver initialized successfully")
+                    except Exception as e:
+                        logger.warning(f"Failed to connect to Neo4j: {e}")
+                        return None
         return cls._driver
-    
+
+    @classmethod
+    def get_async_driver(cls) -> AsyncDriver:
+        """
+        获取当前事件循环的 Neo4j 异步驱动
+
+        异步驱动的连接池绑定事件循环，因此每个事件循环各自持有一个驱动。
+        同步代码里 asyncio.run 创建的短生命周期事件循环结束时，驱动随之关闭。
+
+        Raises:
+            RuntimeError: 不在事件循环中调用
+        """
+        loop = asyncio.get_running_loop()
+        with cls._lock:
+            driver = cls._async_drivers.get(loop)
+            if driver is None:
+                driver = AsyncGraphDatabase.driver(settings.NEO4J_URI, **cls._driver_kwargs())
+                cls._async_drivers[loop] = driver
+                cls._shutdown_guards[loop] = cls._start_shutdown_guard(driver)
+                logger.info("Neo4j async driver initialized successfully")
+            return driver
+
+    @classmethod
+    def _start_shutdown_guard(cls, driver: AsyncDriver):
+        """
+        把一个挂起的异步生成器登记到当前事件循环
+
+        asyncio.run 结束前会调用 loop.shutdown_asyncgens() 关闭所有未结束的异步生成器，
+        守卫的 finally 借此在事件循环仍在运行时关闭驱动，避免每次 asyncio.run 泄漏一个连接池。
+        """
+        guard = cls._close_on_loop_shutdown(driver)
+        # 第一次迭代时事件循环登记该生成器，之后挂起在 yield 处
+        asyncio.ensure_future(guard.__anext__())
+        return guard
+
+    @classmethod
+    async def _close_on_loop_shutdown(cls, driver: AsyncDriver):
+        try:
+            yield
+        finally:
+            loop = asyncio.get_running_loop()
+            with cls._lock:
+                # close_async 已经关闭过的驱动不再重复关闭
+                owned = cls._async_drivers.get(loop) is driver
+                if owned:
+                    cls._async_drivers.pop(loop, None)
+            if owned:
+                try:
+                    await driver.close()
+                    logger.info("Neo4j async driver closed with its event loop")
+                except Exception as e:
+                    logger.warning(f"Error closing Neo4j async driver: {e}")
+
+    @classmethod
+    @asynccontextmanager
+    async def async_session(cls, **session_kwargs) -> AsyncIterator[AsyncSession]:
+        """从共享异步驱动借出会话"""
+        session = cls.get_async_driver().session(**session_kwargs)
+        try:
+            yield session
+        finally:
+            await session.close()
+
+    @classmethod
+    async def run_query(cls, query: str, parameters: Optional[Dict[str, Any]] = None, **kwargs) -> List[Dict[str, Any]]:
+        """
+        执行 Cypher 并返回全部记录（dict 列表）
+        """
+        async with cls.async_session() as session:
+            result = await session.run(query, parameters, **kwargs)
+            return await result.data()
+
     @classmethod
     def is_available(cls) -> bool:
         """检查 Neo4j 是否可用"""
@@ -65,29 +163,52 @@ class Neo4jService:
             return True
         except Exception:
             return False
-    
+
+    @classmethod
+    async def is_available_async(cls) -> bool:
+        """检查 Neo4j 是否可用（异步）"""
+        try:
+            await cls.run_query("RETURN 1")
+            return True
+        except Exception:
+            return False
+
     @classmethod
     def close(cls):
-        """关闭 Neo4j 连接"""
-        if cls._driver:
+        """关闭 Neo4j 同步驱动"""
+        with cls._lock:
+            driver, cls._driver = cls._driver, None
+            cls._initialized = False
+        if driver:
             try:
-                cls._driver.close()
+                driver.close()
                 logger.info("Neo4j driver closed")
             except Exception as e:
                 logger.warning(f"Error closing Neo4j driver: {e}")
-            finally:
-                cls._driver = None
-    
+
+    @classmethod
+    async def close_async(cls):
+        """关闭当前事件循环的异步驱动和同步驱动（应用关闭时调用）"""
+        loop = asyncio.get_running_loop()
+        with cls._lock:
+            driver = cls._async_drivers.pop(loop, None)
+        if driver:
+            try:
+                await driver.close()
+                logger.info("Neo4j async driver closed")
+            except Exception as e:
+                logger.warning(f"Error closing Neo4j async driver: {e}")
+        cls.close()
+
     @classmethod
     async def initialize(cls):
         """初始化服务（异步兼容）"""
         if cls._initialized:
             return
-        
-        driver = cls.get_driver()
-        if driver:
-            cls._initialized = True
-            logger.info("Neo4j service initialized")
+
+        cls.get_async_driver()
+        cls._initialized = True
+        logger.info("Neo4j service initialized")
 
 
 # 创建全局实例
@@ -0,0 +1,315 @@
+"""
+问答对批量导入 (QA Bulk Ingestion)
+
+逐条调用 engine.store_qa_pair 时每条样本都要一次向量化、一个 Neo4j 会话（多条语句）和一次 Milvus insert + flush。
+批量导入按 QA_BULK_INGEST_CHUNK_SIZE 分块处理，每块：
+- 一次 VectorService.batch_embed
+- 一次 Milvus 多行 insert（整个任务结束后只 flush 一次）
+- 一个 Neo4j UNWIND 写事务
+行级错误（缺少字段、格式错误）只跳过该行；块写入失败时该块所有行记为失败，其余块继续。
+
+上传文件（JSONL / CSV）逐行读取，不整体载入内存；任务在后台执行，通过 job_id 查询进度和逐行错误报告。
+
+使用方式：
+    from app.services.qa_bulk_ingestion import qa_bulk_ingestion
+
+    job = qa_bulk_ingestion.start_file(engine, path, "jsonl", connection_id=1, user_id=2, tenant_id=3)
+    qa_bulk_ingestion.get_job(job.id, user_id=2, tenant_id=3).to_dict()
+
+    job = await qa_bulk_ingestion.run(engine, enumerate(rows, 1))   # 同步执行（batch-create 接口）
+"""
+import asyncio
+import csv
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.hybrid_retrieval import (
+    QAPairWithContext, clean_sql, extract_entities_from_question, extract_tables_from_sql, generate_qa_id
+)
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_FORMATS = ("jsonl", "csv")
+# 任务状态中返回的错误条数（完整报告通过 errors 接口获取）
+_STATUS_ERROR_PREVIEW = 20
+_TRUE_VALUES = {"1", "true", "yes", "y", "是"}
+
+
+def _parse_list(value: Any) -> Optional[List[str]]:
+    """列表字段：JSON 中为数组，CSV 中为逗号分隔的字符串"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(",") if item.strip()]
+    return [str(item) for item in value]
+
+
+def _parse_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in _TRUE_VALUES
+    return bool(value)
+
+
+def build_qa_pair(row: Dict[str, Any], connection_id: Optional[int] = None) -> QAPairWithContext:
+    """
+    由一行导入数据构建问答对（字段同 QAPairCreate），数据不合法时抛出 ValueError
+
+    connection_id 不为空时覆盖行内的 connection_id。
+    """
+    if not isinstance(row, dict):
+        raise ValueError("每行必须是一个对象")
+    question = str(row.get("question") or "").strip()
+    sql = str(row.get("sql") or "").strip()
+    if not question:
+        raise ValueError("缺少 question")
+    if not sql:
+        raise ValueError("缺少 sql")
+
+    if connection_id is None:
+        try:
+            connection_id = int(row["connection_id"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("缺少或无效的 connection_id")
+    try:
+        difficulty_level = int(row.get("difficulty_level") or 3)
+    except (TypeError, ValueError):
+        raise ValueError(f"无效的 difficulty_level: {row.get('difficulty_level')}")
+    query_type = str(row.get("query_type") or "SELECT")
+
+    used_tables = _parse_list(row.get("used_tables")) or extract_tables_from_sql(sql)
+    mentioned_entities = _parse_list(row.get("mentioned_entities")) or extract_entities_from_question(question)
+
+    return QAPairWithContext(
+        id=generate_qa_id(),
+        question=question,
+        sql=clean_sql(sql),
+        connection_id=connection_id,
+        difficulty_level=difficulty_level,
+        query_type=query_type,
+        success_rate=0.0,
+        verified=_parse_bool(row.get("verified", False)),
+        created_at=datetime.now(),
+        used_tables=used_tables,
+        used_columns=[],
+        query_pattern=query_type,
+        mentioned_entities=mentioned_entities
+    )
+
+
+def iter_file_rows(path: str, file_format: str) -> Iterator[Tuple[int, Any]]:
+    """
+    逐行读取导入文件，返回 (行号, 行数据)
+
+    JSONL 中无法解析的行返回 (行号, ValueError)，由调用方记为该行错误。
+    """
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if file_format == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                # 表头为第 1 行
+                yield reader.line_num, row
+            return
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, ValueError(f"JSON 解析失败: {e.msg}")
+
+
+class QABulkIngestionJob:
+    """一次批量导入任务的进度与错误报告"""
+
+    def __init__(self, connection_id: Optional[int] = None, filename: Optional[str] = None,
+                 user_id: Optional[int] = None, tenant_id: Optional[int] = None):
+        self.id = uuid.uuid4().hex
+        self.connection_id = connection_id
+        self.filename = filename
+        # 发起导入的用户，只有该用户可以查询进度和错误报告
+        self.user_id = user_id
+        self.tenant_id = tenant_id
+        self.status = "pending"       # pending / running / completed / failed
+        self.total: Optional[int] = None
+        self.processed = 0
+        self.created = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def record_error(self, row: int, error: str, question: Optional[str] = None) -> None:
+        self.failed += 1
+        self.processed += 1
+        entry = {"row": row, "error": error}
+        if question:
+            entry["question"] = question[:100]
+        self.errors.append(entry)
+
+    def to_dict(self, include_errors: bool = False) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "connection_id": self.connection_id,
+            "filename": self.filename,
+            "total": self.total,
+            "processed": self.processed,
+            "created": self.created,
+            "failed": self.failed,
+            "progress": round(self.processed / self.total, 4) if self.total else (1.0 if self.done else 0.0),
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+        data["errors"] = self.errors if include_errors else self.errors[:_STATUS_ERROR_PREVIEW]
+        return data
+
+
+class QABulkIngestionService:
+    """
+    问答对批量导入
+
+    只保存最近 QA_BULK_INGEST_MAX_JOBS 个任务的状态（进程内）。
+    """
+
+    def __init__(self, chunk_size: Optional[int] = None, max_jobs: Optional[int] = None):
+        self._chunk_size = max(chunk_size or settings.QA_BULK_INGEST_CHUNK_SIZE, 1)
+        self._max_jobs = max_jobs or settings.QA_BULK_INGEST_MAX_JOBS
+        self._jobs: "OrderedDict[str, QABulkIngestionJob]" = OrderedDict()
+
+    # ===== 对外接口 =====
+
+    def start_file(self, engine: Any, path: str, file_format: str, connection_id: int,
+                   filename: Optional[str] = None, user_id: Optional[int] = None,
+                   tenant_id: Optional[int] = None) -> QABulkIngestionJob:
+        """在后台导入文件（导入结束后删除该文件），立即返回任务"""
+        if file_format not in SUPPORTED_FORMATS:
+            raise ValueError(f"不支持的文件格式: {file_format}")
+        job = QABulkIngestionJob(
+            connection_id=connection_id, filename=filename, user_id=user_id, tenant_id=tenant_id
+        )
+        self._register(job)
+        job.task = asyncio.create_task(self._run_file(engine, path, file_format, job))
+        return job
+
+    async def run(self, engine: Any, rows: Iterable[Tuple[int, Any]],
+                  connection_id: Optional[int] = None) -> QABulkIngestionJob:
+        """在当前请求中导入 (行号, 行数据) 序列，返回结束后的任务"""
+        job = QABulkIngestionJob(connection_id=connection_id)
+        await self._ingest(engine, rows, job)
+        return job
+
+    def get_job(self, job_id: str, user_id: Optional[int] = None,
+                tenant_id: Optional[int] = None) -> Optional[QABulkIngestionJob]:
+        """获取任务，不是该用户（租户）发起的任务视为不存在"""
+        job = self._jobs.get(job_id)
+        if job is None or job.user_id != user_id or job.tenant_id != tenant_id:
+            return None
+        return job
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "jobs": len(self._jobs),
+            "running": sum(1 for job in self._jobs.values() if not job.done),
+            "chunk_size": self._chunk_size,
+        }
+
+    # ===== 内部方法 =====
+
+    def _register(self, job: QABulkIngestionJob) -> None:
+        self._jobs[job.id] = job
+        # 超过上限时丢弃最早的已结束任务
+        for job_id in [job_id for job_id, old in self._jobs.items() if old.done]:
+            if len(self._jobs) <= self._max_jobs:
+                break
+            del self._jobs[job_id]
+
+    async def _run_file(self, engine: Any, path: str, file_format: str, job: QABulkIngestionJob) -> None:
+        try:
+            job.total = await asyncio.to_thread(lambda: sum(1 for _ in iter_file_rows(path, file_format)))
+            await self._ingest(engine, iter_file_rows(path, file_format), job)
+        except Exception as e:
+            # _ingest 内部已记录失败状态，这里只处理统计行数时的异常
+            if not job.done:
+                job.status = "failed"
+                job.error = str(e)
+                job.finished_at = datetime.now()
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    async def _ingest(self, engine: Any, rows: Iterable[Tuple[int, Any]], job: QABulkIngestionJob) -> None:
+        job.status = "running"
+        start_time = time.time()
+        # connection_id -> [(行号, 问答对)]，每个连接单独分块（不同连接写入不同的 Milvus 集合）
+        chunks: Dict[int, List[Tuple[int, QAPairWithContext]]] = {}
+        written_connections = set()
+        try:
+            for row_number, row in rows:
+                if isinstance(row, Exception):
+                    job.record_error(row_number, str(row))
+                    continue
+                try:
+                    qa_pair = build_qa_pair(row, job.connection_id)
+                except ValueError as e:
+                    job.record_error(row_number, str(e), row.get("question") if isinstance(row, dict) else None)
+                    continue
+                chunk = chunks.setdefault(qa_pair.connection_id, [])
+                chunk.append((row_number, qa_pair))
+                if len(chunk) >= self._chunk_size:
+                    await self._store_chunk(engine, chunks.pop(qa_pair.connection_id), job)
+                    written_connections.add(qa_pair.connection_id)
+
+            for connection_id, chunk in chunks.items():
+                await self._store_chunk(engine, chunk, job)
+                written_connections.add(connection_id)
+
+            # 各块写入时未 flush，结束后每个集合只 flush 一次
+            for connection_id in written_connections:
+                milvus_service = await engine.get_milvus_service_for_connection(connection_id)
+                await milvus_service.flush()
+
+            job.status = "completed"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"QA bulk ingestion job {job.id} failed: {str(e)}")
+            raise
+        finally:
+            job.finished_at = datetime.now()
+            logger.info(
+                f"QA bulk ingestion job {job.id} {job.status}: created={job.created}, failed={job.failed}, "
+                f"elapsed={time.time() - start_time:.2f}s"
+            )
+
+    async def _store_chunk(self, engine: Any, chunk: List[Tuple[int, QAPairWithContext]],
+                           job: QABulkIngestionJob) -> None:
+        qa_pairs = [qa_pair for _, qa_pair in chunk]
+        try:
+            await engine.store_qa_pairs_batch(qa_pairs, flush=False)
+        except Exception as e:
+            logger.warning(f"QA bulk ingestion job {job.id}: chunk of {len(chunk)} rows failed: {str(e)}")
+            for row_number, qa_pair in chunk:
+                job.record_error(row_number, f"批量写入失败: {e}", qa_pair.question)
+            return
+        job.created += len(chunk)
+        job.processed += len(chunk)
+
+
+# 创建全局实例
+qa_bulk_ingestion = QABulkIngestionService()
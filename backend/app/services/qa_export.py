@@ -0,0 +1,78 @@
+"""
+问答对流式导出 (QA Export)
+
+按页遍历 Milvus 集合（query_iterator）并批量补齐 Neo4j 上下文，逐页序列化为 NDJSON 或 CSV：
+- 内存占用只有一页（QA_EXPORT_BATCH_SIZE 条），与知识库大小无关
+- 第一页读取完成即开始输出，不等待全部数据
+- 导出字段与批量导入（qa_bulk_ingestion）的字段一致，导出文件可以直接重新导入
+
+使用方式：
+    from app.services.qa_export import export_qa_pairs
+
+    return StreamingResponse(export_qa_pairs(engine, connection_id, "ndjson"), media_type=...)
+"""
+import csv
+import io
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FIELDS = [
+    "id", "question", "sql", "connection_id", "difficulty_level", "query_type",
+    "success_rate", "verified", "created_at", "used_tables", "mentioned_entities",
+]
+# 格式 -> (媒体类型, 文件扩展名)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "jsonl"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+# 兼容的格式别名
+_FORMAT_ALIASES = {"json": "ndjson", "jsonl": "ndjson"}
+
+
+def normalize_export_format(file_format: str) -> Optional[str]:
+    """返回规范化的导出格式，不支持时返回 None"""
+    file_format = (file_format or "").lower()
+    file_format = _FORMAT_ALIASES.get(file_format, file_format)
+    return file_format if file_format in EXPORT_FORMATS else None
+
+
+def _ndjson_page(rows: List[Dict[str, Any]]) -> str:
+    return "".join(
+        json.dumps({field: row.get(field) for field in EXPORT_FIELDS}, ensure_ascii=False, default=str) + "\n"
+        for row in rows
+    )
+
+
+def _csv_page(rows: List[Dict[str, Any]], header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        writer.writerow([
+            # 列表字段按逗号拼接，与批量导入的 CSV 解析一致
+            ",".join(row.get(field) or []) if field in ("used_tables", "mentioned_entities") else row.get(field)
+            for field in EXPORT_FIELDS
+        ])
+    return buffer.getvalue()
+
+
+async def export_qa_pairs(engine: Any, connection_id: int, file_format: str,
+                          batch_size: Optional[int] = None) -> AsyncIterator[str]:
+    """逐页生成导出内容（file_format 为 normalize_export_format 的返回值）"""
+    batch_size = batch_size or settings.QA_EXPORT_BATCH_SIZE
+    exported = 0
+    if file_format == "csv":
+        # 带 BOM，Excel 打开时正确识别 UTF-8；表头在没有数据时也输出
+        yield "\ufeff" + _csv_page([], header=True)
+
+    async for page in engine.iter_qa_pairs(connection_id, batch_size):
+        exported += len(page)
+        yield _csv_page(page, header=False) if file_format == "csv" else _ndjson_page(page)
+
+    logger.info(f"Exported {exported} QA pairs (connection_id={connection_id}, format={file_format})")
@@ -7,34 +7,26 @@
 
 优化历史:
 - 2026-01-19: 初始实现，解决重复查询需要重新走完整流程的问题
+- 精确缓存改为 SQLite 共享存储（query_cache_store），所有 worker 进程共享，按字节数淘汰；
+  sql_executor_node 执行成功后写入，键与查询时一致（含 tenant_id）
+- 按源表数据版本失效：记录 SQL 读取的表及执行前探测的数据版本（table_version_probe），
+  命中时版本变化则作废；所有源表都有版本的条目使用 QUERY_CACHE_TRACKED_TTL
 """
 
 import hashlib
 import logging
 import asyncio
 import time
-from typing import Dict, Any, Optional, List
-from dataclasses import dataclass, field
-from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+from dataclasses import dataclass
 from threading import Lock
 
-logger = logging.getLogger(__name__)
-
+from app.core.config import settings
+from app.services.query_cache_store import QueryCacheStore
+from app.services.sql_helpers import extract_table_names_from_sql
+from app.services.table_version_probe import table_version_probe
 
-@dataclass
-class CacheEntry:
-    """缓存条目"""
-    query: str                          # 原始查询
-    connection_id: int                  # 数据库连接ID
-    tenant_id: Optional[int]            # 租户ID（多租户隔离）
-    sql: str                            # 生成的SQL
-    result: Any                         # 执行结果
-    created_at: float                   # 创建时间戳
-    hit_count: int = 0                  # 命中次数
-    
-    def is_expired(self, ttl_seconds: int) -> bool:
-        """检查是否过期"""
-        return time.time() - self.created_at > ttl_seconds
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -53,7 +45,9 @@ class QueryCacheService:
     
     特性:
     - 双层缓存：精确匹配 + 语义匹配
-    - LRU 淘汰策略
+    - 精确缓存存储在多进程共享的 SQLite 文件中
+    - 按总字节数淘汰最久未访问的条目
+    - 源表数据版本变化时精确失效
     - TTL 过期机制
     - 线程安全
     - 单例模式
@@ -63,8 +57,8 @@ class QueryCacheService:
     _lock = Lock()
     
     # 配置
-    MAX_CACHE_SIZE = 1000               # 最大缓存条目数
-    EXACT_CACHE_TTL = 3600              # 精确缓存 TTL（1小时）
+    EXACT_CACHE_TTL = settings.EXACT_CACHE_TTL  # 精确缓存 TTL（默认1小时）
+    TRACKED_CACHE_TTL = settings.QUERY_CACHE_TRACKED_TTL  # 源表均可探测版本时的 TTL（默认1天）
     SEMANTIC_SIMILARITY_THRESHOLD = 0.95  # 语义匹配阈值
     
     def __new__(cls):
@@ -79,8 +73,8 @@ class QueryCacheService:
         if self._initialized:
             return
         
-        # 使用 OrderedDict 实现 LRU
-        self._exact_cache: OrderedDict[str, CacheEntry] = OrderedDict()
+        # 精确缓存存储（跨进程共享，按字节数淘汰）
+        self._store = QueryCacheStore(settings.QUERY_CACHE_DB_PATH, settings.QUERY_CACHE_MAX_BYTES)
         self._cache_lock = Lock()
         self._stats = {
             "exact_hits": 0,
@@ -132,25 +126,6 @@ class QueryCacheService:
         key_str = f"{tenant_prefix}{normalized_query}:{connection_id}"
         return hashlib.md5(key_str.encode()).hexdigest()
     
-    def _evict_if_needed(self):
-        """LRU 淘汰"""
-        while len(self._exact_cache) >= self.MAX_CACHE_SIZE:
-            # 移除最老的条目
-            self._exact_cache.popitem(last=False)
-            logger.debug("Cache eviction: removed oldest entry")
-    
-    def _clean_expired(self):
-        """清理过期条目"""
-        now = time.time()
-        expired_keys = [
-            key for key, entry in self._exact_cache.items()
-            if entry.is_expired(self.EXACT_CACHE_TTL)
-        ]
-        for key in expired_keys:
-            del self._exact_cache[key]
-        if expired_keys:
-            logger.debug(f"Cleaned {len(expired_keys)} expired cache entries")
-    
     async def check_cache(self, query: str, connection_id: int, tenant_id: Optional[int] = None) -> Optional[CacheHit]:
         """
         检查缓存（支持多租户隔离）
@@ -169,9 +144,6 @@ class QueryCacheService:
         Returns:
             CacheHit 如果命中，否则 None
         """
-        import asyncio
-        from app.core.config import settings
-        
         # Phase 6: 检查缓存模式
         cache_mode = getattr(settings, 'CACHE_MODE', 'simple')
         
@@ -180,7 +152,9 @@ class QueryCacheService:
             # 简化模式：只检查精确缓存
             # ==========================================
             start_time = time.time()
-            result = self._check_exact_cache(query, connection_id, tenant_id)
+            # 校验源表版本可能访问目标库，放到线程池执行
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(None, self._check_exact_cache, query, connection_id, tenant_id)
             elapsed_ms = int((time.time() - start_time) * 1000)
             
             if result:
@@ -261,34 +235,37 @@ class QueryCacheService:
         """检查精确匹配缓存（支持多租户隔离）"""
         cache_key = self._make_cache_key(query, connection_id, tenant_id)
         
-        with self._cache_lock:
-            # 定期清理过期条目
-            if len(self._exact_cache) > 100:
-                self._clean_expired()
-            
-            if cache_key in self._exact_cache:
-                entry = self._exact_cache[cache_key]
-                
-                # 检查是否过期
-                if entry.is_expired(self.EXACT_CACHE_TTL):
-                    del self._exact_cache[cache_key]
-                    return None
-                
-                # 更新 LRU 顺序
-                self._exact_cache.move_to_end(cache_key)
-                entry.hit_count += 1
-                
-                return CacheHit(
-                    hit_type="exact",
-                    query=entry.query,
-                    sql=entry.sql,
-                    result=entry.result,
-                    similarity=1.0
-                )
+        try:
+            entry = self._store.get(cache_key)
+        except Exception as e:
+            logger.warning(f"Exact cache lookup failed: {e}")
+            return None
         
-        return None
+        if entry is None:
+            return None
+        
+        if self._is_stale(entry):
+            self._store.delete(cache_key)
+            logger.info(f"Cache STALE: source tables changed, connection_id={connection_id}, tables={entry['tables']}")
+            return None
+        
+        return CacheHit(
+            hit_type="exact",
+            query=entry["query"],
+            sql=entry["sql"],
+            result=entry["result"],
+            similarity=1.0
+        )
+    
+    def _is_stale(self, entry: Dict[str, Any]) -> bool:
+        """写入时记录了版本的源表，当前版本不同（或已无法探测）即视为过期"""
+        tracked = {table: version for table, version in entry["table_versions"].items() if version is not None}
+        if not tracked:
+            return False
+        current = table_version_probe.get_versions(entry["connection_id"], tracked.keys())
+        return any(current.get(table) != version for table, version in tracked.items())
     
-    async def _check_semantic_cache(self, query: str, connection_id: int) -> Optional[CacheHit]:
+    async def _check_semantic_cache(self, query: str, connection_id: int, tenant_id: Optional[int] = None) -> Optional[CacheHit]:
         """
         检查语义匹配缓存
         
@@ -329,19 +306,19 @@ class QueryCacheService:
                     # 从精确缓存中查找对应的执行结果
                     # 语义匹配只能返回 SQL，执行结果需要重新执行
                     # 但如果精确缓存中有这个 QA 对的结果，可以直接返回
-                    matched_key = self._make_cache_key(qa_pair.question, connection_id)
-                    
-                    with self._cache_lock:
-                        if matched_key in self._exact_cache:
-                            entry = self._exact_cache[matched_key]
-                            if not entry.is_expired(self.EXACT_CACHE_TTL):
-                                return CacheHit(
-                                    hit_type="semantic" if not is_exact_text_match else "exact_text",
-                                    query=qa_pair.question,
-                                    sql=qa_pair.sql,
-                                    result=entry.result,
-                                    similarity=effective_score  # ✅ 使用有效分数
-                                )
+                    # 校验源表版本可能访问目标库，放到线程池执行
+                    loop = asyncio.get_running_loop()
+                    matched = await loop.run_in_executor(
+                        None, self._check_exact_cache, qa_pair.question, connection_id, tenant_id
+                    )
+                    if matched:
+                        return CacheHit(
+                            hit_type="semantic" if not is_exact_text_match else "exact_text",
+                            query=qa_pair.question,
+                            sql=qa_pair.sql,
+                            result=matched.result,
+                            similarity=effective_score  # ✅ 使用有效分数
+                        )
                     
                     # 如果没有执行结果缓存，仍然返回 SQL（可以跳过 SQL 生成步骤）
                     return CacheHit(
@@ -358,59 +335,99 @@ class QueryCacheService:
             logger.warning(f"Semantic cache check failed: {e}")
             return None
     
-    def store_result(self, query: str, connection_id: int, sql: str, result: Any) -> None:
+    def store_result(
+        self,
+        query: str,
+        connection_id: int,
+        sql: str,
+        result: Any,
+        tenant_id: Optional[int] = None,
+        table_versions: Optional[Dict[str, Optional[str]]] = None
+    ) -> bool:
         """
-        存储查询结果到缓存
+        存储查询结果到缓存（键与 check_cache 一致）
+        
+        table_versions 应为执行 SQL 之前探测的源表版本（见 probe_table_versions），
+        执行期间源表发生的写入会使条目在下次命中时失效。
+        未传入时在此处探测（可能访问目标库），异步代码中应放到线程池调用。
         
         Args:
             query: 用户查询
             connection_id: 数据库连接ID
             sql: 生成的SQL
             result: 执行结果
+            tenant_id: 租户ID（可选，用于多租户隔离）
+            table_versions: 执行前的源表数据版本（可选）
+            
+        Returns:
+            是否已写入
         """
-        cache_key = self._make_cache_key(query, connection_id)
+        cache_key = self._make_cache_key(query, connection_id, tenant_id)
         
-        with self._cache_lock:
-            # 检查是否需要淘汰
-            self._evict_if_needed()
-            
-            # 存储新条目
-            self._exact_cache[cache_key] = CacheEntry(
+        try:
+            # 记录 SQL 读取的表及当前数据版本，所有源表都有版本时可安全使用更长的 TTL
+            tables = extract_table_names_from_sql(sql)
+            if table_versions is None:
+                table_versions = table_version_probe.get_versions(connection_id, tables)
+            tracked = bool(table_versions) and all(v is not None for v in table_versions.values())
+            stored = self._store.put(
+                cache_key,
                 query=self._normalize_query(query),
                 connection_id=connection_id,
+                tenant_id=tenant_id,
                 sql=sql,
                 result=result,
-                created_at=time.time()
+                ttl=self.TRACKED_CACHE_TTL if tracked else self.EXACT_CACHE_TTL,
+                tables=tables,
+                table_versions=table_versions
             )
-            
-            # 移动到末尾（最新）
-            self._exact_cache.move_to_end(cache_key)
-            self._stats["stores"] += 1
+        except Exception as e:
+            logger.warning(f"Cache STORE failed: {e}")
+            return False
         
-        logger.info(f"Cache STORE: query='{query[:50]}...', connection_id={connection_id}")
+        if stored:
+            with self._cache_lock:
+                self._stats["stores"] += 1
+            logger.info(f"Cache STORE: query='{self._normalize_query(query)[:50]}...', connection_id={connection_id}, tenant_id={tenant_id}")
+        return stored
+    
+    def probe_table_versions(self, connection_id: int, sql: str) -> Dict[str, Optional[str]]:
+        """
+        探测 SQL 源表的当前数据版本，在执行 SQL 之前调用，结果传给 store_result
+        
+        可能访问目标库，异步代码中应放到线程池调用。
+        """
+        try:
+            return table_version_probe.get_versions(connection_id, extract_table_names_from_sql(sql))
+        except Exception as e:
+            logger.warning(f"Table version probe failed: {e}")
+            return {}
     
     def get_stats(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
+        store_stats = self._store.get_stats()
         with self._cache_lock:
             total_hits = self._stats["exact_hits"] + self._stats["semantic_hits"]
             total_requests = total_hits + self._stats["misses"]
             hit_rate = total_hits / total_requests if total_requests > 0 else 0
             
             return {
-                "cache_size": len(self._exact_cache),
-                "max_size": self.MAX_CACHE_SIZE,
+                "cache_size": store_stats["entries"],
+                "cache_bytes": store_stats["bytes"],
+                "max_bytes": store_stats["max_bytes"],
                 "exact_hits": self._stats["exact_hits"],
                 "semantic_hits": self._stats["semantic_hits"],
                 "misses": self._stats["misses"],
                 "stores": self._stats["stores"],
                 "hit_rate": f"{hit_rate:.2%}",
-                "ttl_seconds": self.EXACT_CACHE_TTL
+                "ttl_seconds": self.EXACT_CACHE_TTL,
+                "tracked_ttl_seconds": self.TRACKED_CACHE_TTL
             }
     
     def clear(self) -> None:
         """清空缓存"""
+        self._store.clear()
         with self._cache_lock:
-            self._exact_cache.clear()
             self._stats = {
                 "exact_hits": 0,
                 "semantic_hits": 0,
@@ -429,18 +446,28 @@ class QueryCacheService:
         Returns:
             被清除的条目数
         """
-        with self._cache_lock:
-            keys_to_remove = [
-                key for key, entry in self._exact_cache.items()
-                if entry.connection_id == connection_id
-            ]
-            for key in keys_to_remove:
-                del self._exact_cache[key]
-            
-            if keys_to_remove:
-                logger.info(f"Invalidated {len(keys_to_remove)} cache entries for connection_id={connection_id}")
+        table_version_probe.invalidate(connection_id)
+        removed = self._store.delete_connection(connection_id)
+        if removed:
+            logger.info(f"Invalidated {removed} cache entries for connection_id={connection_id}")
+        return removed
+
+    def invalidate_tables(self, connection_id: int, tables: List[str]) -> int:
+        """
+        使读取了指定表的缓存失效（已知数据变更时主动调用）
+        
+        Args:
+            connection_id: 数据库连接ID
+            tables: 发生变更的表名
             
-            return len(keys_to_remove)
+        Returns:
+            被清除的条目数
+        """
+        table_version_probe.invalidate(connection_id)
+        removed = self._store.delete_tables(connection_id, tables)
+        if removed:
+            logger.info(f"Invalidated {removed} cache entries for connection_id={connection_id}, tables={tables}")
+        return removed
 
 
 # 便捷函数
@@ -0,0 +1,210 @@
+"""
+查询结果缓存存储 (Query Cache Store)
+
+精确查询缓存（L1）的持久化存储层，基于本地 SQLite 文件：
+- 同一台机器上的所有 uvicorn / LangGraph worker 进程共享同一份缓存
+- WAL 模式，读写并发；写入冲突时由 busy_timeout 等待
+- 按字节数淘汰：总大小超过 QUERY_CACHE_MAX_BYTES 时按最近访问时间淘汰最旧条目
+- 每个条目记录 SQL 读取的表及写入时的表数据版本，可按表精确失效
+- 路径留空时使用进程内的内存数据库（不跨进程共享）
+
+结果以 JSON 序列化（与 SSE 输出一致，Decimal/日期等类型转为字符串）。
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 表结构变化时递增，打开旧版本的缓存文件时直接重建（缓存数据可丢弃）
+_SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS query_cache (
+    cache_key TEXT PRIMARY KEY,
+    tenant_id INTEGER,
+    connection_id INTEGER NOT NULL,
+    query TEXT NOT NULL,
+    sql TEXT NOT NULL,
+    result TEXT,
+    tables TEXT NOT NULL DEFAULT '[]',
+    table_versions TEXT NOT NULL DEFAULT '{}',
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    hit_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_query_cache_accessed_at ON query_cache (accessed_at);
+CREATE INDEX IF NOT EXISTS ix_query_cache_connection ON query_cache (connection_id);
+"""
+
+
+class QueryCacheStore:
+    """
+    SQLite 缓存存储
+
+    每个进程持有一个连接，进程内通过锁串行化访问；进程间由 SQLite 文件锁协调。
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self._path = path or ":memory:"
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self._path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self._path)), exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout = 5000")
+            if self._path != ":memory:":
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.execute("PRAGMA synchronous = NORMAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS query_cache")
+                conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+            logger.info(f"Query cache store opened: {self._path}")
+        return self._conn
+
+    # ===== 对外接口 =====
+
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """读取未过期的条目并更新访问时间；不存在或已过期返回 None"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT query, connection_id, tenant_id, sql, result, created_at, hit_count, "
+                "tables, table_versions, expires_at "
+                "FROM query_cache WHERE cache_key = ?",
+                (cache_key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now >= row[9]:
+                conn.execute("DELETE FROM query_cache WHERE cache_key = ?", (cache_key,))
+                return None
+            conn.execute(
+                "UPDATE query_cache SET accessed_at = ?, hit_count = hit_count + 1 WHERE cache_key = ?",
+                (now, cache_key)
+            )
+        return {
+            "query": row[0],
+            "connection_id": row[1],
+            "tenant_id": row[2],
+            "sql": row[3],
+            "result": json.loads(row[4]) if row[4] is not None else None,
+            "created_at": row[5],
+            "hit_count": row[6] + 1,
+            "tables": json.loads(row[7]),
+            "table_versions": json.loads(row[8]),
+        }
+
+    def put(
+        self,
+        cache_key: str,
+        query: str,
+        connection_id: int,
+        tenant_id: Optional[int],
+        sql: str,
+        result: Any,
+        ttl: float,
+        tables: Optional[List[str]] = None,
+        table_versions: Optional[Dict[str, Optional[str]]] = None
+    ) -> bool:
+        """写入（覆盖）条目，超过总字节上限时淘汰最久未访问的条目；单条超过上限时不缓存"""
+        payload = json.dumps(result, ensure_ascii=False, default=str) if result is not None else None
+        size = len(cache_key) + len(query.encode()) + len(sql.encode()) + (len(payload.encode()) if payload else 0)
+        if size > self._max_bytes:
+            logger.debug(f"Query cache entry too large ({size} bytes), skipped")
+            return False
+
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO query_cache "
+                    "(cache_key, tenant_id, connection_id, query, sql, result, tables, table_versions, "
+                    "size, created_at, expires_at, accessed_at, hit_count) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                    (
+                        cache_key, tenant_id, connection_id, query, sql, payload,
+                        json.dumps(sorted(tables or [])), json.dumps(table_versions or {}),
+                        size, now, now + ttl, now
+                    )
+                )
+                self._evict(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def delete_connection(self, connection_id: int) -> int:
+        """删除指定连接的全部条目，返回删除数量"""
+        with self._lock:
+            cursor = self._connect().execute("DELETE FROM query_cache WHERE connection_id = ?", (connection_id,))
+            return cursor.rowcount
+
+    def delete(self, cache_key: str) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM query_cache WHERE cache_key = ?", (cache_key,))
+
+    def delete_tables(self, connection_id: int, tables: List[str]) -> int:
+        """删除指定连接下读取了任一给定表的条目，返回删除数量"""
+        names = sorted({t.lower() for t in tables})
+        if not names:
+            return 0
+        placeholders = ", ".join("?" for _ in names)
+        with self._lock:
+            cursor = self._connect().execute(
+                "DELETE FROM query_cache WHERE connection_id = ? AND EXISTS ("
+                f"SELECT 1 FROM json_each(query_cache.tables) WHERE json_each.value IN ({placeholders}))",
+                (connection_id, *names)
+            )
+            return cursor.rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM query_cache")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, total = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM query_cache"
+            ).fetchone()
+        return {"entries": count, "bytes": total, "max_bytes": self._max_bytes, "path": self._path}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ===== 内部方法 =====
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """按最近访问时间从旧到新删除，直到总大小不超过上限"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM query_cache").fetchone()[0]
+        if total <= self._max_bytes:
+            return
+        excess = total - self._max_bytes
+        victims = []
+        freed = 0
+        for cache_key, size in conn.execute("SELECT cache_key, size FROM query_cache ORDER BY accessed_at"):
+            victims.append((cache_key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM query_cache WHERE cache_key = ?", victims)
+        logger.debug(f"Query cache eviction: removed {len(victims)} entries ({freed} bytes)")
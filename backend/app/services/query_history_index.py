@@ -0,0 +1,343 @@
+"""
+查询历史向量索引 (Query History Vector Index)
+
+按租户在进程内维护查询历史的向量索引，相似查询检索不再每次全表加载并逐行计算余弦相似度。
+
+特性：
+- 归一化的 float32 矩阵，一次矩阵-向量乘法 + argpartition 取 top-k
+- 懒加载：首次检索时从持久化文件加载，再从数据库补齐文件之后新增的记录
+- tenant_id 为空时与原逻辑一致，检索全部租户的历史
+- 增量更新：save_query 写库后直接追加到已加载的索引
+- 持久化：向量矩阵保存为 .npy 文件，加载时以 mmap 方式打开，不占用常驻内存
+- LRU 淘汰：最多保留 QUERY_HISTORY_INDEX_MAX_TENANTS 个租户的索引
+- 跨进程：距上次同步超过 QUERY_HISTORY_INDEX_SYNC_INTERVAL 秒时按主键增量拉取新记录
+
+使用方式：
+    from app.services.query_history_index import query_history_index
+
+    hits = query_history_index.search(db, tenant_id, embedding, connection_id=1, limit=5, threshold=0.7)
+    # [(query_history_id, similarity), ...]
+
+    query_history_index.add(tenant_id, history.id, history.connection_id, history.embedding)
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 元数据矩阵中 connection_id 为空时的占位值
+_NO_CONNECTION = -1
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+def _parse_embedding(embedding: Any) -> Optional[List[float]]:
+    if isinstance(embedding, str):
+        embedding = json.loads(embedding)
+    return embedding or None
+
+
+class TenantVectorIndex:
+    """
+    单个租户的查询历史向量索引
+
+    base 为已持久化的矩阵（mmap 只读），新追加的向量先放在内存 tail 中，
+    累积到 QUERY_HISTORY_INDEX_FLUSH_SIZE 条后与 base 合并写回文件。
+    """
+
+    def __init__(self, tenant_id: Optional[int], directory: Optional[str]):
+        self.tenant_id = tenant_id
+        self._directory = directory
+        self.dim: Optional[int] = None
+        self.synced_id = 0  # 已从数据库同步到的最大 ID（本进程 add 的记录不推进）
+        self.synced_at = 0.0
+        self._base_vectors: Optional[np.ndarray] = None
+        self._base_meta: Optional[np.ndarray] = None  # shape (n, 2): [id, connection_id]
+        self._tail_vectors: List[np.ndarray] = []
+        self._tail_meta: List[Tuple[int, int]] = []
+        self._ids = set()
+        self._persisted_id = 0
+        self._lock = threading.RLock()
+
+    # ===== 加载 / 持久化 =====
+
+    def _paths(self) -> Optional[Tuple[str, str]]:
+        if not self._directory:
+            return None
+        name = f"tenant_{'all' if self.tenant_id is None else self.tenant_id}"
+        return (
+            os.path.join(self._directory, f"{name}.vectors.npy"),
+            os.path.join(self._directory, f"{name}.meta.npz"),
+        )
+
+    def load(self) -> None:
+        """从持久化文件加载（文件不存在或损坏时从空索引开始）"""
+        paths = self._paths()
+        if not paths or not all(os.path.exists(p) for p in paths):
+            return
+        try:
+            vectors = np.load(paths[0], mmap_mode="r")
+            with np.load(paths[1]) as data:
+                meta = data["meta"]
+                synced_id = int(data["synced_id"])
+            if vectors.ndim != 2 or len(vectors) != len(meta):
+                raise ValueError("vectors/meta size mismatch")
+        except Exception as e:
+            logger.warning(f"Ignoring corrupt query history index for tenant {self.tenant_id}: {e}")
+            return
+        with self._lock:
+            self._base_vectors = vectors
+            self._base_meta = meta
+            self.dim = vectors.shape[1] if len(vectors) else None
+            self._ids = set(meta[:, 0].tolist())
+            self.synced_id = self._persisted_id = synced_id
+
+    def flush(self) -> None:
+        """将内存中追加的向量合并写回文件，并重新以 mmap 打开"""
+        paths = self._paths()
+        with self._lock:
+            if not paths or (not self._tail_vectors and self._persisted_id == self.synced_id):
+                return
+            vectors, meta = self._merged()
+            try:
+                os.makedirs(self._directory, exist_ok=True)
+                tmp_vectors, tmp_meta = f"{paths[0]}.tmp", f"{paths[1]}.tmp"
+                with open(tmp_vectors, "wb") as f:
+                    np.save(f, vectors)
+                with open(tmp_meta, "wb") as f:
+                    np.savez(f, meta=meta, synced_id=np.int64(self.synced_id))
+                os.replace(tmp_vectors, paths[0])
+                os.replace(tmp_meta, paths[1])
+                self._persisted_id = self.synced_id
+                self._base_vectors = np.load(paths[0], mmap_mode="r")
+            except Exception as e:
+                logger.warning(f"Failed to persist query history index for tenant {self.tenant_id}: {e}")
+                self._base_vectors = vectors
+            self._base_meta = meta
+            self._tail_vectors = []
+            self._tail_meta = []
+
+    def _merged(self) -> Tuple[np.ndarray, np.ndarray]:
+        parts_v = [] if self._base_vectors is None else [np.asarray(self._base_vectors)]
+        parts_m = [] if self._base_meta is None else [self._base_meta]
+        if self._tail_vectors:
+            parts_v.append(np.vstack(self._tail_vectors))
+            parts_m.append(np.asarray(self._tail_meta, dtype=np.int64))
+        if not parts_v:
+            return np.zeros((0, self.dim or 0), dtype=np.float32), np.zeros((0, 2), dtype=np.int64)
+        return np.vstack(parts_v), np.vstack(parts_m)
+
+    # ===== 写入 / 检索 =====
+
+    def add_many(self, rows: Sequence[Tuple[int, Optional[int], Any]]) -> int:
+        """追加 (id, connection_id, embedding) 记录，已存在或维度不一致的记录会被跳过"""
+        ids, connections, vectors = [], [], []
+        with self._lock:
+            for history_id, connection_id, embedding in rows:
+                embedding = _parse_embedding(embedding)
+                if not embedding or history_id in self._ids:
+                    continue
+                if self.dim is None:
+                    self.dim = len(embedding)
+                if len(embedding) != self.dim:
+                    continue
+                ids.append(int(history_id))
+                connections.append(_NO_CONNECTION if connection_id is None else int(connection_id))
+                vectors.append(embedding)
+                self._ids.add(history_id)
+            if not vectors:
+                return 0
+            self._tail_vectors.append(_normalize_rows(np.asarray(vectors, dtype=np.float32)))
+            self._tail_meta.extend(zip(ids, connections))
+            pending = sum(len(v) for v in self._tail_vectors)
+        if pending >= settings.QUERY_HISTORY_INDEX_FLUSH_SIZE:
+            self.flush()
+        return len(vectors)
+
+    def search(
+        self,
+        embedding: Sequence[float],
+        connection_id: Optional[int] = None,
+        limit: int = 5,
+        threshold: float = 0.7
+    ) -> List[Tuple[int, float]]:
+        """返回相似度不低于阈值的 top-k (id, similarity)，按相似度降序"""
+        with self._lock:
+            if self.dim is None or len(embedding) != self.dim or limit <= 0:
+                return []
+            query = np.asarray(embedding, dtype=np.float32)
+            norm = np.linalg.norm(query)
+            if norm == 0:
+                return []
+            query = query / norm
+            blocks = []
+            if self._base_vectors is not None and len(self._base_vectors):
+                blocks.append((self._base_vectors, self._base_meta))
+            if self._tail_vectors:
+                blocks.append((np.vstack(self._tail_vectors), np.asarray(self._tail_meta, dtype=np.int64)))
+
+        scores_parts, meta_parts = [], []
+        for vectors, meta in blocks:
+            scores = vectors @ query
+            mask = scores >= threshold
+            if connection_id is not None:
+                mask &= meta[:, 1] == connection_id
+            scores_parts.append(scores[mask])
+            meta_parts.append(meta[mask, 0])
+        if not scores_parts:
+            return []
+        scores = np.concatenate(scores_parts)
+        ids = np.concatenate(meta_parts)
+        if len(scores) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            scores, ids = scores[top], ids[top]
+        order = np.argsort(-scores, kind="stable")
+        return [(int(ids[i]), float(scores[i])) for i in order]
+
+    def __len__(self) -> int:
+        with self._lock:
+            base = 0 if self._base_vectors is None else len(self._base_vectors)
+            return base + sum(len(v) for v in self._tail_vectors)
+
+
+class QueryHistoryIndex:
+    """
+    按租户管理 TenantVectorIndex（LRU）
+
+    线程安全；淘汰的租户索引会先写回文件。
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_tenants: Optional[int] = None,
+        sync_interval: Optional[float] = None
+    ):
+        self._directory = settings.QUERY_HISTORY_INDEX_DIR if directory is None else directory
+        self._max_tenants = max_tenants or settings.QUERY_HISTORY_INDEX_MAX_TENANTS
+        self._sync_interval = settings.QUERY_HISTORY_INDEX_SYNC_INTERVAL if sync_interval is None else sync_interval
+        self._indexes: "OrderedDict[Optional[int], TenantVectorIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks: Dict[Optional[int], threading.Lock] = {}
+
+    # ===== 对外接口 =====
+
+    def search(
+        self,
+        db: Session,
+        tenant_id: Optional[int],
+        embedding: Sequence[float],
+        connection_id: Optional[int] = None,
+        limit: int = 5,
+        threshold: float = 0.7
+    ) -> List[Tuple[int, float]]:
+        """在租户的查询历史中检索相似查询，返回 [(query_history_id, similarity)]"""
+        index = self._get_index(db, tenant_id)
+        return index.search(embedding, connection_id=connection_id, limit=limit, threshold=threshold)
+
+    def add(self, tenant_id: Optional[int], history_id: int, connection_id: Optional[int], embedding: Any) -> None:
+        """新增查询历史后调用；租户索引未加载时忽略（下次加载时会从数据库补齐）"""
+        with self._lock:
+            # 同时更新“全部租户”索引（tenant_id 为空的检索）
+            indexes = [self._indexes.get(key) for key in {tenant_id, None}]
+        for index in indexes:
+            if index is not None:
+                index.add_many([(history_id, connection_id, embedding)])
+
+    def invalidate(self, tenant_id: Optional[int] = None) -> None:
+        """丢弃内存中的索引（tenant_id 为空时丢弃全部），持久化文件保留"""
+        with self._lock:
+            if tenant_id is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(tenant_id, None)
+
+    def flush_all(self) -> None:
+        """将所有租户未落盘的向量写回文件（应用关闭时调用）"""
+        with self._lock:
+            indexes = list(self._indexes.values())
+        for index in indexes:
+            index.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "loaded_tenants": len(self._indexes),
+                "vectors": sum(len(index) for index in self._indexes.values()),
+                "directory": self._directory,
+            }
+
+    # ===== 内部方法 =====
+
+    def _get_index(self, db: Session, tenant_id: Optional[int]) -> TenantVectorIndex:
+        with self._lock:
+            index = self._indexes.get(tenant_id)
+            if index is not None:
+                self._indexes.move_to_end(tenant_id)
+            build_lock = self._build_locks.setdefault(tenant_id, threading.Lock())
+
+        if index is not None and time.monotonic() - index.synced_at < self._sync_interval:
+            return index
+
+        with build_lock:
+            with self._lock:
+                index = self._indexes.get(tenant_id)
+            if index is None:
+                index = TenantVectorIndex(tenant_id, self._directory)
+                index.load()
+            if time.monotonic() - index.synced_at >= self._sync_interval:
+                self._catch_up(db, index)
+            self._store(tenant_id, index)
+        return index
+
+    def _store(self, tenant_id: Optional[int], index: TenantVectorIndex) -> None:
+        evicted = []
+        with self._lock:
+            self._indexes[tenant_id] = index
+            self._indexes.move_to_end(tenant_id)
+            while len(self._indexes) > self._max_tenants:
+                evicted.append(self._indexes.popitem(last=False)[1])
+        for old in evicted:
+            old.flush()
+
+    @staticmethod
+    def _catch_up(db: Session, index: TenantVectorIndex) -> None:
+        """按主键拉取同步水位之后的新记录（已通过 add 加入的记录会被跳过）"""
+        from app.models.query_history import QueryHistory
+
+        start = time.perf_counter()
+        query = db.query(QueryHistory.id, QueryHistory.connection_id, QueryHistory.embedding).filter(
+            QueryHistory.embedding.isnot(None),
+            QueryHistory.id > index.synced_id,
+        )
+        if index.tenant_id is not None:
+            query = query.filter(QueryHistory.tenant_id == index.tenant_id)
+        rows = query.order_by(QueryHistory.id).all()
+        added = index.add_many(rows)
+        if rows:
+            index.synced_id = max(index.synced_id, int(rows[-1][0]))
+        index.synced_at = time.monotonic()
+        if rows:
+            index.flush()
+            logger.info(
+                f"Query history index for tenant {index.tenant_id}: +{added} vectors "
+                f"({len(index)} total) in {(time.perf_counter() - start) * 1000:.1f}ms"
+            )
+
+
+# 创建全局实例
+query_history_index = QueryHistoryIndex()
@@ -1,9 +1,8 @@
-import json
-import numpy as np
 from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
 from app.models.query_history import QueryHistory
 from app.core.llms import get_default_embedding_model
+from app.services.query_history_index import query_history_index
 
 class QueryHistoryService:
     """
@@ -56,6 +55,8 @@ class QueryHistoryService:
         self.db.add(history)
         self.db.commit()
         self.db.refresh(history)
+        if embedding:
+            query_history_index.add(tenant_id, history.id, connection_id, embedding)
         return history
 
     def find_similar_queries(
@@ -83,48 +84,27 @@ class QueryHistoryService:
 
         try:
             target_embedding = self.embedding_model.embed_query(query_text)
-            
-            # 构建查询，按租户过滤
-            query = self.db.query(QueryHistory).filter(
-                QueryHistory.embedding.isnot(None)
+
+            # 多租户隔离: 在该租户的向量索引中检索，可选按连接ID过滤
+            hits = query_history_index.search(
+                self.db,
+                tenant_id,
+                target_embedding,
+                connection_id=connection_id,
+                limit=limit,
+                threshold=threshold
             )
-            
-            # 多租户隔离: 只查询指定租户的数据
-            if tenant_id is not None:
-                query = query.filter(QueryHistory.tenant_id == tenant_id)
-            
-            # 可选: 按连接ID过滤
-            if connection_id is not None:
-                query = query.filter(QueryHistory.connection_id == connection_id)
-            
-            history_items = query.all()
-            
-            results = []
-            for item in history_items:
-                if not item.embedding:
-                    continue
-                
-                # Calculate cosine similarity
-                item_embedding = item.embedding
-                if isinstance(item_embedding, str):
-                    item_embedding = json.loads(item_embedding)
-                
-                similarity = self._cosine_similarity(target_embedding, item_embedding)
-                
-                if similarity >= threshold:
-                    results.append((similarity, item))
-            
-            # Sort by similarity desc
-            results.sort(key=lambda x: x[0], reverse=True)
-            
-            return [item for _, item in results[:limit]]
-            
+            if not hits:
+                return []
+
+            items = self.db.query(QueryHistory).filter(
+                QueryHistory.id.in_([history_id for history_id, _ in hits])
+            ).all()
+            items_by_id = {item.id: item for item in items}
+
+            # Keep similarity order
+            return [items_by_id[history_id] for history_id, _ in hits if history_id in items_by_id]
+
         except Exception as e:
             print(f"Error searching similar queries: {e}")
             return []
-
-    def _cosine_similarity(self, v1, v2):
-        dot_product = np.dot(v1, v2)
-        norm_v1 = np.linalg.norm(v1)
-        norm_v2 = np.linalg.norm(v2)
-        return dot_product / (norm_v1 * norm_v2)
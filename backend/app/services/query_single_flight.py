@@ -0,0 +1,185 @@
+"""
+相同查询合并执行 (Query Single-Flight)
+
+多个用户同时提交相同问题（同一租户、同一连接）时，只执行一次完整的查询流程：
+- 第一个请求（leader）在后台任务中执行，产生的事件写入共享缓冲区
+- 之后到达的相同请求（follower）不再执行，从头回放缓冲区并等待后续事件
+- 执行结束后立即移除，之后的相同请求重新执行（结果复用由查询缓存负责）
+- 所有订阅方都断开连接时取消执行（与单个请求断开时取消 SQL 的行为一致）
+
+键由调用方通过 make_key 生成（与 QueryCacheService 的缓存键一致，包含租户隔离）。
+
+启用 Checkpointer 时，每个请求有自己的会话（thread）：只合并新会话的请求（is_new_thread），
+follower 结束后用 copy_thread_state 把 leader 会话的最终状态写入自己的会话，
+之后可以在自己的会话上继续多轮对话，与独立执行一致。
+
+使用方式：
+    from app.services.query_single_flight import query_single_flight
+
+    key = query_single_flight.make_key(query, connection_id, tenant_id, "stream")
+    async for event in query_single_flight.stream(key, lambda: produce_events()):
+        ...
+    result = await query_single_flight.run(key, lambda: graph.process_query(...))
+    await copy_thread_state(compiled_graph, leader_thread_id, thread_id)
+"""
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """一次共享执行：事件缓冲区 + 订阅方计数"""
+
+    def __init__(self):
+        self.events: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._waiter = asyncio.Event()
+
+    def notify(self) -> None:
+        self._waiter.set()
+        self._waiter = asyncio.Event()
+
+    async def wait(self) -> None:
+        await self._waiter.wait()
+
+
+class QuerySingleFlight:
+    """
+    相同查询合并执行
+
+    只在单个事件循环（单个 worker 进程）内合并。
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._stats = {"leaders": 0, "followers": 0}
+
+    @staticmethod
+    def make_key(query: str, connection_id: int, tenant_id: Optional[int] = None, *variant: Any) -> str:
+        """生成合并键：查询缓存键 + 变体（如接口类型、智能体 ID）"""
+        from app.services.query_cache_service import get_cache_service
+
+        key = get_cache_service()._make_cache_key(query, connection_id, tenant_id)
+        return ":".join([key, *(str(v) for v in variant)])
+
+    # ===== 对外接口 =====
+
+    async def stream(self, key: str, source: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """
+        订阅 key 对应的事件流，没有执行中的流时调用 source() 开始执行
+
+        每个订阅方都会收到完整的事件序列；执行出错时每个订阅方都会收到该异常。
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            flight.task = asyncio.create_task(self._produce(key, flight, source))
+            self._stats["leaders"] += 1
+        else:
+            self._stats["followers"] += 1
+            logger.info(f"Single-flight: joined in-flight query {key[:12]} ({flight.subscribers} waiting)")
+
+        flight.subscribers += 1
+        index = 0
+        try:
+            while True:
+                if index < len(flight.events):
+                    index += 1
+                    yield flight.events[index - 1]
+                elif flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                else:
+                    await flight.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # 所有订阅方都已离开，取消执行；新请求不再加入这次执行
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """合并执行单个协程，返回共享的结果"""
+        async def source():
+            yield await factory()
+
+        events = self.stream(key, source)
+        try:
+            return await events.__anext__()
+        finally:
+            await events.aclose()
+
+    def get_stats(self) -> Dict[str, int]:
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._flights)
+        return stats
+
+    # ===== 内部方法 =====
+
+    async def _produce(self, key: str, flight: _Flight, source: Callable[[], AsyncIterator[Any]]) -> None:
+        try:
+            async for event in source():
+                flight.events.append(event)
+                flight.notify()
+        except (Exception, asyncio.CancelledError) as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.notify()
+
+
+async def is_new_thread(checkpointer: Any, thread_id: str) -> bool:
+    """会话是否还没有任何 checkpoint（未启用 Checkpointer 时视为新会话）"""
+    if checkpointer is None:
+        return True
+    return await checkpointer.aget_tuple({"configurable": {"thread_id": thread_id}}) is None
+
+
+async def copy_thread_state(graph: Any, source_thread_id: str, thread_id: str) -> bool:
+    """
+    把 leader 会话的最终状态写入 follower 自己的会话
+
+    Args:
+        graph: 编译后的 LangGraph 图（与 leader 执行时使用同一 Checkpointer）
+        source_thread_id: leader 的会话 ID
+        thread_id: follower 的会话 ID
+
+    Returns:
+        是否可以直接复用 leader 的结果；leader 停在中断（如等待澄清）时返回 False，
+        follower 应自行执行，之后才能在自己的会话上 resume
+    """
+    if source_thread_id == thread_id or graph.checkpointer is None:
+        return True
+
+    history = [
+        snapshot async for snapshot in
+        graph.aget_state_history({"configurable": {"thread_id": source_thread_id}}, limit=2)
+    ]
+    if not history:
+        # leader 没有进入图（如闲聊路由），没有会话状态
+        return True
+    final = history[0]
+    if final.next:
+        return False
+
+    values = dict(final.values)
+    if "thread_id" in values:
+        values["thread_id"] = thread_id
+    # 以 leader 最后一步执行的节点写入，写入后的会话没有待执行节点
+    as_node = history[1].next[-1] if len(history) > 1 and history[1].next else None
+    await graph.aupdate_state({"configurable": {"thread_id": thread_id}}, values, as_node=as_node)
+    logger.info(f"Single-flight: copied final state of thread {source_thread_id} into {thread_id}")
+    return True
+
+
+# 创建全局实例
+query_single_flight = QuerySingleFlight()
@@ -104,6 +104,9 @@ class ResultValidator:
         
         # 3. 行数限制检查
         self._check_row_count(validation, row_count)
+        if data.get("truncated"):
+            validation.add_warning(f"结果已截断，仅返回前 {row_count} 行")
+            validation.add_suggestion("添加筛选条件或聚合以缩小结果集")
         
         # 4. 数据质量检查
         self._check_data_quality(validation, columns, rows)
@@ -203,7 +206,7 @@ class ResultValidator:
         
         for row in sample_rows:
             # 处理列表格式
-            if isinstance(row, list):
+            if isinstance(row, (list, tuple)):
                 if len(row) != len(columns):
                     validation.add_warning(f"数据列数（{len(row)}）与列名数（{len(columns)}）不匹配")
                     break
@@ -237,7 +240,7 @@ class ResultValidator:
         total_rows = len(rows)
         
         for row in rows[:100]:  # 只检查前 100 行
-            if isinstance(row, list):
+            if isinstance(row, (list, tuple)):
                 for i, val in enumerate(row):
                     if i < len(columns) and val is None:
                         null_counts[columns[i]] += 1
@@ -19,6 +19,7 @@ from .discovery import (
 # Persistence 模块
 from .persistence import (
     save_discovered_schema,
+    save_published_schema,
     sync_schema_to_graph_db,
 )
 
@@ -31,5 +32,6 @@ __all__ = [
     "discover_sqlite_schema",
     # Persistence
     "save_discovered_schema",
+    "save_published_schema",
     "sync_schema_to_graph_db",
 ]
@@ -21,10 +21,9 @@ def discover_generic_schema(inspector) -> List[Dict[str, Any]]:
         print(f"Warning: Could not get views: {str(view_error)}")
         views = []
 
-    print(f"Found {len(tables)} tables/views: {', '.join(tables)}")
+    print(f"Found {len(tables)} tables/views")
 
     for table_name in tables:
-        print(f"Processing table/view: {table_name}")
         table_info = {
             "table_name": table_name,
             "columns": [],
@@ -36,7 +35,6 @@ def discover_generic_schema(inspector) -> List[Dict[str, Any]]:
         # Get columns for each table
         try:
             columns = inspector.get_columns(table_name)
-            print(f"Found {len(columns)} columns in {table_name}")
 
             for column in columns:
                 column_info = {
@@ -52,7 +50,6 @@ def discover_generic_schema(inspector) -> List[Dict[str, Any]]:
             # Mark primary keys
             try:
                 pks = inspector.get_primary_keys(table_name)
-                print(f"Primary keys for {table_name}: {pks}")
                 for pk in pks:
                     for column in table_info["columns"]:
                         if column["column_name"] == pk:
@@ -65,17 +62,14 @@ def discover_generic_schema(inspector) -> List[Dict[str, Any]]:
                     col_name = column["column_name"].lower()
                     if col_name == 'id' or col_name.endswith('_id') or col_name == f"{table_name.lower()}_id":
                         if 'int' in column["data_type"].lower() or 'serial' in column["data_type"].lower():
-                            print(f"Identified potential primary key by naming convention: {column['column_name']}")
                             column["is_primary_key"] = True
 
             # Mark foreign keys
             try:
                 fks = inspector.get_foreign_keys(table_name)
-                print(f"Foreign keys for {table_name}: {len(fks)}")
                 
                 # Process explicit foreign keys
                 for fk in fks:
-                    print(f"  FK: {fk}")
                     # 处理复合外键
                     for i, constrained_column in enumerate(fk["constrained_columns"]):
                         for column in table_info["columns"]:
@@ -93,7 +87,6 @@ def discover_generic_schema(inspector) -> List[Dict[str, Any]]:
                 
                 # If no foreign keys found, try to infer from naming convention
                 if len(fks) == 0:
-                    print(f"No explicit foreign keys found for {table_name}, attempting to infer from naming convention")
                     for column in table_info["columns"]:
                         col_name = column["column_name"].lower()
 
@@ -127,7 +120,6 @@ def discover_generic_schema(inspector) -> List[Dict[str, Any]]:
                             
                             # 如果找到匹配的表，标记为外键
                             if matched_table:
-                                print(f"Identified potential foreign key by naming convention: {column['column_name']} -> {matched_table}")
                                 column["is_foreign_key"] = True
                                 column["references"] = {
                                     "table": matched_table,
@@ -141,7 +133,6 @@ def discover_generic_schema(inspector) -> List[Dict[str, Any]]:
                         elif not column["is_primary_key"] and not column["is_foreign_key"]:
                             for table_name_to_check in tables:
                                 if col_name == table_name_to_check.lower() or col_name == f"{table_name_to_check.lower()}id":
-                                    print(f"Identified potential foreign key by table name match: {column['column_name']} -> {table_name_to_check}")
                                     column["is_foreign_key"] = True
                                     column["references"] = {
                                         "table": table_name_to_check,
@@ -168,7 +159,6 @@ def discover_generic_schema(inspector) -> List[Dict[str, Any]]:
 
                         # 如果表存在，标记为外键
                         if table_exists:
-                            print(f"Identified potential foreign key by naming convention: {column['column_name']} -> {potential_table}")
                             column["is_foreign_key"] = True
                             column["references"] = {
                                 "table": next(t for t in tables if t.lower() == potential_table),
@@ -182,7 +172,6 @@ def discover_generic_schema(inspector) -> List[Dict[str, Any]]:
                     elif not column["is_primary_key"] and not column["is_foreign_key"]:
                         for table_name_to_check in tables:
                             if col_name == table_name_to_check.lower() or col_name == f"{table_name_to_check.lower()}id":
-                                print(f"Identified potential foreign key by table name match: {column['column_name']} -> {table_name_to_check}")
                                 column["is_foreign_key"] = True
                                 column["references"] = {
                                     "table": table_name_to_check,
@@ -196,9 +185,7 @@ def discover_generic_schema(inspector) -> List[Dict[str, Any]]:
             # 获取唯一约束
             try:
                 unique_constraints = inspector.get_unique_constraints(table_name)
-                print(f"Unique constraints for {table_name}: {len(unique_constraints)}")
                 for uc in unique_constraints:
-                    print(f"  UC: {uc}")
                     table_info["unique_constraints"].append(uc)
 
                     # 标记列为唯一
@@ -211,9 +198,7 @@ def discover_generic_schema(inspector) -> List[Dict[str, Any]]:
             # 获取索引
             try:
                 indexes = inspector.get_indexes(table_name)
-                print(f"Indexes for {table_name}: {len(indexes)}")
                 for idx in indexes:
-                    print(f"  Index: {idx}")
                     table_info["indexes"].append(idx)
 
                     # 标记列为唯一（如果索引是唯一的）
@@ -1,12 +1,17 @@
 """
 Schema 发现主入口
 根据数据库类型选择合适的发现方法
+
+元数据先通过 CachedInspector 按表分块批量反射（可并行），
+各数据库的发现方法随后只读取内存中的反射结果。
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional
 
+from app.core.config import settings
 from app.models.db_connection import DBConnection
-from app.services.db_service import get_db_engine
+from app.services.db_service import get_pooled_engine
+from app.services.schema_utils import CachedInspector
 from sqlalchemy import inspect
 
 from .generic import discover_generic_schema
@@ -14,26 +19,55 @@ from .mysql import discover_mysql_schema
 from .postgresql import discover_postgresql_schema
 from .sqlite import discover_sqlite_schema
 
+# 进度回调：(阶段, 已完成数, 总数)，阶段为 "tables" / "reflect" / "analyze"
+ProgressCallback = Callable[[str, int, int], None]
+
 
-def discover_schema(connection: DBConnection) -> List[Dict[str, Any]]:
+def discover_schema(connection: DBConnection, progress_callback: Optional[ProgressCallback] = None) -> List[Dict[str, Any]]:
     """
     Discover schema from a database connection.
     """
+    def report(stage: str, done: int, total: int) -> None:
+        if progress_callback:
+            progress_callback(stage, done, total)
+
     try:
         print(f"Discovering schema for {connection.name} ({connection.db_type} at {connection.host}:{connection.port}/{connection.database_name})")
-        engine = get_db_engine(connection)
-        inspector = inspect(engine)
+        engine = get_pooled_engine(connection)
+        inspector = CachedInspector(inspect(engine))
+        db_type = connection.db_type.lower()
+
+        # 批量预取所有表/视图的元数据，通用发现方法额外需要唯一约束和索引
+        tables = inspector.get_table_names()
+        try:
+            tables += inspector.get_view_names()
+        except Exception:
+            pass
+        report("tables", len(tables), len(tables))
+
+        methods = None if db_type not in ("mysql", "postgresql", "sqlite") else (
+            "get_columns", "get_pk_constraint", "get_foreign_keys"
+        )
+        inspector.prefetch(
+            tables,
+            methods=methods,
+            chunk_size=settings.SCHEMA_DISCOVERY_CHUNK_SIZE,
+            max_workers=settings.SCHEMA_DISCOVERY_MAX_WORKERS,
+            progress_callback=lambda done, total: report("reflect", done, total),
+        )
 
         # Choose the appropriate discovery method based on database type
-        if connection.db_type.lower() == "mysql":
-            return discover_mysql_schema(inspector)
-        elif connection.db_type.lower() == "postgresql":
-            return discover_postgresql_schema(inspector)
-        elif connection.db_type.lower() == "sqlite":
-            return discover_sqlite_schema(inspector)
+        if db_type == "mysql":
+            schema_info = discover_mysql_schema(inspector)
+        elif db_type == "postgresql":
+            schema_info = discover_postgresql_schema(inspector)
+        elif db_type == "sqlite":
+            schema_info = discover_sqlite_schema(inspector)
         else:
             # Default discovery method
-            return discover_generic_schema(inspector)
+            schema_info = discover_generic_schema(inspector)
+        report("analyze", len(schema_info), len(schema_info))
+        return schema_info
     except Exception as e:
         error_msg = f"Schema discovery failed: {str(e)}"
         print(error_msg)
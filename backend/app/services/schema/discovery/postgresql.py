@@ -22,10 +22,9 @@ def discover_postgresql_schema(inspector) -> List[Dict[str, Any]]:
         print(f"Warning: Could not get views: {str(view_error)}")
         views = []
 
-    print(f"Found {len(tables)} tables/views: {', '.join(tables)}")
+    print(f"Found {len(tables)} tables/views")
 
     for table_name in tables:
-        print(f"Processing table/view: {table_name}")
         table_info = {
             "table_name": table_name,
             "columns": [],
@@ -35,7 +34,6 @@ def discover_postgresql_schema(inspector) -> List[Dict[str, Any]]:
         # Get columns for each table
         try:
             columns = inspector.get_columns(table_name)
-            print(f"Found {len(columns)} columns in {table_name}")
 
             for column in columns:
                 column_info = {
@@ -50,7 +48,6 @@ def discover_postgresql_schema(inspector) -> List[Dict[str, Any]]:
             # Mark primary keys - PostgreSQL has reliable PK detection
             try:
                 pks = inspector.get_pk_constraint(table_name)["constrained_columns"]
-                print(f"Primary keys for {table_name}: {pks}")
                 for pk in pks:
                     for column in table_info["columns"]:
                         if column["column_name"] == pk:
@@ -62,17 +59,14 @@ def discover_postgresql_schema(inspector) -> List[Dict[str, Any]]:
                     col_name = column["column_name"].lower()
                     if col_name == 'id' or col_name.endswith('_id') or col_name == f"{table_name.lower()}_id":
                         if 'int' in column["data_type"].lower() or 'serial' in column["data_type"].lower():
-                            print(f"Identified potential primary key by naming convention: {column['column_name']}")
                             column["is_primary_key"] = True
 
             # Mark foreign keys - PostgreSQL has reliable FK detection
             try:
                 fks = inspector.get_foreign_keys(table_name)
-                print(f"Foreign keys for {table_name}: {len(fks)}")
                 
                 # Process explicit foreign keys
                 for fk in fks:
-                    print(f"  FK: {fk}")
                     for column in table_info["columns"]:
                         if column["column_name"] in fk["constrained_columns"]:
                             column["is_foreign_key"] = True
@@ -83,7 +77,6 @@ def discover_postgresql_schema(inspector) -> List[Dict[str, Any]]:
                 
                 # If no foreign keys found, try to infer from naming convention
                 if len(fks) == 0:
-                    print(f"No explicit foreign keys found for {table_name}, attempting to infer from naming convention")
                     for column in table_info["columns"]:
                         col_name = column["column_name"].lower()
                         if col_name.endswith('_id') and not column["is_primary_key"]:
@@ -114,7 +107,6 @@ def discover_postgresql_schema(inspector) -> List[Dict[str, Any]]:
                                         break
                             
                             if matched_table:
-                                print(f"Identified potential foreign key by naming convention: {column['column_name']} -> {matched_table}")
                                 column["is_foreign_key"] = True
                                 column["references"] = {
                                     "table": matched_table,
@@ -130,7 +122,6 @@ def discover_postgresql_schema(inspector) -> List[Dict[str, Any]]:
                         potential_table = col_name[:-3]  # Remove '_id' suffix
                         # Check if this table exists
                         if potential_table in [t.lower() for t in tables]:
-                            print(f"Identified potential foreign key by naming convention: {column['column_name']} -> {potential_table}")
                             column["is_foreign_key"] = True
                             column["references"] = {
                                 "table": next(t for t in tables if t.lower() == potential_table),
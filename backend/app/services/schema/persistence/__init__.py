@@ -3,10 +3,12 @@ Schema 持久化模块
 提供 Schema 保存和 Neo4j 同步功能
 """
 
-from .save import save_discovered_schema
+from .save import save_discovered_schema, save_published_schema, load_existing_schema
 from .neo4j_sync import sync_schema_to_graph_db
 
 __all__ = [
     "save_discovered_schema",
+    "save_published_schema",
+    "load_existing_schema",
     "sync_schema_to_graph_db",
 ]
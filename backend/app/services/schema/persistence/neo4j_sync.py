@@ -1,130 +1,241 @@
 """
 Neo4j 同步
 将 Schema 元数据同步到 Neo4j 图数据库
+
+- 批量写入：按 NEO4J_SYNC_BATCH_SIZE 分批 UNWIND，每批一个显式写事务
+- 唯一约束：Table.id / Column.id 唯一约束及 connection_id 索引，MERGE 走索引
+- 增量同步（默认）：读取图中已同步的 Schema 与当前 Schema 快照对比，
+  只写入新增/变更的表、列、关系，只删除已不存在的部分
+- 全量重建：删除该连接的 Table/Column 节点后整体重写
 """
 
-from neo4j import GraphDatabase
+import logging
+import threading
+from typing import Any, Dict, List, Tuple
 
 from app.core.config import settings
-from app import crud
+from app.services.neo4j_service import neo4j_service
+from app.services.schema_snapshot import schema_snapshot_cache
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA_CONSTRAINTS = [
+    "CREATE CONSTRAINT schema_table_id IF NOT EXISTS FOR (t:Table) REQUIRE t.id IS UNIQUE",
+    "CREATE CONSTRAINT schema_column_id IF NOT EXISTS FOR (c:Column) REQUIRE c.id IS UNIQUE",
+    "CREATE INDEX schema_table_connection IF NOT EXISTS FOR (t:Table) ON (t.connection_id)",
+    "CREATE INDEX schema_column_connection IF NOT EXISTS FOR (c:Column) ON (c.connection_id)",
+]
+_constraints_lock = threading.Lock()
+_constraints_ready = False
+
+# ===== 写入语句（UNWIND 批量） =====
+
+_UPSERT_TABLES = """
+UNWIND $rows AS row
+MERGE (t:Table {id: row.id})
+SET t.connection_id = row.connection_id, t.name = row.name, t.description = row.description
+"""
+
+_UPSERT_COLUMNS = """
+UNWIND $rows AS row
+MATCH (t:Table {id: row.table_id})
+MERGE (c:Column {id: row.id})
+SET c.connection_id = row.connection_id, c.name = row.name, c.type = row.type,
+    c.description = row.description, c.is_pk = row.is_pk, c.is_fk = row.is_fk
+MERGE (t)-[:HAS_COLUMN]->(c)
+"""
+
+_UPSERT_RELATIONSHIPS = """
+UNWIND $rows AS row
+MATCH (source:Column {id: row.source_column_id})
+MATCH (target:Column {id: row.target_column_id})
+MERGE (source)-[r:REFERENCES]->(target)
+SET r.type = row.type, r.description = row.description, r.connection_id = row.connection_id
+"""
+
+_DELETE_TABLES = """
+UNWIND $rows AS id
+MATCH (t:Table {id: id})
+DETACH DELETE t
+"""
+
+_DELETE_COLUMNS = """
+UNWIND $rows AS id
+MATCH (c:Column {id: id})
+DETACH DELETE c
+"""
+
+_DELETE_RELATIONSHIPS = """
+UNWIND $rows AS row
+MATCH (:Column {id: row.source_column_id})-[r:REFERENCES]->(:Column {id: row.target_column_id})
+DELETE r
+"""
+
+# ===== 读取图中已同步的 Schema =====
 
+_READ_TABLES = """
+MATCH (t:Table {connection_id: $connection_id})
+RETURN t.id AS id, t.connection_id AS connection_id, t.name AS name, t.description AS description
+"""
+
+_READ_COLUMNS = """
+MATCH (c:Column {connection_id: $connection_id})
+OPTIONAL MATCH (t:Table)-[:HAS_COLUMN]->(c)
+RETURN c.id AS id, t.id AS table_id, c.connection_id AS connection_id, c.name AS name, c.type AS type,
+       c.description AS description, c.is_pk AS is_pk, c.is_fk AS is_fk
+"""
 
-def sync_schema_to_graph_db(connection_id: int):
+_READ_RELATIONSHIPS = """
+MATCH (source:Column {connection_id: $connection_id})-[r:REFERENCES]->(target:Column)
+RETURN source.id AS source_column_id, target.id AS target_column_id,
+       r.type AS type, r.description AS description, r.connection_id AS connection_id
+"""
+
+_CLEAR_SCHEMA = """
+MATCH (n {connection_id: $connection_id})
+WHERE n:Table OR n:Column
+DETACH DELETE n
+"""
+
+
+def sync_schema_to_graph_db(connection_id: int, incremental: bool = True):
     """
     Sync schema metadata to Neo4j graph database.
+
+    Args:
+        connection_id: 数据库连接ID
+        incremental: True 时只同步差异部分，False 时删除该连接的表/列节点后全量重建
+
+    Returns:
+        连接下有表时返回 True，否则返回 False
     """
+    # 发布/保存 Schema 后都会调用同步，先让内存快照失效（即使 Neo4j 不可用）
+    schema_snapshot_cache.invalidate(connection_id)
     try:
-        print(f"Starting sync to Neo4j for connection_id: {connection_id}")
-        # Connect to Neo4j
-        print(f"Connecting to Neo4j at {settings.NEO4J_URI} with user {settings.NEO4J_USER}")
-        driver = GraphDatabase.driver(
-            settings.NEO4J_URI,
-            auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
-        )
+        # Shared pooled Neo4j driver
+        driver = neo4j_service.get_driver()
+        if driver is None:
+            raise Exception("Neo4j driver unavailable")
+
+        from app.db.session import SessionLocal
+
+        db = SessionLocal()
+        try:
+            snapshot = schema_snapshot_cache.get(db, connection_id)
+        finally:
+            db.close()
+
+        desired_tables, desired_columns, desired_relationships = _build_rows(snapshot)
 
         with driver.session() as session:
-            # Clear existing schema for this connection
-            print(f"Clearing existing schema for connection_id: {connection_id}")
-            session.run(
-                "MATCH (n {connection_id: $connection_id}) DETACH DELETE n",
-                connection_id=connection_id
-            )
-
-            # Get all tables for this connection from MySQL
-            from sqlalchemy.orm import Session
-            from app.db.session import SessionLocal
-
-            db = SessionLocal()
-            try:
-                print(f"Fetching tables for connection_id: {connection_id}")
-                tables = crud.schema_table.get_by_connection(db=db, connection_id=connection_id)
-                print(f"Found {len(tables)} tables for connection_id: {connection_id}")
-
-                if len(tables) == 0:
-                    print(f"Warning: No tables found for connection_id: {connection_id}")
-                    return False
-
-                # Create Table nodes
-                for table in tables:
-                    print(f"Creating Table node for table: {table.table_name} (id: {table.id})")
-                    session.run(
-                        """
-                        CREATE (t:Table {
-                            id: $id,
-                            connection_id: $connection_id,
-                            name: $name,
-                            description: $description
-                        })
-                        """,
-                        id=table.id,
-                        connection_id=connection_id,
-                        name=table.table_name,
-                        description=table.description or ""
-                    )
-
-                    # Get columns for this table
-                    columns = crud.schema_column.get_by_table(db=db, table_id=table.id)
-                    print(f"Found {len(columns)} columns for table: {table.table_name}")
-
-                    # Create Column nodes and HAS_COLUMN relationships
-                    for column in columns:
-                        print(f"Creating Column node for column: {column.column_name} (id: {column.id})")
-                        session.run(
-                            """
-                            CREATE (c:Column {
-                                id: $id,
-                                name: $name,
-                                type: $type,
-                                description: $description,
-                                is_pk: $is_pk,
-                                is_fk: $is_fk,
-                                connection_id: $connection_id
-                            })
-                            WITH c
-                            MATCH (t:Table {id: $table_id})
-                            CREATE (t)-[:HAS_COLUMN]->(c)
-                            """,
-                            id=column.id,
-                            name=column.column_name,
-                            type=column.data_type,
-                            description=column.description or "",
-                            is_pk=column.is_primary_key,
-                            is_fk=column.is_foreign_key,
-                            connection_id=connection_id,
-                            table_id=table.id
-                        )
-
-                # Create FOREIGN_KEY relationships
-                relationships = crud.schema_relationship.get_by_connection(db=db, connection_id=connection_id)
-                print(f"Found {len(relationships)} relationships for connection_id: {connection_id}")
-
-                for rel in relationships:
-                    print(f"Creating REFERENCES relationship from column id: {rel.source_column_id} to column id: {rel.target_column_id}")
-                    session.run(
-                        """
-                        MATCH (source:Column {id: $source_column_id})
-                        MATCH (target:Column {id: $target_column_id})
-                        CREATE (source)-[:REFERENCES {
-                            type: $relationship_type,
-                            description: $description,
-                            connection_id: $connection_id
-                        }]->(target)
-                        """,
-                        source_column_id=rel.source_column_id,
-                        target_column_id=rel.target_column_id,
-                        relationship_type=rel.relationship_type or "unknown",
-                        description=rel.description or "",
-                        connection_id=connection_id
-                    )
-
-                print(f"Successfully synced schema to Neo4j for connection_id: {connection_id}")
-            finally:
-                db.close()
-
-        driver.close()
+            _ensure_constraints(session)
+
+            if incremental:
+                current_tables, current_columns, current_relationships = _read_graph_schema(session, connection_id)
+            else:
+                session.execute_write(_run_write, _CLEAR_SCHEMA, connection_id=connection_id)
+                current_tables, current_columns, current_relationships = {}, {}, {}
+
+            tables_upsert, tables_delete = _diff(desired_tables, current_tables)
+            columns_upsert, columns_delete = _diff(desired_columns, current_columns)
+            relationships_upsert, relationships_delete = _diff(desired_relationships, current_relationships)
+
+            # 先删关系和节点，再按 表 -> 列 -> 关系 的顺序写入
+            _write_batches(session, _DELETE_RELATIONSHIPS, [
+                {"source_column_id": s, "target_column_id": t} for s, t in relationships_delete
+            ])
+            _write_batches(session, _DELETE_COLUMNS, columns_delete)
+            _write_batches(session, _DELETE_TABLES, tables_delete)
+            _write_batches(session, _UPSERT_TABLES, tables_upsert)
+            _write_batches(session, _UPSERT_COLUMNS, columns_upsert)
+            _write_batches(session, _UPSERT_RELATIONSHIPS, relationships_upsert)
+
+        logger.info(
+            f"Synced schema to Neo4j for connection {connection_id} "
+            f"({'incremental' if incremental else 'full'}): "
+            f"tables +{len(tables_upsert)}/-{len(tables_delete)}, "
+            f"columns +{len(columns_upsert)}/-{len(columns_delete)}, "
+            f"relationships +{len(relationships_upsert)}/-{len(relationships_delete)}"
+        )
+
+        if not desired_tables:
+            logger.warning(f"No tables found for connection_id: {connection_id}")
+            return False
         return True
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"Graph DB sync failed: {str(e)}\n{error_trace}")
+        logger.exception(f"Graph DB sync failed for connection {connection_id}")
         raise Exception(f"Graph DB sync failed: {str(e)}")
+
+
+def _build_rows(snapshot) -> Tuple[Dict[Any, Dict], Dict[Any, Dict], Dict[Any, Dict]]:
+    """将 Schema 快照转换为图节点/关系属性（与图中存储格式一致）"""
+    connection_id = snapshot.connection_id
+    tables = {
+        t.id: {"id": t.id, "connection_id": connection_id, "name": t.name, "description": t.description}
+        for t in snapshot.tables.values()
+    }
+    columns = {
+        c.id: {
+            "id": c.id, "table_id": c.table_id, "connection_id": connection_id, "name": c.name,
+            "type": c.data_type, "description": c.description, "is_pk": c.is_primary_key, "is_fk": c.is_foreign_key
+        }
+        for c in snapshot.columns.values()
+    }
+    relationships = {}
+    for rel in snapshot.relationships:
+        if rel.source_column_id not in snapshot.columns or rel.target_column_id not in snapshot.columns:
+            continue
+        relationships[(rel.source_column_id, rel.target_column_id)] = {
+            "source_column_id": rel.source_column_id,
+            "target_column_id": rel.target_column_id,
+            "type": rel.relationship_type or "unknown",
+            "description": rel.description or "",
+            "connection_id": connection_id,
+        }
+    return tables, columns, relationships
+
+
+def _read_graph_schema(session, connection_id: int) -> Tuple[Dict[Any, Dict], Dict[Any, Dict], Dict[Any, Dict]]:
+    """读取图中该连接已同步的表、列、关系"""
+    tables = {row["id"]: row for row in session.run(_READ_TABLES, connection_id=connection_id).data()}
+    columns = {row["id"]: row for row in session.run(_READ_COLUMNS, connection_id=connection_id).data()}
+    relationships = {
+        (row["source_column_id"], row["target_column_id"]): row
+        for row in session.run(_READ_RELATIONSHIPS, connection_id=connection_id).data()
+    }
+    return tables, columns, relationships
+
+
+def _diff(desired: Dict[Any, Dict], current: Dict[Any, Dict]) -> Tuple[List[Dict], List[Any]]:
+    """对比期望状态与图中状态，返回 (需要写入的行, 需要删除的键)"""
+    upsert = [row for key, row in desired.items() if current.get(key) != row]
+    delete = [key for key in current if key not in desired]
+    return upsert, delete
+
+
+def _write_batches(session, query: str, rows: List[Any]) -> None:
+    """按批次在显式写事务中执行 UNWIND 语句"""
+    batch_size = max(settings.NEO4J_SYNC_BATCH_SIZE, 1)
+    for start in range(0, len(rows), batch_size):
+        session.execute_write(_run_write, query, rows=rows[start:start + batch_size])
+
+
+def _run_write(tx, query: str, **params) -> None:
+    tx.run(query, **params).consume()
+
+
+def _ensure_constraints(session) -> None:
+    """创建 Table.id / Column.id 唯一约束和 connection_id 索引（每个进程只执行一次）"""
+    global _constraints_ready
+    if _constraints_ready:
+        return
+    with _constraints_lock:
+        if _constraints_ready:
+            return
+        for statement in _SCHEMA_CONSTRAINTS:
+            try:
+                session.run(statement).consume()
+            except Exception as e:
+                # 已有重复数据等情况下约束无法创建，MERGE 仍可工作，只是无法走唯一索引
+                logger.warning(f"Failed to create Neo4j schema constraint ({statement}): {e}")
+        _constraints_ready = True
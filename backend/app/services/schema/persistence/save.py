@@ -1,24 +1,79 @@
 """
 Schema 保存
 将发现的 Schema 保存到数据库
+
+一次性预加载连接下已有的表/列/关系到字典，在内存中计算新增与变更，
+新增行通过 bulk_insert_mappings 批量写入，整个保存过程只提交一次事务。
 """
 
-from typing import List, Dict, Any, Tuple
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple
 from sqlalchemy import inspect
 from sqlalchemy.orm import Session
 
-from app import crud, schemas
-from app.services.db_service import get_db_engine
-from app.services.schema_utils import determine_relationship_type
+from app import crud
+from app.models.schema_column import SchemaColumn
+from app.models.schema_relationship import SchemaRelationship
+from app.models.schema_table import SchemaTable
+from app.services.db_service import get_pooled_engine
+from app.services.schema_utils import CachedInspector, determine_relationship_type
 from .neo4j_sync import sync_schema_to_graph_db
 
 
+@dataclass
+class ExistingSchema:
+    """连接下已保存的 Schema（按名称/列对索引）"""
+    tables: Dict[str, SchemaTable] = field(default_factory=dict)                           # table_name -> 表
+    columns: Dict[Tuple[int, str], SchemaColumn] = field(default_factory=dict)             # (table_id, column_name) -> 列
+    relationships: Dict[Tuple[int, int], SchemaRelationship] = field(default_factory=dict)  # (源列ID, 目标列ID) -> 关系
+
+    def column(self, table_name: str, column_name: str) -> Optional[SchemaColumn]:
+        table = self.tables.get(table_name)
+        return self.columns.get((table.id, column_name)) if table else None
+
+
+def load_existing_schema(db: Session, connection_id: int) -> ExistingSchema:
+    """三条查询加载连接下全部已保存的表、列、关系"""
+    existing = ExistingSchema()
+    _reload_tables(db, connection_id, existing)
+    _reload_columns(db, connection_id, existing)
+    _reload_relationships(db, connection_id, existing)
+    return existing
+
+
+def _reload_tables(db: Session, connection_id: int, existing: ExistingSchema) -> None:
+    tables = db.query(SchemaTable).filter(SchemaTable.connection_id == connection_id).all()
+    existing.tables = {table.table_name: table for table in tables}
+
+
+def _reload_columns(db: Session, connection_id: int, existing: ExistingSchema) -> None:
+    columns = (
+        db.query(SchemaColumn)
+        .join(SchemaTable, SchemaColumn.table_id == SchemaTable.id)
+        .filter(SchemaTable.connection_id == connection_id)
+        .all()
+    )
+    existing.columns = {(column.table_id, column.column_name): column for column in columns}
+
+
+def _reload_relationships(db: Session, connection_id: int, existing: ExistingSchema) -> None:
+    relationships = db.query(SchemaRelationship).filter(SchemaRelationship.connection_id == connection_id).all()
+    existing.relationships = {(rel.source_column_id, rel.target_column_id): rel for rel in relationships}
+
+
+def _set_changed(obj: Any, values: Dict[str, Any]) -> None:
+    """只为有变化的字段赋值，避免产生无意义的 UPDATE"""
+    for key, value in values.items():
+        if getattr(obj, key) != value:
+            setattr(obj, key, value)
+
+
 def save_discovered_schema(db: Session, connection_id: int, schema_info: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
     """
     Save discovered schema to the database and detect relationships.
     Returns a tuple of (tables_data, relationships_data) for frontend display.
     """
-    print(f"Saving discovered schema for connection {connection_id}")
+    print(f"Saving discovered schema for connection {connection_id} ({len(schema_info)} tables)")
 
     # Get the connection
     connection = crud.db_connection.get(db=db, id=connection_id)
@@ -27,169 +82,170 @@ def save_discovered_schema(db: Session, connection_id: int, schema_info: List[Di
 
     inspector = None
     try:
-        engine = get_db_engine(connection)
-        inspector = inspect(engine)
+        engine = get_pooled_engine(connection)
+        inspector = CachedInspector(inspect(engine))
     except Exception as e:
         print(f"Warning: Failed to create inspector for relationship type detection: {str(e)}")
 
-    tables_data: List[Dict[str, Any]] = []
-    relationships_data: List[Dict[str, Any]] = []
-
-    # Process tables and columns
-    for table_info in schema_info:
-        table_name = table_info.get("table_name")
-        if not table_name:
-            continue
-        print(f"Processing table: {table_name}")
-
-        existing_table = crud.schema_table.get_by_name_and_connection(
-            db=db, table_name=table_name, connection_id=connection_id
-        )
-
-        if existing_table:
-            print(f"Table {table_name} already exists, updating...")
-            table_obj = existing_table
-        else:
-            print(f"Creating new table: {table_name}")
-            table_create = schemas.SchemaTableCreate(
-                connection_id=connection_id,
-                table_name=table_name,
-                description=f"Auto-discovered table: {table_name}",
-                ui_metadata={"position": {"x": 0, "y": 0}}
-            )
-            table_obj = crud.schema_table.create(db=db, obj_in=table_create)
-
-        tables_data.append({
-            "id": table_obj.id,
-            "table_name": table_obj.table_name,
-            "description": table_obj.description,
-            "ui_metadata": table_obj.ui_metadata
-        })
-
-        for column_info in (table_info.get("columns") or []):
-            column_name = column_info.get("column_name")
-            if not column_name:
-                continue
+    discovered_tables = [t for t in schema_info if t.get("table_name")]
 
-            existing_column = crud.schema_column.get_by_name_and_table(
-                db=db, column_name=column_name, table_id=table_obj.id
-            )
-
-            if existing_column:
-                print(f"Column {column_name} already exists, updating...")
-                column_update = schemas.SchemaColumnUpdate(
-                    data_type=column_info.get("data_type") or "",
-                    is_primary_key=column_info.get("is_primary_key", False),
-                    is_foreign_key=column_info.get("is_foreign_key", False),
-                    is_unique=column_info.get("is_unique", False)
-                )
-                crud.schema_column.update(
-                    db=db, db_obj=existing_column, obj_in=column_update
-                )
-            else:
-                print(f"Creating new column: {column_name}")
-                column_create = schemas.SchemaColumnCreate(
-                    table_id=table_obj.id,
-                    column_name=column_name,
-                    data_type=column_info.get("data_type") or "",
-                    description=f"Auto-discovered column: {column_name}",
-                    is_primary_key=column_info.get("is_primary_key", False),
-                    is_foreign_key=column_info.get("is_foreign_key", False),
-                    is_unique=column_info.get("is_unique", False)
-                )
-                crud.schema_column.create(db=db, obj_in=column_create)
-
-    # Process relationships
-    for table_info in schema_info:
+    try:
+        existing = load_existing_schema(db, connection_id)
+
+        # 1. 新增表
+        new_tables = {}
+        for table_info in discovered_tables:
+            table_name = table_info["table_name"]
+            if table_name not in existing.tables and table_name not in new_tables:
+                new_tables[table_name] = {
+                    "connection_id": connection_id,
+                    "table_name": table_name,
+                    "description": f"Auto-discovered table: {table_name}",
+                    "ui_metadata": {"position": {"x": 0, "y": 0}},
+                }
+        if new_tables:
+            db.bulk_insert_mappings(SchemaTable, list(new_tables.values()))
+            _reload_tables(db, connection_id, existing)
+
+        # 2. 新增/更新列
+        new_columns = []
+        pending_columns = set()
+        for table_info in discovered_tables:
+            table_obj = existing.tables[table_info["table_name"]]
             for column_info in (table_info.get("columns") or []):
-                if column_info.get("is_foreign_key") and column_info.get("references"):
-                    source_table_name = table_info.get("table_name")
-                    source_column_name = column_info.get("column_name")
-                    references = column_info.get("references") or {}
-                    target_table_name = references.get("table")
-                    target_column_name = references.get("column")
-                    if not (source_table_name and source_column_name and target_table_name and target_column_name):
-                        continue
-
-                    print(f"Processing relationship: {source_table_name}.{source_column_name} -> {target_table_name}.{target_column_name}")
-
-                    source_table = crud.schema_table.get_by_name_and_connection(
-                        db=db, table_name=source_table_name, connection_id=connection_id
-                    )
-                    target_table = crud.schema_table.get_by_name_and_connection(
-                        db=db, table_name=target_table_name, connection_id=connection_id
-                    )
+                column_name = column_info.get("column_name")
+                if not column_name:
+                    continue
+                values = {
+                    "data_type": column_info.get("data_type") or "",
+                    "is_primary_key": column_info.get("is_primary_key", False),
+                    "is_foreign_key": column_info.get("is_foreign_key", False),
+                    "is_unique": column_info.get("is_unique", False),
+                }
+                key = (table_obj.id, column_name)
+                existing_column = existing.columns.get(key)
+                if existing_column:
+                    _set_changed(existing_column, values)
+                elif key not in pending_columns:
+                    pending_columns.add(key)
+                    new_columns.append({
+                        "table_id": table_obj.id,
+                        "column_name": column_name,
+                        "description": f"Auto-discovered column: {column_name}",
+                        **values,
+                    })
+        if new_columns:
+            db.bulk_insert_mappings(SchemaColumn, new_columns)
+        db.flush()
+        _reload_columns(db, connection_id, existing)
 
-                    if not source_table or not target_table:
-                        print(f"Warning: Could not find tables for relationship")
-                        continue
+        # 3. 关系（外键）
+        foreign_keys = []
+        for table_info in discovered_tables:
+            for column_info in (table_info.get("columns") or []):
+                if not (column_info.get("is_foreign_key") and column_info.get("references")):
+                    continue
+                references = column_info.get("references") or {}
+                fk = (table_info["table_name"], column_info.get("column_name"), references.get("table"), references.get("column"))
+                if all(fk):
+                    foreign_keys.append(fk)
 
-                    source_column = crud.schema_column.get_by_name_and_table(
-                        db=db, column_name=source_column_name, table_id=source_table.id
-                    )
-                    target_column = crud.schema_column.get_by_name_and_table(
-                        db=db, column_name=target_column_name, table_id=target_table.id
-                    )
+        if inspector is not None and foreign_keys:
+            inspector.prefetch(name for fk in foreign_keys for name in (fk[0], fk[2]))
 
-                    if not source_column or not target_column:
-                        print(f"Warning: Could not find columns for relationship")
-                        continue
+        resolved = []
+        new_relationships = []
+        pending_relationships = set()
+        for source_table_name, source_column_name, target_table_name, target_column_name in foreign_keys:
+            source_column = existing.column(source_table_name, source_column_name)
+            target_column = existing.column(target_table_name, target_column_name)
+            if not source_column or not target_column:
+                print(f"Warning: Could not find columns for relationship {source_table_name}.{source_column_name} -> {target_table_name}.{target_column_name}")
+                continue
 
-                    existing_rel = crud.schema_relationship.get_by_columns(
-                        db=db, source_column_id=source_column.id, target_column_id=target_column.id
+            try:
+                if inspector is None:
+                    relationship_type = "1-to-N"
+                else:
+                    relationship_type = determine_relationship_type(
+                        inspector=inspector,
+                        source_table=source_table_name,
+                        source_column=source_column_name,
+                        target_table=target_table_name,
+                        target_column=target_column_name,
+                        schema_info=schema_info
                     )
+            except Exception as e:
+                print(f"[WARNING] 确定关系类型时出错: {str(e)}")
+                relationship_type = "1-to-N"
 
-                    try:
-                        if inspector is None:
-                            relationship_type = "1-to-N"
-                        else:
-                            relationship_type = determine_relationship_type(
-                                inspector=inspector,
-                                source_table=source_table_name,
-                                source_column=source_column_name,
-                                target_table=target_table_name,
-                                target_column=target_column_name,
-                                schema_info=schema_info
-                            )
-                    except Exception as e:
-                        print(f"[WARNING] 确定关系类型时出错: {str(e)}")
-                        relationship_type = "1-to-N"
-
-                    if existing_rel:
-                        print(f"Relationship already exists, updating...")
-                        rel_update = schemas.SchemaRelationshipUpdate(
-                            relationship_type=relationship_type,
-                            description=f"Auto-discovered relationship: {source_table_name}.{source_column_name} -> {target_table_name}.{target_column_name}"
-                        )
-                        rel_obj = crud.schema_relationship.update(
-                            db=db, db_obj=existing_rel, obj_in=rel_update
-                        )
-                    else:
-                        print(f"Creating new relationship")
-                        rel_create = schemas.SchemaRelationshipCreate(
-                            connection_id=connection_id,
-                            source_table_id=source_table.id,
-                            source_column_id=source_column.id,
-                            target_table_id=target_table.id,
-                            target_column_id=target_column.id,
-                            relationship_type=relationship_type,
-                            description=f"Auto-discovered relationship: {source_table_name}.{source_column_name} -> {target_table_name}.{target_column_name}"
-                        )
-                        rel_obj = crud.schema_relationship.create(db=db, obj_in=rel_create)
-
-                    relationships_data.append({
-                        "id": rel_obj.id,
-                        "source_table": source_table.table_name,
-                        "source_table_id": source_table.id,
-                        "source_column": source_column.column_name,
-                        "source_column_id": source_column.id,
-                        "target_table": target_table.table_name,
-                        "target_table_id": target_table.id,
-                        "target_column": target_column.column_name,
-                        "target_column_id": target_column.id,
-                        "relationship_type": rel_obj.relationship_type,
-                        "description": rel_obj.description
-                    })
+            values = {
+                "relationship_type": relationship_type,
+                "description": f"Auto-discovered relationship: {source_table_name}.{source_column_name} -> {target_table_name}.{target_column_name}",
+            }
+            key = (source_column.id, target_column.id)
+            existing_rel = existing.relationships.get(key)
+            if existing_rel:
+                _set_changed(existing_rel, values)
+            elif key not in pending_relationships:
+                pending_relationships.add(key)
+                new_relationships.append({
+                    "connection_id": connection_id,
+                    "source_table_id": source_column.table_id,
+                    "source_column_id": source_column.id,
+                    "target_table_id": target_column.table_id,
+                    "target_column_id": target_column.id,
+                    **values,
+                })
+            resolved.append(key)
+
+        if new_relationships:
+            db.bulk_insert_mappings(SchemaRelationship, new_relationships)
+            db.flush()
+            _reload_relationships(db, connection_id, existing)
+
+        # 提交后对象会过期，先在事务内组装返回数据
+        tables_by_id = {table.id: table for table in existing.tables.values()}
+        columns_by_id = {column.id: column for column in existing.columns.values()}
+
+        tables_data: List[Dict[str, Any]] = []
+        for table_info in discovered_tables:
+            table_obj = existing.tables[table_info["table_name"]]
+            tables_data.append({
+                "id": table_obj.id,
+                "table_name": table_obj.table_name,
+                "description": table_obj.description,
+                "ui_metadata": table_obj.ui_metadata
+            })
+
+        relationships_data: List[Dict[str, Any]] = []
+        for key in resolved:
+            rel_obj = existing.relationships[key]
+            source_table = tables_by_id[rel_obj.source_table_id]
+            target_table = tables_by_id[rel_obj.target_table_id]
+            relationships_data.append({
+                "id": rel_obj.id,
+                "source_table": source_table.table_name,
+                "source_table_id": source_table.id,
+                "source_column": columns_by_id[rel_obj.source_column_id].column_name,
+                "source_column_id": rel_obj.source_column_id,
+                "target_table": target_table.table_name,
+                "target_table_id": target_table.id,
+                "target_column": columns_by_id[rel_obj.target_column_id].column_name,
+                "target_column_id": rel_obj.target_column_id,
+                "relationship_type": rel_obj.relationship_type,
+                "description": rel_obj.description
+            })
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    print(
+        f"Saved schema for connection {connection_id}: {len(new_tables)} new tables, "
+        f"{len(new_columns)} new columns, {len(new_relationships)} new relationships"
+    )
 
     try:
         sync_schema_to_graph_db(connection_id)
@@ -197,3 +253,93 @@ def save_discovered_schema(db: Session, connection_id: int, schema_info: List[Di
         print(f"Warning: Failed to sync to graph database: {str(e)}")
 
     return tables_data, relationships_data
+
+
+def save_published_schema(db: Session, connection_id: int, schema_data: Dict[str, Any]) -> None:
+    """
+    Save schema metadata edited in the schema designer.
+    Relationships missing from schema_data are deleted.
+    """
+    tables_data = schema_data.get("tables", [])
+    relationships_data = schema_data.get("relationships", [])
+
+    try:
+        existing = load_existing_schema(db, connection_id)
+
+        # 1. 表：已存在则更新描述与布局，否则批量新增
+        new_tables = {}
+        for table_data in tables_data:
+            values = {"description": table_data.get("description"), "ui_metadata": table_data.get("ui_metadata")}
+            table_obj = existing.tables.get(table_data["table_name"])
+            if table_obj:
+                _set_changed(table_obj, values)
+            else:
+                new_tables[table_data["table_name"]] = {
+                    "connection_id": connection_id, "table_name": table_data["table_name"], **values
+                }
+        if new_tables:
+            db.bulk_insert_mappings(SchemaTable, list(new_tables.values()))
+            _reload_tables(db, connection_id, existing)
+
+        # 2. 列
+        new_columns = {}
+        for table_data in tables_data:
+            table_obj = existing.tables[table_data["table_name"]]
+            for column_data in table_data.get("columns", []):
+                key = (table_obj.id, column_data["column_name"])
+                column_obj = existing.columns.get(key)
+                if column_obj:
+                    _set_changed(column_obj, {
+                        "description": column_data.get("description"),
+                        "is_primary_key": column_data.get("is_primary_key"),
+                        "is_foreign_key": column_data.get("is_foreign_key"),
+                    })
+                else:
+                    new_columns[key] = {
+                        "table_id": table_obj.id,
+                        "column_name": column_data["column_name"],
+                        "data_type": column_data["data_type"],
+                        "description": column_data.get("description"),
+                        "is_primary_key": column_data.get("is_primary_key", False),
+                        "is_foreign_key": column_data.get("is_foreign_key", False),
+                    }
+        if new_columns:
+            db.bulk_insert_mappings(SchemaColumn, list(new_columns.values()))
+        db.flush()
+        _reload_columns(db, connection_id, existing)
+
+        # 3. 关系：更新已有、新增缺失、删除前端已移除的
+        kept = set()
+        new_relationships = {}
+        for rel_data in relationships_data:
+            source_column = existing.column(rel_data["source_table"], rel_data["source_column"])
+            target_column = existing.column(rel_data["target_table"], rel_data["target_column"])
+            if not source_column or not target_column:
+                continue
+
+            key = (source_column.id, target_column.id)
+            values = {"relationship_type": rel_data.get("relationship_type"), "description": rel_data.get("description")}
+            rel_obj = existing.relationships.get(key)
+            if rel_obj:
+                _set_changed(rel_obj, values)
+                kept.add(key)
+            else:
+                new_relationships[key] = {
+                    "connection_id": connection_id,
+                    "source_table_id": source_column.table_id,
+                    "source_column_id": source_column.id,
+                    "target_table_id": target_column.table_id,
+                    "target_column_id": target_column.id,
+                    **values,
+                }
+
+        stale_ids = [rel.id for key, rel in existing.relationships.items() if key not in kept]
+        if stale_ids:
+            db.query(SchemaRelationship).filter(SchemaRelationship.id.in_(stale_ids)).delete(synchronize_session=False)
+        if new_relationships:
+            db.bulk_insert_mappings(SchemaRelationship, list(new_relationships.values()))
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
@@ -144,25 +144,24 @@ def get_full_schema_for_connection(
     Returns:
         SchemaContext: 统一格式的 Schema 上下文
     """
-    from app import crud
+    from app.services.schema_snapshot import schema_snapshot_cache
     
-    # 获取所有表 - 不限制数量
-    all_tables = crud.schema_table.get_by_connection(db=db, connection_id=connection_id)
+    # 获取所有表 - 不限制数量（来自 Schema 快照，一次批量加载后常驻内存）
+    snapshot = schema_snapshot_cache.get(db, connection_id)
+    all_tables = list(snapshot.tables.values())
     
     # 只在极端情况下（超过 9999 表）才截断，并记录警告
     if len(all_tables) > max_tables:
         logger.warning(f"⚠️ 表数量({len(all_tables)})超过限制({max_tables})，将截断。这可能影响 SQL 准确性！")
         all_tables = all_tables[:max_tables]
     
-    # 构建 table_id -> table_name 映射
-    table_id_to_name = {table.id: table.table_name for table in all_tables}
-    table_ids = set(table_id_to_name.keys())
+    table_ids = {table.id for table in all_tables}
     
     # 转换为统一格式 - 表信息
     tables = [
         TableInfo(
-            table_name=table.table_name,
-            description=table.description or "",
+            table_name=table.name,
+            description=table.description,
             id=table.id
         )
         for table in all_tables
@@ -170,17 +169,13 @@ def get_full_schema_for_connection(
     
     # 获取所有列并转换为统一格式
     columns = []
-    col_id_to_name = {}  # 用于关系查询
-    
     for table in all_tables:
-        table_columns = crud.schema_column.get_by_table(db=db, table_id=table.id)
-        for col in table_columns:
-            col_id_to_name[col.id] = col.column_name
+        for col in snapshot.columns_of(table.id):
             columns.append(ColumnInfo(
-                table_name=table.table_name,
-                column_name=col.column_name,
+                table_name=table.name,
+                column_name=col.name,
                 data_type=col.data_type,
-                description=col.description or "",
+                description=col.description,
                 is_primary_key=col.is_primary_key,
                 is_foreign_key=col.is_foreign_key,
                 id=col.id,
@@ -189,15 +184,15 @@ def get_full_schema_for_connection(
     
     # 获取所有关系并转换为统一格式
     relationships = []
-    all_relationships = crud.schema_relationship.get_by_connection(db=db, connection_id=connection_id)
-    
-    for rel in all_relationships:
+    for rel in snapshot.relationships:
         if rel.source_table_id in table_ids and rel.target_table_id in table_ids:
+            source_column = snapshot.columns.get(rel.source_column_id)
+            target_column = snapshot.columns.get(rel.target_column_id)
             relationships.append(RelationshipInfo(
-                source_table=table_id_to_name.get(rel.source_table_id, ""),
-                source_column=col_id_to_name.get(rel.source_column_id, ""),
-                target_table=table_id_to_name.get(rel.target_table_id, ""),
-                target_column=col_id_to_name.get(rel.target_column_id, ""),
+                source_table=snapshot.tables[rel.source_table_id].name,
+                source_column=source_column.name if source_column else "",
+                target_table=snapshot.tables[rel.target_table_id].name,
+                target_column=target_column.name if target_column else "",
                 relationship_type=rel.relationship_type or "references",
                 id=rel.id
             ))
@@ -24,6 +24,7 @@ from app.services.schema.discovery import (
 # ============================================================================
 from app.services.schema.persistence import (
     save_discovered_schema,
+    save_published_schema,
     sync_schema_to_graph_db,
 )
 
@@ -40,5 +41,6 @@ __all__ = [
     "discover_sqlite_schema",
     # Persistence
     "save_discovered_schema",
+    "save_published_schema",
     "sync_schema_to_graph_db",
 ]
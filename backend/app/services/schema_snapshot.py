@@ -0,0 +1,279 @@
+"""
+Schema 快照缓存 (Schema Snapshot Cache)
+
+按 connection_id 缓存编译好的 Schema 快照（表、列、关系及邻接索引），
+每次问答组装 Schema 上下文时直接查内存字典，不再逐表访问元数据库。
+
+特性：
+- 一次批量加载：表、列、关系各一条查询，不受分页 limit 限制
+- id -> 对象字典与邻接索引，按表取列/取关系为 O(1)
+- 版本号：发布/同步/编辑 Schema 时调用 invalidate()，版本递增，旧快照立即作废
+- TTL 兜底：多进程部署下其他进程的修改最多延迟 SCHEMA_SNAPSHOT_TTL 秒可见
+
+使用方式：
+    from app.services.schema_snapshot import schema_snapshot_cache
+
+    snapshot = schema_snapshot_cache.get(db, connection_id)
+    columns = snapshot.columns_of(table_id)
+
+    # Schema 变更后
+    schema_snapshot_cache.invalidate(connection_id)
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SnapshotTable:
+    """快照中的表"""
+    id: int
+    name: str
+    description: str
+
+
+@dataclass(frozen=True)
+class SnapshotColumn:
+    """快照中的列"""
+    id: int
+    table_id: int
+    name: str
+    data_type: str
+    description: str
+    is_primary_key: bool
+    is_foreign_key: bool
+
+
+@dataclass(frozen=True)
+class SnapshotRelationship:
+    """快照中的表关系"""
+    id: int
+    source_table_id: int
+    source_column_id: int
+    target_table_id: int
+    target_column_id: int
+    relationship_type: Optional[str]
+    description: Optional[str]
+
+
+@dataclass
+class SchemaSnapshot:
+    """
+    单个连接的只读 Schema 快照
+
+    快照构建后不应被修改，多个请求线程可同时读取。
+    """
+    connection_id: int
+    version: int
+    tables: Dict[int, SnapshotTable] = field(default_factory=dict)
+    columns: Dict[int, SnapshotColumn] = field(default_factory=dict)
+    relationships: Tuple[SnapshotRelationship, ...] = ()
+    table_ids_by_name: Dict[str, int] = field(default_factory=dict)
+    columns_by_table: Dict[int, Tuple[SnapshotColumn, ...]] = field(default_factory=dict)
+    outgoing: Dict[int, Tuple[SnapshotRelationship, ...]] = field(default_factory=dict)
+    incoming: Dict[int, Tuple[SnapshotRelationship, ...]] = field(default_factory=dict)
+    built_at: float = field(default_factory=time.monotonic)
+
+    @classmethod
+    def build(
+        cls,
+        connection_id: int,
+        version: int,
+        tables: Iterable[SnapshotTable],
+        columns: Iterable[SnapshotColumn],
+        relationships: Iterable[SnapshotRelationship]
+    ) -> "SchemaSnapshot":
+        """由表/列/关系记录编译快照及索引"""
+        tables_by_id = {t.id: t for t in tables}
+        columns_by_id: Dict[int, SnapshotColumn] = {}
+        columns_by_table: Dict[int, List[SnapshotColumn]] = {tid: [] for tid in tables_by_id}
+        for col in columns:
+            if col.table_id not in columns_by_table:
+                continue
+            columns_by_id[col.id] = col
+            columns_by_table[col.table_id].append(col)
+
+        rels = tuple(r for r in relationships if r.source_table_id in tables_by_id and r.target_table_id in tables_by_id)
+        outgoing: Dict[int, List[SnapshotRelationship]] = {}
+        incoming: Dict[int, List[SnapshotRelationship]] = {}
+        for rel in rels:
+            outgoing.setdefault(rel.source_table_id, []).append(rel)
+            incoming.setdefault(rel.target_table_id, []).append(rel)
+
+        return cls(
+            connection_id=connection_id,
+            version=version,
+            tables=tables_by_id,
+            columns=columns_by_id,
+            relationships=rels,
+            table_ids_by_name={t.name: t.id for t in tables_by_id.values()},
+            columns_by_table={tid: tuple(cols) for tid, cols in columns_by_table.items()},
+            outgoing={tid: tuple(r) for tid, r in outgoing.items()},
+            incoming={tid: tuple(r) for tid, r in incoming.items()},
+        )
+
+    def columns_of(self, table_id: int) -> Tuple[SnapshotColumn, ...]:
+        """表的全部列（按列ID排序）"""
+        return self.columns_by_table.get(table_id, ())
+
+    def table_by_name(self, table_name: str) -> Optional[SnapshotTable]:
+        table_id = self.table_ids_by_name.get(table_name)
+        return self.tables.get(table_id) if table_id is not None else None
+
+    def relationships_among(self, table_ids: Iterable[int]) -> List[SnapshotRelationship]:
+        """两端都在给定表集合内的关系（去重，按表顺序）"""
+        table_ids = list(table_ids)
+        selected = set(table_ids)
+        result = []
+        seen = set()
+        for table_id in table_ids:
+            for rel in self.outgoing.get(table_id, ()) + self.incoming.get(table_id, ()):
+                if rel.id in seen:
+                    continue
+                if rel.source_table_id in selected and rel.target_table_id in selected:
+                    seen.add(rel.id)
+                    result.append(rel)
+        return result
+
+
+class SchemaSnapshotCache:
+    """
+    按 connection_id 缓存 SchemaSnapshot
+
+    线程安全；构建期间发生失效时，构建结果只返回给本次调用，不写入缓存。
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        self._ttl = settings.SCHEMA_SNAPSHOT_TTL if ttl is None else ttl
+        self._max_entries = max_entries or settings.SCHEMA_SNAPSHOT_MAX_ENTRIES
+        self._snapshots: "OrderedDict[int, SchemaSnapshot]" = OrderedDict()
+        self._versions: Dict[int, int] = {}
+        self._epoch = 0  # invalidate() 全部清空时递增
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    # ===== 对外接口 =====
+
+    def get(self, db: Session, connection_id: int) -> SchemaSnapshot:
+        """获取连接的 Schema 快照，不存在或已过期时批量加载"""
+        with self._lock:
+            snapshot = self._snapshots.get(connection_id)
+            version = self._versions.get(connection_id, 0)
+            epoch = self._epoch
+            if snapshot is not None and snapshot.version == version and not self._expired(snapshot):
+                self._snapshots.move_to_end(connection_id)
+                self._hits += 1
+                return snapshot
+            self._misses += 1
+
+        snapshot = self._load(db, connection_id, version)
+
+        with self._lock:
+            unchanged = self._epoch == epoch and self._versions.get(connection_id, 0) == version
+            if self._ttl > 0 and unchanged:
+                self._snapshots[connection_id] = snapshot
+                self._snapshots.move_to_end(connection_id)
+                while len(self._snapshots) > self._max_entries:
+                    self._snapshots.popitem(last=False)
+        return snapshot
+
+    def get_version(self, connection_id: int) -> int:
+        """连接当前的 Schema 版本号（每次失效递增）"""
+        with self._lock:
+            return self._versions.get(connection_id, 0)
+
+    def invalidate(self, connection_id: Optional[int] = None) -> None:
+        """Schema 变更后使快照失效（connection_id 为空时清空全部）"""
+        with self._lock:
+            if connection_id is None:
+                for cid in set(self._versions) | set(self._snapshots):
+                    self._versions[cid] = self._versions.get(cid, 0) + 1
+                self._epoch += 1
+                self._snapshots.clear()
+                return
+            self._versions[connection_id] = self._versions.get(connection_id, 0) + 1
+            self._snapshots.pop(connection_id, None)
+        logger.debug(f"Schema snapshot invalidated for connection {connection_id}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "cached_connections": len(self._snapshots),
+                "hits": self._hits,
+                "misses": self._misses,
+                "ttl": self._ttl,
+            }
+
+    # ===== 内部方法 =====
+
+    def _expired(self, snapshot: SchemaSnapshot) -> bool:
+        return self._ttl <= 0 or time.monotonic() - snapshot.built_at >= self._ttl
+
+    @staticmethod
+    def _load(db: Session, connection_id: int, version: int) -> SchemaSnapshot:
+        """三条查询批量加载连接的全部表、列、关系"""
+        from app.models.schema_table import SchemaTable
+        from app.models.schema_column import SchemaColumn
+        from app.models.schema_relationship import SchemaRelationship
+
+        start = time.perf_counter()
+        table_rows = (
+            db.query(SchemaTable.id, SchemaTable.table_name, SchemaTable.description)
+            .filter(SchemaTable.connection_id == connection_id)
+            .order_by(SchemaTable.id)
+            .all()
+        )
+        column_rows = (
+            db.query(
+                SchemaColumn.id, SchemaColumn.table_id, SchemaColumn.column_name, SchemaColumn.data_type,
+                SchemaColumn.description, SchemaColumn.is_primary_key, SchemaColumn.is_foreign_key
+            )
+            .join(SchemaTable, SchemaColumn.table_id == SchemaTable.id)
+            .filter(SchemaTable.connection_id == connection_id)
+            .order_by(SchemaColumn.id)
+            .all()
+        )
+        relationship_rows = (
+            db.query(
+                SchemaRelationship.id, SchemaRelationship.source_table_id, SchemaRelationship.source_column_id,
+                SchemaRelationship.target_table_id, SchemaRelationship.target_column_id,
+                SchemaRelationship.relationship_type, SchemaRelationship.description
+            )
+            .filter(SchemaRelationship.connection_id == connection_id)
+            .order_by(SchemaRelationship.id)
+            .all()
+        )
+
+        snapshot = SchemaSnapshot.build(
+            connection_id=connection_id,
+            version=version,
+            tables=(SnapshotTable(id=r[0], name=r[1], description=r[2] or "") for r in table_rows),
+            columns=(
+                SnapshotColumn(
+                    id=r[0], table_id=r[1], name=r[2], data_type=r[3], description=r[4] or "",
+                    is_primary_key=bool(r[5]), is_foreign_key=bool(r[6])
+                )
+                for r in column_rows
+            ),
+            relationships=(SnapshotRelationship(*r) for r in relationship_rows),
+        )
+        logger.info(
+            f"Schema snapshot built for connection {connection_id} (v{version}): "
+            f"{len(snapshot.tables)} tables, {len(snapshot.columns)} columns, "
+            f"{len(snapshot.relationships)} relationships in {(time.perf_counter() - start) * 1000:.1f}ms"
+        )
+        return snapshot
+
+
+# 创建全局实例
+schema_snapshot_cache = SchemaSnapshotCache()
@@ -1,8 +1,135 @@
 """
 Schema utilities for database schema analysis.
 """
-from typing import List, Dict, Any, Optional, Set, Tuple
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Set, Tuple, Iterable, Callable
 from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.reflection import ObjectKind
+
+
+class CachedInspector:
+    """
+    按表缓存反射结果的 Inspector 包装
+
+    Schema 发现和关系类型判断会对同一张表反复调用 get_columns / get_pk_constraint 等方法，
+    直接使用 Inspector 时每次调用都要借出一次连接，远程库上表多时非常慢。这里：
+    - prefetch() 通过 SQLAlchemy 2.0 的 get_multi_* 按表分块批量反射（PostgreSQL 等方言为集合查询），
+      可选多线程并行处理各分块，每个分块使用独立连接
+    - 其余调用按 (方法, 表名) 缓存，同一张表的同一类元数据只反射一次
+    - 提供发现逻辑用到的 Inspector 接口（含 get_primary_keys）
+    """
+
+    _METHODS = ("get_columns", "get_pk_constraint", "get_foreign_keys", "get_unique_constraints", "get_indexes")
+
+    def __init__(self, inspector):
+        self._inspector = inspector
+        self._cache: Dict[Tuple[str, str], Any] = {}
+        self._lock = threading.Lock()
+
+    def prefetch(
+        self,
+        table_names: Iterable[str],
+        methods: Optional[Iterable[str]] = None,
+        chunk_size: int = 0,
+        max_workers: int = 1,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> None:
+        """
+        批量反射给定表（含视图）的元数据
+
+        Args:
+            table_names: 表名列表
+            methods: 需要预取的方法，默认列、主键、外键、唯一约束和索引
+            chunk_size: 每个分块的表数量（0 表示不分块）
+            max_workers: 并行处理分块的线程数（需要 Inspector 绑定 Engine）
+            progress_callback: 每完成一个分块回调 (已完成表数, 总表数)
+        """
+        names = sorted(set(table_names))
+        if not names:
+            return
+        methods = tuple(methods or self._METHODS)
+        chunk_size = chunk_size if chunk_size > 0 else len(names)
+        chunks = [names[i:i + chunk_size] for i in range(0, len(names), chunk_size)]
+
+        engine = self._inspector.bind if isinstance(self._inspector.bind, Engine) else None
+        done = 0
+
+        def report(chunk):
+            nonlocal done
+            with self._lock:
+                done += len(chunk)
+                current = done
+            if progress_callback:
+                progress_callback(current, len(names))
+
+        if engine is None or max_workers <= 1 or len(chunks) == 1:
+            for chunk in chunks:
+                self._prefetch_chunk(self._inspector, chunk, methods)
+                report(chunk)
+            return
+
+        def run(chunk):
+            # Inspector 不是线程安全的，每个分块使用独立的 Inspector 和连接
+            with engine.connect() as conn:
+                self._prefetch_chunk(inspect(conn), chunk, methods)
+            return chunk
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks)), thread_name_prefix="schema-reflect") as pool:
+            for future in as_completed([pool.submit(run, chunk) for chunk in chunks]):
+                report(future.result())
+
+    def _prefetch_chunk(self, inspector, names: List[str], methods: Tuple[str, ...]) -> None:
+        for method in methods:
+            get_multi = getattr(inspector, f"get_multi_{method[len('get_'):]}", None)
+            if get_multi is None:
+                continue
+            try:
+                result = get_multi(filter_names=names, kind=ObjectKind.ANY)
+            except Exception as e:
+                print(f"[WARNING] 批量反射 {method} 失败，将按表反射: {str(e)}")
+                continue
+            with self._lock:
+                for (schema, table_name), value in result.items():
+                    if schema is None:
+                        self._cache[(method, table_name)] = value
+
+    def _get(self, method: str, table_name: Optional[str]) -> Any:
+        key = (method, table_name)
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+        args = () if table_name is None else (table_name,)
+        value = getattr(self._inspector, method)(*args)
+        with self._lock:
+            self._cache[key] = value
+        return value
+
+    def get_table_names(self) -> List[str]:
+        return list(self._get("get_table_names", None))
+
+    def get_view_names(self) -> List[str]:
+        return list(self._get("get_view_names", None))
+
+    def get_columns(self, table_name: str) -> List[Dict[str, Any]]:
+        return self._get("get_columns", table_name)
+
+    def get_pk_constraint(self, table_name: str) -> Dict[str, Any]:
+        return self._get("get_pk_constraint", table_name)
+
+    def get_primary_keys(self, table_name: str) -> List[str]:
+        return list(self.get_pk_constraint(table_name).get("constrained_columns") or [])
+
+    def get_foreign_keys(self, table_name: str) -> List[Dict[str, Any]]:
+        return self._get("get_foreign_keys", table_name)
+
+    def get_unique_constraints(self, table_name: str) -> List[Dict[str, Any]]:
+        return self._get("get_unique_constraints", table_name)
+
+    def get_indexes(self, table_name: str) -> List[Dict[str, Any]]:
+        return self._get("get_indexes", table_name)
+
 
 def is_column_unique_in_table(inspector, table_name: str, column_name: str) -> bool:
     """
@@ -227,7 +227,8 @@ class SkillRouter:
         适用于复杂查询或关键词匹配不确定的情况
         """
         try:
-            from app.core.llm_factory import create_llm
+            from langchain_core.messages import HumanMessage
+            from app.core.agent_config import get_agent_llm, CORE_AGENT_ROUTER
             
             # 构建 Skill 描述
             skill_descriptions = []
@@ -250,8 +251,8 @@ class SkillRouter:
 
 只返回数字，不要解释。"""
 
-            llm = create_llm(temperature=0)
-            response = await llm.ainvoke(prompt)
+            llm = get_agent_llm(CORE_AGENT_ROUTER, use_wrapper=True)
+            response = await llm.ainvoke([HumanMessage(content=prompt)], cache=True)
             
             # 解析响应
             response_text = response.content.strip()
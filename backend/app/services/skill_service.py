@@ -19,7 +19,6 @@ import fnmatch
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 
-from app.core.config import settings
 from app.models.skill import Skill as SkillModel
 from app.schemas.skill import (
     Skill, SkillCreate, SkillUpdate, SkillLoadResult, SkillSuggestion
@@ -29,13 +28,6 @@ from app.services.neo4j_service import neo4j_service
 
 logger = logging.getLogger(__name__)
 
-try:
-    from neo4j import GraphDatabase, Driver
-except Exception:
-    GraphDatabase = None
-    Driver = None
-
-
 class SkillService:
     """
     Skill 服务 - SaaS 多租户支持
@@ -47,10 +39,6 @@ class SkillService:
     4. Skill-Centric - JOIN 规则内嵌于 Skill
     """
     
-    def __init__(self):
-        self._neo4j_driver = None
-        self._neo4j_initialized = False
-    
     # ==================== CRUD ====================
     
     async def create_skill(self, data: SkillCreate, tenant_id: Optional[int] = None) -> Skill:
@@ -334,13 +322,9 @@ class SkillService:
     ) -> List[Dict[str, Any]]:
         """获取 Skill 关联的指标"""
         try:
-            driver = self._get_neo4j_driver()
-            if not driver:
-                return []
-            
-            with driver.session() as session:
+            async with neo4j_service.async_session() as session:
                 # 查询 Skill 关联的指标（通过 BELONGS_TO_SKILL 关系）
-                result = session.run("""
+                result = await session.run("""
                     MATCH (s:Skill {name: $skill_name, connection_id: $connection_id})
                     MATCH (m:Metric)-[:BELONGS_TO_SKILL]->(s)
                     RETURN m
@@ -348,7 +332,7 @@ class SkillService:
                 """, skill_name=skill.name, connection_id=connection_id)
                 
                 metrics = []
-                for record in result:
+                async for record in result:
                     node = record["m"]
                     metrics.append({
                         "name": node.get("name"),
@@ -362,14 +346,14 @@ class SkillService:
                 
                 # 如果没有通过关系找到，尝试通过表名匹配
                 if not metrics and skill.table_names:
-                    result = session.run("""
+                    result = await session.run("""
                         MATCH (m:Metric {connection_id: $connection_id})
                         WHERE m.source_table IN $table_names
                         RETURN m
                         LIMIT 20
                     """, connection_id=connection_id, table_names=skill.table_names)
                     
-                    for record in result:
+                    async for record in result:
                         node = record["m"]
                         metrics.append({
                             "name": node.get("name"),
@@ -404,16 +388,12 @@ class SkillService:
         
         # 回退：从 Neo4j 查询（向后兼容旧数据）
         try:
-            driver = self._get_neo4j_driver()
-            if not driver:
-                return []
-            
-            with driver.session() as session:
+            async with neo4j_service.async_session() as session:
                 # 通过表名查找相关的 JOIN 规则
                 if not skill.table_names:
                     return []
                 
-                result = session.run("""
+                result = await session.run("""
                     MATCH (j:JoinRule {connection_id: $connection_id})
                     WHERE j.left_table IN $table_names OR j.right_table IN $table_names
                     RETURN j
@@ -422,7 +402,7 @@ class SkillService:
                 """, connection_id=connection_id, table_names=skill.table_names)
                 
                 rules = []
-                for record in result:
+                async for record in result:
                     node = record["j"]
                     rules.append({
                         "name": node.get("name"),
@@ -486,37 +466,12 @@ class SkillService:
     
     # ==================== Neo4j 同步 ====================
     
-    def _get_neo4j_driver(self):
-        if self._neo4j_initialized:
-            return self._neo4j_driver
-        
-        self._neo4j_initialized = True
-        
-        if not GraphDatabase or not getattr(settings, "NEO4J_URI", None):
-            self._neo4j_driver = None
-            return None
-        
-        try:
-            self._neo4j_driver = GraphDatabase.driver(
-                settings.NEO4J_URI,
-                auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD),
-            )
-            return self._neo4j_driver
-        except Exception as e:
-            logger.warning(f"Failed to connect to Neo4j: {e}")
-            self._neo4j_driver = None
-            return None
-    
     async def _sync_to_neo4j(self, skill: SkillModel):
         """同步 Skill 到 Neo4j"""
         try:
-            driver = self._get_neo4j_driver()
-            if not driver:
-                return
-            
-            with driver.session() as session:
+            async with neo4j_service.async_session() as session:
                 # 创建/更新 Skill 节点
-                session.run("""
+                await session.run("""
                     MERGE (s:Skill {name: $name, connection_id: $connection_id})
                     SET s.display_name = $display_name,
                         s.description = $description,
@@ -533,14 +488,14 @@ class SkillService:
                 )
                 
                 # 删除旧的 CONTAINS_TABLE 关系
-                session.run("""
+                await session.run("""
                     MATCH (s:Skill {name: $name, connection_id: $connection_id})-[r:CONTAINS_TABLE]->()
                     DELETE r
                 """, name=skill.name, connection_id=skill.connection_id)
                 
                 # 建立与 Table 的关系
                 for table_name in (skill.table_names or []):
-                    session.run("""
+                    await session.run("""
                         MATCH (s:Skill {name: $skill_name, connection_id: $connection_id})
                         MATCH (t:Table {name: $table_name, connection_id: $connection_id})
                         MERGE (s)-[:CONTAINS_TABLE]->(t)
@@ -552,7 +507,7 @@ class SkillService:
                 
                 # 自动关联 Metric（根据 table_names）
                 if skill.table_names:
-                    session.run("""
+                    await session.run("""
                         MATCH (s:Skill {name: $skill_name, connection_id: $connection_id})
                         MATCH (m:Metric {connection_id: $connection_id})
                         WHERE m.source_table IN $table_names
@@ -570,12 +525,8 @@ class SkillService:
     async def _remove_from_neo4j(self, skill_name: str, connection_id: int):
         """从 Neo4j 删除 Skill"""
         try:
-            driver = self._get_neo4j_driver()
-            if not driver:
-                return
-            
-            with driver.session() as session:
-                session.run("""
+            async with neo4j_service.async_session() as session:
+                await session.run("""
                     MATCH (s:Skill {name: $name, connection_id: $connection_id})
                     DETACH DELETE s
                 """, name=skill_name, connection_id=connection_id)
@@ -586,13 +537,7 @@ class SkillService:
     
     def close(self):
         """关闭资源（使用公共 Neo4j 服务，此方法保留以保持兼容）"""
-        if self._neo4j_driver:
-            try:
-                self._neo4j_driver.close()
-            except Exception:
-                pass
-        self._neo4j_driver = None
-        self._neo4j_initialized = False
+        pass
 
 
 # 全局实例
@@ -0,0 +1,231 @@
+"""
+异步 SQL 执行服务 (SQL Execution Service)
+
+将目标数据库查询从事件循环线程移到专用有界线程池中执行，
+避免单个慢查询阻塞同一 worker 内的其他 SSE 流。
+
+特性：
+- 专用线程池（SQL_EXECUTOR_MAX_WORKERS），与默认 executor 隔离
+- 按租户限制并发（SQL_TENANT_MAX_CONCURRENCY），单租户的慢查询不会占满线程池
+- 真实超时：数据库端语句超时 + 客户端等待超时，排队时间计入总超时
+- 支持取消：协程被取消（客户端断开）或超时时，中止数据库端正在执行的语句
+
+使用方式：
+    from app.services.sql_execution_service import sql_execution_service
+
+    result = await sql_execution_service.execute_by_id(connection_id, sql, timeout=30)
+    result.columns, result.rows, result.truncated
+"""
+import asyncio
+import logging
+import math
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core.exceptions import SQLExecutionException
+
+logger = logging.getLogger(__name__)
+
+# 客户端等待在数据库端超时基础上的宽限时间（秒），让数据库先返回超时错误
+_CLIENT_TIMEOUT_GRACE = 2.0
+
+
+class SQLExecutionService:
+    """
+    异步 SQL 执行服务
+
+    线程池在首次使用时创建；并发信号量按事件循环隔离，可在多个事件循环中使用。
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, tenant_max_concurrency: Optional[int] = None):
+        self._max_workers = max_workers or settings.SQL_EXECUTOR_MAX_WORKERS
+        self._tenant_max_concurrency = tenant_max_concurrency or settings.SQL_TENANT_MAX_CONCURRENCY
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        # event loop -> {tenant_key: Semaphore}
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Any, asyncio.Semaphore]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._running: Dict[Any, int] = {}
+
+    # ===== 对外接口 =====
+
+    async def execute_by_id(
+        self,
+        connection_id: int,
+        query: str,
+        timeout: Optional[float] = None,
+        max_rows: Optional[int] = None,
+        tenant_id: Optional[int] = None
+    ):
+        """
+        根据连接ID执行查询
+
+        Raises:
+            SQLExecutionException: 连接不存在、超时或执行失败
+        """
+        from app.services.db_service import get_db_connection_by_id
+
+        loop = asyncio.get_running_loop()
+        connection = await loop.run_in_executor(self._get_executor(), get_db_connection_by_id, connection_id)
+        if not connection:
+            raise SQLExecutionException(
+                f"找不到连接ID为 {connection_id} 的数据库连接",
+                details={"connection_id": connection_id}
+            )
+        return await self.execute(connection, query, timeout=timeout, max_rows=max_rows, tenant_id=tenant_id)
+
+    async def execute(
+        self,
+        connection: Any,
+        query: str,
+        timeout: Optional[float] = None,
+        max_rows: Optional[int] = None,
+        tenant_id: Optional[int] = None
+    ):
+        """
+        在专用线程池中执行查询
+
+        Args:
+            connection: DBConnection 对象
+            query: SQL 语句
+            timeout: 总超时（秒，含排队时间），默认 SQL_DEFAULT_TIMEOUT
+            max_rows: 最多返回行数，默认 SQL_RESULT_MAX_ROWS
+            tenant_id: 并发限制所属租户，默认取 connection.tenant_id
+
+        Returns:
+            ColumnarResult
+
+        Raises:
+            SQLExecutionException: 超时或执行失败
+            asyncio.CancelledError: 调用方被取消（查询会被中止）
+        """
+        from app.services.db_service import QueryStream, ColumnarResult, QueryCancelledError
+
+        timeout = float(timeout or settings.SQL_DEFAULT_TIMEOUT)
+        deadline = time.monotonic() + timeout
+        tenant_key = self._tenant_key(connection, tenant_id)
+        semaphore = self._get_semaphore(tenant_key)
+
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise SQLExecutionException(
+                f"Query timed out after {timeout:g}s waiting for an execution slot",
+                details={"tenant": tenant_key, "timeout": timeout}
+            )
+
+        remaining = max(deadline - time.monotonic(), 1.0)
+        stream = QueryStream(
+            connection, query, max_rows=max_rows, timeout_seconds=math.ceil(remaining)
+        )
+
+        def run() -> ColumnarResult:
+            rows = []
+            for batch in stream:
+                rows.extend(batch)
+            return ColumnarResult(columns=stream.columns, rows=rows, truncated=stream.truncated)
+
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._get_executor().submit(run)
+        except BaseException:
+            semaphore.release()
+            raise
+        self._track(tenant_key, 1)
+        # 并发名额在线程真正结束后才释放，超时/取消后的残留查询仍计入租户并发
+        future.add_done_callback(lambda _: self._release(loop, semaphore, tenant_key))
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=remaining + _CLIENT_TIMEOUT_GRACE)
+        except asyncio.TimeoutError:
+            self._cancel_in_background(loop, stream)
+            raise SQLExecutionException(
+                f"Query timed out after {timeout:g}s",
+                details={"tenant": tenant_key, "timeout": timeout}
+            )
+        except asyncio.CancelledError:
+            logger.info(f"SQL execution cancelled by caller (tenant={tenant_key})")
+            self._cancel_in_background(loop, stream)
+            raise
+        except QueryCancelledError as e:
+            raise SQLExecutionException(str(e), details={"tenant": tenant_key})
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取执行线程池与各租户并发统计"""
+        with self._lock:
+            running = dict(self._running)
+        return {
+            "max_workers": self._max_workers,
+            "tenant_max_concurrency": self._tenant_max_concurrency,
+            "running": running,
+        }
+
+    def shutdown(self) -> None:
+        """关闭线程池（应用关闭时调用）"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    # ===== 内部方法 =====
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._max_workers, thread_name_prefix="sql-exec"
+                )
+            return self._executor
+
+    def _get_semaphore(self, tenant_key: Any) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphores = self._semaphores.setdefault(loop, {})
+            semaphore = semaphores.get(tenant_key)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self._tenant_max_concurrency)
+                semaphores[tenant_key] = semaphore
+            return semaphore
+
+    @staticmethod
+    def _tenant_key(connection: Any, tenant_id: Optional[int]) -> Any:
+        if tenant_id is not None:
+            return tenant_id
+        tenant_id = getattr(connection, "tenant_id", None)
+        if tenant_id is not None:
+            return tenant_id
+        # 无租户的连接各自独立限流
+        return f"connection:{getattr(connection, 'id', None)}"
+
+    def _track(self, tenant_key: Any, delta: int) -> None:
+        with self._lock:
+            count = self._running.get(tenant_key, 0) + delta
+            if count > 0:
+                self._running[tenant_key] = count
+            else:
+                self._running.pop(tenant_key, None)
+
+    def _release(self, loop: asyncio.AbstractEventLoop, semaphore: asyncio.Semaphore, tenant_key: Any) -> None:
+        self._track(tenant_key, -1)
+        try:
+            loop.call_soon_threadsafe(semaphore.release)
+        except RuntimeError:
+            # 事件循环已关闭，信号量随之失效
+            pass
+
+    @staticmethod
+    def _cancel_in_background(loop: asyncio.AbstractEventLoop, stream: Any) -> None:
+        # cancel() 可能需要另开连接（MySQL KILL QUERY），不能在事件循环线程中执行
+        try:
+            loop.run_in_executor(None, stream.cancel)
+        except RuntimeError:
+            stream.cancel()
+
+
+# 创建全局实例
+sql_execution_service = SQLExecutionService()
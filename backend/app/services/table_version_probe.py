@@ -0,0 +1,146 @@
+"""
+表数据版本探测 (Table Version Probe)
+
+为查询结果缓存提供按表的轻量数据版本，用于在源表变化时精确失效缓存：
+- MySQL：information_schema.TABLES.UPDATE_TIME
+- PostgreSQL：pg_stat_user_tables 的插入/更新/删除计数
+- 其他数据库（或上述方式取不到版本的表）：可选的水位列 MAX(QUERY_CACHE_WATERMARK_COLUMN)
+
+取不到版本的表返回 None，调用方应回退到 TTL 过期。
+同一连接的探测结果缓存 QUERY_CACHE_VERSION_PROBE_TTL 秒，高并发检查缓存时不会反复访问目标库。
+
+使用方式：
+    from app.services.table_version_probe import table_version_probe
+
+    versions = table_version_probe.get_versions(connection_id, ["orders", "customers"])
+    # {"orders": "2026-01-01 10:00:00", "customers": None}
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import bindparam, text
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_MYSQL_VERSIONS = text(
+    "SELECT TABLE_NAME, UPDATE_TIME FROM information_schema.TABLES "
+    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN :names"
+).bindparams(bindparam("names", expanding=True))
+
+_POSTGRES_VERSIONS = text(
+    "SELECT relname, SUM(n_tup_ins), SUM(n_tup_upd), SUM(n_tup_del) FROM pg_stat_user_tables "
+    "WHERE relname IN :names GROUP BY relname"
+).bindparams(bindparam("names", expanding=True))
+
+
+class TableVersionProbe:
+    """
+    按表探测数据版本
+
+    线程安全；探测失败时返回 None（不抛异常），缓存逻辑据此回退到 TTL。
+    """
+
+    def __init__(self, probe_ttl: Optional[float] = None, watermark_column: Optional[str] = None):
+        self._probe_ttl = settings.QUERY_CACHE_VERSION_PROBE_TTL if probe_ttl is None else probe_ttl
+        self._watermark_column = (
+            settings.QUERY_CACHE_WATERMARK_COLUMN if watermark_column is None else watermark_column
+        )
+        # (connection_id, table) -> (version, probed_at)
+        self._versions: Dict[Tuple[int, str], Tuple[Optional[str], float]] = {}
+        self._lock = threading.Lock()
+
+    # ===== 对外接口 =====
+
+    def get_versions(self, connection_id: int, tables: Iterable[str]) -> Dict[str, Optional[str]]:
+        """获取表的当前数据版本（表名小写），取不到版本的表为 None"""
+        tables = sorted({t.lower() for t in tables if t})
+        if not tables:
+            return {}
+
+        now = time.monotonic()
+        result: Dict[str, Optional[str]] = {}
+        missing = []
+        with self._lock:
+            for table in tables:
+                cached = self._versions.get((connection_id, table))
+                if cached is not None and now - cached[1] < self._probe_ttl:
+                    result[table] = cached[0]
+                else:
+                    missing.append(table)
+        if not missing:
+            return result
+
+        probed = self._probe(connection_id, missing)
+        probed_at = time.monotonic()
+        with self._lock:
+            for table in missing:
+                version = probed.get(table)
+                self._versions[(connection_id, table)] = (version, probed_at)
+                result[table] = version
+        return result
+
+    def invalidate(self, connection_id: Optional[int] = None) -> None:
+        """丢弃探测结果缓存（connection_id 为空时丢弃全部）"""
+        with self._lock:
+            if connection_id is None:
+                self._versions.clear()
+            else:
+                for key in [k for k in self._versions if k[0] == connection_id]:
+                    del self._versions[key]
+
+    # ===== 内部方法 =====
+
+    def _probe(self, connection_id: int, tables: list) -> Dict[str, Optional[str]]:
+        from app.services.db_service import get_db_connection_by_id
+        from app.services.db_engine_registry import db_engine_registry
+
+        try:
+            connection = get_db_connection_by_id(connection_id)
+            if connection is None:
+                return {}
+            db_type = (connection.db_type or "").lower()
+            versions: Dict[str, Optional[str]] = {}
+            with db_engine_registry.connect(connection) as conn:
+                if db_type == "mysql":
+                    versions = self._probe_mysql(conn, tables)
+                elif db_type == "postgresql":
+                    versions = self._probe_postgresql(conn, tables)
+                if self._watermark_column:
+                    for table in tables:
+                        if versions.get(table) is None:
+                            versions[table] = self._probe_watermark(conn, table)
+            return versions
+        except Exception as e:
+            logger.warning(f"Table version probe failed for connection {connection_id}: {e}")
+            return {}
+
+    @staticmethod
+    def _probe_mysql(conn: Any, tables: list) -> Dict[str, Optional[str]]:
+        rows = conn.execute(_MYSQL_VERSIONS, {"names": tables}).fetchall()
+        # UPDATE_TIME 为空（如 MySQL 5.7 InnoDB、重启后尚未写入）时视为未知
+        return {name.lower(): str(update_time) if update_time else None for name, update_time in rows}
+
+    @staticmethod
+    def _probe_postgresql(conn: Any, tables: list) -> Dict[str, Optional[str]]:
+        rows = conn.execute(_POSTGRES_VERSIONS, {"names": tables}).fetchall()
+        return {name.lower(): f"{ins}:{upd}:{dele}" for name, ins, upd, dele in rows}
+
+    def _probe_watermark(self, conn: Any, table: str) -> Optional[str]:
+        preparer = conn.dialect.identifier_preparer
+        try:
+            # 每个表一个保存点，缺少水位列的表报错时不影响其他表的探测
+            with conn.begin_nested():
+                value = conn.execute(text(
+                    f"SELECT MAX({preparer.quote(self._watermark_column)}) FROM {preparer.quote(table)}"
+                )).scalar()
+        except Exception:
+            return None
+        return None if value is None else str(value)
+
+
+# 创建全局实例
+table_version_probe = TableVersionProbe()
@@ -6,24 +6,19 @@ import re
 import json
 from typing import Dict, Any, List, Optional, Tuple, Set
 from sqlalchemy.orm import Session
-from neo4j import GraphDatabase
 
-from app.core.config import settings
 from app.core.llms import get_default_model
+from app.core.llm_wrapper import get_llm_wrapper
+from app.services.schema_snapshot import schema_snapshot_cache
 from app import crud
 
-# 查询分析缓存，避免重复的LLM调用
-query_analysis_cache = {}
-
 
 def analyze_query_with_llm(query: str) -> Dict[str, Any]:
     """
     使用LLM分析自然语言查询，提取关键实体和意图
     返回包含实体、关系和查询意图的结构化分析
+    （相同查询的 LLM 响应由 LLM 调用缓存复用）
     """
-    # 检查缓存
-    if query in query_analysis_cache:
-        return query_analysis_cache[query]
     try:
         # 为LLM准备提示
         prompt = f"""
@@ -42,11 +37,11 @@ def analyze_query_with_llm(query: str) -> Dict[str, Any]:
             "comparison_related": 布尔值，表示查询是否涉及值比较
         }}
         """
-        # 调用LLM
-        model_client = get_default_model()
-        # 直接使用model_client以保持一致性
-        response = model_client.invoke(
-            [{"role": "user", "content": prompt}, {"role": "system", "content": "你是一名数据库专家，擅长根据自然语言分析相关的数据库表及列"}]
+        # 调用LLM（使用全局包装器，调用指标计入 get_llm_metrics；结果只取决于查询，开启调用缓存）
+        llm = get_llm_wrapper()
+        response = llm.invoke(
+            [{"role": "user", "content": prompt}, {"role": "system", "content": "你是一名数据库专家，擅长根据自然语言分析相关的数据库表及列"}],
+            cache=True
         )
 
         response_text = response.content
@@ -63,14 +58,10 @@ def analyze_query_with_llm(query: str) -> Dict[str, Any]:
         else:
             analysis = _create_fallback_analysis(query)
 
-        # 缓存结果
-        query_analysis_cache[query] = analysis
         return analysis
     except Exception as e:
         # 如果发生任何错误，回退到关键词提取
-        analysis = _create_fallback_analysis(query)
-        query_analysis_cache[query] = analysis
-        return analysis
+        return _create_fallback_analysis(query)
 
 
 def _create_fallback_analysis(query: str) -> Dict[str, Any]:
@@ -228,12 +219,12 @@ def filter_expanded_tables_with_llm(query: str, query_analysis: Dict[str, Any],
         ]
         """
 
-        # 调用LLM
-        model_client = get_default_model()
-        # 直接使用model_client以保持一致性
-        response = model_client.invoke(
+        # 调用LLM（使用全局包装器；结果只取决于查询和候选表，开启调用缓存）
+        llm = get_llm_wrapper()
+        response = llm.invoke(
             [{"role": "user", "content": prompt},
-             {"role": "system", "content": "你是一名数据库专家，擅长分析自然语言查询与相关的数据库表是否有关"}]
+             {"role": "system", "content": "你是一名数据库专家，擅长分析自然语言查询与相关的数据库表是否有关"}],
+            cache=True
         )
         response_text = response.content
 
@@ -390,130 +381,94 @@ def extract_sql_from_llm_response(response: str) -> str:
 def retrieve_relevant_schema(db: Session, connection_id: int, query: str) -> Dict[str, Any]:
     """
     基于自然语言查询检索相关的表结构信息
-    使用Neo4j图数据库和LLM找到相关表和列
+    使用LLM和Schema快照找到相关表和列
+
+    表、列、关系均来自进程内的 Schema 快照（与 Neo4j 图同源），
+    组装过程只访问内存索引，耗时与选中的表数量成正比。
     """
     try:
         # 1. 使用LLM分析查询并提取关键实体和意图
         query_analysis = analyze_query_with_llm(query)
 
-        # 连接到Neo4j
-        driver = GraphDatabase.driver(
-            settings.NEO4J_URI,
-            auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
-        )
+        snapshot = schema_snapshot_cache.get(db, connection_id)
 
         # 使用字典按ID跟踪表以防止重复
         relevant_tables_dict = {}
-        relevant_columns = set()
+        relevant_column_ids = set()
         table_relevance_scores = {}
 
-        with driver.session() as session:
-            # 2. 首先，获取此连接的所有表及其描述
-            # 这将用于语义匹配
-            all_tables = session.run(
-                """
-                MATCH (t:Table {connection_id: $connection_id})
-                RETURN t.id AS id, t.name AS name, t.description AS description
-                """,
-                connection_id=connection_id
-            ).data()
-
-            # 3. 使用语义搜索基于查询分析找到相关表
-            relevant_table_ids = find_relevant_tables_semantic(query, query_analysis, all_tables)
-
-            # 4. 按ID获取表并设置相关性分数
-            for table_id, relevance_score in relevant_table_ids:
-                # 确保table_id是整数类型
-                if not isinstance(table_id, int):
-                    try:
-                        table_id = int(table_id)
-                    except (ValueError, TypeError):
-                        continue
+        # 2. 首先，获取此连接的所有表及其描述
+        # 这将用于语义匹配
+        all_tables = [
+            {"id": t.id, "name": t.name, "description": t.description}
+            for t in snapshot.tables.values()
+        ]
 
-                # 查找表信息
-                table_info = next((t for t in all_tables if t["id"] == table_id), None)
-                if table_info:
-                    # 在字典中存储表，以ID为键
-                    relevant_tables_dict[table_info["id"]] = (
-                        table_info["id"], table_info["name"], table_info["description"]
+        # 3. 使用语义搜索基于查询分析找到相关表
+        relevant_table_ids = find_relevant_tables_semantic(query, query_analysis, all_tables)
+
+        # 4. 按ID获取表并设置相关性分数
+        for table_id, relevance_score in relevant_table_ids:
+            # 确保table_id是整数类型
+            if not isinstance(table_id, int):
+                try:
+                    table_id = int(table_id)
+                except (ValueError, TypeError):
+                    continue
+
+            table_info = snapshot.tables.get(table_id)
+            if table_info:
+                # 在字典中存储表，以ID为键
+                relevant_tables_dict[table_info.id] = (table_info.id, table_info.name, table_info.description)
+                table_relevance_scores[table_info.id] = relevance_score
+
+        # 5. 找到与查询相关的列（匹配列名或描述）
+        for entity in query_analysis["entities"]:
+            entity = entity.lower()
+            for column in snapshot.columns.values():
+                if entity not in column.name.lower() and entity not in column.description.lower():
+                    continue
+                relevant_column_ids.add(column.id)
+                # 添加表或更新（如果已存在且有更好的描述）
+                if column.table_id not in relevant_tables_dict or not relevant_tables_dict[column.table_id][2]:
+                    relevant_tables_dict[column.table_id] = (
+                        column.table_id, snapshot.tables[column.table_id].name, ""
                     )
-                    table_relevance_scores[table_info["id"]] = relevance_score
-
-            # 5. 找到与查询相关的列
-            for entity in query_analysis["entities"]:
-                # 搜索匹配实体名称或描述的列
-                result = session.run(
-                    """
-                    MATCH (c:Column {connection_id: $connection_id})
-                    WHERE toLower(c.name) CONTAINS $entity OR toLower(c.description) CONTAINS $entity
-                    MATCH (t:Table)-[:HAS_COLUMN]->(c)
-                    RETURN c.id AS id, c.name AS name, c.type AS type, c.description AS description,
-                           c.is_pk AS is_pk, c.is_fk AS is_fk, t.id AS table_id, t.name AS table_name
-                    """,
-                    connection_id=connection_id,
-                    entity=entity.lower()
-                )
-
-                for record in result:
-                    relevant_columns.add((
-                        record["id"], record["name"], record["type"], record["description"],
-                        record["is_pk"], record["is_fk"], record["table_id"], record["table_name"]
-                    ))
+                # 为有匹配列的表增加相关性分数
+                table_relevance_scores[column.table_id] = table_relevance_scores.get(column.table_id, 0) + 0.5
+
+        # 6. 如果找到了一些相关表/列，扩展以包含相关表
+        if relevant_tables_dict or relevant_column_ids:
+            table_ids = list(relevant_tables_dict.keys())
+            selected = set(table_ids)
+
+            # 通过外键找到连接的表（1跳）
+            for source_table_id in table_ids:
+                for rel in snapshot.outgoing.get(source_table_id, ()):
+                    if rel.target_table_id in selected:
+                        continue
+                    target = snapshot.tables[rel.target_table_id]
                     # 添加表或更新（如果已存在且有更好的描述）
-                    if record["table_id"] not in relevant_tables_dict or not relevant_tables_dict[record["table_id"]][2]:
-                        relevant_tables_dict[record["table_id"]] = (
-                            record["table_id"], record["table_name"], ""
-                        )
-                    # 为有匹配列的表增加相关性分数
-                    table_relevance_scores[record["table_id"]] = table_relevance_scores.get(record["table_id"], 0) + 0.5
-
-            # 6. 如果找到了一些相关表/列，扩展以包含相关表
-            if relevant_tables_dict or relevant_columns:
-                table_ids = list(relevant_tables_dict.keys())
-
-                # 通过外键找到连接的表（1跳）
-                if table_ids:
-                    result = session.run(
-                        """
-                        MATCH (t1:Table {connection_id: $connection_id})-[:HAS_COLUMN]->
-                              (c1:Column)-[:REFERENCES]->
-                              (c2:Column)<-[:HAS_COLUMN]-(t2:Table {connection_id: $connection_id})
-                        WHERE t1.id IN $table_ids AND NOT t2.id IN $table_ids
-                        RETURN t2.id AS id, t2.name AS name, t2.description AS description,
-                               c1.id AS source_column_id, c1.name AS source_column_name,
-                               c2.id AS target_column_id, c2.name AS target_column_name,
-                               t1.id AS source_table_id
-                        """,
-                        connection_id=connection_id,
-                        table_ids=table_ids
-                    )
-
-                    for record in result:
-                        # 添加表或更新（如果已存在且有更好的描述）
-                        if record["id"] not in relevant_tables_dict or (
-                            not relevant_tables_dict[record["id"]][2] and record["description"]
-                        ):
-                            relevant_tables_dict[record["id"]] = (
-                                record["id"], record["name"], record["description"]
-                            )
-                        # 相关表基于源表的分数获得相关性分数
-                        source_score = table_relevance_scores.get(record["source_table_id"], 0)
-                        table_relevance_scores[record["id"]] = source_score * 0.7  # 相关表分数降低
-
-                # 7. 使用LLM评估扩展表是否真正与查询相关
-                expanded_tables = [t for t in relevant_tables_dict.values() if t[0] not in table_ids]
-                if expanded_tables:
-                    filtered_expanded_tables = filter_expanded_tables_with_llm(
-                        query, query_analysis, expanded_tables, table_relevance_scores
-                    )
-                    # 移除LLM认为不相关的表
-                    # 只保留相关表
-                    filtered_table_ids = set(table_ids).union({t[0] for t in filtered_expanded_tables})
-                    relevant_tables_dict = {
-                        tid: t for tid, t in relevant_tables_dict.items() if tid in filtered_table_ids
-                    }
-
-        driver.close()
+                    if target.id not in relevant_tables_dict or (
+                        not relevant_tables_dict[target.id][2] and target.description
+                    ):
+                        relevant_tables_dict[target.id] = (target.id, target.name, target.description)
+                    # 相关表基于源表的分数获得相关性分数
+                    source_score = table_relevance_scores.get(source_table_id, 0)
+                    table_relevance_scores[target.id] = source_score * 0.7  # 相关表分数降低
+
+            # 7. 使用LLM评估扩展表是否真正与查询相关
+            expanded_tables = [t for t in relevant_tables_dict.values() if t[0] not in selected]
+            if expanded_tables:
+                filtered_expanded_tables = filter_expanded_tables_with_llm(
+                    query, query_analysis, expanded_tables, table_relevance_scores
+                )
+                # 移除LLM认为不相关的表
+                # 只保留相关表
+                filtered_table_ids = selected.union({t[0] for t in filtered_expanded_tables})
+                relevant_tables_dict = {
+                    tid: t for tid, t in relevant_tables_dict.items() if tid in filtered_table_ids
+                }
 
         # 8. 按相关性分数排序表
         sorted_tables = sorted(
@@ -527,25 +482,15 @@ def retrieve_relevant_schema(db: Session, connection_id: int, query: str) -> Dic
 
         # 如果没有找到相关表，返回所有表
         if not tables_list:
-            all_tables_from_db = crud.schema_table.get_by_connection(db=db, connection_id=connection_id)
-            tables_list = [
-                {
-                    "id": table.id,
-                    "name": table.table_name,
-                    "description": table.description or ""
-                }
-                for table in all_tables_from_db
-            ]
-
-        columns_list = []
+            tables_list = all_tables
 
         # 获取表的所有列
+        columns_list = []
         for table in tables_list:
-            table_columns = crud.schema_column.get_by_table(db=db, table_id=table["id"])
-            for column in table_columns:
+            for column in snapshot.columns_of(table["id"]):
                 columns_list.append({
                     "id": column.id,
-                    "name": column.column_name,
+                    "name": column.name,
                     "type": column.data_type,
                     "description": column.description,
                     "is_primary_key": column.is_primary_key,
@@ -554,56 +499,21 @@ def retrieve_relevant_schema(db: Session, connection_id: int, query: str) -> Dic
                     "table_name": table["name"]
                 })
 
-        # 获取表之间的关系
+        # 获取选中表之间的关系（返回所有表时即为全部关系）
+        table_names = {t["id"]: t["name"] for t in tables_list}
         relationships_list = []
-        table_ids = [t["id"] for t in tables_list]
-
-        # 如果返回所有表，则获取所有关系
-        all_tables_count = len(crud.schema_table.get_by_connection(db=db, connection_id=connection_id))
-        if len(tables_list) == all_tables_count:
-            all_relationships = crud.schema_relationship.get_by_connection(db=db, connection_id=connection_id)
-
-            for rel in all_relationships:
-                source_table = next((t for t in tables_list if t["id"] == rel.source_table_id), None)
-                target_table = next((t for t in tables_list if t["id"] == rel.target_table_id), None)
-                source_column = next((c for c in columns_list if c["id"] == rel.source_column_id), None)
-                target_column = next((c for c in columns_list if c["id"] == rel.target_column_id), None)
-
-                if source_table and target_table and source_column and target_column:
-                    relationships_list.append({
-                        "id": rel.id,
-                        "source_table": source_table["name"],
-                        "source_column": source_column["name"],
-                        "target_table": target_table["name"],
-                        "target_column": target_column["name"],
-                        "relationship_type": rel.relationship_type
-                    })
-        else:
-            # 如果只返回相关表，则获取这些表之间的关系
-            for table in tables_list:
-                source_rels = crud.schema_relationship.get_by_source_table(db=db, source_table_id=table["id"])
-                target_rels = crud.schema_relationship.get_by_target_table(db=db, target_table_id=table["id"])
-
-                for rel in source_rels + target_rels:
-                    # 只包含相关表集中的表之间的关系
-                    if rel.source_table_id in table_ids and rel.target_table_id in table_ids:
-                        source_table = next((t for t in tables_list if t["id"] == rel.source_table_id), None)
-                        target_table = next((t for t in tables_list if t["id"] == rel.target_table_id), None)
-                        source_column = next((c for c in columns_list if c["id"] == rel.source_column_id), None)
-                        target_column = next((c for c in columns_list if c["id"] == rel.target_column_id), None)
-
-                        if source_table and target_table and source_column and target_column:
-                            # 确保不重复添加关系
-                            rel_dict = {
-                                "id": rel.id,
-                                "source_table": source_table["name"],
-                                "source_column": source_column["name"],
-                                "target_table": target_table["name"],
-                                "target_column": target_column["name"],
-                                "relationship_type": rel.relationship_type
-                            }
-                            if rel_dict not in relationships_list:
-                                relationships_list.append(rel_dict)
+        for rel in snapshot.relationships_among(table_names):
+            source_column = snapshot.columns.get(rel.source_column_id)
+            target_column = snapshot.columns.get(rel.target_column_id)
+            if source_column and target_column:
+                relationships_list.append({
+                    "id": rel.id,
+                    "source_table": table_names[rel.source_table_id],
+                    "source_column": source_column.name,
+                    "target_table": table_names[rel.target_table_id],
+                    "target_column": target_column.name,
+                    "relationship_type": rel.relationship_type
+                })
 
         return {
             "tables": tables_list,
@@ -14,11 +14,10 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime
 import logging
 
-from neo4j import GraphDatabase
 from sqlalchemy import text
 
-from app.core.config import settings
-from app.services.db_service import get_db_engine, get_db_connection_by_id
+from app.services.db_service import get_pooled_engine, get_db_connection_by_id
+from app.services.neo4j_service import neo4j_service
 from app.schemas.metric import ColumnProfile, TableProfile
 
 logger = logging.getLogger(__name__)
@@ -34,28 +33,16 @@ class ValueProfilingService:
     """值域预检索服务"""
     
     def __init__(self):
-        self.neo4j_driver = None
         self._initialized = False
     
-    def _get_neo4j_driver(self):
-        """获取 Neo4j 驱动"""
-        if not self.neo4j_driver:
-            self.neo4j_driver = GraphDatabase.driver(
-                settings.NEO4J_URI,
-                auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
-            )
-        return self.neo4j_driver
-    
     async def initialize(self):
         """初始化服务"""
         if self._initialized:
             return
         
         try:
-            driver = self._get_neo4j_driver()
-            # 测试连接
-            with driver.session() as session:
-                session.run("RETURN 1")
+            # 测试连接（共享异步驱动）
+            await neo4j_service.run_query("RETURN 1")
             
             self._initialized = True
             logger.info("Value profiling service initialized")
@@ -89,7 +76,7 @@ class ValueProfilingService:
         if not connection:
             raise ValueError(f"Connection {connection_id} not found")
         
-        engine = get_db_engine(connection)
+        engine = get_pooled_engine(connection)
         profile = ColumnProfile(
             column_name=column_name,
             table_name=table_name,
@@ -195,7 +182,7 @@ class ValueProfilingService:
         if not connection:
             raise ValueError(f"Connection {connection_id} not found")
         
-        engine = get_db_engine(connection)
+        engine = get_pooled_engine(connection)
         
         # 获取行数
         row_count = 0
@@ -278,14 +265,13 @@ class ValueProfilingService:
         """
         await self.initialize()
         
-        driver = self._get_neo4j_driver()
-        with driver.session() as session:
-            result = session.run("""
+        async with neo4j_service.async_session() as session:
+            result = await session.run("""
                 MATCH (t:Table {name: $table_name, connection_id: $connection_id})-[:HAS_COLUMN]->(c:Column {name: $column_name})
                 RETURN c
             """, table_name=table_name, connection_id=connection_id, column_name=column_name)
             
-            record = result.single()
+            record = await result.single()
             if not record:
                 return None
             
@@ -329,16 +315,15 @@ class ValueProfilingService:
         """
         await self.initialize()
         
-        driver = self._get_neo4j_driver()
-        with driver.session() as session:
+        async with neo4j_service.async_session() as session:
             if table_name:
-                result = session.run("""
+                result = await session.run("""
                     MATCH (t:Table {name: $table_name, connection_id: $connection_id})-[:HAS_COLUMN]->(c:Column)
                     WHERE c.is_enum = true
                     RETURN t.name AS table_name, c.name AS column_name, c.enum_values AS enum_values
                 """, table_name=table_name, connection_id=connection_id)
             else:
-                result = session.run("""
+                result = await session.run("""
                     MATCH (t:Table {connection_id: $connection_id})-[:HAS_COLUMN]->(c:Column)
                     WHERE c.is_enum = true
                     RETURN t.name AS table_name, c.name AS column_name, c.enum_values AS enum_values
@@ -350,7 +335,7 @@ class ValueProfilingService:
                     "column_name": record["column_name"],
                     "enum_values": record["enum_values"] or []
                 }
-                for record in result
+                async for record in result
             ]
     
     async def get_date_columns(
@@ -370,17 +355,16 @@ class ValueProfilingService:
         """
         await self.initialize()
         
-        driver = self._get_neo4j_driver()
-        with driver.session() as session:
+        async with neo4j_service.async_session() as session:
             if table_name:
-                result = session.run("""
+                result = await session.run("""
                     MATCH (t:Table {name: $table_name, connection_id: $connection_id})-[:HAS_COLUMN]->(c:Column)
                     WHERE c.date_min IS NOT NULL OR c.date_max IS NOT NULL
                     RETURN t.name AS table_name, c.name AS column_name, 
                            c.date_min AS date_min, c.date_max AS date_max
                 """, table_name=table_name, connection_id=connection_id)
             else:
-                result = session.run("""
+                result = await session.run("""
                     MATCH (t:Table {connection_id: $connection_id})-[:HAS_COLUMN]->(c:Column)
                     WHERE c.date_min IS NOT NULL OR c.date_max IS NOT NULL
                     RETURN t.name AS table_name, c.name AS column_name,
@@ -394,7 +378,7 @@ class ValueProfilingService:
                     "date_min": record["date_min"],
                     "date_max": record["date_max"]
                 }
-                for record in result
+                async for record in result
             ]
     
     # ===== 辅助方法 =====
@@ -407,9 +391,8 @@ class ValueProfilingService:
         profile: ColumnProfile
     ):
         """将 Profile 结果存储到 Neo4j Column 节点"""
-        driver = self._get_neo4j_driver()
-        with driver.session() as session:
-            session.run("""
+        async with neo4j_service.async_session() as session:
+            await session.run("""
                 MATCH (t:Table {name: $table_name, connection_id: $connection_id})-[:HAS_COLUMN]->(c:Column {name: $column_name})
                 SET c.distinct_count = $distinct_count,
                     c.null_count = $null_count,
@@ -441,15 +424,14 @@ class ValueProfilingService:
     
     async def _get_tables_from_neo4j(self, connection_id: int) -> List[str]:
         """从 Neo4j 获取表名列表"""
-        driver = self._get_neo4j_driver()
-        with driver.session() as session:
-            result = session.run("""
+        async with neo4j_service.async_session() as session:
+            result = await session.run("""
                 MATCH (t:Table {connection_id: $connection_id})
                 RETURN t.name AS name
                 ORDER BY t.name
             """, connection_id=connection_id)
             
-            return [record["name"] for record in result]
+            return [record["name"] async for record in result]
     
     async def _get_columns_from_neo4j(
         self,
@@ -457,15 +439,14 @@ class ValueProfilingService:
         table_name: str
     ) -> List[Dict[str, str]]:
         """从 Neo4j 获取字段列表"""
-        driver = self._get_neo4j_driver()
-        with driver.session() as session:
-            result = session.run("""
+        async with neo4j_service.async_session() as session:
+            result = await session.run("""
                 MATCH (t:Table {name: $table_name, connection_id: $connection_id})-[:HAS_COLUMN]->(c:Column)
                 RETURN c.name AS name, c.type AS type
                 ORDER BY c.name
             """, table_name=table_name, connection_id=connection_id)
             
-            return [{"name": record["name"], "type": record["type"] or "unknown"} for record in result]
+            return [{"name": record["name"], "type": record["type"] or "unknown"} async for record in result]
     
     def _is_numeric_type(self, data_type: str) -> bool:
         """判断是否为数值类型"""
@@ -482,10 +463,8 @@ class ValueProfilingService:
         return any(t in data_type.lower() for t in date_types)
     
     def close(self):
-        """关闭连接"""
-        if self.neo4j_driver:
-            self.neo4j_driver.close()
-            self.neo4j_driver = None
+        """关闭资源（使用公共 Neo4j 服务，此方法保留以保持兼容）"""
+        pass
 
 
 # 创建全局实例
@@ -0,0 +1,149 @@
+"""
+Widget 数据缓存编码 (Widget data_cache codec)
+
+data_cache 原来保存行字典列表，每一行都重复全部列名，5 千行的 Widget 可达数 MB，
+每次打开 Dashboard 都要完整解析。刷新时改为写入列式格式：
+
+    {
+        "format": "columnar",
+        "columns": ["region", "amount"],        # 列名只存一次
+        "values": [["华东", ...], [120.5, ...]],  # 每列一个数组（未压缩）
+        "row_count": 5000,
+        "truncated": false,
+        "refreshed_at": "..."
+    }
+
+列数据序列化后超过 DASHBOARD_CACHE_COMPRESS_MIN_BYTES 时用 zstd 压缩，"values" 换成
+"codec": "zstd" 和 base64 编码的 "payload"（未安装 zstandard 或配置为 none 时不压缩）。
+
+读取方不直接访问 data_cache["data"]，统一通过本模块读取，只在需要时解码：
+- columnar_view：API 响应返回列式格式（压缩的只解压为 "values"，不展开为行字典），
+  由前端展开为行；未压缩的缓存原样返回
+- cache_rows：取行字典列表，用于聚合分析、预测等；limit 只展开前若干行（如 AI 推荐的样本）
+旧格式（行字典 / rows / 列表）和洞察分析 Widget 的缓存原样返回，无需迁移。
+
+使用方式：
+    from app.services.widget_cache_codec import encode_data_cache, cache_rows
+
+    widget.data_cache = encode_data_cache(columns, rows, truncated=False)
+    rows = cache_rows(widget.data_cache)
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，未安装时不压缩
+    zstandard = None
+
+COLUMNAR_FORMAT = "columnar"
+ZSTD_CODEC = "zstd"
+
+
+def encode_data_cache(
+    columns: Sequence[str],
+    rows: Sequence[Sequence[Any]],
+    *,
+    truncated: bool = False,
+    refreshed_at: Optional[str] = None,
+    **extra: Any
+) -> Dict[str, Any]:
+    """
+    把查询结果编码为列式 data_cache
+
+    Args:
+        columns: 列名
+        rows: 行值列表（与 columns 顺序一致，值已是 JSON 可序列化类型）
+        truncated: 结果是否被截断
+        refreshed_at: 刷新时间（ISO 字符串），默认当前时间
+        extra: 其他需要保留的字段（如 error）
+    """
+    columns = list(columns)
+    values = [list(column) for column in zip(*rows)] if rows else [[] for _ in columns]
+    cache = {
+        "format": COLUMNAR_FORMAT,
+        "columns": columns,
+        "row_count": len(rows),
+        "truncated": truncated,
+        "refreshed_at": refreshed_at or datetime.utcnow().isoformat(),
+        **extra
+    }
+
+    compressed = _compress(values)
+    if compressed is not None:
+        cache["codec"] = ZSTD_CODEC
+        cache["payload"] = compressed
+    else:
+        cache["values"] = values
+    return cache
+
+
+def is_columnar(cache: Any) -> bool:
+    return isinstance(cache, dict) and cache.get("format") == COLUMNAR_FORMAT
+
+
+def decode_columns(cache: Dict[str, Any]) -> Tuple[List[str], List[list]]:
+    """返回列式缓存的 (列名, 每列的值数组)"""
+    columns = cache.get("columns") or []
+    if cache.get("codec") == ZSTD_CODEC:
+        values = _decompress(cache["payload"])
+    else:
+        values = cache.get("values") or [[] for _ in columns]
+    return columns, values
+
+
+def cache_rows(cache: Any, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    取出缓存中的行字典列表，兼容列式格式和旧格式（data / rows / 列表）
+
+    Args:
+        limit: 只取前 limit 行（列式缓存只为这些行构造字典）
+    """
+    if not cache:
+        return []
+    if is_columnar(cache):
+        columns, values = decode_columns(cache)
+        if limit is not None:
+            values = [column[:limit] for column in values]
+        return [dict(zip(columns, row)) for row in zip(*values)]
+    if isinstance(cache, list):
+        rows = cache
+    elif isinstance(cache, dict):
+        rows = cache.get("data") or cache.get("rows") or []
+    else:
+        return []
+    return rows if limit is None else rows[:limit]
+
+
+def columnar_view(cache: Any) -> Any:
+    """
+    API 响应使用的缓存格式：列式缓存保持列式，压缩的解压为 "values"
+
+    不展开为行字典（由前端按需展开）；未压缩的列式缓存和其他格式原样返回
+    """
+    if not is_columnar(cache) or cache.get("codec") != ZSTD_CODEC:
+        return cache
+    view = {key: value for key, value in cache.items() if key not in ("codec", "payload")}
+    view["values"] = decode_columns(cache)[1]
+    return view
+
+
+def _compress(values: List[list]) -> Optional[str]:
+    if zstandard is None or settings.DASHBOARD_CACHE_COMPRESSION != ZSTD_CODEC:
+        return None
+    raw = json.dumps(values, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(raw) < settings.DASHBOARD_CACHE_COMPRESS_MIN_BYTES:
+        return None
+    compressed = zstandard.ZstdCompressor(level=settings.DASHBOARD_CACHE_ZSTD_LEVEL).compress(raw)
+    return base64.b64encode(compressed).decode("ascii")
+
+
+def _decompress(payload: str) -> List[list]:
+    if zstandard is None:
+        raise RuntimeError("Widget 缓存使用 zstd 压缩，需要安装 zstandard")
+    raw = zstandard.ZstdDecompressor().decompress(base64.b64decode(payload))
+    return json.loads(raw)
@@ -0,0 +1,131 @@
+"""
+Dashboard 列表与 Widget 数据按需加载测试
+
+验证：
+- 列表不加载 widgets 关系和 data_cache，Widget 数量来自聚合子查询
+- 总数与列表使用相同的过滤条件（含租户隔离）
+- 键集分页按 (updated_at, id) 连续翻页不重复不遗漏，无效游标抛出 ValueError
+- 详情 include_data=False 时不加载 data_cache，Widget 数据可单独按需获取
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import BigInteger, create_engine, event
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401  注册所有模型，保证关系可以解析
+from app import crud
+from app.db.base_class import Base
+from app.models.dashboard import Dashboard
+from app.models.dashboard_permission import DashboardPermission
+from app.models.dashboard_widget import DashboardWidget
+from app.models.tenant import Tenant
+from app.models.user import User
+from app.services.dashboard_service import dashboard_service
+from app.services.dashboard_widget_service import dashboard_widget_service
+from app.services.widget_cache_codec import encode_data_cache
+
+
+@compiles(BigInteger, "sqlite")
+def _bigint_as_integer(type_, compiler, **kw):
+    # SQLite 只有 INTEGER PRIMARY KEY 自增
+    return "INTEGER"
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    Base.metadata.create_all(engine, tables=[
+        Tenant.__table__, User.__table__, Dashboard.__table__,
+        DashboardWidget.__table__, DashboardPermission.__table__
+    ])
+    session = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    session.add_all([
+        User(id=1, username="alice", email="a@x.com", password_hash="x", display_name="Alice"),
+        User(id=2, username="bob", email="b@x.com", password_hash="x"),
+    ])
+    base = datetime(2026, 1, 1)
+    for i in range(1, 8):
+        session.add(Dashboard(
+            id=i, name=f"d{i}", owner_id=1, layout_config=[], tenant_id=None,
+            # 两两相同的更新时间，验证游标在时间相同时按 id 排序
+            updated_at=base + timedelta(hours=i // 2)
+        ))
+    session.add(Dashboard(id=8, name="bob's", owner_id=2, layout_config=[], updated_at=base))
+    session.add(Dashboard(id=9, name="deleted", owner_id=1, layout_config=[], updated_at=base, deleted_at=base))
+    session.add(DashboardPermission(dashboard_id=1, user_id=1, permission_level="owner", granted_by=1))
+    for i in range(3):
+        session.add(DashboardWidget(
+            dashboard_id=1, widget_type="bar_chart", title=f"w{i}", connection_id=1,
+            query_config={"generated_sql": "SELECT 1"}, position_config={},
+            data_cache=encode_data_cache(["n"], [[i]])
+        ))
+    session.commit()
+    yield session
+    session.close()
+
+
+def collect_statements(db):
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+class TestListing:
+
+    def test_counts_widgets_without_loading_them(self, db):
+        statements = collect_statements(db)
+        rows, total, _ = crud.crud_dashboard.get_by_user(db, user_id=1, limit=20)
+
+        assert total == 7 and len(rows) == 7
+        counts = {dashboard.id: count for dashboard, count in rows}
+        assert counts[1] == 3 and counts[2] == 0
+        assert rows[0][0].owner.username == "alice"
+        assert not any("data_cache" in s or "layout_config" in s for s in statements)
+        assert "widgets" not in rows[0][0].__dict__
+
+    def test_total_respects_tenant(self, db):
+        rows, total, _ = crud.crud_dashboard.get_by_user(db, user_id=1, tenant_id=99, scope="all")
+        assert rows == [] and total == 0
+
+    def test_keyset_pages_are_contiguous(self, db):
+        seen = []
+        cursor = None
+        while True:
+            rows, total, cursor = crud.crud_dashboard.get_by_user(db, user_id=1, limit=3, cursor=cursor)
+            seen.extend(dashboard.id for dashboard, _ in rows)
+            if cursor is None:
+                break
+
+        assert seen == [7, 6, 5, 4, 3, 2, 1]
+        with pytest.raises(ValueError):
+            crud.crud_dashboard.get_by_user(db, user_id=1, cursor="not-a-cursor")
+
+    def test_service_returns_cursor(self, db):
+        items, total, next_cursor = dashboard_service.get_dashboards_by_user(db, user_id=1, page_size=5)
+
+        assert total == 7 and len(items) == 5 and next_cursor
+        assert items[-1].widget_count == 0 and items[-1].id == 3
+        assert items[0].permission_level == "owner"
+
+
+class TestWidgetData:
+
+    def test_detail_without_data(self, db):
+        statements = collect_statements(db)
+        detail = dashboard_service.get_dashboard_detail(db, dashboard_id=1, user_id=1, include_data=False)
+
+        assert len(detail.widgets) == 3
+        assert all(widget["data_cache"] is None for widget in detail.widgets)
+        assert not any("data_cache" in s for s in statements)
+
+    def test_fetch_payloads_on_demand(self, db):
+        widget_ids = [w.id for w in crud.crud_dashboard_widget.get_by_dashboard(db, dashboard_id=1)]
+        items = dashboard_widget_service.get_widget_data(db, dashboard_id=1, user_id=1, widget_ids=widget_ids[1:])
+
+        assert [item.id for item in items] == widget_ids[1:]
+        assert items[0].data_cache["columns"] == ["n"] and items[0].data_cache["values"] == [[1]]
+        # 没有权限的用户拿不到数据
+        assert dashboard_widget_service.get_widget_data(db, dashboard_id=1, user_id=2) is None
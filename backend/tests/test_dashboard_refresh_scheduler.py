@@ -0,0 +1,223 @@
+"""
+Dashboard 自动刷新调度测试
+
+验证：
+- system_config 行租约：同一时刻只有一个持有者，过期或释放后可被接管
+- 只刷新到期的 Widget（跳过洞察分析 Widget、已删除 Dashboard、未开启自动刷新的 Widget）
+- 与全局刷新一样按 (连接, 规范化SQL) 合并，相同 SQL 只执行一次，结果写入所有使用它的 Widget
+- 单个连接同时执行的查询数不超过上限
+- 连续失败指数退避，退避期间不再刷新
+- 刷新期间定期续租，租约被其他 worker 接管时立即停止本轮
+"""
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import BigInteger, create_engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401  注册所有模型，保证关系可以解析
+from app import crud
+from app.core.config import settings
+from app.db.base_class import Base
+from app.models.dashboard import Dashboard
+from app.models.dashboard_widget import DashboardWidget
+from app.models.system_config import SystemConfig
+from app.services import db_service
+from app.services.dashboard_refresh_scheduler import LEASE_KEY, DashboardRefreshScheduler
+from app.services.dashboard_refresh_service import DashboardRefreshService
+
+
+@compiles(BigInteger, "sqlite")
+def _bigint_as_integer(type_, compiler, **kw):
+    # SQLite 只有 INTEGER PRIMARY KEY 自增
+    return "INTEGER"
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    Base.metadata.create_all(engine, tables=[
+        Dashboard.__table__, DashboardWidget.__table__, SystemConfig.__table__
+    ])
+    return sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+
+def add_widget(db, name, dashboard_id, connection_id, interval, last_refresh_at=None, widget_type="bar_chart",
+               sql=None):
+    widget = DashboardWidget(
+        dashboard_id=dashboard_id, widget_type=widget_type, title=name, connection_id=connection_id,
+        query_config={"generated_sql": sql or f"SELECT '{name}'"}, position_config={}, refresh_interval=interval,
+        last_refresh_at=last_refresh_at
+    )
+    db.add(widget)
+    db.commit()
+    return widget.id
+
+
+class TestLease:
+
+    def test_single_holder_until_expiry_or_release(self, session_factory):
+        db = session_factory()
+        assert crud.system_config.try_acquire_lease(db, lease_key=LEASE_KEY, holder="a", ttl_seconds=60)
+        assert not crud.system_config.try_acquire_lease(db, lease_key=LEASE_KEY, holder="b", ttl_seconds=60)
+        # 持有者续租
+        assert crud.system_config.try_acquire_lease(db, lease_key=LEASE_KEY, holder="a", ttl_seconds=-1)
+        # 已过期，b 接管
+        assert crud.system_config.try_acquire_lease(db, lease_key=LEASE_KEY, holder="b", ttl_seconds=60)
+
+        crud.system_config.release_lease(db, lease_key=LEASE_KEY, holder="a")   # 非持有者释放无效
+        assert not crud.system_config.try_acquire_lease(db, lease_key=LEASE_KEY, holder="a", ttl_seconds=60)
+        crud.system_config.release_lease(db, lease_key=LEASE_KEY, holder="b")
+        assert crud.system_config.try_acquire_lease(db, lease_key=LEASE_KEY, holder="a", ttl_seconds=60)
+        db.close()
+
+
+class TestScheduler:
+
+    @pytest.fixture
+    def widgets(self, session_factory):
+        db = session_factory()
+        db.add_all([
+            Dashboard(id=1, name="live", owner_id=1, layout_config=[]),
+            Dashboard(id=2, name="deleted", owner_id=1, layout_config=[], deleted_at=datetime.utcnow()),
+        ])
+        db.commit()
+        now = datetime.utcnow()
+        ids = {
+            "never": add_widget(db, "never", 1, 10, 60),
+            "stale": add_widget(db, "stale", 1, 10, 60, now - timedelta(seconds=600)),
+            "fresh": add_widget(db, "fresh", 1, 10, 600, now),
+            "other_conn": add_widget(db, "other_conn", 1, 20, 60),
+            "manual": add_widget(db, "manual", 1, 10, 0),
+            "insight": add_widget(db, "insight", 1, 10, 60, widget_type="insight_analysis"),
+            "deleted": add_widget(db, "deleted", 2, 10, 60),
+        }
+        db.close()
+        return ids
+
+    @pytest.fixture
+    def refreshed(self, monkeypatch):
+        # 记录执行的 Widget 名称（SQL 为 SELECT '<名称>'）
+        calls = {"names": [], "active": {}, "max_active": {}, "fail": set(), "delay": 0.01}
+        lock = threading.Lock()
+
+        def fake_lookup(connection_id):
+            return type("Conn", (), {"id": connection_id})()
+
+        def fake_fetch(self, connection, sql):
+            connection_id = connection.id
+            name = sql.split("'")[1]
+            with lock:
+                calls["active"][connection_id] = calls["active"].get(connection_id, 0) + 1
+                calls["max_active"][connection_id] = max(calls["max_active"].get(connection_id, 0),
+                                                         calls["active"][connection_id])
+            time.sleep(calls["delay"])
+            with lock:
+                calls["active"][connection_id] -= 1
+                calls["names"].append(name)
+            if name in calls["fail"]:
+                return {"success": False, "error": "boom"}
+            return {"success": True, "columns": ["name"], "rows": [[name]], "truncated": False}
+
+        monkeypatch.setattr(db_service, "get_db_connection_by_id", fake_lookup)
+        monkeypatch.setattr(DashboardRefreshService, "_fetch_rows_sync", fake_fetch)
+        return calls
+
+    async def test_refreshes_due_widgets_with_connection_cap(self, session_factory, widgets, refreshed, monkeypatch):
+        monkeypatch.setattr(settings, "DASHBOARD_AUTO_REFRESH_PER_CONNECTION", 1)
+        scheduler = DashboardRefreshScheduler(session_factory=session_factory, enabled=True)
+
+        assert await scheduler.run_once() == 3
+        assert sorted(refreshed["names"]) == ["never", "other_conn", "stale"]
+        assert refreshed["max_active"] == {10: 1, 20: 1}
+
+        db = session_factory()
+        widget = db.get(DashboardWidget, widgets["stale"])
+        assert widget.data_cache["values"] == [["stale"]]
+        db.close()
+
+        # 刚刷新过，下一轮没有到期的 Widget
+        assert await scheduler.run_once() == 0
+
+    async def test_shared_sql_runs_once(self, session_factory, widgets, refreshed):
+        db = session_factory()
+        copies = [add_widget(db, f"copy{i}", 1, 10, 60, sql="SELECT  'never' ;") for i in range(2)]
+        db.close()
+        scheduler = DashboardRefreshScheduler(session_factory=session_factory, enabled=True)
+
+        assert await scheduler.run_once() == 5
+        assert sorted(refreshed["names"]) == ["never", "other_conn", "stale"]
+
+        db = session_factory()
+        caches = [db.get(DashboardWidget, widget_id).data_cache for widget_id in [widgets["never"], *copies]]
+        assert all(cache["values"] == [["never"]] for cache in caches)
+        db.close()
+
+    async def test_second_worker_does_not_refresh(self, session_factory, widgets, refreshed):
+        leader = DashboardRefreshScheduler(session_factory=session_factory, enabled=True)
+        follower = DashboardRefreshScheduler(session_factory=session_factory, enabled=True)
+
+        await leader.run_once()
+        refreshed["names"].clear()
+        assert await follower.run_once() == 0
+        assert refreshed["names"] == []
+        assert follower.get_stats()["is_leader"] is False
+
+    async def test_failures_back_off(self, session_factory, widgets, refreshed):
+        scheduler = DashboardRefreshScheduler(session_factory=session_factory, enabled=True)
+        refreshed["fail"].add("never")
+
+        await scheduler.run_once()
+        assert scheduler._failures[widgets["never"]][0] == 1
+
+        refreshed["names"].clear()
+        await scheduler.run_once()
+        assert "never" not in refreshed["names"]
+        assert scheduler.get_stats()["backoff_skips"] == 1
+
+        # 退避结束后重试，成功后清除失败记录
+        scheduler._failures[widgets["never"]] = (1, 0.0)
+        refreshed["fail"].clear()
+        await scheduler.run_once()
+        assert "never" in refreshed["names"]
+        assert widgets["never"] not in scheduler._failures
+
+    async def test_round_stops_when_lease_is_taken_over(self, session_factory, widgets, refreshed, monkeypatch):
+        monkeypatch.setattr(settings, "DASHBOARD_AUTO_REFRESH_LEASE_TTL", 0.15)
+        monkeypatch.setattr(settings, "DASHBOARD_AUTO_REFRESH_PER_CONNECTION", 1)
+        refreshed["delay"] = 0.2
+        scheduler = DashboardRefreshScheduler(session_factory=session_factory, enabled=True)
+
+        async def take_over():
+            await asyncio.sleep(0.02)
+            db = session_factory()
+            # 模拟租约过期后被其他 worker 接管
+            crud.system_config.release_lease(db, lease_key=LEASE_KEY, holder=scheduler.holder)
+            assert crud.system_config.try_acquire_lease(db, lease_key=LEASE_KEY, holder="other", ttl_seconds=60)
+            db.close()
+
+        refreshed_count, _ = await asyncio.gather(scheduler.run_once(), take_over())
+
+        assert refreshed_count == 0
+        assert scheduler.get_stats()["lease_lost"] == 1
+        assert scheduler.get_stats()["is_leader"] is False
+
+    async def test_heartbeat_keeps_lease_during_long_round(self, session_factory, widgets, refreshed, monkeypatch):
+        monkeypatch.setattr(settings, "DASHBOARD_AUTO_REFRESH_LEASE_TTL", 0.15)
+        refreshed["delay"] = 0.3
+        scheduler = DashboardRefreshScheduler(session_factory=session_factory, enabled=True)
+        follower = DashboardRefreshScheduler(session_factory=session_factory, enabled=True)
+
+        async def try_take_over():
+            await asyncio.sleep(0.2)
+            return await follower.run_once()
+
+        refreshed_count, follower_count = await asyncio.gather(scheduler.run_once(), try_take_over())
+
+        # 一轮超过了租约有效期，但续租后其他 worker 无法接管
+        assert refreshed_count == 3 and follower_count == 0
+        assert scheduler.get_stats()["lease_lost"] == 0
@@ -0,0 +1,185 @@
+"""
+Dashboard 全局刷新测试
+
+验证：
+- SQL 规范化只合并空白/结尾分号差异，不改变引号内的内容和大小写
+- 同一连接上相同 SQL 只执行一次，结果写入所有使用它的 Widget
+- 连接配置每个连接只加载一次，找不到连接时该连接的 Widget 全部失败
+- 单个连接同时执行的查询数不超过 DASHBOARD_REFRESH_PER_CONNECTION
+- 刷新结果在所有查询结束后一次批量写回（一次提交），写回失败时对应 Widget 标记为失败
+- 刷新期间被删除的 Widget 不影响其他 Widget 的写回
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+from sqlalchemy import BigInteger, create_engine, event
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401  注册所有模型，保证关系可以解析
+from app import crud
+from app.core.config import settings
+from app.db.base_class import Base
+from app.models.dashboard import Dashboard
+from app.models.dashboard_widget import DashboardWidget
+from app.services import db_service
+from app.services.dashboard_refresh_service import DashboardRefreshService, normalize_sql
+
+
+@compiles(BigInteger, "sqlite")
+def _bigint_as_integer(type_, compiler, **kw):
+    # SQLite 只有 INTEGER PRIMARY KEY 自增
+    return "INTEGER"
+
+
+def test_normalize_sql():
+    assert normalize_sql("SELECT  a\n FROM t ;") == normalize_sql("SELECT a FROM t")
+    assert normalize_sql("SELECT 'a  b'") != normalize_sql("SELECT 'a b'")
+    assert normalize_sql("SELECT * FROM t WHERE x = 'A'") != normalize_sql("SELECT * FROM t WHERE x = 'a'")
+
+
+@pytest.fixture
+def db(tmp_path):
+    # 写回在线程池中执行
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine, tables=[Dashboard.__table__, DashboardWidget.__table__])
+    session = sessionmaker(bind=engine, autocommit=False, autoflush=False)()
+    session.add(Dashboard(id=1, name="d", owner_id=1, layout_config=[]))
+    session.commit()
+    yield session
+    session.close()
+
+
+def add_widget(db, connection_id, sql, widget_type="bar_chart"):
+    widget = DashboardWidget(
+        dashboard_id=1, widget_type=widget_type, title="w", connection_id=connection_id,
+        query_config={"generated_sql": sql} if sql else {}, position_config={}
+    )
+    db.add(widget)
+    db.commit()
+    return widget.id
+
+
+@pytest.fixture
+def executed(monkeypatch):
+    calls = {"sql": [], "lookups": [], "active": {}, "max_active": {}}
+    lock = threading.Lock()
+
+    def fake_lookup(connection_id):
+        calls["lookups"].append(connection_id)
+        return None if connection_id == 99 else type("Conn", (), {"id": connection_id})()
+
+    def fake_fetch(self, connection, sql):
+        with lock:
+            calls["sql"].append((connection.id, sql))
+            calls["active"][connection.id] = calls["active"].get(connection.id, 0) + 1
+            calls["max_active"][connection.id] = max(calls["max_active"].get(connection.id, 0),
+                                                     calls["active"][connection.id])
+        time.sleep(0.02)
+        with lock:
+            calls["active"][connection.id] -= 1
+        return {"success": True, "columns": ["n"], "rows": [[len(sql)]], "truncated": False}
+
+    monkeypatch.setattr(db_service, "get_db_connection_by_id", fake_lookup)
+    monkeypatch.setattr(DashboardRefreshService, "_fetch_rows_sync", fake_fetch)
+    return calls
+
+
+async def test_shared_sql_runs_once(db, executed):
+    ids = [
+        add_widget(db, 1, "SELECT count(*) FROM orders"),
+        add_widget(db, 1, "select count(*) from orders"),
+        add_widget(db, 1, "SELECT count(*)\n  FROM orders;"),
+        add_widget(db, 2, "SELECT count(*) FROM orders"),
+        add_widget(db, 1, None),
+        add_widget(db, 1, "SELECT 1", widget_type="insight_analysis"),
+    ]
+
+    response = await DashboardRefreshService().global_refresh(db, 1)
+
+    # 大小写不同的 SQL 不合并；不同连接各执行一次
+    assert len(executed["sql"]) == 3
+    assert sorted(executed["lookups"]) == [1, 2]
+    assert response.success_count == 4 and response.failed_count == 1
+    assert ids[5] not in response.results
+
+    widgets = {w.id: w for w in db.query(DashboardWidget).all()}
+    assert widgets[ids[0]].data_cache == widgets[ids[2]].data_cache
+    assert widgets[ids[0]].last_refresh_at is not None
+    assert widgets[ids[4]].data_cache is None
+
+
+async def test_missing_connection_fails_its_widgets(db, executed):
+    ids = [add_widget(db, 99, "SELECT 1"), add_widget(db, 99, "SELECT 2"), add_widget(db, 1, "SELECT 1")]
+
+    response = await DashboardRefreshService().global_refresh(db, 1)
+
+    assert not response.results[ids[0]].success and not response.results[ids[1]].success
+    assert response.results[ids[2]].success
+    assert executed["sql"] == [(1, "SELECT 1")]
+
+
+async def test_per_connection_cap(db, executed, monkeypatch):
+    monkeypatch.setattr(settings, "DASHBOARD_REFRESH_PER_CONNECTION", 2)
+    for i in range(6):
+        add_widget(db, 1, f"SELECT {i}")
+        add_widget(db, 2, f"SELECT {i}")
+
+    service = DashboardRefreshService()
+    service._semaphore = asyncio.Semaphore(10)
+    response = await service.global_refresh(db, 1)
+
+    assert response.success_count == 12
+    assert executed["max_active"] == {1: 2, 2: 2}
+
+
+async def test_results_written_in_one_commit(db, executed):
+    ids = [add_widget(db, 1, f"SELECT {i}") for i in range(5)]
+    commits = []
+    event.listen(db, "after_commit", lambda session: commits.append(1))
+
+    response = await DashboardRefreshService().global_refresh(db, 1)
+
+    assert response.success_count == 5
+    assert len(commits) == 1
+    db.expire_all()
+    for widget_id in ids:
+        widget = db.get(DashboardWidget, widget_id)
+        assert widget.data_cache["row_count"] == 1 and widget.last_refresh_at is not None
+
+
+async def test_write_failure_marks_widgets_failed(db, executed, monkeypatch):
+    widget_id = add_widget(db, 1, "SELECT 1")
+
+    def fail(db, *, updates):
+        raise RuntimeError("deadlock")
+
+    monkeypatch.setattr(crud.crud_dashboard_widget, "bulk_update_cache", fail)
+    response = await DashboardRefreshService().global_refresh(db, 1)
+
+    assert response.failed_count == 1
+    assert "deadlock" in response.results[widget_id].error
+
+
+async def test_widget_deleted_mid_round(db, executed, monkeypatch):
+    ids = [add_widget(db, 1, "SELECT 1"), add_widget(db, 1, "SELECT 2"), add_widget(db, 2, "SELECT 1")]
+    fetch = DashboardRefreshService._fetch_rows_sync
+    table = DashboardWidget.__table__
+
+    def fetch_and_delete(self, connection, sql):
+        if sql == "SELECT 2":
+            # 查询执行期间用户删除了这个 Widget
+            with db.get_bind().begin() as conn:
+                conn.execute(table.delete().where(table.c.id == ids[1]))
+        return fetch(self, connection, sql)
+
+    monkeypatch.setattr(DashboardRefreshService, "_fetch_rows_sync", fetch_and_delete)
+    response = await DashboardRefreshService().global_refresh(db, 1)
+
+    assert response.results[ids[0]].success and response.results[ids[2]].success
+    db.expire_all()
+    assert db.get(DashboardWidget, ids[1]) is None
+    for widget_id in (ids[0], ids[2]):
+        assert db.get(DashboardWidget, widget_id).data_cache["row_count"] == 1
@@ -0,0 +1,199 @@
+"""
+目标数据库访问测试（Engine 注册表 + 查询执行）
+
+使用临时 SQLite 文件验证：
+- 同一 connection_id 复用 Engine
+- 连接配置变更后重建 Engine
+- invalidate 释放 Engine
+- 连接池统计
+- 流式、限行的列式查询结果，截断时不读完服务端游标的剩余行
+"""
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import text
+
+from app.services.db_engine_registry import DBEngineRegistry
+from app.services.db_service import execute_query
+
+
+def _make_connection(db_path, connection_id=1, **overrides):
+    fields = dict(
+        id=connection_id,
+        db_type="sqlite",
+        host="",
+        port=0,
+        username="",
+        password_encrypted="",
+        database_name=str(db_path),
+    )
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    db_path = tmp_path / "target.db"
+    connection = _make_connection(db_path)
+    registry = DBEngineRegistry()
+    with registry.connect(connection) as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+        conn.execute(text("INSERT INTO items (name) VALUES ('a'), ('b')"))
+        conn.commit()
+    registry.dispose_all()
+    return db_path
+
+
+class TestDBEngineRegistry:
+
+    def setup_method(self):
+        self.registry = DBEngineRegistry()
+
+    def teardown_method(self):
+        self.registry.dispose_all()
+
+    def test_engine_reused_for_same_connection(self, sqlite_db):
+        connection = _make_connection(sqlite_db)
+        first = self.registry.get_engine(connection)
+        second = self.registry.get_engine(connection)
+        assert first is second
+
+    def test_engine_rebuilt_when_config_changes(self, sqlite_db):
+        connection = _make_connection(sqlite_db)
+        first = self.registry.get_engine(connection)
+        edited = _make_connection(sqlite_db, password_encrypted="changed")
+        assert self.registry.get_engine(edited) is not first
+
+    def test_invalidate_releases_engine(self, sqlite_db):
+        connection = _make_connection(sqlite_db)
+        first = self.registry.get_engine(connection)
+        assert self.registry.invalidate(connection.id) is True
+        assert self.registry.invalidate(connection.id) is False
+        assert self.registry.get_engine(connection) is not first
+
+    def test_stats_track_checkouts(self, sqlite_db):
+        connection = _make_connection(sqlite_db)
+        for _ in range(3):
+            with self.registry.connect(connection) as conn:
+                conn.execute(text("SELECT 1"))
+
+        stats = self.registry.get_stats()
+        pool = stats["pools"][connection.id]
+        assert stats["engine_count"] == 1
+        assert pool["checkouts"] == 3
+        assert pool["connects"] >= 1
+        assert pool["max_wait_ms"] >= 0
+
+    def test_requires_persisted_connection(self, sqlite_db):
+        connection = _make_connection(sqlite_db, connection_id=None)
+        with pytest.raises(ValueError):
+            self.registry.get_engine(connection)
+
+
+def test_execute_query_uses_shared_registry(sqlite_db):
+    from app.services.db_engine_registry import db_engine_registry
+
+    connection = _make_connection(sqlite_db, connection_id=987654)
+    try:
+        rows = execute_query(connection, "SELECT name FROM items ORDER BY id")
+        assert rows == [{"name": "a"}, {"name": "b"}]
+        assert 987654 in db_engine_registry.get_stats()["pools"]
+    finally:
+        db_engine_registry.invalidate(987654)
+
+
+class TestQueryStream:
+    """流式、限行查询"""
+
+    def test_columnar_result_truncated_at_cap(self, sqlite_db):
+        from app.services.db_service import execute_query_columnar, QueryStream
+        from app.services.db_engine_registry import db_engine_registry
+
+        connection = _make_connection(sqlite_db, connection_id=987655)
+        try:
+            result = execute_query_columnar(connection, "SELECT id, name FROM items ORDER BY id", max_rows=1)
+            assert result.columns == ["id", "name"]
+            assert result.rows == [(1, "a")]
+            assert result.truncated is True
+
+            stream = QueryStream(connection, "SELECT name FROM items ORDER BY id", max_rows=10, batch_size=1)
+            batches = list(stream)
+            assert batches == [[("a",)], [("b",)]]
+            assert stream.row_count == 2
+            assert stream.truncated is False
+        finally:
+            db_engine_registry.invalidate(987655)
+
+    def test_truncation_abandons_draining_cursor(self, sqlite_db, monkeypatch):
+        from sqlalchemy import event
+        from app.services import db_service
+        from app.services.db_engine_registry import db_engine_registry
+
+        # 模拟 MySQL SSCursor：截断后不读完剩余行，中止查询并丢弃连接
+        monkeypatch.setattr(db_service, "_DRAINING_CURSOR_DB_TYPES", {"sqlite"})
+        connection = _make_connection(sqlite_db, connection_id=987656)
+        invalidated = []
+        try:
+            event.listen(db_engine_registry.get_engine(connection), "invalidate",
+                         lambda *args: invalidated.append(1))
+            stream = db_service.QueryStream(connection, "SELECT name FROM items ORDER BY id", max_rows=1, batch_size=1)
+            assert list(stream) == [[("a",)]]
+            assert stream.truncated is True
+            assert invalidated == [1]
+
+            # 未截断的查询正常归还连接
+            assert list(db_service.QueryStream(connection, "SELECT name FROM items", max_rows=10)) == [[("a",), ("b",)]]
+            assert invalidated == [1]
+        finally:
+            db_engine_registry.invalidate(987656)
+
+
+# 纯 SQLite 的慢查询（约数秒），用于验证超时与取消
+SLOW_QUERY = (
+    "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 200000000) "
+    "SELECT count(*) FROM n"
+)
+
+
+class TestSQLExecutionService:
+    """专用线程池异步执行：结果、超时、取消、租户并发"""
+
+    def setup_method(self):
+        from app.services.sql_execution_service import SQLExecutionService
+        self.service = SQLExecutionService(max_workers=2, tenant_max_concurrency=1)
+
+    def teardown_method(self):
+        from app.services.db_engine_registry import db_engine_registry
+        self.service.shutdown()
+        db_engine_registry.invalidate(987656)
+
+    async def test_execute_returns_columnar_result(self, sqlite_db):
+        connection = _make_connection(sqlite_db, connection_id=987656)
+        result = await self.service.execute(connection, "SELECT name FROM items ORDER BY id")
+        assert result.columns == ["name"]
+        assert result.rows == [("a",), ("b",)]
+        assert self.service.get_stats()["running"] == {}
+
+    async def test_timeout_aborts_query(self, sqlite_db):
+        from app.core.exceptions import SQLExecutionException
+
+        connection = _make_connection(sqlite_db, connection_id=987656)
+        with pytest.raises(SQLExecutionException, match="timed out"):
+            await self.service.execute(connection, SLOW_QUERY, timeout=1)
+
+        # 查询被中止后租户名额释放，后续查询可以执行
+        result = await self.service.execute(connection, "SELECT 1 AS one", timeout=10)
+        assert result.rows == [(1,)]
+
+    async def test_cancel_releases_tenant_slot(self, sqlite_db):
+        import asyncio
+
+        connection = _make_connection(sqlite_db, connection_id=987656)
+        task = asyncio.create_task(self.service.execute(connection, SLOW_QUERY, timeout=60))
+        await asyncio.sleep(0.3)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        result = await self.service.execute(connection, "SELECT 1 AS one", timeout=10)
+        assert result.rows == [(1,)]
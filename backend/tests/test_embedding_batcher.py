@@ -0,0 +1,78 @@
+"""
+向量请求微批处理测试
+
+验证：
+- 并发的单条请求合并为一次批量调用，结果按文本分发
+- 相同文本去重
+- 攒满 max_batch_size 立即发送
+- 批量调用失败时所有等待方收到异常；单个调用方取消不影响其他请求
+"""
+import asyncio
+
+import pytest
+
+from app.services.hybrid_retrieval.vector.batcher import EmbeddingBatcher
+
+
+class FakeProvider:
+    def __init__(self, fail=False, delay=0.0):
+        self.calls = []
+        self.fail = fail
+        self.delay = delay
+
+    async def embed_batch(self, texts):
+        self.calls.append(list(texts))
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("provider down")
+        return [[float(len(t))] for t in texts]
+
+
+class TestEmbeddingBatcher:
+
+    async def test_concurrent_requests_are_coalesced_and_deduplicated(self):
+        provider = FakeProvider()
+        batcher = EmbeddingBatcher(provider.embed_batch, max_batch_size=32, max_wait_ms=5)
+
+        results = await asyncio.gather(*[batcher.submit(t) for t in ["a", "bb", "a", "ccc"]])
+
+        assert results == [[1.0], [2.0], [1.0], [3.0]]
+        assert provider.calls == [["a", "bb", "ccc"]]
+        assert batcher.get_stats() == {"requests": 4, "deduplicated": 1, "batches": 1, "texts": 3}
+
+    async def test_full_batch_is_sent_immediately(self):
+        provider = FakeProvider()
+        batcher = EmbeddingBatcher(provider.embed_batch, max_batch_size=2, max_wait_ms=10_000)
+
+        results = await asyncio.wait_for(
+            asyncio.gather(*[batcher.submit(t) for t in ["a", "b", "c", "d"]]), timeout=1
+        )
+
+        assert results == [[1.0]] * 4
+        assert provider.calls == [["a", "b"], ["c", "d"]]
+
+    async def test_in_flight_text_is_shared(self):
+        provider = FakeProvider(delay=0.05)
+        batcher = EmbeddingBatcher(provider.embed_batch, max_batch_size=32, max_wait_ms=1)
+
+        first = asyncio.create_task(batcher.submit("a"))
+        await asyncio.sleep(0.01)  # 第一批已发出，仍在请求中
+        second = await batcher.submit("a")
+
+        assert await first == second == [1.0]
+        assert provider.calls == [["a"]]
+
+    async def test_failure_propagates_and_cancellation_is_isolated(self):
+        provider = FakeProvider(fail=True)
+        batcher = EmbeddingBatcher(provider.embed_batch, max_batch_size=32, max_wait_ms=5)
+        with pytest.raises(RuntimeError):
+            await asyncio.gather(batcher.submit("a"), batcher.submit("b"))
+
+        ok = FakeProvider(delay=0.02)
+        batcher = EmbeddingBatcher(ok.embed_batch, max_batch_size=32, max_wait_ms=1)
+        cancelled = asyncio.create_task(batcher.submit("a"))
+        survivor = asyncio.create_task(batcher.submit("a"))
+        await asyncio.sleep(0.005)
+        cancelled.cancel()
+        assert await survivor == [1.0]
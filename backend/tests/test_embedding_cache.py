@@ -0,0 +1,113 @@
+"""
+向量缓存测试
+
+验证：
+- 缓存键与进程无关（稳定摘要），规范化文本后相同
+- 内存层 LRU 限制条数，向量以 float32 存储
+- 磁盘层在新实例（模拟重启）中仍可命中，过期条目不返回
+- VectorService 的命中/未命中计数进入 get_cache_stats
+- 监控按每次调用返回的命中状态计数，并发调用时也不会错算
+- VectorService 的磁盘层读写不在事件循环线程上执行
+"""
+import asyncio
+import hashlib
+
+import numpy as np
+import pytest
+
+from app.services.hybrid_retrieval.vector import VectorService
+from app.services.hybrid_retrieval.vector.embedding_cache import EmbeddingCache
+from app.services.hybrid_retrieval.vector.monitor import VectorServiceMonitor
+
+
+class TestEmbeddingCache:
+
+    def test_key_is_stable_digest(self):
+        key = EmbeddingCache.make_key("openai", "text-embedding-3-small", "各地区销售额")
+        expected = hashlib.sha256("openai\x00text-embedding-3-small\x00各地区销售额".encode("utf-8")).hexdigest()
+        assert key == expected
+        assert key != EmbeddingCache.make_key("ollama", "text-embedding-3-small", "各地区销售额")
+
+    def test_memory_lru_bound_and_float32(self):
+        cache = EmbeddingCache(max_entries=2, ttl=60, db_path="")
+        for key in ("a", "b", "c"):
+            cache.put(key, [0.1, 0.2, 0.3])
+        assert cache.get("a") is None
+        vector = cache.get("c")
+        assert vector.dtype == np.float32
+        stats = cache.get_stats()
+        assert stats["memory_entries"] == 2
+        assert stats["memory_bytes"] == 2 * 3 * 4
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        path = str(tmp_path / "embeddings.sqlite3")
+        EmbeddingCache(max_entries=10, ttl=60, db_path=path).put("k", [1.0, 2.0])
+
+        restarted = EmbeddingCache(max_entries=10, ttl=60, db_path=path)
+        assert restarted.get("k").tolist() == [1.0, 2.0]
+        assert restarted.get_stats()["disk_hits"] == 1
+        # 回填内存层
+        assert restarted.get("k") is not None
+        assert restarted.get_stats()["memory_hits"] == 1
+
+        expired = EmbeddingCache(max_entries=10, ttl=-1, db_path=path)
+        assert expired.get("k") is None
+
+
+class TestVectorServiceCache:
+
+    @pytest.fixture
+    def service(self, monkeypatch):
+        service = VectorService(service_type="openai_compatible", model_name="test-model")
+        service._cache = EmbeddingCache(max_entries=100, ttl=60, db_path="")
+        service._initialized = True
+        service._batcher = None
+        calls = []
+
+        async def fake_embed(text):
+            calls.append(text)
+            return [float(len(text)), 1.0]
+
+        monkeypatch.setattr(service, "_embed_with_retry", fake_embed)
+        service.calls = calls
+        return service
+
+    async def test_hits_and_misses_are_counted(self, service):
+        assert await service.embed_question("销售额") == [3.0, 1.0]
+        assert await service.embed_question("  销售额 ") == [3.0, 1.0]
+        assert service.calls == ["销售额"]
+
+        stats = service.get_cache_stats()
+        assert stats["memory_hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["cache_hit_rate"] == 0.5
+
+    async def test_monitor_counts_each_call(self, service):
+        await service.embed_question("销售额")
+        monitor = VectorServiceMonitor(service)
+
+        # 命中与未命中交错并发，全局未命中计数的变化不能用来判断单次调用
+        await asyncio.gather(*[
+            monitor.embed_with_monitoring("销售额" if i % 2 else f"新问题{i}") for i in range(6)
+        ])
+
+        assert monitor.metrics["cache_hits"] == 3
+        assert monitor.metrics["cache_misses"] == 3
+
+    async def test_disk_tier_is_accessed_off_loop(self, service, tmp_path, monkeypatch):
+        import threading
+
+        service._cache = EmbeddingCache(max_entries=100, ttl=60, db_path=str(tmp_path / "embeddings.sqlite3"))
+        disk_threads = []
+        disk_get, disk_put = service._cache._disk_get, service._cache._disk_put
+        monkeypatch.setattr(service._cache, "_disk_get", lambda *args: (
+            disk_threads.append(threading.current_thread()), disk_get(*args))[1])
+        monkeypatch.setattr(service._cache, "_disk_put", lambda *args: (
+            disk_threads.append(threading.current_thread()), disk_put(*args))[1])
+
+        assert await service.embed_question("销售额") == [3.0, 1.0]
+        service._cache._memory.clear()
+        assert await service.embed_question("销售额") == [3.0, 1.0]
+        assert service.calls == ["销售额"]
+        assert len(disk_threads) == 3
+        assert threading.main_thread() not in disk_threads
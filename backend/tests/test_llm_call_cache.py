@@ -0,0 +1,122 @@
+"""
+LLM 调用结果缓存测试
+
+验证：
+- 缓存键包含模型、temperature、消息内容和额外参数，str/dict/BaseMessage 消息均可
+- LLMWrapper 只在 cache=True 的调用点复用结果，命中率进入 LLMMetrics
+- 未指定模型的包装器每次调用使用当前的默认模型
+- 磁盘层在新实例（模拟重启）中仍可命中，内存层 LRU 限制条数
+- aget / aput 在线程池中读写磁盘层，结果与同步接口一致
+"""
+import asyncio
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from app.core import llm_wrapper
+from app.core.llm_call_cache import LLMCallCache
+from app.core.llm_wrapper import LLMWrapper
+
+
+class FakeChatModel(FakeListChatModel):
+    temperature: float = 0.0
+
+
+class TestLLMCallCache:
+
+    def test_key_covers_model_temperature_and_messages(self):
+        llm = FakeChatModel(responses=["x"])
+        messages = [SystemMessage(content="分类"), HumanMessage(content="各地区销售额")]
+        key = LLMCallCache.make_key(llm, messages)
+
+        assert key == LLMCallCache.make_key(llm, list(messages))
+        assert key != LLMCallCache.make_key(llm, [SystemMessage(content="分类"), HumanMessage(content="利润")])
+        assert key != LLMCallCache.make_key(llm, messages, stop=["\n"])
+        assert LLMCallCache.make_key(llm, "hi") == LLMCallCache.make_key(llm, [{"role": "human", "content": "hi"}])
+
+        assert key != LLMCallCache.make_key(FakeChatModel(responses=["x"], temperature=0.7), messages)
+
+    def test_disk_tier_survives_restart_and_memory_is_bounded(self, tmp_path):
+        path = str(tmp_path / "llm.sqlite3")
+        cache = LLMCallCache(max_entries=1, ttl=60, db_path=path, enabled=True)
+        cache.put("a", "答案A")
+        cache.put("b", "答案B")
+        assert cache.get_stats()["memory_entries"] == 1
+
+        restarted = LLMCallCache(max_entries=10, ttl=60, db_path=path, enabled=True)
+        assert restarted.get("a") == "答案A"
+        assert restarted.get_stats()["disk_hits"] == 1
+        assert LLMCallCache(max_entries=10, ttl=-1, db_path=path, enabled=True).get("a") is None
+
+    async def test_async_access_uses_worker_thread(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "llm.sqlite3")
+        await LLMCallCache(max_entries=10, ttl=60, db_path=path, enabled=True).aput("a", {"intent": "query"})
+
+        threads = []
+        to_thread = asyncio.to_thread
+
+        def record(func, *args):
+            threads.append(func)
+            return to_thread(func, *args)
+
+        monkeypatch.setattr(asyncio, "to_thread", record)
+        restarted = LLMCallCache(max_entries=10, ttl=60, db_path=path, enabled=True)
+        assert await restarted.aget("a") == {"intent": "query"}
+        assert await restarted.aget("a") == {"intent": "query"}
+        assert await restarted.aget("missing") is None
+
+        # 只有内存层未命中时才进入线程池
+        assert len(threads) == 2
+        stats = restarted.get_stats()
+        assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+
+
+class TestLLMWrapperCache:
+
+    @pytest.fixture(autouse=True)
+    def cache(self, monkeypatch):
+        cache = LLMCallCache(max_entries=100, ttl=60, db_path="", enabled=True)
+        monkeypatch.setattr(llm_wrapper, "llm_call_cache", cache)
+        return cache
+
+    async def test_cached_calls_skip_the_model(self):
+        wrapper = LLMWrapper(llm=FakeListChatModel(responses=["first", "second", "third"]))
+        messages = [HumanMessage(content="意图")]
+
+        assert (await wrapper.ainvoke(messages, cache=True)).content == "first"
+        assert (await wrapper.ainvoke(messages, cache=True)).content == "first"
+        assert wrapper.invoke(messages, cache=True).content == "first"
+        # 未开启缓存的调用不受影响
+        assert (await wrapper.ainvoke(messages)).content == "second"
+
+        metrics = wrapper.get_metrics()
+        assert metrics["total_calls"] == 2
+        assert metrics["cache_hits"] == 2
+        assert metrics["cache_misses"] == 1
+        assert metrics["cache_hit_rate"] == pytest.approx(0.6667)
+
+    async def test_disabled_cache_always_calls_model(self, cache):
+        cache.enabled = False
+        wrapper = LLMWrapper(llm=FakeListChatModel(responses=["first", "second"]))
+        messages = [HumanMessage(content="意图")]
+
+        assert (await wrapper.ainvoke(messages, cache=True)).content == "first"
+        assert (await wrapper.ainvoke(messages, cache=True)).content == "second"
+        assert wrapper.get_metrics()["cache_hits"] == 0
+
+    async def test_global_wrapper_follows_default_model(self, monkeypatch):
+        from app.core import llms
+
+        models = {"active": FakeChatModel(responses=["旧模型"])}
+        monkeypatch.setattr(llms, "get_default_model", lambda config_override=None, caller=None: models["active"])
+        monkeypatch.setattr(llm_wrapper, "_global_wrapper", None)
+        wrapper = llm_wrapper.get_llm_wrapper()
+        messages = [HumanMessage(content="意图")]
+
+        assert (await wrapper.ainvoke(messages, cache=True)).content == "旧模型"
+        # 管理员切换默认模型后，共享包装器的下一次调用使用新模型（缓存键包含模型，不会返回旧结果）
+        models["active"] = FakeChatModel(responses=["新模型"], temperature=0.5)
+        assert (await wrapper.ainvoke(messages, cache=True)).content == "新模型"
+        assert llm_wrapper.get_llm_wrapper() is wrapper
+        assert wrapper.get_metrics()["total_calls"] == 2
@@ -0,0 +1,77 @@
+"""
+Milvus 异步访问层测试
+
+使用替身客户端验证：
+- 同一 URI 只创建一个客户端
+- 调用在线程池中执行，不占用事件循环线程
+- 集合存在性 / 是否有数据的缓存与失效
+"""
+import threading
+
+import pytest
+
+from app.services.hybrid_retrieval.storage import milvus_client_pool as pool_module
+from app.services.hybrid_retrieval.storage.milvus_client_pool import MilvusClientPool
+
+
+class FakeMilvusClient:
+    instances = []
+
+    def __init__(self, uri):
+        self.uri = uri
+        self.calls = []
+        self.threads = set()
+        self.rows = [{"id": "qa-1"}]
+        FakeMilvusClient.instances.append(self)
+
+    def has_collection(self, collection_name):
+        self.calls.append(("has_collection", collection_name))
+        self.threads.add(threading.get_ident())
+        return collection_name == "sales_qa_pairs"
+
+    def query(self, collection_name, filter, output_fields, limit):
+        self.calls.append(("query", collection_name, filter))
+        self.threads.add(threading.get_ident())
+        return self.rows[:limit]
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    FakeMilvusClient.instances = []
+    monkeypatch.setattr(pool_module, "MilvusClient", FakeMilvusClient)
+    pool = MilvusClientPool(max_workers=2, meta_cache_ttl=60)
+    yield pool
+    pool.close_all()
+
+
+async def test_one_client_per_uri_and_off_loop(pool):
+    uri = "http://milvus:19530"
+    await pool.run(uri, "has_collection", collection_name="sales_qa_pairs")
+    await pool.run(uri, "has_collection", collection_name="other_qa_pairs")
+
+    assert len(FakeMilvusClient.instances) == 1
+    client = FakeMilvusClient.instances[0]
+    assert threading.get_ident() not in client.threads
+
+
+async def test_has_rows_cached_until_invalidated(pool):
+    uri = "http://milvus:19530"
+    assert await pool.has_rows(uri, "sales_qa_pairs", "connection_id == 1") is True
+    assert await pool.has_rows(uri, "sales_qa_pairs", "connection_id == 1") is True
+
+    client = FakeMilvusClient.instances[0]
+    assert [c[0] for c in client.calls] == ["has_collection", "query"]
+
+    client.rows = []
+    pool.invalidate(uri, "sales_qa_pairs")
+    assert await pool.has_rows(uri, "sales_qa_pairs", "connection_id == 1") is False
+
+
+async def test_missing_collection_skips_query(pool):
+    uri = "http://milvus:19530"
+    assert await pool.has_rows(uri, "missing_qa_pairs", "connection_id == 1") is False
+    client = FakeMilvusClient.instances[0]
+    assert [c[0] for c in client.calls] == ["has_collection"]
@@ -0,0 +1,145 @@
+"""
+Schema -> Neo4j 批量同步测试
+
+使用替身驱动记录写入语句，验证：
+- 全量同步按批次 UNWIND 写入，每批一个写事务
+- 增量同步只写入变更部分、删除已不存在的部分
+"""
+import pytest
+
+from app.services.schema.persistence import neo4j_sync
+from app.services.schema_snapshot import (
+    SchemaSnapshot, SnapshotColumn, SnapshotRelationship, SnapshotTable,
+)
+
+
+class FakeResult:
+    def __init__(self, rows=None):
+        self.rows = rows or []
+
+    def data(self):
+        return self.rows
+
+    def consume(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, graph):
+        self.graph = graph
+        self.writes = []
+
+    def run(self, query, **params):
+        if query == neo4j_sync._READ_TABLES:
+            return FakeResult(list(self.graph["tables"].values()))
+        if query == neo4j_sync._READ_COLUMNS:
+            return FakeResult(list(self.graph["columns"].values()))
+        if query == neo4j_sync._READ_RELATIONSHIPS:
+            return FakeResult(list(self.graph["relationships"].values()))
+        return FakeResult()
+
+    def execute_write(self, fn, query, **params):
+        self.writes.append((query, params))
+        fn(self, query, **params)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeDB:
+    def close(self):
+        pass
+
+
+class FakeDriver:
+    def __init__(self, graph):
+        self.last_session = FakeSession(graph)
+
+    def session(self):
+        return self.last_session
+
+
+def make_snapshot(table_description="订单表"):
+    return SchemaSnapshot.build(
+        connection_id=7,
+        version=0,
+        tables=[
+            SnapshotTable(id=1, name="orders", description=table_description),
+            SnapshotTable(id=2, name="customers", description=""),
+        ],
+        columns=[
+            SnapshotColumn(id=10, table_id=1, name="id", data_type="INT", description="",
+                           is_primary_key=True, is_foreign_key=False),
+            SnapshotColumn(id=11, table_id=1, name="customer_id", data_type="INT", description="",
+                           is_primary_key=False, is_foreign_key=True),
+            SnapshotColumn(id=20, table_id=2, name="id", data_type="INT", description="",
+                           is_primary_key=True, is_foreign_key=False),
+        ],
+        relationships=[
+            SnapshotRelationship(id=100, source_table_id=1, source_column_id=11, target_table_id=2,
+                                 target_column_id=20, relationship_type="many-to-one", description=None),
+        ],
+    )
+
+
+def graph_state(snapshot):
+    tables, columns, relationships = neo4j_sync._build_rows(snapshot)
+    return {"tables": tables, "columns": columns, "relationships": relationships}
+
+
+@pytest.fixture
+def sync_env(monkeypatch):
+    def setup(snapshot, graph):
+        driver = FakeDriver(graph)
+        monkeypatch.setattr(neo4j_sync.neo4j_service, "get_driver", lambda: driver)
+        monkeypatch.setattr(neo4j_sync.schema_snapshot_cache, "get", lambda db, cid: snapshot)
+        monkeypatch.setattr(neo4j_sync, "_constraints_ready", True)
+        monkeypatch.setattr("app.db.session.SessionLocal", FakeDB)
+        return driver.last_session
+    return setup
+
+
+def written(session, query):
+    return [row for q, params in session.writes if q == query for row in params.get("rows", [])]
+
+
+class TestNeo4jSchemaSync:
+
+    def test_full_sync_writes_in_batches(self, sync_env, monkeypatch):
+        monkeypatch.setattr(neo4j_sync.settings, "NEO4J_SYNC_BATCH_SIZE", 2)
+        session = sync_env(make_snapshot(), {"tables": {}, "columns": {}, "relationships": {}})
+
+        assert neo4j_sync.sync_schema_to_graph_db(7, incremental=False) is True
+
+        assert session.writes[0][0] == neo4j_sync._CLEAR_SCHEMA
+        column_batches = [p["rows"] for q, p in session.writes if q == neo4j_sync._UPSERT_COLUMNS]
+        assert [len(batch) for batch in column_batches] == [2, 1]
+        assert [r["id"] for r in written(session, neo4j_sync._UPSERT_TABLES)] == [1, 2]
+        assert len(written(session, neo4j_sync._UPSERT_RELATIONSHIPS)) == 1
+
+    def test_incremental_sync_writes_only_changes(self, sync_env):
+        graph = graph_state(make_snapshot())
+        # 图中多出一张已删除的表及其列
+        graph["tables"][3] = {"id": 3, "connection_id": 7, "name": "legacy", "description": ""}
+        graph["columns"][30] = {"id": 30, "table_id": 3, "connection_id": 7, "name": "id", "type": "INT",
+                                "description": "", "is_pk": True, "is_fk": False}
+        session = sync_env(make_snapshot(table_description="订单主表"), graph)
+
+        assert neo4j_sync.sync_schema_to_graph_db(7) is True
+
+        assert [r["description"] for r in written(session, neo4j_sync._UPSERT_TABLES)] == ["订单主表"]
+        assert written(session, neo4j_sync._UPSERT_COLUMNS) == []
+        assert written(session, neo4j_sync._UPSERT_RELATIONSHIPS) == []
+        assert written(session, neo4j_sync._DELETE_TABLES) == [3]
+        assert written(session, neo4j_sync._DELETE_COLUMNS) == [30]
+
+    def test_incremental_sync_noop_when_unchanged(self, sync_env):
+        snapshot = make_snapshot()
+        session = sync_env(snapshot, graph_state(snapshot))
+
+        neo4j_sync.sync_schema_to_graph_db(7)
+
+        assert session.writes == []
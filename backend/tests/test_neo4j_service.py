@@ -0,0 +1,57 @@
+"""
+Neo4j 公共驱动注册表测试
+
+驱动创建是惰性的（不会真正建立连接），因此无需 Neo4j 服务即可验证：
+- 同一事件循环复用同一个异步驱动
+- 连接池参数来自配置
+- close_async 释放驱动
+- asyncio.run 的事件循环结束时关闭该循环的驱动
+"""
+import asyncio
+from unittest.mock import patch
+
+from app.core.config import settings
+from app.services.neo4j_service import Neo4jService
+
+
+async def test_async_driver_shared_within_loop():
+    try:
+        first = Neo4jService.get_async_driver()
+        second = Neo4jService.get_async_driver()
+        assert first is second
+    finally:
+        await Neo4jService.close_async()
+
+    assert Neo4jService.get_async_driver() is not first
+    await Neo4jService.close_async()
+
+
+async def test_pool_settings_applied():
+    with patch("app.services.neo4j_service.AsyncGraphDatabase") as mock_graph_db:
+        Neo4jService.get_async_driver()
+        kwargs = mock_graph_db.driver.call_args.kwargs
+        assert kwargs["max_connection_pool_size"] == settings.NEO4J_MAX_POOL_SIZE
+        assert kwargs["connection_acquisition_timeout"] == settings.NEO4J_CONNECTION_ACQUISITION_TIMEOUT
+        Neo4jService._async_drivers.clear()
+
+
+def test_driver_closed_when_short_lived_loop_ends():
+    closed = []
+
+    async def use_driver():
+        driver = Neo4jService.get_async_driver()
+        original_close = driver.close
+
+        async def close():
+            closed.append(driver)
+            await original_close()
+
+        driver.close = close
+        await asyncio.sleep(0)
+        return driver
+
+    first = asyncio.run(use_driver())
+    second = asyncio.run(use_driver())
+
+    assert closed == [first, second]
+    assert len(Neo4jService._async_drivers) == 0
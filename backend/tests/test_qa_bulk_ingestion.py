@@ -0,0 +1,246 @@
+"""
+问答对批量导入测试
+
+验证：
+- 行数据校验：缺少字段 / 格式错误的行记入逐行错误报告，CSV 中的列表字段按逗号拆分
+- JSONL / CSV 逐行读取，行号与文件一致，JSONL 解析失败的行单独报错
+- 按块调用 store_qa_pairs_batch（块内不 flush，任务结束后每个集合 flush 一次），块失败只影响该块
+- 后台任务汇报进度，结束后删除临时文件；只有发起导入的用户可以查询任务
+- 引擎批量写入：一次 batch_embed，Neo4j 失败时回滚本批 Milvus 写入
+- Neo4j 初始化时为 QAPair / QueryPattern / Entity 的 id 创建唯一约束，单条失败不影响其他约束
+"""
+import asyncio
+import os
+from datetime import datetime
+
+import pytest
+
+from app.services.hybrid_retrieval.engine.retrieval_engine import HybridRetrievalEngine
+from app.services.hybrid_retrieval.models import QAPairWithContext
+from app.services.qa_bulk_ingestion import (
+    QABulkIngestionJob, QABulkIngestionService, build_qa_pair, iter_file_rows
+)
+
+
+class FakeMilvus:
+
+    def __init__(self):
+        self.inserted = []
+        self.deleted = []
+        self.flushes = 0
+
+    async def insert_qa_pairs(self, qa_pairs, flush=True):
+        self.inserted.append(([qa_pair.id for qa_pair in qa_pairs], flush))
+
+    async def delete_qa_pairs(self, qa_ids):
+        self.deleted.append(list(qa_ids))
+
+    async def flush(self):
+        self.flushes += 1
+
+
+class FakeEngine:
+
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.milvus = {}
+        self.fail_on = fail_on
+
+    async def store_qa_pairs_batch(self, qa_pairs, flush=True):
+        assert flush is False
+        if self.fail_on and any(qa_pair.question == self.fail_on for qa_pair in qa_pairs):
+            raise RuntimeError("neo4j unavailable")
+        self.batches.append([qa_pair.question for qa_pair in qa_pairs])
+
+    async def get_milvus_service_for_connection(self, connection_id):
+        return self.milvus.setdefault(connection_id, FakeMilvus())
+
+
+def row(i, **extra):
+    return {"question": f"问题{i}", "sql": f"SELECT * FROM t{i}", "connection_id": 1, **extra}
+
+
+class TestRowParsing:
+
+    def test_build_qa_pair_validates_and_parses(self):
+        qa_pair = build_qa_pair(
+            {"question": " 销售额 ", "sql": "SELECT 1", "used_tables": "orders, customers",
+             "verified": "true", "difficulty_level": "4"},
+            connection_id=7
+        )
+        assert (qa_pair.question, qa_pair.connection_id, qa_pair.difficulty_level) == ("销售额", 7, 4)
+        assert qa_pair.used_tables == ["orders", "customers"]
+        assert qa_pair.verified is True
+
+        for bad, message in [({"sql": "SELECT 1", "connection_id": 1}, "question"),
+                             ({"question": "q", "connection_id": 1}, "sql"),
+                             ({"question": "q", "sql": "SELECT 1"}, "connection_id"),
+                             (row(1, difficulty_level="hard"), "difficulty_level")]:
+            with pytest.raises(ValueError, match=message):
+                build_qa_pair(bad)
+
+    def test_iter_file_rows_reports_line_numbers(self, tmp_path):
+        jsonl = tmp_path / "qa.jsonl"
+        jsonl.write_text('{"question": "a"}\n\nnot json\n{"question": "b"}\n', encoding="utf-8")
+        rows = list(iter_file_rows(str(jsonl), "jsonl"))
+        assert [n for n, _ in rows] == [1, 3, 4]
+        assert isinstance(rows[1][1], ValueError)
+
+        csv_file = tmp_path / "qa.csv"
+        csv_file.write_text('question,sql\n"多行\n问题",SELECT 1\nb,SELECT 2\n', encoding="utf-8")
+        rows = list(iter_file_rows(str(csv_file), "csv"))
+        assert [(n, r["question"]) for n, r in rows] == [(3, "多行\n问题"), (4, "b")]
+
+
+class TestBulkIngestion:
+
+    async def test_chunks_and_single_flush_per_collection(self):
+        service = QABulkIngestionService(chunk_size=2)
+        engine = FakeEngine()
+        rows = [row(1), row(2), {"question": "缺少 SQL", "connection_id": 1}, row(3), row(4, connection_id=2), row(5)]
+
+        job = await service.run(engine, enumerate(rows, 1))
+
+        assert job.status == "completed"
+        assert engine.batches == [["问题1", "问题2"], ["问题3", "问题5"], ["问题4"]]
+        assert {cid: milvus.flushes for cid, milvus in engine.milvus.items()} == {1: 1, 2: 1}
+        assert (job.created, job.failed, job.processed) == (5, 1, 6)
+        assert job.errors == [{"row": 3, "error": "缺少 sql", "question": "缺少 SQL"}]
+
+    async def test_failed_chunk_marks_its_rows_only(self):
+        service = QABulkIngestionService(chunk_size=2)
+        engine = FakeEngine(fail_on="问题3")
+
+        job = await service.run(engine, enumerate([row(i) for i in range(1, 6)], 1))
+
+        assert job.status == "completed"
+        assert job.created == 3
+        assert [e["row"] for e in job.errors] == [3, 4]
+        assert "neo4j unavailable" in job.errors[0]["error"]
+
+    async def test_background_file_job_reports_progress(self, tmp_path):
+        path = tmp_path / "qa.csv"
+        path.write_text("question,sql\na,SELECT 1\nb,\nc,SELECT 3\n", encoding="utf-8")
+        service = QABulkIngestionService(chunk_size=10)
+        engine = FakeEngine()
+
+        job = service.start_file(
+            engine, str(path), "csv", connection_id=9, filename="qa.csv", user_id=5, tenant_id=7
+        )
+        assert service.get_job(job.id, user_id=5, tenant_id=7) is job
+        # 其他租户或同租户的其他用户都查不到该任务
+        assert service.get_job(job.id, user_id=5, tenant_id=8) is None
+        assert service.get_job(job.id, user_id=6, tenant_id=7) is None
+        assert service.get_job(job.id) is None
+        await asyncio.wait_for(job.task, timeout=5)
+
+        status = job.to_dict()
+        assert status["status"] == "completed"
+        assert (status["total"], status["created"], status["failed"], status["progress"]) == (3, 2, 1, 1.0)
+        assert status["errors"] == [{"row": 3, "error": "缺少 sql", "question": "b"}]
+        assert engine.milvus[9].flushes == 1
+        assert not os.path.exists(path)
+
+    def test_finished_jobs_are_evicted(self):
+        service = QABulkIngestionService(max_jobs=2)
+
+        jobs = [QABulkIngestionJob() for _ in range(3)]
+        jobs[0].status = "completed"
+        for job in jobs:
+            service._register(job)
+        assert service.get_job(jobs[0].id) is None
+        assert service.get_job(jobs[2].id) is jobs[2]
+
+
+class TestEngineBatchStore:
+
+    @pytest.fixture
+    def engine(self):
+        engine = HybridRetrievalEngine.__new__(HybridRetrievalEngine)
+        engine._initialized = True
+        engine.milvus = FakeMilvus()
+        engine.embedded = []
+
+        class FakeVector:
+            async def batch_embed(self, questions):
+                engine.embedded.append(list(questions))
+                return [[1.0, float(i)] for i in range(len(questions))]
+
+        class FakeNeo4j:
+            fail = False
+
+            async def store_qa_pairs_batch(self, qa_pairs):
+                if self.fail:
+                    raise RuntimeError("neo4j down")
+
+        async def get_milvus(connection_id):
+            return engine.milvus
+
+        engine.vector_service = FakeVector()
+        engine.neo4j_service = FakeNeo4j()
+        engine.get_milvus_service_for_connection = get_milvus
+        return engine
+
+    def qa(self, qa_id, connection_id=1000001):
+        return QAPairWithContext(
+            id=qa_id, question=f"问题 {qa_id}", sql="SELECT 1", connection_id=connection_id,
+            difficulty_level=2, query_type="SELECT", success_rate=0.0, verified=False,
+            created_at=datetime.now(), used_tables=[], used_columns=[], query_pattern="SELECT",
+            mentioned_entities=[]
+        )
+
+    async def test_one_embed_and_insert_per_batch(self, engine):
+        pairs = [self.qa("a"), self.qa("b")]
+        await engine.store_qa_pairs_batch(pairs, flush=False)
+
+        assert engine.embedded == [["问题 a", "问题 b"]]
+        assert engine.milvus.inserted == [(["a", "b"], False)]
+        assert pairs[1].embedding_vector == [1.0, 1.0]
+
+    async def test_neo4j_failure_rolls_back_milvus(self, engine):
+        engine.neo4j_service.fail = True
+        with pytest.raises(RuntimeError):
+            await engine.store_qa_pairs_batch([self.qa("a"), self.qa("b")])
+        assert engine.milvus.deleted == [["a", "b"]]
+
+    async def test_rejects_mixed_connections(self, engine):
+        with pytest.raises(ValueError):
+            await engine.store_qa_pairs_batch([self.qa("a", 1), self.qa("b", 2)])
+
+
+class TestNeo4jConstraints:
+
+    async def test_initialize_creates_id_constraints(self, monkeypatch):
+        from app.services.hybrid_retrieval.storage import neo4j_enhanced
+
+        statements = []
+
+        class FakeSession:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def run(self, statement):
+                statements.append(statement)
+                if "Entity" in statement:
+                    raise RuntimeError("duplicate ids")
+
+                class Result:
+                    async def consume(self):
+                        pass
+                return Result()
+
+        async def run_query(query):
+            return []
+
+        monkeypatch.setattr(neo4j_enhanced.neo4j_service, "run_query", run_query)
+        monkeypatch.setattr(neo4j_enhanced.neo4j_service, "async_session", FakeSession)
+
+        service = neo4j_enhanced.EnhancedNeo4jService()
+        await service.initialize()
+
+        assert service._initialized
+        for label in ("QAPair", "QueryPattern", "Entity"):
+            assert any(f":{label})" in s and "IS UNIQUE" in s for s in statements)
@@ -0,0 +1,148 @@
+"""
+问答对流式导出测试
+
+验证：
+- Milvus 迭代器逐页读取，读完或提前退出时关闭迭代器
+- 引擎每页一次 Neo4j 批量查询补齐上下文，Neo4j 不可用时只导出 Milvus 字段
+- NDJSON / CSV 逐页输出，CSV 先输出表头，导出的 CSV 可被批量导入解析
+"""
+import json
+
+import pytest
+
+from app.services.hybrid_retrieval.engine.retrieval_engine import HybridRetrievalEngine
+from app.services.hybrid_retrieval.storage.milvus_client_pool import MilvusClientPool
+from app.services.qa_bulk_ingestion import build_qa_pair, iter_file_rows
+from app.services.qa_export import export_qa_pairs, normalize_export_format
+
+
+def milvus_row(i):
+    return {"id": f"qa{i}", "question": f"问题{i}", "sql": f"SELECT * FROM t{i}", "connection_id": 1,
+            "difficulty_level": 2, "query_type": "SELECT", "success_rate": 0.5, "verified": True}
+
+
+class FakeIterator:
+
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.closed = False
+
+    def next(self):
+        return self.pages.pop(0) if self.pages else []
+
+    def close(self):
+        self.closed = True
+
+
+class TestMilvusIterate:
+
+    async def test_pages_and_closes(self, monkeypatch):
+        pool = MilvusClientPool(max_workers=1)
+        iterator = FakeIterator([[1, 2], [3]])
+
+        class FakeClient:
+            def query_iterator(self, **kwargs):
+                assert kwargs["batch_size"] == 2
+                return iterator
+
+        monkeypatch.setattr(pool, "get_client", lambda uri: FakeClient())
+
+        pages = [page async for page in pool.iterate("uri", "query_iterator", batch_size=2)]
+        assert pages == [[1, 2], [3]]
+        assert iterator.closed
+
+    async def test_early_exit_closes(self, monkeypatch):
+        pool = MilvusClientPool(max_workers=1)
+        iterator = FakeIterator([[1], [2]])
+        monkeypatch.setattr(pool, "get_client", lambda uri: type("C", (), {"query_iterator": lambda self: iterator})())
+
+        pages = pool.iterate("uri", "query_iterator")
+        async for _ in pages:
+            break
+        await pages.aclose()
+        assert iterator.closed
+
+
+class FakeMilvusService:
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    async def iter_qa_pairs(self, connection_id, batch_size=1000):
+        for page in self.pages:
+            yield [dict(row) for row in page]
+
+
+class FakeNeo4j:
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    async def get_qa_contexts(self, qa_ids):
+        self.calls.append(list(qa_ids))
+        if self.fail:
+            raise RuntimeError("neo4j down")
+        return {qa_id: {"created_at": "2026-01-01T00:00:00", "used_tables": ["orders", "users"],
+                        "mentioned_entities": ["销售额"]} for qa_id in qa_ids}
+
+
+@pytest.fixture
+def engine():
+    engine = HybridRetrievalEngine.__new__(HybridRetrievalEngine)
+    engine._initialized = True
+    engine.neo4j_service = FakeNeo4j()
+    service = FakeMilvusService([[milvus_row(1), milvus_row(2)], [milvus_row(3)]])
+
+    async def get_milvus(connection_id):
+        return service
+
+    engine.get_milvus_service_for_connection = get_milvus
+    return engine
+
+
+class TestEngineIteration:
+
+    async def test_joins_neo4j_context_per_page(self, engine):
+        pages = [page async for page in engine.iter_qa_pairs(1, batch_size=2)]
+
+        assert [len(page) for page in pages] == [2, 1]
+        assert engine.neo4j_service.calls == [["qa1", "qa2"], ["qa3"]]
+        assert pages[0][0]["used_tables"] == ["orders", "users"]
+
+    async def test_neo4j_failure_exports_milvus_fields(self, engine):
+        engine.neo4j_service = FakeNeo4j(fail=True)
+        pages = [page async for page in engine.iter_qa_pairs(1)]
+
+        assert sum(len(page) for page in pages) == 3
+        assert pages[1][0]["used_tables"] == [] and pages[1][0]["created_at"] is None
+        # 失败后不再重复请求 Neo4j
+        assert len(engine.neo4j_service.calls) == 1
+
+
+class TestExportFormats:
+
+    def test_normalize_format(self):
+        assert normalize_export_format("JSON") == "ndjson"
+        assert normalize_export_format("csv") == "csv"
+        assert normalize_export_format("xlsx") is None
+
+    async def test_ndjson_streams_one_chunk_per_page(self, engine):
+        chunks = [chunk async for chunk in export_qa_pairs(engine, 1, "ndjson", batch_size=2)]
+
+        assert len(chunks) == 2
+        rows = [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+        assert [row["id"] for row in rows] == ["qa1", "qa2", "qa3"]
+        assert rows[0]["mentioned_entities"] == ["销售额"]
+
+    async def test_csv_roundtrips_through_bulk_import(self, engine, tmp_path):
+        chunks = [chunk async for chunk in export_qa_pairs(engine, 1, "csv")]
+        assert chunks[0].startswith("\ufeffid,question,sql")
+
+        path = tmp_path / "export.csv"
+        path.write_text("".join(chunks), encoding="utf-8")
+        qa_pairs = [build_qa_pair(row, connection_id=5) for _, row in iter_file_rows(str(path), "csv")]
+
+        assert [qa.question for qa in qa_pairs] == ["问题1", "问题2", "问题3"]
+        assert qa_pairs[0].used_tables == ["orders", "users"]
+        assert qa_pairs[0].verified is True
@@ -0,0 +1,117 @@
+"""
+QA 倒排索引测试
+
+验证：
+- 结构检索：按重叠表数排序，打分与原 Cypher 查询一致，重叠数相同时按 Jaccard 排序
+- 模式检索：相同查询类型且难度不超过 difficulty + 1，模式分来自 QueryPattern.usage_count
+- 增删改增量维护，位复用后检索结果正确，不再使用的表释放编号
+- 从 Neo4j 只加载一次，加载失败时返回 None（回退到 Cypher）
+"""
+from datetime import datetime
+
+import pytest
+
+from app.services.hybrid_retrieval.models import QAPairWithContext
+from app.services.hybrid_retrieval.storage.qa_inverted_index import ConnectionInvertedIndex, QAInvertedIndex
+
+
+def qa(qa_id, tables, query_type="AGGREGATE", difficulty=2, success_rate=1.0, sql="SELECT 1"):
+    return QAPairWithContext(
+        id=qa_id, question=f"问题 {qa_id}", sql=sql, connection_id=1, difficulty_level=difficulty,
+        query_type=query_type, success_rate=success_rate, verified=True, created_at=datetime.now(),
+        used_tables=tables, used_columns=[], query_pattern=query_type, mentioned_entities=[]
+    )
+
+
+class TestConnectionInvertedIndex:
+
+    def test_structural_search_orders_by_overlap_then_jaccard(self):
+        index = ConnectionInvertedIndex([
+            qa("a", ["orders", "customers", "products", "regions"]),
+            qa("b", ["Orders", "customers"]),
+            qa("c", ["orders"]),
+            qa("d", ["inventory"]),
+        ])
+
+        results = index.structural_search(["orders", "customers", "payments"])
+
+        assert [r.qa_pair.id for r in results] == ["b", "a", "c"]
+        assert [r.structural_score for r in results] == pytest.approx([2 / 3, 2 / 3, 1 / 3])
+        assert index.structural_search(["unknown"]) == []
+
+    def test_pattern_search_filters_type_and_difficulty(self):
+        index = ConnectionInvertedIndex([
+            qa("a", [], difficulty=1, success_rate=0.5),
+            qa("b", [], difficulty=3, success_rate=0.9),
+            qa("c", [], difficulty=4),
+            qa("d", [], query_type="JOIN", difficulty=1),
+        ], pattern_usage={("AGGREGATE", 1): 40, ("AGGREGATE", 3): 250})
+
+        results = index.pattern_search("AGGREGATE", 2)
+
+        assert [r.qa_pair.id for r in results] == ["b", "a"]
+        assert [r.pattern_score for r in results] == pytest.approx([1.0, 0.4])
+        assert results[1].explanation.endswith("40")
+
+    def test_incremental_updates_and_slot_reuse(self):
+        index = ConnectionInvertedIndex([qa("a", ["orders"]), qa("b", ["orders"])])
+
+        index.remove("a")
+        index.add(qa("e", [], sql="SELECT * FROM refunds JOIN orders ON 1=1"))
+        assert index.update("b", {"query_type": "JOIN"})
+        assert not index.update("missing", {"verified": False})
+
+        assert {r.qa_pair.id for r in index.structural_search(["orders"])} == {"b", "e"}
+        assert [r.qa_pair.id for r in index.structural_search(["refunds"])] == ["e"]
+        assert [r.qa_pair.id for r in index.pattern_search("JOIN", 2)] == ["b"]
+        assert len(index) == 2
+
+    def test_unused_tables_release_their_ids(self):
+        index = ConnectionInvertedIndex()
+        for i in range(50):
+            index.add(qa(f"q{i}", [f"tmp_{i}", "orders"]))
+            index.remove(f"q{i}")
+
+        assert len(index._table_ids) == 0
+        index.add(qa("a", ["orders", "customers"]))
+        index.add(qa("b", ["customers"]))
+        assert sorted(index._table_ids.values()) == [0, 1]
+        assert [r.qa_pair.id for r in index.structural_search(["orders", "customers"])] == ["a", "b"]
+
+
+class FakeNeo4jService:
+    def __init__(self, qa_pairs=None, fail=False):
+        self.qa_pairs = qa_pairs or []
+        self.fail = fail
+        self.loads = 0
+
+    async def load_qa_pairs(self, connection_id):
+        self.loads += 1
+        if self.fail:
+            raise ConnectionError("neo4j down")
+        return self.qa_pairs
+
+    async def load_pattern_usage(self):
+        return {("AGGREGATE", 2): 7}
+
+
+class TestQAInvertedIndex:
+
+    async def test_loads_once_and_applies_writes(self):
+        neo4j = FakeNeo4jService([qa("a", ["orders"])])
+        index = QAInvertedIndex(ttl=60, enabled=True)
+
+        assert [r.qa_pair.id for r in await index.structural_search(1, neo4j, ["orders"])] == ["a"]
+        index.add(qa("b", ["orders"]))
+        index.remove(1, "a")
+        assert [r.qa_pair.id for r in await index.structural_search(1, neo4j, ["orders"])] == ["b"]
+        results = await index.pattern_search(1, neo4j, "AGGREGATE", 2)
+        assert [r.qa_pair.id for r in results] == ["b"]
+        # 加载的使用次数 + 本进程写入一次
+        assert results[0].pattern_score == pytest.approx(0.08)
+        assert neo4j.loads == 1
+
+    async def test_load_failure_falls_back(self):
+        index = QAInvertedIndex(ttl=60, enabled=True)
+        assert await index.structural_search(1, FakeNeo4jService(fail=True), ["orders"]) is None
+        assert index.get_stats()["load_failures"] == 1
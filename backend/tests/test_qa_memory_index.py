@@ -0,0 +1,96 @@
+"""
+QA 样本内存索引测试
+
+验证：
+- 加载一次后在内存中检索，结果与暴力余弦相似度排序一致，格式与 Milvus 检索结果相同
+- 样本数超过上限的连接返回 None（由 Milvus 检索）
+- store/update/delete 同步到已加载的索引，过期后重新加载
+"""
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.services.hybrid_retrieval.models import QAPairWithContext
+from app.services.hybrid_retrieval.storage.qa_memory_index import QAMemoryIndex
+
+
+def make_record(i, vector, connection_id=1):
+    return {
+        "id": f"qa-{i}", "question": f"问题{i}", "sql": f"SELECT {i}", "connection_id": connection_id,
+        "difficulty_level": 1, "query_type": "SELECT", "success_rate": 1.0, "verified": True,
+        "vector": list(vector),
+    }
+
+
+class FakeMilvusService:
+    collection_name = "sales_qa_pairs"
+
+    def __init__(self, records):
+        self.records = records
+        self.loads = 0
+
+    async def run(self, method, collection_name, filter, output_fields, limit):
+        assert method == "query" and "vector" in output_fields
+        self.loads += 1
+        return self.records[:limit]
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).normal(size=(50, 8)).astype(np.float32)
+
+
+class TestQAMemoryIndex:
+
+    async def test_search_matches_brute_force(self, vectors):
+        milvus = FakeMilvusService([make_record(i, v) for i, v in enumerate(vectors)])
+        index = QAMemoryIndex(max_size=100, ttl=60, enabled=True)
+        query = vectors[7] + 0.01
+
+        results = await index.search(1, milvus, query.tolist(), top_k=5)
+        await index.search(1, milvus, query.tolist(), top_k=5)
+
+        normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        expected = np.argsort(-(normed @ (query / np.linalg.norm(query))))[:5]
+        assert [r["id"] for r in results] == [f"qa-{i}" for i in expected]
+        assert results[0]["similarity_score"] == pytest.approx(1.0, abs=1e-3)
+        assert set(results[0]) == {"id", "question", "sql", "connection_id", "difficulty_level",
+                                   "query_type", "success_rate", "verified", "similarity_score"}
+        assert milvus.loads == 1
+        assert index.count(1) == 50
+
+    async def test_large_collection_falls_back_to_milvus(self, vectors):
+        milvus = FakeMilvusService([make_record(i, v) for i, v in enumerate(vectors)])
+        index = QAMemoryIndex(max_size=10, ttl=60, enabled=True)
+
+        assert await index.search(1, milvus, vectors[0].tolist()) is None
+        assert index.count(1) is None
+        assert index.get_stats()["milvus_only_connections"] == 1
+
+    async def test_writes_are_applied_and_ttl_reloads(self, vectors):
+        milvus = FakeMilvusService([make_record(i, vectors[i]) for i in range(3)])
+        index = QAMemoryIndex(max_size=100, ttl=60, enabled=True)
+        await index.search(1, milvus, vectors[0].tolist())
+
+        index.add(QAPairWithContext(
+            id="qa-new", question="新问题", sql="SELECT 9", connection_id=1, difficulty_level=2,
+            query_type="SELECT", success_rate=1.0, verified=False, created_at=datetime.now(),
+            used_tables=[], used_columns=[], query_pattern="SELECT", mentioned_entities=[],
+            embedding_vector=vectors[10].tolist()
+        ))
+        assert (await index.search(1, milvus, vectors[10].tolist(), top_k=1))[0]["id"] == "qa-new"
+
+        index.update(1, "qa-new", {"sql": "SELECT 10"}, new_vector=vectors[11].tolist())
+        top = (await index.search(1, milvus, vectors[11].tolist(), top_k=1))[0]
+        assert (top["id"], top["sql"]) == ("qa-new", "SELECT 10")
+
+        index.remove(1, "qa-0")
+        results = await index.search(1, milvus, vectors[0].tolist(), top_k=10)
+        assert "qa-0" not in {r["id"] for r in results}
+        assert index.count(1) == 3
+        assert milvus.loads == 1
+
+        index._ttl = 0
+        await index.search(1, milvus, vectors[0].tolist())
+        assert milvus.loads == 2
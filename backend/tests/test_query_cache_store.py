@@ -0,0 +1,234 @@
+"""
+精确查询缓存存储测试
+
+验证：
+- store_result 与 check_cache 使用相同的键（含 tenant_id）
+- 两个存储实例（模拟两个 worker 进程）共享同一 SQLite 文件
+- 按总字节数淘汰最久未访问的条目
+- 源表数据版本变化时条目失效，可按表主动失效；语义命中时的版本校验不在事件循环上执行
+- sql_executor_node 执行成功后写入缓存（澄清补充过的查询不写入），记录执行前探测的源表版本
+"""
+import time
+
+import pytest
+
+from app.core.state import SQLExecutionResult
+from app.services.query_cache_service import QueryCacheService
+from app.services.query_cache_store import QueryCacheStore
+from app.services.table_version_probe import TableVersionProbe, table_version_probe
+
+RESULT = {
+    "success": True,
+    "data": {"columns": ["region", "total"], "data": [["east", 10]], "row_count": 1},
+    "error": None,
+}
+
+
+@pytest.fixture
+def table_versions(monkeypatch):
+    """目标库的表版本（测试中直接修改）"""
+    versions = {}
+    monkeypatch.setattr(table_version_probe, "_probe_ttl", 0)
+    monkeypatch.setattr(
+        table_version_probe, "_probe",
+        lambda connection_id, tables: {t: versions[t] for t in tables if t in versions}
+    )
+    return versions
+
+
+@pytest.fixture
+def cache_service(tmp_path, monkeypatch, table_versions):
+    service = QueryCacheService.get_instance()
+    store = QueryCacheStore(str(tmp_path / "cache.sqlite3"), max_bytes=1024 * 1024)
+    monkeypatch.setattr(service, "_store", store)
+    yield service
+    store.close()
+
+
+class TestQueryCacheStore:
+
+    async def test_store_then_check_with_tenant(self, cache_service):
+        assert cache_service.store_result("各地区销售额", 3, "SELECT 1;", RESULT, tenant_id=9)
+
+        hit = await cache_service.check_cache("各地区销售额 ", 3, tenant_id=9)
+        assert hit is not None and hit.hit_type == "exact"
+        assert hit.sql == "SELECT 1;"
+        assert hit.result == RESULT
+
+        assert await cache_service.check_cache("各地区销售额", 3, tenant_id=10) is None
+        assert await cache_service.check_cache("各地区销售额", 4, tenant_id=9) is None
+
+    def test_store_is_shared_between_processes(self, tmp_path):
+        path = str(tmp_path / "shared.sqlite3")
+        writer = QueryCacheStore(path, max_bytes=1024 * 1024)
+        reader = QueryCacheStore(path, max_bytes=1024 * 1024)
+        writer.put("k", "q", 1, None, "SELECT 1;", RESULT, ttl=60)
+        assert reader.get("k")["result"] == RESULT
+        assert reader.delete_connection(1) == 1
+        assert writer.get("k") is None
+
+    def test_expired_entry_is_dropped(self, tmp_path):
+        store = QueryCacheStore(str(tmp_path / "ttl.sqlite3"), max_bytes=1024 * 1024)
+        store.put("k", "q", 1, None, "SELECT 1;", RESULT, ttl=0)
+        time.sleep(0.01)
+        assert store.get("k") is None
+        assert store.get_stats()["entries"] == 0
+
+    def test_evicts_least_recently_accessed_by_bytes(self, tmp_path):
+        store = QueryCacheStore(str(tmp_path / "evict.sqlite3"), max_bytes=600)
+        payload = {"rows": "x" * 100}
+        for key in ("a", "b", "c"):
+            store.put(key, "q", 1, None, "SELECT 1;", payload, ttl=60)
+            time.sleep(0.01)
+        store.get("a")  # a 变为最近访问
+        time.sleep(0.01)
+        store.put("d", "q", 1, None, "SELECT 1;", payload, ttl=60)
+        store.put("e", "q", 1, None, "SELECT 1;", payload, ttl=60)
+
+        stats = store.get_stats()
+        assert stats["bytes"] <= 600
+        assert store.get("a") is not None
+        assert store.get("b") is None
+        assert not store.put("huge", "q", 1, None, "SELECT 1;", {"rows": "x" * 1000}, ttl=60)
+
+
+class TestTableVersionInvalidation:
+
+    async def test_entry_invalidated_when_source_table_changes(self, cache_service, table_versions):
+        table_versions.update({"sales": "2026-01-01 10:00:00", "regions": "2026-01-01 09:00:00"})
+        sql = "SELECT r.name, SUM(s.amount) FROM sales s JOIN regions r ON s.region_id = r.id GROUP BY r.name;"
+        cache_service.store_result("各地区销售额", 3, sql, RESULT)
+
+        entry = cache_service._store.get(cache_service._make_cache_key("各地区销售额", 3))
+        assert entry["tables"] == ["regions", "sales"]
+        assert await cache_service.check_cache("各地区销售额", 3) is not None
+
+        table_versions["sales"] = "2026-01-01 11:00:00"
+        assert await cache_service.check_cache("各地区销售额", 3) is None
+        assert cache_service._store.get_stats()["entries"] == 0
+
+    async def test_untracked_tables_fall_back_to_ttl(self, cache_service, monkeypatch):
+        monkeypatch.setattr(cache_service, "EXACT_CACHE_TTL", 0)
+        cache_service.store_result("销售额", 3, "SELECT SUM(amount) FROM sales;", RESULT)
+        assert await cache_service.check_cache("销售额", 3) is None
+
+    async def test_invalidate_tables(self, cache_service):
+        cache_service.store_result("销售额", 3, "SELECT SUM(amount) FROM sales;", RESULT)
+        cache_service.store_result("客户数", 3, "SELECT COUNT(*) FROM customers;", RESULT)
+        assert cache_service.invalidate_tables(3, ["SALES"]) == 1
+        assert await cache_service.check_cache("销售额", 3) is None
+        assert await cache_service.check_cache("客户数", 3) is not None
+
+    async def test_semantic_match_probes_versions_off_loop(self, cache_service, table_versions, monkeypatch):
+        import threading
+        from types import SimpleNamespace
+        from app.services.hybrid_retrieval_service import HybridRetrievalEnginePool
+
+        table_versions["sales"] = "2026-01-01 10:00:00"
+        cache_service.store_result("销售额", 3, "SELECT SUM(amount) FROM sales;", RESULT)
+        probe_threads = []
+        probe = table_version_probe._probe
+        monkeypatch.setattr(table_version_probe, "_probe", lambda connection_id, tables: (
+            probe_threads.append(threading.current_thread()), probe(connection_id, tables))[1])
+
+        class FakeEngine:
+            async def hybrid_retrieve(self, **kwargs):
+                qa_pair = SimpleNamespace(question="销售额", sql="SELECT SUM(amount) FROM sales;")
+                return [SimpleNamespace(qa_pair=qa_pair, final_score=0.99)]
+
+        async def has_samples(connection_id):
+            return True
+
+        async def get_engine(connection_id):
+            return FakeEngine()
+
+        monkeypatch.setattr(HybridRetrievalEnginePool, "has_qa_samples", has_samples)
+        monkeypatch.setattr(HybridRetrievalEnginePool, "get_engine", get_engine)
+
+        hit = await cache_service._check_semantic_cache("总销售额", 3)
+        assert hit is not None and hit.result == RESULT
+        assert probe_threads and threading.main_thread() not in probe_threads
+
+    def test_probe_reuses_recent_versions(self, monkeypatch):
+        probe = TableVersionProbe(probe_ttl=60, watermark_column="")
+        calls = []
+        monkeypatch.setattr(probe, "_probe", lambda cid, tables: calls.append(tables) or {"a": "1"})
+        assert probe.get_versions(1, ["A", "b"]) == {"a": "1", "b": None}
+        assert probe.get_versions(1, ["a"]) == {"a": "1"}
+        assert calls == [["a", "b"]]
+
+    def test_watermark_column_probe(self):
+        from sqlalchemy import create_engine, text
+
+        engine = create_engine("sqlite://")
+        probe = TableVersionProbe(probe_ttl=0, watermark_column="updated_at")
+        with engine.connect() as conn:
+            conn.execute(text("CREATE TABLE sales (id INTEGER, updated_at TEXT)"))
+            conn.execute(text("CREATE TABLE regions (id INTEGER)"))
+            conn.execute(text("INSERT INTO sales VALUES (1, '2026-01-01'), (2, '2026-02-01')"))
+            assert probe._probe_watermark(conn, "sales") == "2026-02-01"
+            assert probe._probe_watermark(conn, "regions") is None
+            assert probe._probe_watermark(conn, "sales") == "2026-02-01"
+
+
+class TestSqlExecutorWritesCache:
+
+    async def test_successful_execution_is_cached(self, cache_service):
+        from app.agents.nodes.worker_nodes import _store_result_in_cache
+
+        state = {
+            "messages": [{"type": "human", "content": "各地区销售额"}],
+            "connection_id": 3,
+            "tenant_id": 9,
+            "generated_sql": "SELECT region, SUM(amount) FROM sales GROUP BY region;",
+        }
+        await _store_result_in_cache(state, {"execution_result": SQLExecutionResult(
+            success=True, data=RESULT["data"], execution_time=0.1, rows_affected=1
+        )})
+
+        hit = await cache_service.check_cache("各地区销售额", 3, tenant_id=9)
+        assert hit is not None
+        assert hit.sql == state["generated_sql"]
+        assert hit.result["success"] is True
+        assert hit.result["data"] == RESULT["data"]
+
+    async def test_clarified_query_is_not_cached(self, cache_service):
+        from app.agents.nodes.worker_nodes import _store_result_in_cache
+
+        state = {
+            "messages": [{"type": "human", "content": "销售额"}],
+            "connection_id": 3,
+            "enriched_query": "销售额（时间范围：2025年）",
+            "generated_sql": "SELECT 1;",
+        }
+        await _store_result_in_cache(state, {"execution_result": SQLExecutionResult(success=True, data=RESULT["data"])})
+        assert await cache_service.check_cache("销售额", 3) is None
+
+    async def test_entry_keeps_versions_probed_before_execution(self, cache_service, table_versions, monkeypatch):
+        """执行期间源表被写入时，缓存条目记录的是执行前的版本，下次命中时失效"""
+        import sys
+        from types import SimpleNamespace
+        from app.agents.nodes.worker_nodes import sql_executor_node
+
+        async def process(state):
+            table_versions["sales"] = "v2"  # 查询执行期间发生写入
+            return {"execution_result": SQLExecutionResult(success=True, data=RESULT["data"])}
+
+        # 默认 Agent 模块导入时会创建 LLM，这里用注入的 Agent 代替
+        executor = SimpleNamespace(process=process)
+        monkeypatch.setitem(
+            sys.modules, "app.agents.agents.sql_executor_agent", SimpleNamespace(sql_executor_agent=executor)
+        )
+        table_versions["sales"] = "v1"
+        state = {
+            "messages": [{"type": "human", "content": "销售额"}],
+            "connection_id": 3,
+            "generated_sql": "SELECT SUM(amount) FROM sales;",
+            "custom_agents": {"sql_executor": executor},
+        }
+        result = await sql_executor_node(state, lambda event: None)
+
+        assert result["source_table_versions"] == {"sales": "v1"}
+        entry = cache_service._store.get(cache_service._make_cache_key("销售额", 3))
+        assert entry["table_versions"] == {"sales": "v1"}
+        assert await cache_service.check_cache("销售额", 3) is None
@@ -0,0 +1,113 @@
+"""
+查询历史向量索引测试
+
+使用内存 SQLite 元数据库验证：
+- 首次检索时批量加载租户历史，之后在同步间隔内不再访问数据库
+- top-k / 阈值 / 连接过滤与逐行余弦相似度结果一致
+- add() 增量追加，持久化文件以 mmap 方式重新加载并从水位之后补齐
+- LRU 按租户淘汰
+"""
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.base import Base
+from app.models.query_history import QueryHistory
+from app.services.query_history_index import QueryHistoryIndex
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine, tables=[QueryHistory.__table__])
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine)()
+    rng = np.random.default_rng(0)
+    rows = []
+    for i in range(1, 201):
+        rows.append(QueryHistory(
+            id=i,
+            tenant_id=1 if i <= 150 else 2,
+            connection_id=1 if i % 2 else 2,
+            query_text=f"query {i}",
+            embedding=rng.normal(size=16).tolist(),
+        ))
+    rows.append(QueryHistory(id=201, tenant_id=1, connection_id=1, query_text="no embedding", embedding=None))
+    session.add_all(rows)
+    session.commit()
+    yield session
+    session.close()
+
+
+def brute_force(db, tenant_id, embedding, connection_id, limit, threshold):
+    query = db.query(QueryHistory).filter(QueryHistory.embedding.isnot(None))
+    if tenant_id is not None:
+        query = query.filter(QueryHistory.tenant_id == tenant_id)
+    if connection_id is not None:
+        query = query.filter(QueryHistory.connection_id == connection_id)
+    target = np.asarray(embedding)
+    scored = []
+    for item in query.all():
+        if not item.embedding:
+            continue
+        vector = np.asarray(item.embedding)
+        similarity = float(target @ vector / (np.linalg.norm(target) * np.linalg.norm(vector)))
+        if similarity >= threshold:
+            scored.append((similarity, item.id))
+    scored.sort(reverse=True)
+    return [history_id for _, history_id in scored[:limit]]
+
+
+class TestQueryHistoryIndex:
+
+    @pytest.mark.parametrize("tenant_id,connection_id", [(1, None), (1, 2), (2, 1), (None, None)])
+    def test_matches_brute_force(self, db, tenant_id, connection_id):
+        index = QueryHistoryIndex(directory="", sync_interval=60)
+        target = db.get(QueryHistory, 7).embedding
+        hits = index.search(db, tenant_id, target, connection_id=connection_id, limit=5, threshold=0.1)
+        assert [history_id for history_id, _ in hits] == brute_force(db, tenant_id, target, connection_id, 5, 0.1)
+
+    def test_loaded_index_does_not_query_database(self, db, engine):
+        index = QueryHistoryIndex(directory="", sync_interval=60)
+        target = db.get(QueryHistory, 7).embedding
+        index.search(db, 1, target)
+
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        for _ in range(5):
+            hits = index.search(db, 1, target, limit=1, threshold=0.99)
+            assert hits[0][0] == 7
+        assert statements == []
+
+    def test_add_is_searchable_and_persisted(self, db, tmp_path):
+        index = QueryHistoryIndex(directory=str(tmp_path), sync_interval=60)
+        index.search(db, 1, [1.0] * 16)
+
+        db.add(QueryHistory(id=300, tenant_id=1, connection_id=1, query_text="new", embedding=[5.0] + [0.0] * 15))
+        db.commit()
+        index.add(1, 300, 1, [5.0] + [0.0] * 15)
+        assert index.search(db, 1, [1.0] + [0.0] * 15, limit=1, threshold=0.99) == [(300, pytest.approx(1.0))]
+        index.flush_all()
+
+        # 新进程：从文件 mmap 加载，并从同步水位之后补齐（不重复加入 300）
+        db.add(QueryHistory(id=301, tenant_id=1, connection_id=1, query_text="later", embedding=[0.0] * 15 + [1.0]))
+        db.commit()
+        reloaded = QueryHistoryIndex(directory=str(tmp_path), sync_interval=60)
+        assert reloaded.search(db, 1, [0.0] * 15 + [1.0], limit=1, threshold=0.99)[0][0] == 301
+        assert reloaded.search(db, 1, [1.0] + [0.0] * 15, limit=1, threshold=0.99)[0][0] == 300
+        assert reloaded.get_stats()["vectors"] == 152
+        assert isinstance(reloaded._indexes[1]._base_vectors, np.memmap)
+
+    def test_lru_evicts_least_recent_tenant(self, db):
+        index = QueryHistoryIndex(directory="", max_tenants=1, sync_interval=60)
+        index.search(db, 1, [1.0] * 16)
+        index.search(db, 2, [1.0] * 16)
+        assert list(index._indexes) == [2]
@@ -0,0 +1,165 @@
+"""
+相同查询合并执行测试
+
+验证：
+- 并发的相同请求只执行一次，所有订阅方收到完整事件序列（晚到的订阅方从头回放）
+- 不同租户的键不同，不会合并
+- 执行出错时每个订阅方都收到异常，执行结束后相同请求重新执行
+- 所有订阅方离开后取消执行
+- follower 的会话写入 leader 的最终状态后可继续多轮对话；leader 停在中断时不复制
+"""
+import asyncio
+
+import pytest
+
+from app.services.query_single_flight import QuerySingleFlight, copy_thread_state, is_new_thread
+
+
+class Source:
+    def __init__(self, events=("a", "b", "c"), delay=0.01, fail=False):
+        self.events = events
+        self.delay = delay
+        self.fail = fail
+        self.runs = 0
+        self.cancelled = False
+
+    async def __call__(self):
+        self.runs += 1
+        try:
+            for event in self.events:
+                await asyncio.sleep(self.delay)
+                yield event
+            if self.fail:
+                raise RuntimeError("boom")
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+async def collect(flight, key, source):
+    return [event async for event in flight.stream(key, source)]
+
+
+class TestQuerySingleFlight:
+
+    async def test_concurrent_subscribers_share_one_execution(self):
+        flight = QuerySingleFlight()
+        source = Source()
+
+        leader = asyncio.create_task(collect(flight, "k", source))
+        await asyncio.sleep(0.015)  # 已产生部分事件后加入
+        follower = asyncio.create_task(collect(flight, "k", source))
+
+        assert await leader == await follower == ["a", "b", "c"]
+        assert source.runs == 1
+        assert flight.get_stats() == {"leaders": 1, "followers": 1, "in_flight": 0}
+
+        # 执行结束后重新执行
+        assert await collect(flight, "k", source) == ["a", "b", "c"]
+        assert source.runs == 2
+
+    async def test_run_shares_result_and_error(self):
+        flight = QuerySingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"success": True}
+
+        results = await asyncio.gather(*[flight.run("k", work) for _ in range(3)])
+        assert results == [{"success": True}] * 3
+        assert len(calls) == 1
+
+        source = Source(fail=True)
+        outcomes = await asyncio.gather(
+            collect(flight, "e", source), collect(flight, "e", source), return_exceptions=True
+        )
+        assert all(isinstance(o, RuntimeError) for o in outcomes)
+        assert source.runs == 1
+
+    async def test_key_isolates_tenants(self):
+        key_a = QuerySingleFlight.make_key("各地区销售额", 1, 10, "stream")
+        key_b = QuerySingleFlight.make_key("各地区销售额 ", 1, 11, "stream")
+        assert key_a != key_b
+        assert key_a == QuerySingleFlight.make_key("各地区销售额 ", 1, 10, "stream")
+        assert key_a != QuerySingleFlight.make_key("各地区销售额", 1, 10, "chat")
+
+    async def test_execution_cancelled_when_all_subscribers_leave(self):
+        flight = QuerySingleFlight()
+        source = Source(delay=1)
+
+        tasks = [asyncio.create_task(collect(flight, "k", source)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        tasks[0].cancel()
+        await asyncio.sleep(0.01)
+        assert not source.cancelled
+        tasks[1].cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.sleep(0.01)
+
+        assert source.cancelled
+        assert flight.get_stats()["in_flight"] == 0
+
+
+class TestThreadState:
+
+    @pytest.fixture
+    def graph(self):
+        from typing import Annotated, TypedDict
+
+        from langgraph.checkpoint.memory import InMemorySaver
+        from langgraph.graph import END, START, StateGraph
+        from langgraph.graph.message import add_messages
+        from langgraph.types import interrupt
+
+        class State(TypedDict, total=False):
+            messages: Annotated[list, add_messages]
+            thread_id: str
+            generated_sql: str
+
+        async def generate(state):
+            if "澄清" in state["messages"][-1].content:
+                interrupt({"type": "clarification_request"})
+            return {"generated_sql": "SELECT 1;", "messages": [("ai", "生成 SQL")]}
+
+        async def analyze(state):
+            return {"messages": [("ai", "分析完成")]}
+
+        builder = StateGraph(State)
+        builder.add_node("generate", generate)
+        builder.add_node("analyze", analyze)
+        builder.add_edge(START, "generate")
+        builder.add_edge("generate", "analyze")
+        builder.add_edge("analyze", END)
+        return builder.compile(checkpointer=InMemorySaver())
+
+    @staticmethod
+    def config(thread_id):
+        return {"configurable": {"thread_id": thread_id}}
+
+    async def test_follower_thread_continues_like_leader(self, graph):
+        await graph.ainvoke({"messages": [("user", "销售额")], "thread_id": "leader"}, self.config("leader"))
+        assert await is_new_thread(graph.checkpointer, "follower")
+
+        assert await copy_thread_state(graph, "leader", "follower")
+        assert not await is_new_thread(graph.checkpointer, "follower")
+        state = await graph.aget_state(self.config("follower"))
+        assert state.next == ()
+        assert state.values["generated_sql"] == "SELECT 1;"
+        assert state.values["thread_id"] == "follower"
+        assert len(state.values["messages"]) == 3
+
+        # 下一轮对话在 follower 自己的会话上继续
+        result = await graph.ainvoke({"messages": [("user", "按月份")]}, self.config("follower"))
+        assert len(result["messages"]) == 6
+        leader = await graph.aget_state(self.config("leader"))
+        assert len(leader.values["messages"]) == 3
+
+    async def test_interrupted_leader_is_not_copied(self, graph):
+        await graph.ainvoke({"messages": [("user", "需要澄清")]}, self.config("leader"))
+        assert not await copy_thread_state(graph, "leader", "follower")
+        assert await is_new_thread(graph.checkpointer, "follower")
+
+    async def test_without_checkpointer(self):
+        assert await is_new_thread(None, "t")
@@ -0,0 +1,181 @@
+"""
+Schema 批量持久化测试
+
+使用内存 SQLite 元数据库验证：
+- 发现的 Schema 通过批量插入保存，语句数不随表/列数量增长
+- 重复保存时只更新变化的列
+- 发布 Schema 时删除前端已移除的关系
+- CachedInspector 批量（分块、并行）反射后不再逐表访问数据库
+"""
+import pytest
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.base import Base
+from app.models.schema_column import SchemaColumn
+from app.models.schema_relationship import SchemaRelationship
+from app.models.schema_table import SchemaTable
+from app.services.schema.persistence import save as save_module
+from app.services.schema_utils import CachedInspector
+
+
+def make_schema_info(table_count):
+    schema_info = [{
+        "table_name": "customers",
+        "columns": [
+            {"column_name": "id", "data_type": "INTEGER", "is_primary_key": True},
+            {"column_name": "name", "data_type": "VARCHAR"},
+        ],
+    }]
+    for i in range(table_count):
+        schema_info.append({
+            "table_name": f"orders_{i}",
+            "columns": [
+                {"column_name": "id", "data_type": "INTEGER", "is_primary_key": True},
+                {"column_name": "customer_id", "data_type": "INTEGER", "is_foreign_key": True,
+                 "references": {"table": "customers", "column": "id"}},
+                {"column_name": "amount", "data_type": "DECIMAL"},
+            ],
+        })
+    return schema_info
+
+
+@pytest.fixture
+def db(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(
+        engine, tables=[SchemaTable.__table__, SchemaColumn.__table__, SchemaRelationship.__table__]
+    )
+    session = sessionmaker(bind=engine, autoflush=False)()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    session.info["statements"] = statements
+
+    monkeypatch.setattr(save_module.crud.db_connection, "get", lambda db, id: object())
+
+    def no_engine(connection):
+        raise RuntimeError("target database unavailable")
+
+    monkeypatch.setattr(save_module, "get_pooled_engine", no_engine)
+    monkeypatch.setattr(save_module, "sync_schema_to_graph_db", lambda connection_id: True)
+    yield session
+    session.close()
+    engine.dispose()
+
+
+class TestSaveDiscoveredSchema:
+
+    def test_bulk_insert_statement_count_is_constant(self, db):
+        tables_data, relationships_data = save_module.save_discovered_schema(db, 7, make_schema_info(2))
+        small = len(db.info["statements"])
+
+        db.info["statements"].clear()
+        save_module.save_discovered_schema(db, 8, make_schema_info(40))
+        large = len(db.info["statements"])
+
+        assert len(tables_data) == 3
+        assert [(r["source_table"], r["source_column"], r["target_table"], r["relationship_type"])
+                for r in relationships_data] == [
+            ("orders_0", "customer_id", "customers", "1-to-N"),
+            ("orders_1", "customer_id", "customers", "1-to-N"),
+        ]
+        assert large == small
+        assert db.query(SchemaColumn).join(SchemaTable).filter(SchemaTable.connection_id == 8).count() == 122
+        assert db.query(SchemaRelationship).filter(SchemaRelationship.connection_id == 8).count() == 40
+
+    def test_resave_updates_only_changed_columns(self, db):
+        save_module.save_discovered_schema(db, 7, make_schema_info(3))
+        schema_info = make_schema_info(3)
+        schema_info[1]["columns"][2]["data_type"] = "NUMERIC(12,2)"
+
+        db.info["statements"].clear()
+        tables_data, relationships_data = save_module.save_discovered_schema(db, 7, schema_info)
+
+        updates = [s for s in db.info["statements"] if s.startswith("UPDATE")]
+        inserts = [s for s in db.info["statements"] if s.startswith("INSERT")]
+        assert len(updates) == 1 and "schemacolumn" in updates[0]
+        assert inserts == []
+        assert len(relationships_data) == 3
+        assert db.query(SchemaColumn).filter(SchemaColumn.data_type == "NUMERIC(12,2)").count() == 1
+
+
+class TestSavePublishedSchema:
+
+    def test_publish_updates_and_removes_stale_relationships(self, db):
+        save_module.save_discovered_schema(db, 7, make_schema_info(2))
+
+        save_module.save_published_schema(db, 7, {
+            "tables": [{
+                "table_name": "customers",
+                "description": "客户",
+                "ui_metadata": {"position": {"x": 10, "y": 20}},
+                "columns": [{"column_name": "email", "data_type": "VARCHAR", "description": "邮箱"}],
+            }],
+            "relationships": [{
+                "source_table": "orders_1", "source_column": "customer_id",
+                "target_table": "customers", "target_column": "id",
+                "relationship_type": "N-to-1",
+            }],
+        })
+
+        customers = db.query(SchemaTable).filter_by(connection_id=7, table_name="customers").one()
+        assert customers.description == "客户"
+        assert {c.column_name for c in customers.columns} == {"id", "name", "email"}
+        rels = db.query(SchemaRelationship).filter_by(connection_id=7).all()
+        assert [(r.source_table.table_name, r.relationship_type) for r in rels] == [("orders_1", "N-to-1")]
+
+
+class TestCachedInspector:
+
+    def test_prefetch_serves_repeated_reflection_from_cache(self):
+        engine = create_engine("sqlite://", poolclass=StaticPool)
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE customers (id INTEGER PRIMARY KEY, email TEXT UNIQUE)"))
+            conn.execute(text(
+                "CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers(id))"
+            ))
+
+        inspector = CachedInspector(inspect(engine))
+        inspector.prefetch(["customers", "orders"])
+
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        for _ in range(3):
+            assert inspector.get_pk_constraint("orders")["constrained_columns"] == ["id"]
+            assert inspector.get_foreign_keys("orders")[0]["referred_table"] == "customers"
+            assert inspector.get_unique_constraints("customers")[0]["column_names"] == ["email"]
+        assert statements == []
+
+    def test_chunked_parallel_prefetch_reports_progress(self, tmp_path):
+        from app.services.schema.discovery.sqlite import discover_sqlite_schema
+
+        engine = create_engine(f"sqlite:///{tmp_path / 'target.db'}")
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT)"))
+            for i in range(5):
+                conn.execute(text(
+                    f"CREATE TABLE orders_{i} (id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers(id))"
+                ))
+
+        inspector = CachedInspector(inspect(engine))
+        tables = inspector.get_table_names()
+        progress = []
+        inspector.prefetch(
+            tables,
+            methods=("get_columns", "get_pk_constraint", "get_foreign_keys"),
+            chunk_size=2,
+            max_workers=3,
+            progress_callback=lambda done, total: progress.append((done, total)),
+        )
+        assert sorted(progress) == [(2, 6), (4, 6), (6, 6)]
+        assert inspector.get_primary_keys("orders_0") == ["id"]
+
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        schema_info = discover_sqlite_schema(inspector)
+        assert len(schema_info) == 6
+        assert {t["table_name"] for t in schema_info} == set(tables)
+        # 仅剩视图列表查询，表/列/外键均来自预取结果
+        assert all("sqlite_master" in s or "sqlite_temp_master" in s for s in statements)
@@ -0,0 +1,129 @@
+"""
+Schema 快照缓存测试
+
+使用内存 SQLite 元数据库验证：
+- 批量加载表、列、关系并建立索引（不受分页 limit 限制）
+- 命中缓存时不访问数据库
+- invalidate() 后重新加载，版本号递增
+- retrieve_relevant_schema 基于快照组装 Schema 上下文
+"""
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.base import Base
+from app.models.schema_column import SchemaColumn
+from app.models.schema_relationship import SchemaRelationship
+from app.models.schema_table import SchemaTable
+from app.services.schema_snapshot import SchemaSnapshotCache
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    tables = [SchemaTable.__table__, SchemaColumn.__table__, SchemaRelationship.__table__]
+    Base.metadata.create_all(engine, tables=tables)
+    session = sessionmaker(bind=engine)()
+
+    orders = SchemaTable(id=1, connection_id=7, table_name="orders", description="订单表")
+    customers = SchemaTable(id=2, connection_id=7, table_name="customers", description=None)
+    products = SchemaTable(id=3, connection_id=7, table_name="products", description="商品")
+    other = SchemaTable(id=4, connection_id=8, table_name="orders", description="其他连接")
+    session.add_all([orders, customers, products, other])
+    session.add_all([
+        SchemaColumn(id=10, table_id=1, column_name="id", data_type="INT", is_primary_key=True),
+        SchemaColumn(id=11, table_id=1, column_name="customer_id", data_type="INT", is_foreign_key=True),
+        SchemaColumn(id=12, table_id=1, column_name="product_id", data_type="INT", is_foreign_key=True),
+        SchemaColumn(id=20, table_id=2, column_name="id", data_type="INT", is_primary_key=True),
+        SchemaColumn(id=21, table_id=2, column_name="name", data_type="VARCHAR", description="客户名称"),
+        SchemaColumn(id=30, table_id=3, column_name="id", data_type="INT", is_primary_key=True),
+        SchemaColumn(id=40, table_id=4, column_name="id", data_type="INT"),
+    ])
+    session.add_all([
+        SchemaRelationship(id=100, connection_id=7, source_table_id=1, source_column_id=11,
+                           target_table_id=2, target_column_id=20, relationship_type="many-to-one"),
+        SchemaRelationship(id=101, connection_id=7, source_table_id=1, source_column_id=12,
+                           target_table_id=3, target_column_id=30, relationship_type="many-to-one"),
+    ])
+    session.commit()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    session.info["statements"] = statements
+    yield session
+    session.close()
+    engine.dispose()
+
+
+class TestSchemaSnapshotCache:
+
+    def test_builds_indexes_for_connection(self, db):
+        snapshot = SchemaSnapshotCache(ttl=60).get(db, 7)
+
+        assert list(snapshot.tables) == [1, 2, 3]
+        assert snapshot.tables[2].description == ""
+        assert [c.name for c in snapshot.columns_of(1)] == ["id", "customer_id", "product_id"]
+        assert snapshot.table_by_name("customers").id == 2
+        assert [r.id for r in snapshot.outgoing[1]] == [100, 101]
+        assert [r.id for r in snapshot.incoming[2]] == [100]
+        assert [r.id for r in snapshot.relationships_among([2, 1])] == [100]
+        assert 40 not in snapshot.columns
+        assert len(db.info["statements"]) == 3
+
+    def test_cache_hit_skips_database(self, db):
+        cache = SchemaSnapshotCache(ttl=60)
+        first = cache.get(db, 7)
+        executed = len(db.info["statements"])
+
+        assert cache.get(db, 7) is first
+        assert len(db.info["statements"]) == executed
+        assert cache.get_stats()["hits"] == 1
+
+    def test_invalidate_reloads_with_new_version(self, db):
+        cache = SchemaSnapshotCache(ttl=60)
+        first = cache.get(db, 7)
+
+        db.get(SchemaTable, 3).description = "商品信息"
+        db.commit()
+        assert cache.get(db, 7) is first
+
+        cache.invalidate(7)
+        second = cache.get(db, 7)
+        assert second is not first
+        assert second.version == first.version + 1
+        assert second.tables[3].description == "商品信息"
+
+    def test_zero_ttl_disables_caching(self, db):
+        cache = SchemaSnapshotCache(ttl=0)
+        assert cache.get(db, 7) is not cache.get(db, 7)
+
+
+class TestRetrieveRelevantSchemaFromSnapshot:
+
+    def test_assembles_selected_tables_without_database(self, db, monkeypatch):
+        from app.services import text2sql_utils
+
+        cache = SchemaSnapshotCache(ttl=60)
+        cache.get(db, 7)
+        executed = len(db.info["statements"])
+
+        monkeypatch.setattr(text2sql_utils, "schema_snapshot_cache", cache)
+        monkeypatch.setattr(text2sql_utils, "analyze_query_with_llm", lambda q: {"entities": ["客户名称"]})
+        monkeypatch.setattr(text2sql_utils, "find_relevant_tables_semantic", lambda q, a, t: [(1, 1.0)])
+        # 外键扩展出的表全部保留
+        monkeypatch.setattr(text2sql_utils, "filter_expanded_tables_with_llm", lambda q, a, t, s: t)
+
+        result = text2sql_utils.retrieve_relevant_schema(db, 7, "每个客户的订单数")
+
+        # customers 由列匹配选中（+0.5），products 由外键扩展得到（1.0 * 0.7）
+        assert [t["name"] for t in result["tables"]] == ["orders", "products", "customers"]
+        assert {c["table_name"] for c in result["columns"]} == {"orders", "customers", "products"}
+        assert [(r["source_table"], r["source_column"], r["target_table"], r["target_column"])
+                for r in result["relationships"]] == [
+            ("orders", "customer_id", "customers", "id"),
+            ("orders", "product_id", "products", "id"),
+        ]
+        assert len(db.info["statements"]) == executed
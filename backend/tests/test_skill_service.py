@@ -9,6 +9,7 @@ Skill Service 单元测试
 - Neo4j 同步（Mock）
 """
 import pytest
+from contextlib import asynccontextmanager
 from unittest.mock import patch, MagicMock, AsyncMock
 from datetime import datetime
 
@@ -236,30 +237,33 @@ class TestSkillServiceNeo4j:
     def skill_service(self):
         return SkillService()
     
-    def test_get_neo4j_driver_lazy_init(self, skill_service):
-        """测试 Neo4j 驱动懒加载"""
-        assert skill_service._neo4j_driver is None
-        assert skill_service._neo4j_initialized is False
-    
-    @patch('app.services.skill_service.GraphDatabase')
-    def test_get_neo4j_driver_success(self, mock_graph_db, skill_service):
-        """测试成功获取 Neo4j 驱动"""
-        mock_driver = MagicMock()
-        mock_graph_db.driver.return_value = mock_driver
-        
-        driver = skill_service._get_neo4j_driver()
-        
-        # 验证驱动被创建
-        assert mock_graph_db.driver.called
-    
-    @patch('app.services.skill_service.GraphDatabase')
-    def test_get_neo4j_driver_failure(self, mock_graph_db, skill_service):
-        """测试获取 Neo4j 驱动失败"""
-        mock_graph_db.driver.side_effect = Exception("Connection failed")
-        
-        driver = skill_service._get_neo4j_driver()
-        
-        assert driver is None
+    @staticmethod
+    def _mock_async_session(session):
+        @asynccontextmanager
+        async def _session():
+            yield session
+        return _session
+
+    @pytest.mark.asyncio
+    async def test_remove_uses_shared_async_session(self, skill_service):
+        """测试通过共享异步驱动执行 Neo4j 写入"""
+        session = AsyncMock()
+        with patch('app.services.skill_service.neo4j_service') as mock_neo4j:
+            mock_neo4j.async_session = self._mock_async_session(session)
+            await skill_service._remove_from_neo4j("sales_order", connection_id=1)
+
+        session.run.assert_awaited_once()
+        assert session.run.await_args.kwargs == {"name": "sales_order", "connection_id": 1}
+
+    @pytest.mark.asyncio
+    async def test_neo4j_failure_degrades_gracefully(self, skill_service):
+        """测试 Neo4j 不可用时返回空结果而不抛出异常"""
+        skill = MagicMock(table_names=["orders"], join_rules=None)
+        skill.name = "sales_order"
+        with patch('app.services.skill_service.neo4j_service') as mock_neo4j:
+            mock_neo4j.async_session.side_effect = Exception("Connection failed")
+            assert await skill_service._get_skill_metrics(skill, connection_id=1) == []
+            assert await skill_service._get_skill_join_rules(skill, connection_id=1) == []
 
 
 class TestSkillServiceMultiTenant:
@@ -0,0 +1,87 @@
+"""
+Widget 数据缓存列式编码测试
+
+验证：
+- 列名只存一次，小结果不压缩，大结果 zstd 压缩后仍可还原
+- cache_rows / columnar_view 兼容旧格式（data / rows / 列表）和洞察分析缓存，cache_rows 可只展开前几行
+- 响应 Schema 返回列式格式：压缩的只解压为 values，未压缩的原样返回，不展开为行字典
+"""
+import json
+from datetime import datetime
+
+from app.core.config import settings
+from app.schemas.dashboard_widget import WidgetRefreshResponse
+from app.services.widget_cache_codec import cache_rows, columnar_view, encode_data_cache
+
+COLUMNS = ["region", "amount"]
+
+
+def make_rows(n):
+    return [["华东" if i % 2 else "华北", i * 1.5] for i in range(n)]
+
+
+def test_small_cache_is_plain_columnar():
+    cache = encode_data_cache(COLUMNS, make_rows(3), truncated=True)
+
+    assert cache["values"] == [["华北", "华东", "华北"], [0.0, 1.5, 3.0]]
+    assert "codec" not in cache and cache["row_count"] == 3
+    assert cache_rows(cache)[1] == {"region": "华东", "amount": 1.5}
+
+
+def test_large_cache_is_compressed(monkeypatch):
+    monkeypatch.setattr(settings, "DASHBOARD_CACHE_COMPRESS_MIN_BYTES", 1024)
+    rows = make_rows(5000)
+    cache = encode_data_cache(COLUMNS, rows)
+
+    assert cache["codec"] == "zstd" and "values" not in cache
+    legacy_size = len(json.dumps([dict(zip(COLUMNS, row)) for row in rows], ensure_ascii=False))
+    assert len(json.dumps(cache)) * 5 < legacy_size
+
+    view = columnar_view(json.loads(json.dumps(cache)))
+    assert view["values"][1][4999] == 4999 * 1.5
+    assert set(view) == {"format", "columns", "values", "row_count", "truncated", "refreshed_at"}
+    assert cache_rows(cache)[4999] == {"region": "华东", "amount": 4999 * 1.5}
+
+
+def test_compression_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "DASHBOARD_CACHE_COMPRESS_MIN_BYTES", 0)
+    monkeypatch.setattr(settings, "DASHBOARD_CACHE_COMPRESSION", "none")
+
+    assert "values" in encode_data_cache(COLUMNS, make_rows(10))
+
+
+def test_legacy_formats_pass_through():
+    rows = [{"region": "华东", "amount": 1}]
+    insight = {"summary": {"total_rows": 1}}
+
+    assert cache_rows({"data": rows}) == rows
+    assert cache_rows({"columns": ["region"], "rows": rows}) == rows
+    assert cache_rows(rows) == rows
+    assert cache_rows(None) == [] and cache_rows(insight) == []
+    assert columnar_view(insight) is insight and columnar_view(rows) is rows
+
+
+def test_sample_rows_only_builds_limit(monkeypatch):
+    monkeypatch.setattr(settings, "DASHBOARD_CACHE_COMPRESS_MIN_BYTES", 1024)
+    cache = encode_data_cache(COLUMNS, make_rows(5000))
+
+    assert cache_rows(cache, limit=2) == [{"region": "华北", "amount": 0.0}, {"region": "华东", "amount": 1.5}]
+    assert cache_rows({"data": [{"a": i} for i in range(5)]}, limit=3) == [{"a": 0}, {"a": 1}, {"a": 2}]
+
+
+def test_empty_and_error_cache():
+    cache = encode_data_cache([], [], error="boom")
+
+    assert columnar_view(cache) is cache
+    assert cache["values"] == [] and cache["error"] == "boom"
+    assert cache_rows(cache) == []
+
+
+def test_response_schema_keeps_columnar_form():
+    cache = encode_data_cache(COLUMNS, make_rows(2))
+    response = WidgetRefreshResponse(
+        id=1, data_cache=cache, last_refresh_at=datetime.utcnow(), refresh_duration_ms=1
+    )
+
+    assert response.data_cache == cache
+    assert "data" not in response.data_cache
@@ -21,6 +21,11 @@ import type {
   GlobalRefreshRequest,
   GlobalRefreshResponse,
 } from '../types/dashboard';
+import { withDecodedDataCache } from '../utils/widgetDataCache';
+
+// Widget 的 data_cache 为列式格式，拿到响应时展开为行
+const decodeDashboardDetail = (detail: DashboardDetail): DashboardDetail =>
+  detail?.widgets ? { ...detail, widgets: detail.widgets.map(withDecodedDataCache) } : detail;
 
 // Dashboard服务
 export const dashboardService = {
@@ -38,7 +43,7 @@ export const dashboardService = {
   // 获取Dashboard详情
   async getDashboardDetail(id: number): Promise<DashboardDetail> {
     const response = await api.get(`/dashboards/${id}`);
-    return response.data;
+    return decodeDashboardDetail(response.data);
   },
 
   // 创建Dashboard
@@ -50,7 +55,7 @@ export const dashboardService = {
   // 更新Dashboard
   async updateDashboard(id: number, data: DashboardUpdate): Promise<DashboardDetail> {
     const response = await api.put(`/dashboards/${id}`, data);
-    return response.data;
+    return decodeDashboardDetail(response.data);
   },
 
   // 删除Dashboard
@@ -62,7 +67,7 @@ export const dashboardService = {
   // 更新Dashboard布局
   async updateDashboardLayout(id: number, layout: LayoutUpdateRequest): Promise<DashboardDetail> {
     const response = await api.put(`/dashboards/${id}/layout`, layout);
-    return response.data;
+    return decodeDashboardDetail(response.data);
   },
 
   // 获取Dashboard权限列表
@@ -194,13 +199,13 @@ export const widgetService = {
   // 创建Widget
   async createWidget(dashboardId: number, data: WidgetCreate): Promise<Widget> {
     const response = await api.post(`/dashboards/${dashboardId}/widgets`, data);
-    return response.data;
+    return withDecodedDataCache(response.data);
   },
 
   // 更新Widget
   async updateWidget(widgetId: number, data: WidgetUpdate): Promise<Widget> {
     const response = await api.put(`/widgets/${widgetId}`, data);
-    return response.data;
+    return withDecodedDataCache(response.data);
   },
 
   // 删除Widget
@@ -212,13 +217,13 @@ export const widgetService = {
   // 手动刷新Widget数据
   async refreshWidget(widgetId: number): Promise<WidgetRefreshResponse> {
     const response = await api.post(`/widgets/${widgetId}/refresh`);
-    return response.data;
+    return withDecodedDataCache(response.data);
   },
 
   // 重新生成Widget查询
   async regenerateWidgetQuery(widgetId: number, data: WidgetRegenerateRequest): Promise<WidgetRegenerateResponse> {
     const response = await api.post(`/widgets/${widgetId}/regenerate`, data);
-    return response.data;
+    return withDecodedDataCache(response.data);
   },
 
   // 批量更新Widget位置（用于拖拽后批量保存）
@@ -267,7 +272,7 @@ export const widgetService = {
       widgetIds.map(async (id) => {
         try {
           const response = await api.post(`/widgets/${id}/refresh`);
-          results[id] = response.data;
+          results[id] = withDecodedDataCache(response.data);
           success.push(id);
         } catch (error) {
           failed.push(id);
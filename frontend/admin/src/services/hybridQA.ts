@@ -91,16 +91,20 @@ export const hybridQAService = {
     return response.data;
   },
 
-  // 导出问答对
-  async exportQAPairs(connectionId?: number, format: string = 'json'): Promise<{
-    status: string;
-    message: string;
-    format: string;
-    connection_id?: number;
+  // 导出问答对（后端以文件流返回 NDJSON 或 CSV）
+  async exportQAPairs(connectionId: number, format: 'ndjson' | 'csv' = 'ndjson'): Promise<{
+    blob: Blob;
+    filename: string;
   }> {
-    const params = { format, ...(connectionId && { connection_id: connectionId }) };
-    const response = await api.get('/hybrid-qa/qa-pairs/export', { params });
-    return response.data;
+    const params = { format, connection_id: connectionId };
+    const response = await api.get('/hybrid-qa/qa-pairs/export', { params, responseType: 'blob' });
+    const disposition: string = response.headers['content-disposition'] || '';
+    const match = disposition.match(/filename="?([^"]+)"?/);
+    const extension = format === 'csv' ? 'csv' : 'ndjson';
+    return {
+      blob: response.data,
+      filename: match ? match[1] : `qa_pairs_${connectionId}.${extension}`,
+    };
   },
 
   // 健康检查
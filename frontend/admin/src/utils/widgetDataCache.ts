@@ -0,0 +1,30 @@
+// Widget 数据缓存解码
+//
+// 后端以列式格式返回 data_cache（列名只出现一次，不在服务端展开为行对象）：
+//   { format: 'columnar', columns: [...], values: [[列1的值...], [列2的值...]], row_count, truncated, refreshed_at }
+// 这里在拿到响应时展开为组件使用的 { columns, data: [{列名: 值}], row_count, ... }。
+// 旧格式缓存和洞察分析结果原样返回。
+
+export const decodeDataCache = (cache: any): any => {
+  if (!cache || cache.format !== 'columnar') return cache;
+
+  const columns: string[] = cache.columns || [];
+  const columnValues: any[][] = cache.values || [];
+  const rowCount = columnValues.length ? columnValues[0].length : 0;
+  const data = new Array(rowCount);
+  for (let i = 0; i < rowCount; i++) {
+    const row: Record<string, any> = {};
+    columns.forEach((column, j) => {
+      row[column] = columnValues[j][i];
+    });
+    data[i] = row;
+  }
+  const decoded = { ...cache, columns, data };
+  delete decoded.format;
+  delete decoded.values;
+  return decoded;
+};
+
+// 解码带 data_cache 字段的对象（Widget、刷新结果等）
+export const withDecodedDataCache = <T extends { data_cache?: any }>(item: T): T =>
+  item && item.data_cache ? { ...item, data_cache: decodeDataCache(item.data_cache) } : item;